@@ -10,4 +10,5 @@ class AiAssistantConfig(AppConfig):
 
     def ready(self):
         """应用启动时执行"""
-        # 可以在这里导入信号处理器等
+        # 注册信号处理器
+        import ai_assistant.signals  # noqa: F401
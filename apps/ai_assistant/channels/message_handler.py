@@ -9,6 +9,7 @@ import json
 from django.contrib.auth import get_user_model
 
 from ..services import AIService
+from ..services.cache_service import CachedToolWrapper
 from ..tools import ToolRegistry
 from ..utils.logger import AIAssistantLogger, log_channel_message, log_error, log_tool_execution
 from .base_channel import IncomingMessage, OutgoingMessage
@@ -199,9 +200,9 @@ class MessageHandler:
 
                 return {"success": False, "error": error_msg}
 
-            # 执行工具
+            # 执行工具（只读工具的结果按权限范围缓存）
             logger.debug(f"Tool params: {arguments}")
-            result = tool.run(**arguments)
+            result = CachedToolWrapper(tool).run(**arguments)
 
             execution_time = time.time() - start_time
 
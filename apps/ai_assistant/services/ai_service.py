@@ -3,25 +3,25 @@ AI Service 统一服务接口
 
 负责：
 1. Provider选择和初始化
-2. 会话管理
-3. 消息记录
+2. 会话管理（上下文窗口缓存见 conversation_context）
+3. 消息记录（异步批量落库）
 4. Token统计
 """
 
 import time
 import uuid
-from typing import Any, Dict, Iterator, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from django.contrib.auth import get_user_model
-from django.utils import timezone
 
-from ..models import AIConversation, AIMessage, AIModelConfig
+from ..models import AIConversation, AIModelConfig
 from ..providers.anthropic_provider import AnthropicProvider
 from ..providers.baidu_provider import BaiduProvider
 from ..providers.base import AIResponse, BaseAIProvider
 from ..providers.mock_provider import MockAIProvider
 from ..providers.openai_provider import OpenAIProvider
 from ..utils import decrypt_api_key
+from .conversation_context import ConversationContextStore, schedule_persist_turn
 
 User = get_user_model()
 
@@ -57,6 +57,9 @@ class AIService:
         # 初始化Provider
         self.provider = self._init_provider()
 
+        # 会话上下文缓存
+        self.context_store = ConversationContextStore()
+
     def _get_default_model_config(self) -> AIModelConfig:
         """获取默认的模型配置"""
         config = (
@@ -116,44 +119,39 @@ class AIService:
         Returns:
             AIResponse对象
         """
-        # 获取或创建会话
-        conversation = self._get_or_create_conversation(conversation_id, channel)
-
-        # 记录用户消息
-        self._save_message(conversation=conversation, role="user", content=message)
+        # 获取会话上下文（缓存命中时无数据库查询）
+        conversation_id, state = self._get_conversation_context(conversation_id, channel)
 
-        # 获取上下文消息
-        context_messages = self._get_context_messages(conversation)
-
-        # 添加当前用户消息
-        context_messages.append({"role": "user", "content": message})
+        # 用户消息先进入上下文窗口，与AI响应一起落库
+        user_message = {"role": "user", "content": message}
+        self.context_store.append(conversation_id, state, [user_message])
+        context_messages = self.context_store.context_messages(state)
 
         # 调用Provider
         start_time = time.time()
-        response = self.provider.chat(context_messages, tools)
+        try:
+            response = self.provider.chat(context_messages, tools)
+        except Exception:
+            # Provider调用失败时单独落库用户消息，消息不丢失
+            self._persist_messages(state, [user_message])
+            raise
         response_time = time.time() - start_time
 
-        # 记录AI响应
-        self._save_message(
-            conversation=conversation,
-            role="assistant",
-            content=response.content,
-            tool_calls=response.tool_calls,
+        # 更新上下文窗口并异步落库
+        self._record_turn(
+            conversation_id,
+            state,
+            user_message,
+            {
+                "role": "assistant",
+                "content": response.content,
+                "tool_calls": response.tool_calls,
+                "tokens_used": response.tokens_used,
+                "response_time": round(response_time, 3),
+            },
             tokens_used=response.tokens_used,
-            response_time=response_time,
         )
 
-        # 更新会话信息
-        conversation.message_count = conversation.messages.count()
-        conversation.last_message_at = timezone.now()
-        conversation.save()
-
-        # 更新模型配置统计
-        self.model_config.total_requests += 1
-        self.model_config.total_tokens += response.tokens_used
-        self.model_config.last_used_at = timezone.now()
-        self.model_config.save()
-
         return response
 
     def stream_chat(
@@ -175,47 +173,68 @@ class AIService:
         Yields:
             生成的文本片段
         """
-        # 获取或创建会话
-        conversation = self._get_or_create_conversation(conversation_id, channel)
+        # 获取会话上下文
+        conversation_id, state = self._get_conversation_context(conversation_id, channel)
 
-        # 记录用户消息
-        self._save_message(conversation=conversation, role="user", content=message)
-
-        # 获取上下文消息
-        context_messages = self._get_context_messages(conversation)
-        context_messages.append({"role": "user", "content": message})
+        # 用户消息先进入上下文窗口，与AI响应一起落库
+        user_message = {"role": "user", "content": message}
+        self.context_store.append(conversation_id, state, [user_message])
+        context_messages = self.context_store.context_messages(state)
 
         # 流式调用Provider
         start_time = time.time()
         full_response = ""
 
-        for chunk in self.provider.stream_chat(context_messages, tools):
-            full_response += chunk
-            yield chunk
+        try:
+            for chunk in self.provider.stream_chat(context_messages, tools):
+                full_response += chunk
+                yield chunk
+        except BaseException:
+            # Provider调用失败或调用方中断输出时单独落库用户消息
+            self._persist_messages(state, [user_message])
+            raise
 
         response_time = time.time() - start_time
 
-        # 记录完整的AI响应
-        self._save_message(
-            conversation=conversation,
-            role="assistant",
-            content=full_response,
-            response_time=response_time,
+        # 更新上下文窗口并异步落库
+        self._record_turn(
+            conversation_id,
+            state,
+            user_message,
+            {
+                "role": "assistant",
+                "content": full_response,
+                "response_time": round(response_time, 3),
+            },
         )
 
-        # 更新会话信息
-        conversation.message_count = conversation.messages.count()
-        conversation.last_message_at = timezone.now()
-        conversation.save()
+    def _get_conversation_context(
+        self, conversation_id: Optional[str], channel: str
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        获取会话上下文
+
+        优先读取缓存的上下文窗口；未命中时查询（或创建）会话并预热缓存。
+
+        Returns:
+            (会话ID, 上下文字典)
+        """
+        if conversation_id:
+            state = self.context_store.get(conversation_id)
+            if state and state.get("user_id") == self.user.pk:
+                return conversation_id, state
 
-        # 更新模型配置统计
-        self.model_config.total_requests += 1
-        self.model_config.last_used_at = timezone.now()
-        self.model_config.save()
+        conversation, created = self._get_or_create_conversation(conversation_id, channel)
+        if created:
+            state = self.context_store.create(conversation)
+        else:
+            state = self.context_store.load(conversation)
+
+        return conversation.conversation_id, state
 
     def _get_or_create_conversation(
         self, conversation_id: Optional[str], channel: str
-    ) -> AIConversation:
+    ) -> Tuple[AIConversation, bool]:
         """获取或创建会话"""
         if conversation_id:
             # 尝试获取现有会话
@@ -224,7 +243,7 @@ class AIService:
             ).first()
 
             if conversation:
-                return conversation
+                return conversation, False
 
         # 创建新会话
         conversation_id = conversation_id or self._generate_conversation_id()
@@ -236,59 +255,46 @@ class AIService:
             created_by=self.user,
         )
 
-        return conversation
+        return conversation, True
 
     def _generate_conversation_id(self) -> str:
         """生成会话ID"""
         return f"conv_{uuid.uuid4().hex[:16]}"
 
-    def _get_context_messages(
-        self, conversation: AIConversation, limit: int = 10
-    ) -> List[Dict[str, str]]:
+    def _record_turn(
+        self,
+        conversation_id: str,
+        state: Dict[str, Any],
+        user_message: Dict[str, Any],
+        reply: Dict[str, Any],
+        tokens_used: int = 0,
+    ):
         """
-        获取上下文消息
+        记录一轮对话
 
-        Args:
-            conversation: 会话对象
-            limit: 最多获取多少条消息（默认10条）
+        AI响应追加到缓存中的上下文窗口（用户消息在调用Provider之前已追加），
+        用户消息和AI响应由同一个异步任务按顺序落库。
 
-        Returns:
-            消息列表
+        Args:
+            conversation_id: 会话ID
+            state: 上下文字典
+            user_message: 用户消息
+            reply: AI响应
+            tokens_used: 本轮消耗的Token数
         """
-        messages = conversation.messages.filter(is_deleted=False).order_by("-created_at")[:limit]
+        self.context_store.append(conversation_id, state, [reply])
+        self._persist_messages(state, [user_message, reply], tokens_used=tokens_used)
 
-        # 反转顺序（最早的在前）
-        messages = list(reversed(messages))
-
-        context = []
-        for msg in messages:
-            # 跳过最后一条用户消息（因为会在外部添加）
-            if msg == messages[-1] and msg.role == "user":
-                continue
-
-            context.append({"role": msg.role, "content": msg.content})
-
-        return context
-
-    def _save_message(
-        self,
-        conversation: AIConversation,
-        role: str,
-        content: str,
-        tool_calls: Optional[List] = None,
-        tokens_used: int = 0,
-        response_time: float = None,
+    def _persist_messages(
+        self, state: Dict[str, Any], messages: List[Dict[str, Any]], tokens_used: int = 0
     ):
-        """保存消息到数据库"""
-        AIMessage.objects.create(
-            conversation=conversation,
-            role=role,
-            content=content,
-            tool_calls=tool_calls,
-            model_config=self.model_config if role == "assistant" else None,
-            tokens_used=tokens_used,
-            response_time=response_time,
-            created_by=self.user,
+        """调度消息和统计计数的批量落库"""
+        schedule_persist_turn(
+            state["conversation_pk"],
+            self.user.pk,
+            self.model_config.pk,
+            messages,
+            tokens_used=tokens_used or 0,
         )
 
     @classmethod
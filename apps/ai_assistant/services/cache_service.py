@@ -1,21 +1,35 @@
 """
 缓存服务
 
-提供工具执行结果的缓存机制，提高查询性能
+提供工具执行结果的缓存机制，提高查询性能：
+1. 缓存键包含权限范围，权限不同的用户不会读到彼此的结果
+2. 工具声明读取的模型，模型数据变更时递增版本号，旧结果不再命中
+3. 耗时的报表工具使用单飞锁，相同请求并发时只查询一次数据库
 """
 
 import hashlib
 import json
-from typing import Any, Dict, Optional
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 
 from django.core.cache import cache
 
+logger = logging.getLogger(__name__)
+
 
 class CacheService:
     """
     缓存服务
 
     负责管理工具执行结果的缓存
+
+    缓存键结构::
+
+        erp_tool_result:{tool_name}:{scope}:{sha256(版本号 + 参数)}
+
+    版本号由全局命名空间版本和工具读取的各模型版本组成，
+    模型 post_save/post_delete 时递增对应版本，无需遍历删除缓存键。
     """
 
     # 缓存键前缀
@@ -24,49 +38,147 @@ class CacheService:
     # 默认缓存时间（秒）
     DEFAULT_TTL = 300  # 5分钟
 
-    @staticmethod
-    def generate_cache_key(tool_name: str, params: Dict[str, Any]) -> str:
+    # 单飞锁持有时间（秒），防止执行者异常退出后锁不释放
+    LOCK_TIMEOUT = 60
+
+    # 等待单飞锁执行者结果的最长时间（秒）
+    LOCK_WAIT_TIMEOUT = 30
+
+    # 等待期间轮询缓存的间隔（秒）
+    LOCK_POLL_INTERVAL = 0.05
+
+    # ==================== 版本号 ====================
+
+    @classmethod
+    def namespace_key(cls) -> str:
+        """全局命名空间版本键（clear_all 时递增）"""
+        return f"{cls.CACHE_KEY_PREFIX}:version:__all__"
+
+    @classmethod
+    def model_version_key(cls, model_label: str) -> str:
+        """模型版本键"""
+        return f"{cls.CACHE_KEY_PREFIX}:version:{model_label}"
+
+    @classmethod
+    def get_versions(cls, model_labels: Iterable[str] = ()) -> str:
+        """
+        获取命名空间和模型的当前版本号
+
+        版本键不存在（首次使用或被淘汰）时以当前时间初始化，
+        保证重新初始化的版本号不会与历史版本号重复。
+
+        Args:
+            model_labels: 模型标签列表（app_label.ModelName）
+
+        Returns:
+            版本号串
+        """
+        keys = [cls.namespace_key()] + [
+            cls.model_version_key(label) for label in sorted(set(model_labels))
+        ]
+        versions = cache.get_many(keys)
+
+        missing = [key for key in keys if key not in versions]
+        if missing:
+            seed = time.time_ns()
+            for key in missing:
+                cache.add(key, seed, None)
+            versions.update(cache.get_many(missing))
+
+        return ".".join(str(versions.get(key, 0)) for key in keys)
+
+    @classmethod
+    def bump_version(cls, model_label: str):
+        """
+        递增模型版本号，使读取该模型的工具缓存全部失效
+
+        Args:
+            model_label: 模型标签（app_label.ModelName）
+        """
+        cls._incr_version(cls.model_version_key(model_label))
+
+    @classmethod
+    def _incr_version(cls, key: str):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # 版本键不存在：初始化为新值即可使旧缓存失效
+            cache.add(key, time.time_ns(), None)
+
+    # ==================== 缓存键 ====================
+
+    @classmethod
+    def get_scope(cls, tool) -> str:
+        """
+        获取工具结果的缓存范围
+
+        cache_scope="permission" 的工具在权限相同的用户之间共享结果，
+        其余工具按用户隔离。
+
+        Args:
+            tool: 工具实例
+
+        Returns:
+            缓存范围标识
+        """
+        from ..tools.registry import ToolRegistry
+
+        fingerprint = ToolRegistry.get_permission_fingerprint(tool.user)
+        if tool.cache_scope == "permission":
+            return fingerprint
+        user_id = getattr(tool.user, "pk", None) or "anonymous"
+        return f"{fingerprint}:user:{user_id}"
+
+    @classmethod
+    def generate_cache_key(
+        cls,
+        tool_name: str,
+        params: Dict[str, Any],
+        scope: str = "",
+        model_labels: Iterable[str] = (),
+    ) -> str:
         """
         生成缓存键
 
         Args:
             tool_name: 工具名称
             params: 工具参数
+            scope: 缓存范围（权限指纹/用户）
+            model_labels: 工具读取的模型
 
         Returns:
             缓存键
         """
-        # 将参数转换为字符串并哈希
-        params_str = json.dumps(params, sort_keys=True)
-        params_hash = hashlib.sha256(params_str.encode()).hexdigest()[:8]
+        params_str = json.dumps(params, sort_keys=True, default=str)
+        versions = cls.get_versions(model_labels)
+        digest = hashlib.sha256(f"{versions}|{params_str}".encode()).hexdigest()
 
-        return f"{CacheService.CACHE_KEY_PREFIX}:{tool_name}:{params_hash}"
+        return f"{cls.CACHE_KEY_PREFIX}:{tool_name}:{scope or 'global'}:{digest}"
 
-    @staticmethod
-    def get(tool_name: str, params: Dict[str, Any]) -> Optional[Any]:
+    # ==================== 读写 ====================
+
+    @classmethod
+    def get(cls, cache_key: str) -> Optional[Any]:
         """
         从缓存获取工具执行结果
 
         Args:
-            tool_name: 工具名称
-            params: 工具参数
+            cache_key: 缓存键
 
         Returns:
             缓存的结果，如果不存在则返回None
         """
-        cache_key = CacheService.generate_cache_key(tool_name, params)
-        return cache.get(cache_key)
+        result = cache.get(cache_key)
+        cls._record_stat("hits" if result is not None else "misses")
+        return result
 
-    @staticmethod
-    def set(
-        tool_name: str, params: Dict[str, Any], result: Dict[str, Any], ttl: int = None
-    ) -> bool:
+    @classmethod
+    def set(cls, cache_key: str, result: Dict[str, Any], ttl: int = None) -> bool:
         """
         将工具执行结果存入缓存
 
         Args:
-            tool_name: 工具名称
-            params: 工具参数
+            cache_key: 缓存键
             result: 执行结果
             ttl: 缓存时间（秒），默认使用DEFAULT_TTL
 
@@ -74,36 +186,103 @@ class CacheService:
             是否成功设置缓存
         """
         if ttl is None:
-            ttl = CacheService.DEFAULT_TTL
-
-        cache_key = CacheService.generate_cache_key(tool_name, params)
-        return cache.set(cache_key, result, ttl)
+            ttl = cls.DEFAULT_TTL
+        cache.set(cache_key, result, ttl)
+        return True
 
-    @staticmethod
-    def delete(tool_name: str, params: Dict[str, Any]) -> bool:
+    @classmethod
+    def delete(cls, cache_key: str) -> bool:
         """
         删除工具执行结果缓存
 
         Args:
-            tool_name: 工具名称
-            params: 工具参数
+            cache_key: 缓存键
 
         Returns:
             是否成功删除
         """
-        cache_key = CacheService.generate_cache_key(tool_name, params)
         return cache.delete(cache_key)
 
-    @staticmethod
-    def clear_all():
-        """清空所有工具结果缓存"""
-        # 注意：这会清空所有缓存，需要谨慎使用
-        keys = cache.keys("erp_tool_result:*")
-        for key in keys:
-            cache.delete(key)
+    @classmethod
+    def get_or_compute(
+        cls,
+        cache_key: str,
+        compute: Callable[[], Tuple[Any, bool]],
+        ttl: int = None,
+        single_flight: bool = False,
+    ) -> Tuple[Any, bool]:
+        """
+        读取缓存，未命中时执行 compute 并写入缓存
 
-    @staticmethod
-    def get_cache_stats() -> Dict[str, Any]:
+        single_flight=True 时只有获得锁的请求执行 compute，
+        其余并发请求等待其写入缓存；执行者失败或等待超时后各自执行。
+
+        Args:
+            cache_key: 缓存键
+            compute: 返回 (结果, 是否可缓存) 的函数
+            ttl: 缓存时间（秒）
+            single_flight: 是否启用单飞锁
+
+        Returns:
+            (结果, 是否来自缓存)
+        """
+        cached = cls.get(cache_key)
+        if cached is not None:
+            return cached, True
+
+        if not single_flight:
+            return cls._compute_and_set(cache_key, compute, ttl), False
+
+        lock_key = f"{cache_key}:lock"
+        if cache.add(lock_key, 1, cls.LOCK_TIMEOUT):
+            try:
+                return cls._compute_and_set(cache_key, compute, ttl), False
+            finally:
+                cache.delete(lock_key)
+
+        deadline = time.monotonic() + cls.LOCK_WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(cls.LOCK_POLL_INTERVAL)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                cls._record_stat("hits")
+                return cached, True
+            if cache.get(lock_key) is None:
+                # 执行者已结束但没有写入缓存（执行失败），不再等待
+                break
+
+        logger.debug(f"等待单飞锁结果未命中，直接执行: {cache_key}")
+        return cls._compute_and_set(cache_key, compute, ttl), False
+
+    @classmethod
+    def _compute_and_set(cls, cache_key: str, compute, ttl: int = None) -> Any:
+        result, cacheable = compute()
+        if cacheable:
+            cls.set(cache_key, result, ttl)
+        return result
+
+    # ==================== 管理 ====================
+
+    @classmethod
+    def clear_all(cls):
+        """使所有工具结果缓存失效（递增全局命名空间版本，旧键随TTL过期）"""
+        cls._incr_version(cls.namespace_key())
+
+    @classmethod
+    def _stat_key(cls, name: str) -> str:
+        return f"{cls.CACHE_KEY_PREFIX}:stats:{name}"
+
+    @classmethod
+    def _record_stat(cls, name: str):
+        key = cls._stat_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, None):
+                cache.incr(key)
+
+    @classmethod
+    def get_cache_stats(cls) -> Dict[str, Any]:
         """
         获取缓存统计信息
 
@@ -111,25 +290,18 @@ class CacheService:
             缓存统计信息
         """
         try:
-            # 获取所有工具缓存键
-            keys = cache.keys("erp_tool_result:*")
+            from ..tools.registry import ToolRegistry
 
-            # 统计信息
-            total_keys = len(keys)
-            tool_stats = {}
-
-            for key in keys:
-                # 解析工具名称
-                parts = key.split(":")
-                if len(parts) >= 3:
-                    tool_name = parts[2]
-                    tool_stats[tool_name] = tool_stats.get(tool_name, 0) + 1
+            counters = cache.get_many([cls._stat_key("hits"), cls._stat_key("misses")])
+            hits = counters.get(cls._stat_key("hits"), 0)
+            misses = counters.get(cls._stat_key("misses"), 0)
+            total = hits + misses
 
             return {
-                "total_cached_results": total_keys,
-                "tools_with_cache": len(tool_stats),
-                "cache_hit_ratio": "N/A",  # 需要额外统计
-                "tool_distribution": tool_stats,
+                "hits": hits,
+                "misses": misses,
+                "cache_hit_ratio": round(hits / total, 4) if total else 0,
+                "watched_models": sorted(ToolRegistry.get_cache_model_labels()),
             }
         except Exception as e:
             return {"error": str(e)}
@@ -139,7 +311,8 @@ class CachedToolWrapper:
     """
     缓存工具包装器
 
-    为查询工具提供透明的缓存支持
+    为查询工具提供透明的缓存支持。只有 risk_level="low" 且声明了
+    cache_models 的工具会被缓存，其他工具直接执行。
     """
 
     def __init__(self, tool, ttl: int = None):
@@ -148,10 +321,32 @@ class CachedToolWrapper:
 
         Args:
             tool: 被包装的工具实例
-            ttl: 缓存时间（秒），默认使用工具特定的TTL
+            ttl: 缓存时间（秒），默认使用工具声明的cache_ttl
         """
         self.tool = tool
-        self.ttl = ttl or CacheService.DEFAULT_TTL
+        self.ttl = ttl or tool.cache_ttl or CacheService.DEFAULT_TTL
+
+    @property
+    def cacheable(self) -> bool:
+        """工具结果是否可缓存"""
+        return self.tool.risk_level == "low" and bool(self.tool.cache_models)
+
+    def run(self, **kwargs):
+        """
+        执行工具（带缓存），返回ToolResult
+
+        Args:
+            **kwargs: 工具参数
+
+        Returns:
+            ToolResult对象
+        """
+        from ..tools.base_tool import ToolResult
+
+        if not self.cacheable:
+            return self.tool.run(**kwargs)
+
+        return ToolResult.from_dict(self.execute(**kwargs))
 
     def execute(self, **kwargs) -> Dict[str, Any]:
         """
@@ -163,30 +358,29 @@ class CachedToolWrapper:
         Returns:
             执行结果
         """
-        tool_name = self.tool.name
-
-        # 检查是否是查询工具（查询工具可以缓存）
-        if self.tool.risk_level != "low":
-            # 非查询工具不缓存
+        # 非查询工具或无权限时不走缓存（权限不足的结果不应写入共享范围）
+        if not self.cacheable or not self.tool.check_permission():
+            return self.tool.run(**kwargs).to_dict()
+
+        cache_key = CacheService.generate_cache_key(
+            self.tool.name,
+            kwargs,
+            scope=CacheService.get_scope(self.tool),
+            model_labels=self.tool.cache_models,
+        )
+
+        def compute():
             result = self.tool.run(**kwargs)
-            return result.to_dict()
-
-        # 尝试从缓存获取
-        cached_result = CacheService.get(tool_name, kwargs)
-        if cached_result is not None:
-            # 添加缓存标记
-            cached_result["_cached"] = True
-            return cached_result
-
-        # 缓存未命中，执行工具
-        result = self.tool.run(**kwargs)
-        result_dict = result.to_dict()
+            return result.to_dict(), result.success and result.data is not None
 
-        # 将成功的结果存入缓存
-        if result.success and result.data is not None:
-            CacheService.set(tool_name, kwargs, result_dict, self.ttl)
+        result, cached = CacheService.get_or_compute(
+            cache_key, compute, self.ttl, single_flight=self.tool.cache_single_flight
+        )
 
-        return result_dict
+        if cached:
+            # 添加缓存标记（不修改缓存中的对象）
+            result = dict(result, _cached=True)
+        return result
 
 
 class QueryOptimizer:
@@ -283,11 +283,10 @@ class ChannelAIService:
             allowed_tools = self.user_ai_config.get_allowed_tools_list()
             blocked_tools = self.user_ai_config.blocked_tools or []
 
-            all_tools = ToolRegistry.get_available_tools(self.user)
             available = [
-                tool.name
-                for tool in all_tools
-                if tool.name in allowed_tools and tool.name not in blocked_tools
+                name
+                for name in ToolRegistry.get_available_tool_names(self.user)
+                if name in allowed_tools and name not in blocked_tools
             ]
 
             return available
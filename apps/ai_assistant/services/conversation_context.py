@@ -0,0 +1,285 @@
+"""
+会话上下文存储
+
+为 AIService 维护每个会话的滚动上下文窗口：
+1. 上下文窗口按Token预算裁剪后缓存，每轮对话只需一次读取、一次写入缓存
+2. 消息与统计计数异步批量落库（每轮一次 bulk_create + F() 原子递增）
+3. 缓存未命中时从数据库加载最近消息预热窗口
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本Token数
+
+    中日韩字符约1字符1Token，其他字符约4字符1Token。
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的Token数
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4 + 1
+
+
+class ConversationContextStore:
+    """
+    会话上下文缓存
+
+    缓存结构（每个会话一个键）::
+
+        {
+            "conversation_pk": 12,
+            "user_id": 3,
+            "channel": "web",
+            "messages": [{"role": "user", "content": "...", "tokens": 8}, ...],
+        }
+    """
+
+    # 缓存键前缀
+    CACHE_KEY_PREFIX = "ai_assistant:conversation_context"
+
+    # 上下文缓存时间（秒）
+    CACHE_TIMEOUT = 3600  # 1小时
+
+    # 上下文窗口Token预算
+    DEFAULT_TOKEN_BUDGET = 4000
+
+    # 上下文窗口最大消息数
+    DEFAULT_MAX_MESSAGES = 10
+
+    def __init__(self, token_budget: Optional[int] = None, max_messages: Optional[int] = None):
+        """
+        初始化上下文存储
+
+        Args:
+            token_budget: 上下文窗口Token预算（可选）
+            max_messages: 上下文窗口最大消息数（可选）
+        """
+        self.token_budget = token_budget or self.DEFAULT_TOKEN_BUDGET
+        self.max_messages = max_messages or self.DEFAULT_MAX_MESSAGES
+
+    @classmethod
+    def get_cache_key(cls, conversation_id: str) -> str:
+        """生成缓存键"""
+        return f"{cls.CACHE_KEY_PREFIX}:{conversation_id}"
+
+    # ==================== 读取 ====================
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取缓存的会话上下文
+
+        Args:
+            conversation_id: 会话ID
+
+        Returns:
+            上下文字典，未命中返回None
+        """
+        return cache.get(self.get_cache_key(conversation_id))
+
+    def load(self, conversation) -> Dict[str, Any]:
+        """
+        从数据库加载最近消息并写入缓存（缓存未命中时调用）
+
+        Args:
+            conversation: AIConversation对象
+
+        Returns:
+            上下文字典
+        """
+        recent = list(
+            conversation.messages.filter(is_deleted=False)
+            .order_by("-created_at")
+            .values("role", "content")[: self.max_messages]
+        )
+        recent.reverse()
+
+        state = self._new_state(conversation)
+        state["messages"] = self._trim(
+            [
+                {
+                    "role": msg["role"],
+                    "content": msg["content"],
+                    "tokens": estimate_tokens(msg["content"]),
+                }
+                for msg in recent
+            ]
+        )
+        self._save(conversation.conversation_id, state)
+        return state
+
+    def context_messages(self, state: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        转换为Provider使用的消息格式
+
+        Args:
+            state: 上下文字典
+
+        Returns:
+            消息列表
+        """
+        return [{"role": msg["role"], "content": msg["content"]} for msg in state["messages"]]
+
+    # ==================== 写入 ====================
+
+    def create(self, conversation) -> Dict[str, Any]:
+        """
+        为新会话创建空的上下文
+
+        Args:
+            conversation: AIConversation对象
+
+        Returns:
+            上下文字典
+        """
+        state = self._new_state(conversation)
+        self._save(conversation.conversation_id, state)
+        return state
+
+    def append(self, conversation_id: str, state: Dict[str, Any], messages: List[Dict[str, str]]):
+        """
+        追加消息到上下文窗口，并按Token预算裁剪
+
+        Args:
+            conversation_id: 会话ID
+            state: 当前上下文字典
+            messages: 新消息列表（role/content）
+        """
+        window = list(state.get("messages", []))
+        for msg in messages:
+            content = msg.get("content") or ""
+            window.append(
+                {"role": msg["role"], "content": content, "tokens": estimate_tokens(content)}
+            )
+        state["messages"] = self._trim(window)
+        self._save(conversation_id, state)
+
+    def invalidate(self, conversation_id: str):
+        """
+        使会话上下文缓存失效
+
+        Args:
+            conversation_id: 会话ID
+        """
+        cache.delete(self.get_cache_key(conversation_id))
+
+    # ==================== 内部方法 ====================
+
+    def _new_state(self, conversation) -> Dict[str, Any]:
+        return {
+            "conversation_pk": conversation.pk,
+            "user_id": conversation.user_id,
+            "channel": conversation.channel,
+            "messages": [],
+        }
+
+    def _trim(self, window: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """按消息数和Token预算从最早的消息开始裁剪（至少保留最后一条）"""
+        window = window[-self.max_messages :]
+        total = sum(msg["tokens"] for msg in window)
+        while len(window) > 1 and total > self.token_budget:
+            total -= window.pop(0)["tokens"]
+        return window
+
+    def _save(self, conversation_id: str, state: Dict[str, Any]):
+        cache.set(self.get_cache_key(conversation_id), state, self.CACHE_TIMEOUT)
+
+
+def persist_turn(
+    conversation_pk: int,
+    user_id: int,
+    model_config_id: Optional[int],
+    messages: List[Dict[str, Any]],
+    tokens_used: int = 0,
+):
+    """
+    批量持久化一轮对话
+
+    同一事务内一次 bulk_create 按顺序写入本轮所有消息，会话与模型配置计数使用 F() 原子递增。
+    模型配置的请求数只在包含AI响应时递增。
+
+    Args:
+        conversation_pk: 会话主键
+        user_id: 用户ID
+        model_config_id: 模型配置ID
+        messages: 消息字典列表（role/content/tool_calls/tokens_used/response_time）
+        tokens_used: 本轮消耗的Token数
+    """
+    from ..models import AIConversation, AIMessage, AIModelConfig
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        AIMessage.objects.bulk_create(
+            [
+                AIMessage(
+                    conversation_id=conversation_pk,
+                    role=msg["role"],
+                    content=msg.get("content") or "",
+                    tool_calls=msg.get("tool_calls"),
+                    model_config_id=model_config_id if msg["role"] == "assistant" else None,
+                    tokens_used=msg.get("tokens_used") or 0,
+                    response_time=msg.get("response_time"),
+                    created_by_id=user_id,
+                )
+                for msg in messages
+            ]
+        )
+
+        AIConversation.objects.filter(pk=conversation_pk).update(
+            message_count=F("message_count") + len(messages),
+            last_message_at=now,
+            updated_at=now,
+        )
+
+        if model_config_id and any(msg["role"] == "assistant" for msg in messages):
+            AIModelConfig.objects.filter(pk=model_config_id).update(
+                total_requests=F("total_requests") + 1,
+                total_tokens=F("total_tokens") + tokens_used,
+                last_used_at=now,
+            )
+
+
+def schedule_persist_turn(
+    conversation_pk: int,
+    user_id: int,
+    model_config_id: Optional[int],
+    messages: List[Dict[str, Any]],
+    tokens_used: int = 0,
+):
+    """
+    调度一轮对话的持久化
+
+    配置了Celery时异步落库，否则同步执行一次批量写入。
+    """
+    if getattr(settings, "CELERY_BROKER_URL", None):
+        from ..tasks import persist_conversation_turn
+
+        try:
+            persist_conversation_turn.delay(
+                conversation_pk, user_id, model_config_id, messages, tokens_used
+            )
+            return
+        except Exception as e:
+            logger.warning(f"异步持久化会话消息失败，改为同步写入: {str(e)}")
+
+    persist_turn(conversation_pk, user_id, model_config_id, messages, tokens_used)
@@ -2,14 +2,261 @@
 工具监控服务
 
 提供工具使用统计、性能指标收集和执行日志记录
+
+存储结构（Redis，每次执行一次流水线写入，全部为原子递增）：
+- {prefix}:tools               SET   已记录的工具名称
+- {prefix}:rank                ZSET  工具 -> 执行次数（Top工具服务端排序）
+- {prefix}:tool:{tool}         HASH  executions/successes/failures/total_time/last_used
+- {prefix}:latency:{tool}      HASH  延迟分桶(ms) -> 次数
+- {prefix}:daily:{date}        HASH  工具 -> 当日执行次数
+- {prefix}:user:{user_id}      HASH  工具 -> 用户执行次数
+
+未配置Redis时（如本地开发的LocMemCache）退化为进程内计数器；Redis写入失败时该次执行也计入进程内计数器。
 """
 
+import logging
+import threading
 from collections import defaultdict
 from datetime import timedelta
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
-from django.core.cache import cache
 from django.utils import timezone
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图分桶上界（毫秒），最后一个桶为 +inf
+LATENCY_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+LATENCY_OVERFLOW_BUCKET = "inf"
+
+# 统计数据保留时间（秒）
+STATS_TTL = 30 * 86400  # 30天
+
+
+def latency_bucket(execution_time: float) -> str:
+    """
+    返回执行时间所属的直方图分桶
+
+    Args:
+        execution_time: 执行时间（秒）
+
+    Returns:
+        分桶标签（上界毫秒数或 "inf"）
+    """
+    ms = execution_time * 1000
+    for bound in LATENCY_BUCKETS_MS:
+        if ms <= bound:
+            return str(bound)
+    return LATENCY_OVERFLOW_BUCKET
+
+
+def histogram_percentile(histogram: Dict[str, int], percentile: float) -> Optional[float]:
+    """
+    根据延迟直方图估算分位数（返回所在分桶的上界，单位秒）
+
+    落在溢出桶的分位数没有上界，返回最后一个有限分桶的上界。
+
+    Args:
+        histogram: 分桶 -> 次数
+        percentile: 分位数（0-1）
+
+    Returns:
+        分位数估算值（秒），无数据返回None
+    """
+    total = sum(histogram.values())
+    if total == 0:
+        return None
+
+    threshold = total * percentile
+    seen = 0
+    for bound in LATENCY_BUCKETS_MS:
+        seen += histogram.get(str(bound), 0)
+        if seen >= threshold:
+            return bound / 1000
+    return LATENCY_BUCKETS_MS[-1] / 1000
+
+
+class RedisToolStatsBackend:
+    """基于Redis哈希计数器的统计存储"""
+
+    def __init__(self, client, prefix: str):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, *parts) -> str:
+        return ":".join([self.prefix, *[str(part) for part in parts]])
+
+    def record(
+        self,
+        tool_name: str,
+        user_id: int,
+        success: bool,
+        execution_time: float,
+        day: str,
+        now_iso: str,
+    ):
+        tool_key = self._key("tool", tool_name)
+        latency_key = self._key("latency", tool_name)
+        daily_key = self._key("daily", day)
+        user_key = self._key("user", user_id)
+        tools_key = self._key("tools")
+        rank_key = self._key("rank")
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.sadd(tools_key, tool_name)
+        pipe.zincrby(rank_key, 1, tool_name)
+        pipe.hincrby(tool_key, "executions", 1)
+        pipe.hincrby(tool_key, "successes" if success else "failures", 1)
+        pipe.hincrbyfloat(tool_key, "total_time", execution_time)
+        pipe.hset(tool_key, "last_used", now_iso)
+        pipe.hincrby(latency_key, latency_bucket(execution_time), 1)
+        pipe.hincrby(daily_key, tool_name, 1)
+        pipe.hincrby(user_key, tool_name, 1)
+        # 工具集合和排行与统计哈希同样过期，避免索引键长期残留
+        for key in (tool_key, latency_key, daily_key, user_key, tools_key, rank_key):
+            pipe.expire(key, STATS_TTL)
+        pipe.execute()
+
+    def tool_names(self) -> List[str]:
+        return sorted(_decode(name) for name in self.client.smembers(self._key("tools")))
+
+    def load_tools(self, tool_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        pipe = self.client.pipeline(transaction=False)
+        for tool_name in tool_names:
+            pipe.hgetall(self._key("tool", tool_name))
+            pipe.hgetall(self._key("latency", tool_name))
+        results = pipe.execute()
+
+        loaded = {}
+        for index, tool_name in enumerate(tool_names):
+            raw = _decode_hash(results[index * 2])
+            if not raw:
+                continue
+            loaded[tool_name] = {
+                "executions": int(raw.get("executions", 0)),
+                "successes": int(raw.get("successes", 0)),
+                "failures": int(raw.get("failures", 0)),
+                "total_time": float(raw.get("total_time", 0.0)),
+                "last_used": raw.get("last_used", ""),
+                "latency": {
+                    bucket: int(count)
+                    for bucket, count in _decode_hash(results[index * 2 + 1]).items()
+                },
+            }
+        return loaded
+
+    def top_tools(self, limit: int) -> List[Tuple[str, int]]:
+        ranked = self.client.zrevrange(self._key("rank"), 0, limit - 1, withscores=True)
+        return [(_decode(name), int(score)) for name, score in ranked]
+
+    def daily(self, days: List[str]) -> Dict[str, Dict[str, int]]:
+        pipe = self.client.pipeline(transaction=False)
+        for day in days:
+            pipe.hgetall(self._key("daily", day))
+        return {
+            day: {tool: int(count) for tool, count in _decode_hash(raw).items()}
+            for day, raw in zip(days, pipe.execute())
+        }
+
+    def user(self, user_id: int) -> Dict[str, int]:
+        raw = _decode_hash(self.client.hgetall(self._key("user", user_id)))
+        return {tool: int(count) for tool, count in raw.items()}
+
+    def clear(self, tool_name: Optional[str] = None):
+        if tool_name:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.srem(self._key("tools"), tool_name)
+            pipe.zrem(self._key("rank"), tool_name)
+            pipe.delete(self._key("tool", tool_name), self._key("latency", tool_name))
+            pipe.execute()
+            return
+
+        keys = list(self.client.scan_iter(match=f"{self.prefix}:*", count=500))
+        if keys:
+            self.client.delete(*keys)
+
+
+class LocalToolStatsBackend:
+    """进程内统计存储（未配置Redis时使用）"""
+
+    _lock = threading.Lock()
+    _tools: Dict[str, Dict[str, Any]] = {}
+    _daily: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    _users: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(
+        self,
+        tool_name: str,
+        user_id: int,
+        success: bool,
+        execution_time: float,
+        day: str,
+        now_iso: str,
+    ):
+        with self._lock:
+            stats = self._tools.setdefault(
+                tool_name,
+                {
+                    "executions": 0,
+                    "successes": 0,
+                    "failures": 0,
+                    "total_time": 0.0,
+                    "last_used": "",
+                    "latency": defaultdict(int),
+                },
+            )
+            stats["executions"] += 1
+            stats["successes" if success else "failures"] += 1
+            stats["total_time"] += execution_time
+            stats["last_used"] = now_iso
+            stats["latency"][latency_bucket(execution_time)] += 1
+            self._daily[day][tool_name] += 1
+            self._users[user_id][tool_name] += 1
+
+    def tool_names(self) -> List[str]:
+        return sorted(self._tools)
+
+    def load_tools(self, tool_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {**self._tools[name], "latency": dict(self._tools[name]["latency"])}
+                for name in tool_names
+                if name in self._tools
+            }
+
+    def top_tools(self, limit: int) -> List[Tuple[str, int]]:
+        with self._lock:
+            ranked = sorted(
+                ((name, stats["executions"]) for name, stats in self._tools.items()),
+                key=lambda x: x[1],
+                reverse=True,
+            )
+        return ranked[:limit]
+
+    def daily(self, days: List[str]) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {day: dict(self._daily.get(day, {})) for day in days}
+
+    def user(self, user_id: int) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._users.get(user_id, {}))
+
+    def clear(self, tool_name: Optional[str] = None):
+        with self._lock:
+            if tool_name:
+                self._tools.pop(tool_name, None)
+                return
+            self._tools.clear()
+            self._daily.clear()
+            self._users.clear()
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _decode_hash(raw: Dict) -> Dict[str, str]:
+    return {_decode(key): _decode(value) for key, value in (raw or {}).items()}
 
 
 class ToolMonitor:
@@ -22,34 +269,23 @@ class ToolMonitor:
     # 缓存键前缀
     CACHE_PREFIX = "erp_tool_monitor"
 
-    def __init__(self):
-        """初始化监控器"""
-        self.stats = self._load_stats()
-
-    def _load_stats(self) -> Dict[str, Any]:
-        """从缓存加载统计数据"""
-        cache_key = f"{self.CACHE_PREFIX}:stats"
-        stats = cache.get(cache_key)
-
-        if not stats:
-            stats = {
-                "executions": defaultdict(int),
-                "successes": defaultdict(int),
-                "failures": defaultdict(int),
-                "total_time": defaultdict(float),
-                "avg_time": defaultdict(float),
-                "last_used": {},
-                "daily_executions": defaultdict(lambda: defaultdict(int)),
-                "user_stats": defaultdict(lambda: defaultdict(int)),
-            }
+    def __init__(self, backend=None):
+        """
+        初始化监控器
+
+        Args:
+            backend: 统计存储（可选，默认Redis，不可用时使用进程内存储）
+        """
+        self.backend = backend or self._default_backend()
 
-        return stats
+    @classmethod
+    def _default_backend(cls):
+        from core.utils.redis_client import get_redis_client
 
-    def _save_stats(self):
-        """保存统计数据到缓存"""
-        cache_key = f"{self.CACHE_PREFIX}:stats"
-        # 缓存1天
-        cache.set(cache_key, self.stats, 86400)
+        client = get_redis_client()
+        if client is not None:
+            return RedisToolStatsBackend(client, cls.CACHE_PREFIX)
+        return LocalToolStatsBackend()
 
     def record_execution(
         self,
@@ -60,7 +296,7 @@ class ToolMonitor:
         metadata: Dict[str, Any] = None,
     ):
         """
-        记录工具执行
+        记录工具执行（一次流水线原子递增，不读取已有统计）
 
         Args:
             tool_name: 工具名称
@@ -69,32 +305,16 @@ class ToolMonitor:
             execution_time: 执行时间（秒）
             metadata: 额外元数据
         """
-        today = timezone.now().strftime("%Y-%m-%d")
-
-        # 更新执行统计
-        self.stats["executions"][tool_name] += 1
-
-        if success:
-            self.stats["successes"][tool_name] += 1
-        else:
-            self.stats["failures"][tool_name] += 1
-
-        # 更新执行时间
-        self.stats["total_time"][tool_name] += execution_time
-        exec_count = self.stats["executions"][tool_name]
-        self.stats["avg_time"][tool_name] = self.stats["total_time"][tool_name] / exec_count
-
-        # 更新最后使用时间
-        self.stats["last_used"][tool_name] = timezone.now().isoformat()
-
-        # 更新每日执行统计
-        self.stats["daily_executions"][today][tool_name] += 1
+        now = timezone.now()
+        args = (tool_name, user_id, success, execution_time)
+        day, now_iso = now.strftime("%Y-%m-%d"), now.isoformat()
 
-        # 更新用户统计
-        self.stats["user_stats"][user_id][tool_name] += 1
-
-        # 保存到缓存
-        self._save_stats()
+        try:
+            self.backend.record(*args, day=day, now_iso=now_iso)
+        except RedisError as e:
+            # Redis不可用时计入进程内计数器，统计失败不能影响工具执行
+            logger.warning(f"记录工具统计失败，改用进程内计数: {str(e)}")
+            LocalToolStatsBackend().record(*args, day=day, now_iso=now_iso)
 
         # 同时记录到日志（如果配置了日志模型）
         self._log_execution(tool_name, user_id, success, execution_time, metadata)
@@ -111,49 +331,56 @@ class ToolMonitor:
         # TODO: 如果需要持久化日志，可以在这里写入数据库
         # 例如创建ToolExecutionLog模型
 
-    def get_tool_stats(self, tool_name: str) -> Dict[str, Any]:
-        """
-        获取指定工具的统计信息
-
-        Args:
-            tool_name: 工具名称
-
-        Returns:
-            统计信息字典
-        """
-        executions = self.stats["executions"].get(tool_name, 0)
-        successes = self.stats["successes"].get(tool_name, 0)
-        failures = self.stats["failures"].get(tool_name, 0)
-        avg_time = self.stats["avg_time"].get(tool_name, 0.0)
-        last_used = self.stats["last_used"].get(tool_name, "")
+    @staticmethod
+    def _build_tool_stats(tool_name: str, raw: Dict[str, Any]) -> Dict[str, Any]:
+        executions = raw.get("executions", 0)
+        successes = raw.get("successes", 0)
+        latency = raw.get("latency", {})
 
         # 计算成功率
         success_rate = 0.0
+        avg_time = 0.0
         if executions > 0:
             success_rate = (successes / executions) * 100
+            avg_time = raw.get("total_time", 0.0) / executions
+
+        p95 = histogram_percentile(latency, 0.95)
 
         return {
             "tool_name": tool_name,
             "total_executions": executions,
             "success_count": successes,
-            "failure_count": failures,
+            "failure_count": raw.get("failures", 0),
             "success_rate": round(success_rate, 2),
             "avg_execution_time": round(avg_time, 3),
-            "last_used": last_used,
+            "p95_execution_time": p95,
+            "latency_histogram": dict(latency),
+            "last_used": raw.get("last_used", ""),
         }
 
+    def get_tool_stats(self, tool_name: str) -> Dict[str, Any]:
+        """
+        获取指定工具的统计信息
+
+        Args:
+            tool_name: 工具名称
+
+        Returns:
+            统计信息字典
+        """
+        raw = self.backend.load_tools([tool_name]).get(tool_name, {})
+        return self._build_tool_stats(tool_name, raw)
+
     def get_all_tools_stats(self) -> List[Dict[str, Any]]:
         """
-        获取所有工具的统计信息
+        获取所有工具的统计信息（一次流水线读取）
 
         Returns:
             工具统计信息列表
         """
-        all_tools = set(self.stats["executions"].keys())
+        loaded = self.backend.load_tools(self.backend.tool_names())
 
-        stats_list = []
-        for tool_name in all_tools:
-            stats_list.append(self.get_tool_stats(tool_name))
+        stats_list = [self._build_tool_stats(name, raw) for name, raw in loaded.items()]
 
         # 按执行次数排序
         stats_list.sort(key=lambda x: x["total_executions"], reverse=True)
@@ -162,7 +389,7 @@ class ToolMonitor:
 
     def get_top_tools(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
-        获取使用最频繁的工具
+        获取使用最频繁的工具（排名由有序集合在服务端完成）
 
         Args:
             limit: 返回数量限制
@@ -170,8 +397,9 @@ class ToolMonitor:
         Returns:
             工具统计列表
         """
-        all_stats = self.get_all_tools_stats()
-        return all_stats[:limit]
+        ranked = [name for name, _ in self.backend.top_tools(limit)]
+        loaded = self.backend.load_tools(ranked)
+        return [self._build_tool_stats(name, loaded[name]) for name in ranked if name in loaded]
 
     def get_user_stats(self, user_id: int) -> Dict[str, Any]:
         """
@@ -183,7 +411,7 @@ class ToolMonitor:
         Returns:
             用户统计信息
         """
-        user_tools = self.stats["user_stats"].get(user_id, {})
+        user_tools = self.backend.user(user_id)
 
         total_executions = sum(user_tools.values())
 
@@ -207,14 +435,13 @@ class ToolMonitor:
         Returns:
             每日统计列表
         """
-        daily_stats = []
         today = timezone.now()
+        date_strs = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+        daily = self.backend.daily(date_strs)
 
-        for i in range(days):
-            date = today - timedelta(days=i)
-            date_str = date.strftime("%Y-%m-%d")
-
-            day_executions = self.stats["daily_executions"].get(date_str, {})
+        daily_stats = []
+        for date_str in date_strs:
+            day_executions = daily.get(date_str, {})
             total_executions = sum(day_executions.values())
 
             daily_stats.append(
@@ -274,7 +501,8 @@ class ToolMonitor:
             "avg_execution_time": round(avg_execution_time, 3),
             "slowest_tools": slowest_tools,
             "fastest_tools": fastest_tools,
-            "most_used_tools": self.get_top_tools(5),
+            # all_stats 已按执行次数排序，无需再次读取
+            "most_used_tools": all_stats[:5],
         }
 
     def get_category_stats(self) -> Dict[str, Any]:
@@ -295,28 +523,7 @@ class ToolMonitor:
         Args:
             tool_name: 工具名称，如果为None则清除所有
         """
-        if tool_name:
-            # 清除指定工具的统计
-            self.stats["executions"].pop(tool_name, None)
-            self.stats["successes"].pop(tool_name, None)
-            self.stats["failures"].pop(tool_name, None)
-            self.stats["total_time"].pop(tool_name, None)
-            self.stats["avg_time"].pop(tool_name, None)
-            self.stats["last_used"].pop(tool_name, None)
-        else:
-            # 清除所有统计
-            self.stats = {
-                "executions": defaultdict(int),
-                "successes": defaultdict(int),
-                "failures": defaultdict(int),
-                "total_time": defaultdict(float),
-                "avg_time": defaultdict(float),
-                "last_used": {},
-                "daily_executions": defaultdict(lambda: defaultdict(int)),
-                "user_stats": defaultdict(lambda: defaultdict(int)),
-            }
-
-        self._save_stats()
+        self.backend.clear(tool_name)
 
     def export_stats(self, format: str = "dict") -> Any:
         """
@@ -0,0 +1,192 @@
+"""
+Signals for the ai_assistant app.
+"""
+
+import logging
+
+from core.signals import bulk_data_changed
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# 可缓存工具读取的模型标签（延迟加载）
+_cache_model_labels = None
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def clear_user_tool_permission_cache(sender, instance, created=False, **kwargs):
+    """
+    用户变更（启用状态、超级用户标志等）时清除该用户的权限缓存
+
+    工具目录按权限指纹缓存，权限缓存清除后用户会匹配到新的目录。
+
+    Args:
+        sender: 用户模型
+        instance: 用户实例
+        created: 是否新建
+        kwargs: 信号参数
+    """
+    if created:
+        return
+
+    from .utils.permissions import clear_user_permission_cache
+
+    clear_user_permission_cache(instance)
+
+
+def clear_user_role_permission_cache(sender, instance, **kwargs):
+    """用户角色变更时清除该用户的权限缓存"""
+    if not instance.user_id:
+        return
+
+    from .utils.permissions import clear_user_permission_cache
+
+    clear_user_permission_cache(instance.user)
+
+
+def clear_role_permission_cache(sender, instance, **kwargs):
+    """
+    角色或角色权限变更时，清除所有持有该角色的用户的权限缓存
+
+    m2m_changed 从权限一侧触发时，instance 为权限，受影响的角色在 pk_set 中。
+    """
+    from django.apps import apps
+
+    from .utils.permissions import clear_user_permission_cache
+
+    Role = apps.get_model("users", "Role")
+    UserRole = apps.get_model("users", "UserRole")
+
+    if isinstance(instance, Role):
+        role_ids = [instance.pk]
+    else:
+        role_ids = list(kwargs.get("pk_set") or [])
+    if not role_ids:
+        return
+
+    for user_role in UserRole.objects.filter(role_id__in=role_ids).select_related("user"):
+        clear_user_permission_cache(user_role.user)
+
+
+def connect_role_signals():
+    """
+    绑定角色模型的权限缓存失效信号
+
+    users 应用定义了 Role/UserRole 模型时才绑定（权限代码从这两个模型读取）。
+
+    Returns:
+        bool: 是否已绑定
+    """
+    from django.apps import apps
+
+    try:
+        Role = apps.get_model("users", "Role")
+        UserRole = apps.get_model("users", "UserRole")
+    except LookupError:
+        return False
+
+    for signal in (post_save, post_delete):
+        signal.connect(
+            clear_user_role_permission_cache,
+            sender=UserRole,
+            dispatch_uid=f"ai_assistant_user_role_{id(signal)}",
+        )
+        signal.connect(
+            clear_role_permission_cache,
+            sender=Role,
+            dispatch_uid=f"ai_assistant_role_{id(signal)}",
+        )
+    m2m_changed.connect(
+        clear_role_permission_cache,
+        sender=Role.permissions.through,
+        dispatch_uid="ai_assistant_role_permissions",
+    )
+    return True
+
+
+connect_role_signals()
+
+
+def _get_cache_model_labels():
+    """
+    获取可缓存工具读取的模型（首次调用时加载工具注册表）
+
+    注册表加载失败时没有工具结果会被缓存，返回空集合即可。
+    """
+    global _cache_model_labels
+
+    if _cache_model_labels is None:
+        try:
+            from .tools.registry import ToolRegistry
+
+            _cache_model_labels = ToolRegistry.get_cache_model_labels()
+        except Exception as e:
+            logger.warning(f"加载工具注册表失败，工具结果缓存失效信号不生效: {str(e)}")
+            _cache_model_labels = frozenset()
+
+    return _cache_model_labels
+
+
+@receiver(post_save, sender="ai_assistant.AIConversation")
+@receiver(post_delete, sender="ai_assistant.AIConversation")
+def invalidate_conversation_context(sender, instance, **kwargs):
+    """
+    会话删除（软删除或物理删除）时清除缓存的上下文窗口
+
+    缓存命中时不再查询会话，已删除的会话必须从缓存中移除。
+
+    Args:
+        sender: AIConversation
+        instance: 会话实例
+        kwargs: 信号参数
+    """
+    if kwargs.get("signal") is post_save and not instance.is_deleted:
+        return
+
+    from .services.conversation_context import ConversationContextStore
+
+    ConversationContextStore().invalidate(instance.conversation_id)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_tool_result_cache(sender, **kwargs):
+    """
+    工具读取的模型数据变更时，递增模型版本号使相关工具结果缓存失效
+
+    注意：QuerySet.update() 和 bulk_* 不会触发信号，批量写入方需要
+    调用 core.signals.bump_version()，由 invalidate_bulk_tool_result_cache 失效。
+
+    Args:
+        sender: 发送信号的模型类
+        kwargs: 信号参数
+    """
+    label = sender._meta.label
+    if label not in _get_cache_model_labels():
+        return
+
+    from .services.cache_service import CacheService
+
+    CacheService.bump_version(label)
+
+
+@receiver(bulk_data_changed)
+def invalidate_bulk_tool_result_cache(sender, models, **kwargs):
+    """
+    批量写入后递增工具读取的模型版本号
+
+    Args:
+        sender: None
+        models: 变更的模型标签集合
+        kwargs: 信号参数
+    """
+    labels = models & _get_cache_model_labels()
+    if not labels:
+        return
+
+    from .services.cache_service import CacheService
+
+    for label in sorted(labels):
+        CacheService.bump_version(label)
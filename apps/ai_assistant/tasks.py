@@ -94,6 +94,7 @@ def execute_tool_async(self, tool_name: str, user_id: int, parameters: dict):
         工具执行结果
     """
     try:
+        from ai_assistant.services.cache_service import CachedToolWrapper
         from ai_assistant.tools.registry import ToolRegistry
         from django.contrib.auth import get_user_model
 
@@ -112,8 +113,8 @@ def execute_tool_async(self, tool_name: str, user_id: int, parameters: dict):
             logger.error(f"工具不存在: tool_name={tool_name}")
             return {"success": False, "error": f"工具 {tool_name} 不存在"}
 
-        # 执行工具
-        result = tool.run(**parameters)
+        # 执行工具（只读工具的结果按权限范围缓存）
+        result = CachedToolWrapper(tool).run(**parameters)
 
         logger.info(f"异步工具执行成功: tool={tool_name}, user={user.username}")
 
@@ -220,3 +221,33 @@ def refresh_access_token(channel: str, app_id: str):
     except Exception as e:
         logger.error(f"刷新Access Token失败: {str(e)}", exc_info=True)
         return {"success": False, "error": str(e)}
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=10)
+def persist_conversation_turn(
+    self,
+    conversation_pk: int,
+    user_id: int,
+    model_config_id: int,
+    messages: list,
+    tokens_used: int = 0,
+):
+    """
+    异步持久化一轮对话消息
+
+    Args:
+        conversation_pk: 会话主键
+        user_id: 用户ID
+        model_config_id: 模型配置ID
+        messages: 本轮消息列表
+        tokens_used: 本轮消耗的Token数
+    """
+    try:
+        from ai_assistant.services.conversation_context import persist_turn
+
+        persist_turn(conversation_pk, user_id, model_config_id, messages, tokens_used)
+        return {"success": True, "message_count": len(messages)}
+
+    except Exception as e:
+        logger.error(f"持久化会话消息失败: {str(e)}", exc_info=True)
+        raise self.retry(exc=e)
@@ -0,0 +1,121 @@
+"""
+测试工具结果缓存
+"""
+
+from unittest import mock
+
+from ai_assistant.services.cache_service import CachedToolWrapper, CacheService
+from ai_assistant.tools.base_tool import ToolResult
+from ai_assistant.tools.registry import ToolRegistry
+from core.signals import bump_version
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from products.models import Product
+
+User = get_user_model()
+
+
+class CacheServiceTestCase(TestCase):
+    """工具结果缓存测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin", password="testpass123", email="admin@example.com"
+        )
+        self.other_admin = User.objects.create_superuser(
+            username="admin2", password="testpass123", email="admin2@example.com"
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def _run(self, tool_name, user, **params):
+        return CachedToolWrapper(ToolRegistry.get_tool(tool_name, user)).execute(**params)
+
+    def test_model_change_invalidates_results(self):
+        """工具读取的模型变更后不再命中旧结果"""
+        Product.objects.create(code="P001", name="激光器", created_by=self.admin)
+
+        first = self._run("search_product", self.admin, keyword="激光")
+        second = self._run("search_product", self.admin, keyword="激光")
+        self.assertNotIn("_cached", first)
+        self.assertTrue(second["_cached"])
+
+        Product.objects.create(code="P002", name="激光头", created_by=self.admin)
+
+        third = self._run("search_product", self.admin, keyword="激光")
+        self.assertNotIn("_cached", third)
+        self.assertEqual(len(third["data"]), 2)
+
+    def test_bulk_write_invalidates_results(self):
+        """批量写入调用 bump_version 后，事务提交时工具结果缓存失效"""
+        Product.objects.create(code="P001", name="激光器", created_by=self.admin)
+        self._run("search_product", self.admin, keyword="激光")
+
+        Product.objects.bulk_create([Product(code="P002", name="激光头", created_by=self.admin)])
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version(Product)
+
+        result = self._run("search_product", self.admin, keyword="激光")
+        self.assertNotIn("_cached", result)
+        self.assertEqual(len(result["data"]), 2)
+
+    def test_user_scope_isolated(self):
+        """默认按用户隔离缓存"""
+        self._run("search_product", self.admin, keyword="激光")
+        result = self._run("search_product", self.other_admin, keyword="激光")
+        self.assertNotIn("_cached", result)
+
+    def test_permission_scope_shared(self):
+        """报表工具在权限相同的用户之间共享缓存"""
+        self._run("generate_inventory_report", self.admin)
+        result = self._run("generate_inventory_report", self.other_admin)
+        self.assertTrue(result["_cached"])
+
+    def test_clear_all_bumps_namespace(self):
+        """clear_all 使所有缓存失效"""
+        self._run("search_product", self.admin, keyword="激光")
+        CacheService.clear_all()
+        result = self._run("search_product", self.admin, keyword="激光")
+        self.assertNotIn("_cached", result)
+
+    def test_failed_results_not_cached(self):
+        """执行失败的结果不写入缓存"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"success": False}, False
+
+        CacheService.get_or_compute("erp_tool_result:test:fail", compute)
+        CacheService.get_or_compute("erp_tool_result:test:fail", compute)
+        self.assertEqual(len(calls), 2)
+
+    def test_single_flight_waits_for_leader(self):
+        """单飞锁被占用时等待执行者写入的结果"""
+        key = "erp_tool_result:test:flight"
+        cache.add(f"{key}:lock", 1, 60)
+
+        def leader_done(seconds):
+            cache.set(key, {"success": True, "data": 1}, 60)
+
+        compute = mock.Mock(return_value=({"success": True, "data": 2}, True))
+        with mock.patch("ai_assistant.services.cache_service.time.sleep", leader_done):
+            result, cached = CacheService.get_or_compute(key, compute, single_flight=True)
+
+        self.assertTrue(cached)
+        self.assertEqual(result["data"], 1)
+        compute.assert_not_called()
+
+    def test_non_cacheable_tool_runs_directly(self):
+        """未声明读取模型的工具不缓存"""
+        tool = ToolRegistry.get_tool("query_sales_orders", self.admin)
+        wrapper = CachedToolWrapper(tool)
+        self.assertFalse(wrapper.cacheable)
+
+        with mock.patch.object(tool, "run", return_value=ToolResult(success=True, data=[])) as run:
+            wrapper.run()
+            wrapper.run()
+        self.assertEqual(run.call_count, 2)
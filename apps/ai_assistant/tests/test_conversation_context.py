@@ -0,0 +1,162 @@
+"""
+测试会话上下文缓存
+"""
+
+from unittest import mock
+
+from ai_assistant.models import AIConversation, AIMessage, AIModelConfig
+from ai_assistant.services.ai_service import AIService
+from ai_assistant.services.conversation_context import ConversationContextStore, estimate_tokens
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+User = get_user_model()
+
+
+class ConversationContextStoreTestCase(TestCase):
+    """上下文窗口裁剪测试"""
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_estimate_tokens(self):
+        """中文按字符计，英文约4字符1Token"""
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertGreater(estimate_tokens("查询销售订单"), estimate_tokens("query"))
+
+    def test_window_respects_token_budget(self):
+        """超出Token预算时从最早的消息开始裁剪"""
+        store = ConversationContextStore(token_budget=50, max_messages=10)
+        state = {"conversation_pk": 1, "user_id": 1, "channel": "web", "messages": []}
+
+        store.append("conv_test", state, [{"role": "user", "content": "一" * 30}])
+        store.append("conv_test", state, [{"role": "assistant", "content": "二" * 30}])
+
+        cached = store.get("conv_test")
+        self.assertEqual(len(cached["messages"]), 1)
+        self.assertEqual(cached["messages"][0]["role"], "assistant")
+
+    def test_window_respects_max_messages(self):
+        """超出最大消息数时只保留最近的消息"""
+        store = ConversationContextStore(max_messages=3)
+        state = {"conversation_pk": 1, "user_id": 1, "channel": "web", "messages": []}
+
+        store.append("conv_test", state, [{"role": "user", "content": str(i)} for i in range(5)])
+
+        contents = [msg["content"] for msg in store.get("conv_test")["messages"]]
+        self.assertEqual(contents, ["2", "3", "4"])
+
+
+class AIServiceContextTestCase(TestCase):
+    """AIService 上下文缓存与批量落库测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="ai_user", password="testpass123")
+        self.model_config = AIModelConfig.objects.create(
+            name="Mock",
+            provider="mock",
+            api_key="mock",
+            model_name="mock-model",
+            is_default=True,
+            created_by=self.user,
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_chat_persists_turn_and_counters(self):
+        """每轮对话批量写入消息，计数原子递增"""
+        service = AIService(self.user, self.model_config)
+        service.provider.chat = lambda messages, tools=None: _response("你好")
+
+        service.chat("第一条", conversation_id="conv_ctx_1")
+        service.chat("第二条", conversation_id="conv_ctx_1")
+
+        conversation = AIConversation.objects.get(conversation_id="conv_ctx_1")
+        self.assertEqual(conversation.message_count, 4)
+        self.assertEqual(AIMessage.objects.filter(conversation=conversation).count(), 4)
+
+        self.model_config.refresh_from_db()
+        self.assertEqual(self.model_config.total_requests, 2)
+        self.assertEqual(self.model_config.total_tokens, 20)
+
+    @override_settings(CELERY_BROKER_URL="memory://")
+    def test_chat_persists_turn_in_one_task(self):
+        """用户消息和AI响应由同一个任务按顺序落库"""
+        service = AIService(self.user, self.model_config)
+        service.provider.chat = lambda messages, tools=None: _response("你好")
+
+        with mock.patch("ai_assistant.tasks.persist_conversation_turn.delay") as delay:
+            service.chat("第一条", conversation_id="conv_ctx_5")
+
+        delay.assert_called_once()
+        messages = delay.call_args[0][3]
+        self.assertEqual(
+            [(msg["role"], msg["content"]) for msg in messages],
+            [("user", "第一条"), ("assistant", "你好")],
+        )
+
+    def test_chat_uses_cached_context(self):
+        """缓存命中时上下文来自缓存窗口"""
+        service = AIService(self.user, self.model_config)
+        seen = []
+
+        def fake_chat(messages, tools=None):
+            seen.append(list(messages))
+            return _response("收到")
+
+        service.provider.chat = fake_chat
+
+        service.chat("第一条", conversation_id="conv_ctx_2")
+        service.chat("第二条", conversation_id="conv_ctx_2")
+
+        self.assertEqual(
+            seen[1],
+            [
+                {"role": "user", "content": "第一条"},
+                {"role": "assistant", "content": "收到"},
+                {"role": "user", "content": "第二条"},
+            ],
+        )
+
+    def test_user_message_recorded_when_provider_fails(self):
+        """Provider调用失败时用户消息已记录"""
+        service = AIService(self.user, self.model_config)
+
+        def failing_chat(messages, tools=None):
+            raise ConnectionError("provider down")
+
+        service.provider.chat = failing_chat
+
+        with self.assertRaises(ConnectionError):
+            service.chat("第一条", conversation_id="conv_ctx_3")
+
+        messages = AIMessage.objects.filter(conversation__conversation_id="conv_ctx_3")
+        self.assertEqual(list(messages.values_list("role", "content")), [("user", "第一条")])
+        cached = service.context_store.get("conv_ctx_3")
+        self.assertEqual([msg["content"] for msg in cached["messages"]], ["第一条"])
+
+        self.model_config.refresh_from_db()
+        self.assertEqual(self.model_config.total_requests, 0)
+
+    def test_deleted_conversation_evicted_from_cache(self):
+        """会话删除后不再从缓存读取上下文"""
+        service = AIService(self.user, self.model_config)
+        service.provider.chat = lambda messages, tools=None: _response("你好")
+        service.chat("第一条", conversation_id="conv_ctx_4")
+        self.assertIsNotNone(service.context_store.get("conv_ctx_4"))
+
+        AIConversation.objects.get(conversation_id="conv_ctx_4").delete()
+
+        self.assertIsNone(service.context_store.get("conv_ctx_4"))
+
+
+def _response(content):
+    from ai_assistant.providers.base import AIResponse
+
+    return AIResponse(content=content, finish_reason="stop", tokens_used=10, model="mock-model")
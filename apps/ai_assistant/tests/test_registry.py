@@ -0,0 +1,97 @@
+"""
+测试工具注册表的工具目录缓存
+"""
+
+from unittest import mock
+
+from ai_assistant.tools.registry import ToolRegistry
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+User = get_user_model()
+
+
+class ToolCatalogTestCase(TestCase):
+    """工具目录测试"""
+
+    def setUp(self):
+        ToolRegistry.invalidate_catalogs()
+        self.superuser = User.objects.create_superuser(
+            username="admin", password="testpass123", email="admin@example.com"
+        )
+        self.user = User.objects.create_user(username="staff", password="testpass123")
+
+    def test_schemas_serialized_at_registration(self):
+        """目录中的Schema与工具实例生成的一致"""
+        functions = ToolRegistry.to_openai_functions(self.superuser)
+        names = [f["function"]["name"] for f in functions]
+
+        self.assertEqual(len(functions), len(ToolRegistry._tool_specs))
+        tool = ToolRegistry.get_tool(names[0], self.superuser)
+        self.assertEqual(functions[0], tool.to_openai_function())
+
+    def test_catalog_memoized_by_fingerprint(self):
+        """相同权限指纹复用同一目录，不再实例化工具"""
+        first = ToolRegistry.get_catalog(self.superuser)
+
+        with mock.patch("ai_assistant.tools.base_tool.BaseTool.__init__") as init:
+            second = ToolRegistry.get_catalog(self.superuser)
+            ToolRegistry.to_anthropic_tools(self.superuser)
+
+        self.assertIs(first, second)
+        init.assert_not_called()
+
+    def test_permission_filtering(self):
+        """普通用户只能看到无需权限或已授权的工具"""
+        with mock.patch(
+            "ai_assistant.utils.permissions.get_user_permission_codes", return_value=set()
+        ):
+            names = ToolRegistry.get_available_tool_names(self.user)
+
+        for name in names:
+            self.assertIsNone(ToolRegistry.get_tool_spec(name).require_permission)
+
+    def test_fingerprint_changes_with_permissions(self):
+        """权限变化后匹配到新的目录"""
+        codes = sorted(ToolRegistry._required_permissions)
+        if not codes:
+            self.skipTest("没有需要权限的工具")
+
+        with mock.patch(
+            "ai_assistant.utils.permissions.get_user_permission_codes", return_value=set()
+        ):
+            before = ToolRegistry.get_permission_fingerprint(self.user)
+        with mock.patch(
+            "ai_assistant.utils.permissions.get_user_permission_codes",
+            return_value={codes[0]},
+        ):
+            after = ToolRegistry.get_permission_fingerprint(self.user)
+            names = ToolRegistry.get_available_tool_names(self.user)
+
+        self.assertNotEqual(before, after)
+        self.assertTrue(
+            any(ToolRegistry.get_tool_spec(n).require_permission == codes[0] for n in names)
+        )
+
+
+class PermissionCacheSignalTestCase(TestCase):
+    """权限缓存失效信号测试"""
+
+    def test_user_save_clears_permission_cache(self):
+        """用户变更后清除权限缓存"""
+        user = User.objects.create_user(username="signal_user", password="testpass123")
+        cache_key = f"user_custom_perms:{user.pk}"
+        cache.set(cache_key, ["sales.view_order"])
+
+        user.is_active = False
+        user.save()
+
+        self.assertIsNone(cache.get(cache_key))
+
+    def test_role_signals_require_role_models(self):
+        """users 应用没有角色模型时不绑定角色信号"""
+        from ai_assistant.signals import connect_role_signals
+
+        with mock.patch("django.apps.apps.get_model", side_effect=LookupError):
+            self.assertFalse(connect_role_signals())
@@ -0,0 +1,98 @@
+"""
+测试工具监控统计
+"""
+
+from ai_assistant.services.tool_monitor import (
+    LocalToolStatsBackend,
+    RedisToolStatsBackend,
+    ToolMonitor,
+    histogram_percentile,
+    latency_bucket,
+)
+from core.tests.redis_helpers import fake_redis, requires_fakeredis
+from django.test import SimpleTestCase
+
+
+class ToolMonitorTestCase(SimpleTestCase):
+    """工具监控测试（进程内计数器）"""
+
+    def setUp(self):
+        self.monitor = ToolMonitor(backend=LocalToolStatsBackend())
+        self.monitor.clear_stats()
+
+    def tearDown(self):
+        self.monitor.clear_stats()
+
+    def test_record_and_report(self):
+        """记录执行后统计正确"""
+        for i in range(10):
+            self.monitor.record_execution("search_customer", 1, i != 0, 0.02)
+        self.monitor.record_execution("check_inventory", 2, True, 0.4)
+
+        stats = self.monitor.get_tool_stats("search_customer")
+        self.assertEqual(stats["total_executions"], 10)
+        self.assertEqual(stats["failure_count"], 1)
+        self.assertEqual(stats["success_rate"], 90.0)
+        self.assertEqual(stats["p95_execution_time"], 0.05)
+
+        top = self.monitor.get_top_tools(1)
+        self.assertEqual(top[0]["tool_name"], "search_customer")
+
+        report = self.monitor.get_performance_report()
+        self.assertEqual(report["total_tools"], 2)
+        self.assertEqual(report["total_executions"], 11)
+        self.assertEqual(report["slowest_tools"][0]["tool_name"], "check_inventory")
+
+        self.assertEqual(self.monitor.get_user_stats(1)["total_executions"], 10)
+        self.assertEqual(self.monitor.get_daily_stats(1)[0]["total_executions"], 11)
+
+    def test_clear_single_tool(self):
+        """清除指定工具统计"""
+        self.monitor.record_execution("search_customer", 1, True, 0.02)
+        self.monitor.record_execution("check_inventory", 1, True, 0.02)
+
+        self.monitor.clear_stats("search_customer")
+
+        names = [s["tool_name"] for s in self.monitor.get_all_tools_stats()]
+        self.assertEqual(names, ["check_inventory"])
+
+    def test_latency_histogram(self):
+        """延迟分桶与分位数估算"""
+        self.assertEqual(latency_bucket(0.005), "10")
+        self.assertEqual(latency_bucket(0.3), "500")
+        self.assertEqual(latency_bucket(60), "inf")
+        self.assertEqual(histogram_percentile({"10": 95, "1000": 5}, 0.95), 0.01)
+        # 溢出桶没有上界，取最后一个有限分桶
+        self.assertEqual(histogram_percentile({"10": 1, "inf": 9}, 0.95), 10.0)
+        self.assertIsNone(histogram_percentile({}, 0.95))
+
+
+@requires_fakeredis
+class RedisToolStatsBackendTestCase(SimpleTestCase):
+    """Redis计数器后端测试"""
+
+    def test_index_keys_expire_with_stats(self):
+        """工具集合和排行与统计哈希设置相同的过期时间"""
+        client = fake_redis()
+        monitor = ToolMonitor(backend=RedisToolStatsBackend(client, "tool_stats_test"))
+
+        monitor.record_execution("query_sales_orders", 1, True, 0.2)
+
+        keys = [key.decode() for key in client.keys("tool_stats_test:*")]
+        self.assertIn("tool_stats_test:tools", keys)
+        self.assertIn("tool_stats_test:rank", keys)
+        for key in keys:
+            self.assertGreater(client.ttl(key), 0, key)
+        self.assertEqual(monitor.get_top_tools(1)[0]["tool_name"], "query_sales_orders")
+
+    def test_redis_error_falls_back_to_local_counters(self):
+        """Redis不可用时记录到进程内计数器，不抛出异常"""
+        monitor = ToolMonitor(backend=RedisToolStatsBackend(fake_redis(False), "tool_stats_test"))
+        local = ToolMonitor(backend=LocalToolStatsBackend())
+        local.clear_stats()
+
+        with self.assertLogs("ai_assistant.services.tool_monitor", "WARNING"):
+            monitor.record_execution("query_sales_orders", 1, True, 0.2)
+
+        self.assertEqual(local.get_tool_stats("query_sales_orders")["total_executions"], 1)
+        local.clear_stats()
@@ -6,7 +6,7 @@ ERP工具基类
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -35,6 +35,16 @@ class ToolResult:
             result["error"] = self.error
         return result
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ToolResult":
+        """从字典格式还原（用于缓存命中的结果）"""
+        return cls(
+            success=data.get("success", False),
+            data=data.get("data"),
+            message=data.get("message", ""),
+            error=data.get("error"),
+        )
+
 
 class BaseTool(ABC):
     """
@@ -54,6 +64,12 @@ class BaseTool(ABC):
     require_approval: bool = False  # 是否需要审核
     risk_level: str = "low"  # 风险级别：low/medium/high
 
+    # 结果缓存（仅对 risk_level="low" 且声明了 cache_models 的工具生效）
+    cache_models: Tuple[str, ...] = ()  # 读取的模型（app_label.ModelName），数据变更时缓存失效
+    cache_ttl: Optional[int] = None  # 缓存时间（秒），默认使用CacheService.DEFAULT_TTL
+    cache_scope: str = "user"  # 缓存范围：user（按用户）/permission（权限相同的用户共享）
+    cache_single_flight: bool = False  # 并发相同请求只执行一次（适用于耗时的报表工具）
+
     def __init__(self, user: User):
         """
         初始化工具
@@ -22,6 +22,8 @@ class CheckInventoryTool(BaseTool):
     category = "inventory"
     risk_level = "low"
 
+    cache_models = ("inventory.InventoryStock", "inventory.Warehouse", "products.Product")
+
     def get_parameters_schema(self) -> Dict[str, Any]:
         return {
             "type": "object",
@@ -93,6 +95,8 @@ class SearchProductTool(BaseTool):
     category = "inventory"
     risk_level = "low"
 
+    cache_models = ("products.Product", "products.ProductCategory", "products.Unit")
+
     def get_parameters_schema(self) -> Dict[str, Any]:
         return {
             "type": "object",
@@ -150,6 +154,8 @@ class GetLowStockAlertTool(BaseTool):
     category = "inventory"
     risk_level = "low"
 
+    cache_models = ("inventory.InventoryStock", "products.Product")
+
     def get_parameters_schema(self) -> Dict[str, Any]:
         return {
             "type": "object",
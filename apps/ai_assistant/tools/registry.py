@@ -4,7 +4,11 @@
 管理所有ERP工具的注册和发现
 """
 
-from typing import Dict, List, Optional, Type
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
 
 from django.contrib.auth import get_user_model
 
@@ -129,6 +133,31 @@ from .sales_tools_extended import (
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """工具静态描述（注册时生成一次）"""
+
+    name: str
+    tool_class: Type[BaseTool]
+    category: str
+    require_permission: Optional[str]
+    risk_level: str
+    openai_function: Dict[str, Any]
+    anthropic_tool: Dict[str, Any]
+    cache_models: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class ToolCatalog:
+    """某一权限集合可用的工具目录"""
+
+    tool_names: Tuple[str, ...]
+    openai_functions: Tuple[Dict[str, Any], ...]
+    anthropic_tools: Tuple[Dict[str, Any], ...]
+
 
 class ToolRegistry:
     """工具注册表"""
@@ -136,28 +165,64 @@ class ToolRegistry:
     # 所有已注册的工具类
     _registered_tools: Dict[str, Type[BaseTool]] = {}
 
+    # 注册时预先生成的工具描述（含序列化后的Schema）
+    _tool_specs: Dict[str, ToolSpec] = {}
+
+    # 已注册工具需要的权限代码
+    _required_permissions: Set[str] = set()
+
+    # 可缓存工具读取的模型（数据变更时使结果缓存失效）
+    _cache_model_labels: Set[str] = set()
+
+    # 按权限指纹缓存的工具目录
+    _catalogs: Dict[str, ToolCatalog] = {}
+
+    # 工具目录缓存上限（不同权限组合数）
+    MAX_CATALOGS = 256
+
+    _lock = threading.Lock()
+
     @classmethod
     def register(cls, tool_class: Type[BaseTool]):
         """
         注册工具
 
+        实例化一次工具以获取名称并生成OpenAI/Anthropic格式的Schema，
+        后续请求直接复用，无需再实例化。
+
         Args:
             tool_class: 工具类
         """
-        # 实例化一个临时对象来获取工具名称
-        # 使用None作为user，因为我们只是要获取名称
+        # 使用None作为user，因为我们只是要获取名称和Schema
         try:
             temp_instance = tool_class(user=None)
-            tool_name = temp_instance.name
-            cls._registered_tools[tool_name] = tool_class
-        except Exception:
+            spec = ToolSpec(
+                name=temp_instance.name,
+                tool_class=tool_class,
+                category=temp_instance.category,
+                require_permission=temp_instance.require_permission,
+                risk_level=temp_instance.risk_level,
+                openai_function=temp_instance.to_openai_function(),
+                anthropic_tool=temp_instance.to_anthropic_tool(),
+                cache_models=tuple(temp_instance.cache_models),
+            )
+        except Exception as e:
             # 如果实例化失败，跳过
-            pass
+            logger.warning(f"工具注册失败 {tool_class.__name__}: {str(e)}")
+            return
+
+        with cls._lock:
+            cls._registered_tools[spec.name] = tool_class
+            cls._tool_specs[spec.name] = spec
+            if spec.require_permission:
+                cls._required_permissions.add(spec.require_permission)
+            cls._cache_model_labels.update(spec.cache_models)
+            cls._catalogs.clear()
 
     @classmethod
     def get_tool(cls, tool_name: str, user: User) -> Optional[BaseTool]:
         """
-        获取工具实例
+        获取工具实例（仅实例化实际调用的工具）
 
         Args:
             tool_name: 工具名称
@@ -171,6 +236,29 @@ class ToolRegistry:
             return tool_class(user=user)
         return None
 
+    @classmethod
+    def get_tool_spec(cls, tool_name: str) -> Optional[ToolSpec]:
+        """
+        获取工具静态描述（不实例化工具）
+
+        Args:
+            tool_name: 工具名称
+
+        Returns:
+            ToolSpec，如果不存在则返回None
+        """
+        return cls._tool_specs.get(tool_name)
+
+    @classmethod
+    def get_cache_model_labels(cls) -> Set[str]:
+        """
+        获取可缓存工具声明读取的模型
+
+        Returns:
+            模型标签集合（app_label.ModelName）
+        """
+        return cls._cache_model_labels
+
     @classmethod
     def get_all_tools(cls, user: User) -> List[BaseTool]:
         """
@@ -182,14 +270,7 @@ class ToolRegistry:
         Returns:
             工具实例列表
         """
-        tools = []
-        for tool_class in cls._registered_tools.values():
-            try:
-                tool = tool_class(user=user)
-                tools.append(tool)
-            except Exception:
-                continue
-        return tools
+        return [spec.tool_class(user=user) for spec in cls._tool_specs.values()]
 
     @classmethod
     def get_tools_by_category(cls, category: str, user: User) -> List[BaseTool]:
@@ -203,15 +284,11 @@ class ToolRegistry:
         Returns:
             工具实例列表
         """
-        tools = []
-        for tool_class in cls._registered_tools.values():
-            try:
-                tool = tool_class(user=user)
-                if tool.category == category:
-                    tools.append(tool)
-            except Exception:
-                continue
-        return tools
+        return [
+            spec.tool_class(user=user)
+            for spec in cls._tool_specs.values()
+            if spec.category == category
+        ]
 
     @classmethod
     def get_available_tools(cls, user: User) -> List[BaseTool]:
@@ -224,43 +301,126 @@ class ToolRegistry:
         Returns:
             用户有权限的工具列表
         """
-        available_tools = []
-        for tool_class in cls._registered_tools.values():
-            try:
-                tool = tool_class(user=user)
-                if tool.check_permission():
-                    available_tools.append(tool)
-            except Exception:
-                continue
-        return available_tools
+        catalog = cls.get_catalog(user)
+        return [cls._tool_specs[name].tool_class(user=user) for name in catalog.tool_names]
+
+    @classmethod
+    def get_available_tool_names(cls, user: User) -> List[str]:
+        """
+        获取用户有权限使用的工具名称（不实例化工具）
+
+        Args:
+            user: 用户对象
+
+        Returns:
+            工具名称列表
+        """
+        return list(cls.get_catalog(user).tool_names)
 
     @classmethod
     def to_openai_functions(cls, user: User) -> List[Dict]:
         """
         转换为OpenAI Function Calling格式
 
+        返回的Schema在进程内共享，调用方不应修改。
+
         Args:
             user: 用户对象
 
         Returns:
             OpenAI函数定义列表
         """
-        tools = cls.get_available_tools(user)
-        return [tool.to_openai_function() for tool in tools]
+        return list(cls.get_catalog(user).openai_functions)
 
     @classmethod
     def to_anthropic_tools(cls, user: User) -> List[Dict]:
         """
         转换为Anthropic Tool Use格式
 
+        返回的Schema在进程内共享，调用方不应修改。
+
         Args:
             user: 用户对象
 
         Returns:
             Anthropic工具定义列表
         """
-        tools = cls.get_available_tools(user)
-        return [tool.to_anthropic_tool() for tool in tools]
+        return list(cls.get_catalog(user).anthropic_tools)
+
+    # ==================== 工具目录 ====================
+
+    @classmethod
+    def get_permission_fingerprint(cls, user: User) -> str:
+        """
+        计算用户的权限指纹
+
+        只考虑已注册工具实际需要的权限代码，权限组合相同的用户共享同一目录。
+
+        Args:
+            user: 用户对象
+
+        Returns:
+            权限指纹
+        """
+        if user is None or not user.is_active:
+            return "none"
+        if user.is_superuser:
+            return "superuser"
+
+        from ai_assistant.utils.permissions import get_user_permission_codes
+
+        granted = sorted(get_user_permission_codes(user) & cls._required_permissions)
+        digest = hashlib.sha1("|".join(granted).encode()).hexdigest()[:16]
+        return f"perms:{digest}"
+
+    @classmethod
+    def get_catalog(cls, user: User) -> ToolCatalog:
+        """
+        获取用户可用的工具目录（按权限指纹缓存）
+
+        Args:
+            user: 用户对象
+
+        Returns:
+            ToolCatalog
+        """
+        fingerprint = cls.get_permission_fingerprint(user)
+        catalog = cls._catalogs.get(fingerprint)
+        if catalog is not None:
+            return catalog
+
+        if fingerprint == "none":
+            specs = [spec for spec in cls._tool_specs.values() if not spec.require_permission]
+        elif fingerprint == "superuser":
+            specs = list(cls._tool_specs.values())
+        else:
+            from ai_assistant.utils.permissions import get_user_permission_codes
+
+            granted = get_user_permission_codes(user)
+            specs = [
+                spec
+                for spec in cls._tool_specs.values()
+                if not spec.require_permission or spec.require_permission in granted
+            ]
+
+        catalog = ToolCatalog(
+            tool_names=tuple(spec.name for spec in specs),
+            openai_functions=tuple(spec.openai_function for spec in specs),
+            anthropic_tools=tuple(spec.anthropic_tool for spec in specs),
+        )
+
+        with cls._lock:
+            if len(cls._catalogs) >= cls.MAX_CATALOGS:
+                cls._catalogs.clear()
+            cls._catalogs[fingerprint] = catalog
+
+        return catalog
+
+    @classmethod
+    def invalidate_catalogs(cls):
+        """清空所有工具目录缓存"""
+        with cls._lock:
+            cls._catalogs.clear()
 
 
 # 自动注册所有工具
@@ -24,6 +24,10 @@ class GenerateSalesReportTool(BaseTool):
     category = "report"
     risk_level = "low"
 
+    cache_models = ("sales.SalesOrder", "customers.Customer")
+    cache_scope = "permission"
+    cache_single_flight = True
+
     def get_parameters_schema(self) -> Dict[str, Any]:
         return {
             "type": "object",
@@ -142,6 +146,10 @@ class GeneratePurchaseReportTool(BaseTool):
     category = "report"
     risk_level = "low"
 
+    cache_models = ("purchase.PurchaseOrder", "suppliers.Supplier")
+    cache_scope = "permission"
+    cache_single_flight = True
+
     def get_parameters_schema(self) -> Dict[str, Any]:
         return {
             "type": "object",
@@ -242,6 +250,10 @@ class GenerateInventoryReportTool(BaseTool):
     category = "report"
     risk_level = "low"
 
+    cache_models = ("inventory.InventoryStock", "products.Product")
+    cache_scope = "permission"
+    cache_single_flight = True
+
     def get_parameters_schema(self) -> Dict[str, Any]:
         return {
             "type": "object",
@@ -7,6 +7,7 @@ from .encryption import APIKeyEncryption, decrypt_api_key, encrypt_api_key
 from .logger import AIAssistantLogger
 from .permissions import (
     clear_user_permission_cache,
+    get_user_permission_codes,
     get_user_permissions,
     get_user_roles,
     has_custom_permission,
@@ -17,6 +18,7 @@ __all__ = [
     "AIAssistantCache",
     "AIAssistantLogger",
     "has_custom_permission",
+    "get_user_permission_codes",
     "get_user_permissions",
     "get_user_roles",
     "clear_user_permission_cache",
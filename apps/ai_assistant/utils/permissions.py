@@ -4,7 +4,7 @@
 提供统一的权限检查接口，支持自定义 Permission 模型
 """
 
-from typing import Dict, List
+from typing import Dict, List, Set
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
@@ -12,25 +12,18 @@ from django.core.cache import cache
 User = get_user_model()
 
 
-def has_custom_permission(user: User, permission_code: str) -> bool:
+def get_user_permission_codes(user: User) -> Set[str]:
     """
-    检查用户是否有指定权限（自定义 Permission 模型）
+    获取用户拥有的自定义权限代码集合（带缓存）
 
     Args:
         user: 用户对象
-        permission_code: 权限代码，格式："sales.add_order"
 
     Returns:
-        bool: 是否有权限
+        权限代码集合；获取失败时返回空集合
     """
-    if not user or user.is_anonymous:
-        return False
-
-    if user.is_superuser:
-        return True
-
-    if not user.is_active:
-        return False
+    if not user or user.is_anonymous or not user.is_active:
+        return set()
 
     try:
         from users.models import UserRole
@@ -63,13 +56,35 @@ def has_custom_permission(user: User, permission_code: str) -> bool:
             cache.set(cache_key, list(perms), 3600)
             cached_perms = list(perms)
 
-        # 检查权限
-        return permission_code in cached_perms
+        return set(cached_perms)
 
     except Exception as e:
         print(f"权限检查失败: {str(e)}")
+        return set()
+
+
+def has_custom_permission(user: User, permission_code: str) -> bool:
+    """
+    检查用户是否有指定权限（自定义 Permission 模型）
+
+    Args:
+        user: 用户对象
+        permission_code: 权限代码，格式："sales.add_order"
+
+    Returns:
+        bool: 是否有权限
+    """
+    if not user or user.is_anonymous:
+        return False
+
+    if user.is_superuser:
+        return True
+
+    if not user.is_active:
         return False
 
+    return permission_code in get_user_permission_codes(user)
+
 
 def get_user_permissions(user: User) -> List[Dict[str, str]]:
     """
@@ -2,7 +2,7 @@
 高级分析数据模型
 """
 
-from bi.models import Dashboard
+from apps.bi.models import Dashboard
 from core.models import BaseModel, Platform, Shop
 from django.db import models
 from django.utils import timezone
@@ -5,3 +5,12 @@ class BIConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.bi"
     verbose_name = "BI报表系统"
+
+    def ready(self):
+        """启用实时大屏（BI_REALTIME_ENABLED）时注册订单/库存变更信号"""
+        from django.conf import settings
+
+        if getattr(settings, "BI_REALTIME_ENABLED", False):
+            from apps.bi.realtime.signals import connect_realtime_signals
+
+            connect_realtime_signals()
@@ -0,0 +1,167 @@
+# Generated by Django 5.0.9 on 2026-10-19 05:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bi", "0002_apiperformance_systemhealth"),
+        ("core", "0012_mediablob_mediasource_mediareference"),
+        ("products", "0004_add_default_unit"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DemandForecast",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="创建时间")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="更新时间")),
+                ("is_deleted", models.BooleanField(default=False, verbose_name="是否删除")),
+                ("deleted_at", models.DateTimeField(blank=True, null=True, verbose_name="删除时间")),
+                (
+                    "forecast_date",
+                    models.DateField(db_index=True, help_text="训练数据截止日期", verbose_name="预测日期"),
+                ),
+                ("history_days", models.PositiveIntegerField(default=0, verbose_name="训练天数")),
+                ("horizon_days", models.PositiveIntegerField(default=30, verbose_name="预测天数")),
+                (
+                    "method",
+                    models.CharField(
+                        choices=[
+                            ("ses", "简单指数平滑"),
+                            ("holt", "Holt线性趋势"),
+                            ("holt_winters", "Holt-Winters季节性"),
+                        ],
+                        max_length=20,
+                        verbose_name="预测方法",
+                    ),
+                ),
+                (
+                    "alpha",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=4, verbose_name="水平平滑系数"
+                    ),
+                ),
+                (
+                    "beta",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=4, verbose_name="趋势平滑系数"
+                    ),
+                ),
+                (
+                    "gamma",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=4, verbose_name="季节平滑系数"
+                    ),
+                ),
+                (
+                    "forecast_total",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=15, verbose_name="预测总量"
+                    ),
+                ),
+                (
+                    "forecast_values",
+                    models.JSONField(blank=True, default=list, verbose_name="逐日预测"),
+                ),
+                (
+                    "mae",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=12, verbose_name="平均绝对误差"
+                    ),
+                ),
+                (
+                    "rmse",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=12, verbose_name="均方根误差"
+                    ),
+                ),
+                (
+                    "wape",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=7,
+                        null=True,
+                        verbose_name="加权绝对百分比误差",
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="%(class)s_created",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="创建人",
+                    ),
+                ),
+                (
+                    "deleted_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="%(class)s_deleted",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="删除人",
+                    ),
+                ),
+                (
+                    "platform",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="demand_forecasts",
+                        to="core.platform",
+                        verbose_name="平台",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="demand_forecasts",
+                        to="products.product",
+                        verbose_name="商品",
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="%(class)s_updated",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="更新人",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "需求预测",
+                "verbose_name_plural": "需求预测",
+                "db_table": "bi_demand_forecast",
+                "ordering": ["-forecast_date", "-forecast_total"],
+                "indexes": [
+                    models.Index(
+                        fields=["forecast_date", "-forecast_total"],
+                        name="bi_demand_f_forecas_64e7e5_idx",
+                    ),
+                    models.Index(
+                        fields=["product", "-forecast_date"], name="bi_demand_f_product_231967_idx"
+                    ),
+                ],
+                "unique_together": {("product", "platform", "forecast_date")},
+            },
+        ),
+    ]
@@ -210,6 +210,63 @@ class ProductSales(BaseModel):
         return f"{self.product.name} - {self.report_date}"
 
 
+class DemandForecast(BaseModel):
+    """商品需求预测（按商品、平台批量生成）"""
+
+    METHOD_CHOICES = [
+        ("ses", "简单指数平滑"),
+        ("holt", "Holt线性趋势"),
+        ("holt_winters", "Holt-Winters季节性"),
+    ]
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="demand_forecasts",
+        verbose_name="商品",
+    )
+    platform = models.ForeignKey(
+        Platform,
+        on_delete=models.CASCADE,
+        related_name="demand_forecasts",
+        verbose_name="平台",
+    )
+
+    # 预测范围
+    forecast_date = models.DateField("预测日期", db_index=True, help_text="训练数据截止日期")
+    history_days = models.PositiveIntegerField("训练天数", default=0)
+    horizon_days = models.PositiveIntegerField("预测天数", default=30)
+
+    # 模型参数
+    method = models.CharField("预测方法", max_length=20, choices=METHOD_CHOICES)
+    alpha = models.DecimalField("水平平滑系数", max_digits=4, decimal_places=2, default=0)
+    beta = models.DecimalField("趋势平滑系数", max_digits=4, decimal_places=2, default=0)
+    gamma = models.DecimalField("季节平滑系数", max_digits=4, decimal_places=2, default=0)
+
+    # 预测结果
+    forecast_total = models.DecimalField("预测总量", max_digits=15, decimal_places=2, default=0)
+    forecast_values = models.JSONField("逐日预测", default=list, blank=True)
+
+    # 准确度（训练期一步预测误差）
+    mae = models.DecimalField("平均绝对误差", max_digits=12, decimal_places=2, default=0)
+    rmse = models.DecimalField("均方根误差", max_digits=12, decimal_places=2, default=0)
+    wape = models.DecimalField("加权绝对百分比误差", max_digits=7, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        verbose_name = "需求预测"
+        verbose_name_plural = "需求预测"
+        db_table = "bi_demand_forecast"
+        ordering = ["-forecast_date", "-forecast_total"]
+        unique_together = [["product", "platform", "forecast_date"]]
+        indexes = [
+            models.Index(fields=["forecast_date", "-forecast_total"]),
+            models.Index(fields=["product", "-forecast_date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} - {self.forecast_date}"
+
+
 class InventoryAnalysis(BaseModel):
     """库存分析数据"""
 
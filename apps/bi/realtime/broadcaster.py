@@ -0,0 +1,477 @@
+"""
+实时大屏推送
+
+领域事件（平台订单新增/状态变化、库存变动）在事务提交后增量更新缓存中的组件聚合，
+再由防抖的广播器按大屏分组推送发生变化的组件数据。
+同一大屏的组件数据每次只计算一次，N 个观看者共享同一份推送。
+"""
+
+import hashlib
+import json
+import logging
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+try:
+    from channels.layers import get_channel_layer
+except ImportError:  # 未安装 channels 时只维护聚合，不推送
+    get_channel_layer = None
+
+logger = logging.getLogger(__name__)
+
+# 事件主题：("sales", platform_id) / ("inventory", warehouse_id)
+Topic = Tuple[str, Optional[int]]
+
+ORDER_STATUSES = (
+    "pending",
+    "paid",
+    "processing",
+    "shipped",
+    "delivered",
+    "cancelled",
+    "refunded",
+)
+PAID_STATUSES = ("paid", "shipped", "delivered")
+SALES_FIELDS = ("orders", "amount_cents") + tuple(f"status_{s}" for s in ORDER_STATUSES)
+INVENTORY_FIELDS = ("quantity", "low_stock")
+
+
+def order_state(order) -> Dict[str, int]:
+    """订单对当日销售聚合的贡献"""
+    return {
+        "orders": 1,
+        "amount_cents": int((order.order_amount or Decimal("0")) * 100),
+        f"status_{order.order_status}": 1,
+    }
+
+
+def stock_state(stock) -> Dict[str, int]:
+    """库存记录对仓库聚合的贡献"""
+    return {"quantity": stock.quantity or 0, "low_stock": int(bool(stock.is_low_stock_flag))}
+
+
+def state_delta(old: Optional[Dict], new: Optional[Dict]) -> Dict[str, int]:
+    """两次状态之间的增量（None 表示记录不存在）"""
+    old, new = old or {}, new or {}
+    delta = {key: new.get(key, 0) - old.get(key, 0) for key in set(old) | set(new)}
+    return {key: value for key, value in delta.items() if value}
+
+
+class RealtimeAggregates:
+    """
+    缓存中的实时组件聚合
+
+    每个范围（某日某平台 / 某仓库，None 表示全部）一组计数器，读时按需从数据库播种，
+    写时用 cache.incr 原子累加。播种窗口内的并发事件可能丢失，由定时重建校正。
+    """
+
+    KEY_PREFIX = "bi_realtime"
+    TIMEOUT = 2 * 24 * 3600
+    RECENT_ORDERS = 10
+
+    # ------------------------------------------------------------------
+    # 键
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def sales_prefix(cls, day, platform_id: Optional[int]) -> str:
+        return f"{cls.KEY_PREFIX}:sales:{day:%Y%m%d}:{platform_id or 'all'}"
+
+    @classmethod
+    def inventory_prefix(cls, warehouse_id: Optional[int]) -> str:
+        return f"{cls.KEY_PREFIX}:inventory:{warehouse_id or 'all'}"
+
+    # ------------------------------------------------------------------
+    # 播种
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def seed_sales(cls, day, platform_id: Optional[int]) -> Dict:
+        """从数据库计算某日销售聚合并写入缓存"""
+        from ecomm_sync.models import PlatformOrder
+
+        queryset = PlatformOrder.objects.filter(created_at__date=day)
+        if platform_id:
+            queryset = queryset.filter(platform_id=platform_id)
+
+        aggregates = queryset.aggregate(
+            orders=Count("id"),
+            amount=Sum("order_amount"),
+            **{
+                f"status_{status}": Count("id", filter=Q(order_status=status))
+                for status in ORDER_STATUSES
+            },
+        )
+        values = {field: aggregates.get(field) or 0 for field in SALES_FIELDS}
+        values["amount_cents"] = int((aggregates["amount"] or Decimal("0")) * 100)
+        recent = [
+            cls._order_row(order) for order in queryset.order_by("-created_at")[: cls.RECENT_ORDERS]
+        ]
+
+        prefix = cls.sales_prefix(day, platform_id)
+        cls._store(prefix, values, extra={f"{prefix}:recent": recent})
+        values["recent_orders"] = recent
+        return values
+
+    @classmethod
+    def seed_inventory(cls, warehouse_id: Optional[int]) -> Dict:
+        """从数据库计算仓库库存聚合并写入缓存"""
+        from inventory.models import InventoryStock
+
+        queryset = InventoryStock.objects.filter(is_deleted=False)
+        if warehouse_id:
+            queryset = queryset.filter(warehouse_id=warehouse_id)
+
+        aggregates = queryset.aggregate(
+            quantity=Sum("quantity"),
+            low_stock=Count("id", filter=Q(is_low_stock_flag=True)),
+        )
+        values = {field: aggregates.get(field) or 0 for field in INVENTORY_FIELDS}
+        cls._store(cls.inventory_prefix(warehouse_id), values)
+        return values
+
+    @classmethod
+    def _store(cls, prefix: str, values: Dict, extra: Optional[Dict] = None):
+        data = {f"{prefix}:{field}": value for field, value in values.items()}
+        data.update(extra or {})
+        data[f"{prefix}:seeded"] = 1
+        cache.set_many(data, cls.TIMEOUT)
+
+    # ------------------------------------------------------------------
+    # 增量更新
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def apply(cls, prefix: str, delta: Dict[str, int]) -> bool:
+        """
+        累加增量
+
+        尚未播种的范围直接跳过（下次读取时会从数据库得到包含本次变更的结果）。
+
+        Returns:
+            bool: 缓存中的聚合是否发生了变化
+        """
+        if not delta or cache.get(f"{prefix}:seeded") is None:
+            return False
+
+        for field, value in delta.items():
+            try:
+                cache.incr(f"{prefix}:{field}", value)
+            except ValueError:
+                # 计数器被淘汰：作废整组，下次读取重新播种
+                cls.invalidate(prefix)
+                return False
+        return True
+
+    @classmethod
+    def invalidate(cls, prefix: str):
+        cache.delete(f"{prefix}:seeded")
+
+    @classmethod
+    def apply_order(
+        cls, order, old_state: Optional[Dict], new_state: Optional[Dict]
+    ) -> List[Topic]:
+        """订单变更：更新所属平台与全部平台的当日聚合，返回受影响的主题"""
+        day = timezone.localdate(order.created_at) if order.created_at else timezone.localdate()
+        delta = state_delta(old_state, new_state)
+        if not delta:
+            return []
+
+        for platform_id in (order.platform_id, None):
+            prefix = cls.sales_prefix(day, platform_id)
+            if cls.apply(prefix, delta) and new_state and old_state is None:
+                cls._push_recent(prefix, order)
+
+        if day != timezone.localdate():
+            return []
+        return [("sales", order.platform_id)]
+
+    @classmethod
+    def apply_stock(
+        cls, stock, old_state: Optional[Dict], new_state: Optional[Dict]
+    ) -> List[Topic]:
+        """库存变更：更新所属仓库与全部仓库的聚合，返回受影响的主题"""
+        delta = state_delta(old_state, new_state)
+        if not delta:
+            return []
+
+        for warehouse_id in (stock.warehouse_id, None):
+            cls.apply(cls.inventory_prefix(warehouse_id), delta)
+        return [("inventory", stock.warehouse_id)]
+
+    @classmethod
+    def _push_recent(cls, prefix: str, order):
+        key = f"{prefix}:recent"
+        recent = cache.get(key) or []
+        recent.insert(0, cls._order_row(order))
+        cache.set(key, recent[: cls.RECENT_ORDERS], cls.TIMEOUT)
+
+    @staticmethod
+    def _order_row(order) -> Dict:
+        return {
+            "platform_order_id": order.platform_order_id,
+            "buyer_name": order.buyer_name,
+            "order_amount": float(order.order_amount or 0),
+            "order_status": order.order_status,
+            "created_at": order.created_at.isoformat() if order.created_at else "",
+        }
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def sales_snapshot(cls, platform_id: Optional[int] = None, day=None) -> Dict:
+        """当日销售组件数据"""
+        day = day or timezone.localdate()
+        prefix = cls.sales_prefix(day, platform_id)
+        keys = [f"{prefix}:{field}" for field in SALES_FIELDS]
+        cached = cache.get_many(keys + [f"{prefix}:seeded", f"{prefix}:recent"])
+
+        if f"{prefix}:seeded" in cached and all(key in cached for key in keys):
+            values = {field: cached[f"{prefix}:{field}"] for field in SALES_FIELDS}
+            values["recent_orders"] = cached.get(f"{prefix}:recent", [])
+        else:
+            values = cls.seed_sales(day, platform_id)
+
+        total_orders = values["orders"]
+        total_amount = values["amount_cents"] / 100
+        paid_orders = sum(values[f"status_{status}"] for status in PAID_STATUSES)
+        return {
+            "total_orders": total_orders,
+            "total_amount": total_amount,
+            "paid_orders": paid_orders,
+            "cancelled_orders": values["status_cancelled"],
+            "refunded_orders": values["status_refunded"],
+            "avg_order_value": round(total_amount / total_orders, 2) if total_orders else 0,
+            "conversion_rate": round(paid_orders / total_orders * 100, 2) if total_orders else 0,
+            "recent_orders": values["recent_orders"],
+        }
+
+    @classmethod
+    def inventory_snapshot(cls, warehouse_id: Optional[int] = None) -> Dict:
+        """仓库库存组件数据"""
+        prefix = cls.inventory_prefix(warehouse_id)
+        keys = [f"{prefix}:{field}" for field in INVENTORY_FIELDS]
+        cached = cache.get_many(keys + [f"{prefix}:seeded"])
+
+        if f"{prefix}:seeded" in cached and all(key in cached for key in keys):
+            values = {field: cached[f"{prefix}:{field}"] for field in INVENTORY_FIELDS}
+        else:
+            values = cls.seed_inventory(warehouse_id)
+
+        return {"total_quantity": values["quantity"], "low_stock_items": values["low_stock"]}
+
+    @classmethod
+    def rebuild(cls) -> Dict:
+        """从数据库重建当日全部聚合（定时校正）"""
+        from core.models import Platform
+        from inventory.models import Warehouse
+
+        day = timezone.localdate()
+        platform_ids = [None] + list(Platform.objects.values_list("id", flat=True))
+        warehouse_ids = [None] + list(Warehouse.objects.values_list("id", flat=True))
+
+        for platform_id in platform_ids:
+            cls.seed_sales(day, platform_id)
+        for warehouse_id in warehouse_ids:
+            cls.seed_inventory(warehouse_id)
+
+        return {"platforms": len(platform_ids) - 1, "warehouses": len(warehouse_ids) - 1}
+
+
+class DashboardBroadcaster:
+    """
+    大屏广播器
+
+    事件先映射到订阅了相应数据源的大屏，同一大屏在防抖窗口内只调度一次刷新；
+    刷新时每个组件计算一次，只把与上次推送不同的组件发送到该大屏的 channel 分组。
+    """
+
+    GROUP_PREFIX = "bi_dashboard"
+    DEBOUNCE_SECONDS = 2
+    INDEX_TIMEOUT = 60
+    INDEX_KEY = "bi_realtime:widget_index"
+
+    # 数据源 -> (主题类型, data_params 中的范围参数)
+    SOURCES = {
+        "SalesSummary": ("sales", "platform_id"),
+        "InventoryAnalysis": ("inventory", "warehouse_id"),
+    }
+
+    @classmethod
+    def group_name(cls, dashboard_id: int) -> str:
+        return f"{cls.GROUP_PREFIX}_{dashboard_id}"
+
+    # ------------------------------------------------------------------
+    # 组件索引
+    # ------------------------------------------------------------------
+
+    def widget_index(self) -> List[Dict]:
+        """可推送组件列表（短期缓存，避免每个事件查询组件表）"""
+        index = cache.get(self.INDEX_KEY)
+        if index is None:
+            index = self._load_widget_index()
+            cache.set(self.INDEX_KEY, index, self.INDEX_TIMEOUT)
+        return index
+
+    def _load_widget_index(self) -> List[Dict]:
+        from apps.bi.models import DashboardWidgetConfig
+
+        # 仪表盘上的组件实例；refresh_interval=0 的组件不自动刷新，不参与推送
+        configs = (
+            DashboardWidgetConfig.objects.filter(
+                is_deleted=False,
+                dashboard__is_deleted=False,
+                widget__is_deleted=False,
+                widget__data_source__in=list(self.SOURCES),
+                widget__refresh_interval__gt=0,
+            )
+            .order_by("dashboard_id", "order", "widget_id")
+            .values("widget_id", "dashboard_id", "widget__data_source", "widget__data_params")
+        )
+        return [
+            {
+                "id": config["widget_id"],
+                "dashboard_id": config["dashboard_id"],
+                "data_source": config["widget__data_source"],
+                "data_params": config["widget__data_params"],
+            }
+            for config in configs
+        ]
+
+    @classmethod
+    def invalidate_index(cls):
+        cache.delete(cls.INDEX_KEY)
+
+    def _widget_scope(self, widget: Dict) -> Topic:
+        kind, param = self.SOURCES[widget["data_source"]]
+        return kind, (widget["data_params"] or {}).get(param)
+
+    def dashboards_for(self, topics: Iterable[Topic]) -> List[int]:
+        """订阅了这些主题的大屏（主题范围为 None 时匹配该类型的全部组件）"""
+        topics = set(topics)
+        dashboards = set()
+        for widget in self.widget_index():
+            kind, scope = self._widget_scope(widget)
+            if any(
+                kind == t_kind and (t_scope is None or scope in (None, t_scope))
+                for t_kind, t_scope in topics
+            ):
+                dashboards.add(widget["dashboard_id"])
+        return sorted(dashboards)
+
+    # ------------------------------------------------------------------
+    # 调度
+    # ------------------------------------------------------------------
+
+    def notify(self, topics: Iterable[Topic]) -> List[int]:
+        """
+        事件通知：为受影响的大屏调度一次刷新
+
+        配置了Celery时延迟 DEBOUNCE_SECONDS 执行，窗口内的后续事件合并到同一次刷新；
+        否则立即同步刷新。
+
+        Returns:
+            List[int]: 本次新调度刷新的大屏ID
+        """
+        scheduled = []
+        for dashboard_id in self.dashboards_for(topics):
+            if not cache.add(self._pending_key(dashboard_id), 1, self.DEBOUNCE_SECONDS * 10):
+                continue
+            scheduled.append(dashboard_id)
+            self._schedule(dashboard_id)
+        return scheduled
+
+    def _schedule(self, dashboard_id: int):
+        if getattr(settings, "CELERY_BROKER_URL", None):
+            from apps.bi.tasks import push_dashboard_update
+
+            try:
+                push_dashboard_update.apply_async((dashboard_id,), countdown=self.DEBOUNCE_SECONDS)
+                return
+            except Exception as e:
+                logger.warning(f"调度大屏推送失败，改为同步推送: {str(e)}")
+
+        self.flush(dashboard_id)
+
+    def _pending_key(self, dashboard_id: int) -> str:
+        return f"bi_realtime:pending:{dashboard_id}"
+
+    def _sent_key(self, dashboard_id: int) -> str:
+        return f"bi_realtime:sent:{dashboard_id}"
+
+    # ------------------------------------------------------------------
+    # 计算与推送
+    # ------------------------------------------------------------------
+
+    def snapshot(self, dashboard_id: int) -> Dict[int, Dict]:
+        """大屏全部可推送组件的当前数据（组件ID -> 数据）"""
+        widgets = [w for w in self.widget_index() if w["dashboard_id"] == dashboard_id]
+        scopes = {}
+        payloads = {}
+        for widget in widgets:
+            scope = self._widget_scope(widget)
+            if scope not in scopes:
+                scopes[scope] = self.compute(*scope)
+            payloads[widget["id"]] = scopes[scope]
+        return payloads
+
+    def compute(self, kind: str, scope: Optional[int]) -> Dict:
+        if kind == "sales":
+            return RealtimeAggregates.sales_snapshot(scope)
+        return RealtimeAggregates.inventory_snapshot(scope)
+
+    def flush(self, dashboard_id: int) -> List[int]:
+        """
+        计算大屏组件并推送变化部分
+
+        Returns:
+            List[int]: 本次推送的组件ID
+        """
+        # 先清除调度标记，计算期间到达的事件会调度下一次刷新
+        cache.delete(self._pending_key(dashboard_id))
+
+        payloads = self.snapshot(dashboard_id)
+        sent = cache.get(self._sent_key(dashboard_id)) or {}
+        digests = {widget_id: self._digest(data) for widget_id, data in payloads.items()}
+        changed = [
+            widget_id for widget_id, digest in digests.items() if sent.get(widget_id) != digest
+        ]
+        if not changed:
+            return []
+
+        timestamp = timezone.now().isoformat()
+        self._group_send(
+            dashboard_id,
+            {
+                "type": "dashboard.update",
+                "dashboard_id": dashboard_id,
+                "widgets": [
+                    {"widget_id": widget_id, "data": payloads[widget_id], "timestamp": timestamp}
+                    for widget_id in changed
+                ],
+            },
+        )
+        cache.set(self._sent_key(dashboard_id), digests, RealtimeAggregates.TIMEOUT)
+        return changed
+
+    def _group_send(self, dashboard_id: int, message: Dict):
+        channel_layer = get_channel_layer() if get_channel_layer else None
+        if channel_layer is None:
+            return
+        try:
+            async_to_sync(channel_layer.group_send)(self.group_name(dashboard_id), message)
+        except Exception as e:
+            logger.error(f"推送大屏 {dashboard_id} 数据失败: {str(e)}")
+
+    @staticmethod
+    def _digest(data: Dict) -> str:
+        raw = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.md5(raw.encode("utf-8")).hexdigest()
@@ -3,90 +3,95 @@
 """
 import json
 import logging
+from typing import Dict, List
 
-from asgire_redis.consumers import AsyncChannelLayerConsumer
-from channels.db import async_db, database
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.layers import get_channel_layer
-from django.db.models import Count
 
-from .services import RealtimeDashboardService
+from .broadcaster import DashboardBroadcaster
 
 logger = logging.getLogger(__name__)
 
 
 class DashboardConsumer(AsyncWebsocketConsumer):
-    """大屏WebSocket消费者"""
+    """
+    大屏WebSocket消费者
 
-    async def connect(self, message):
+    订阅后加入大屏的 channel 分组，由 DashboardBroadcaster 统一推送变化的组件数据，
+    连接本身不再轮询或重复计算。
+    """
+
+    async def connect(self):
         """WebSocket连接"""
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.dashboard_groups = set()
         await self.accept()
         await self.send(text_data=json.dumps({'type': 'connected', 'message': 'Connected'}))
 
     async def disconnect(self, close_code):
         """WebSocket断开连接"""
-        await self.close(close_code)
-        await self.send(text_data=json.dumps({'type': 'disconnected', 'message': 'Disconnected'}))
+        for group in getattr(self, 'dashboard_groups', set()):
+            await self.channel_layer.group_discard(group, self.channel_name)
 
     async def receive(self, text_data):
         """接收WebSocket消息"""
         try:
             data = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Invalid JSON format'}))
+            return
 
-            message_type = data.get('type', '')
+        message_type = data.get('type', '')
 
-            if message_type == 'subscribe':
-                await self.subscribe(data)
-            elif message_type == 'unsubscribe':
-                await self.unsubscribe(data)
-            elif message_type == 'refresh':
-                await self.refresh(data)
-            elif message_type == 'ping':
-                await self.ping(data)
-            else:
-                await self.send(text_data=json.dumps({'type': 'error', 'message': 'Unknown message type'}))
+        if message_type == 'subscribe':
+            await self.subscribe(data)
+        elif message_type == 'unsubscribe':
+            await self.unsubscribe(data)
+        elif message_type == 'refresh':
+            await self.refresh(data)
+        elif message_type == 'ping':
+            await self.ping(data)
+        else:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Unknown message type'}))
 
-        except json.JSONDecodeError:
-            await self.send(text_data({'type': 'error', 'message': 'Invalid JSON format'}))
+    def _dashboard_id(self, data):
+        try:
+            return int(data.get('dashboard_id'))
+        except (TypeError, ValueError):
+            return None
 
     async def subscribe(self, data):
-        """订阅大屏数据"""
-        from asgire_redis.consumers import get_channel_layer
-        channel_layer = get_channel_layer('dashboard')
-
-        # 验证是否为订阅操作
-        if data.get('action') != 'subscribe':
-            await self.send(text_data({'type': 'error', 'message': 'Invalid action'}))
+        """订阅大屏数据：加入分组并返回当前快照"""
+        dashboard_id = self._dashboard_id(data)
+        if dashboard_id is None:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Invalid dashboard_id'}))
             return
 
-        dashboard_id = data.get('dashboard_id')
-
         try:
-            # 创建Redis channel
-            async def get_or_create_channel():
-            channel_name = f"dashboard:{dashboard_id}"
-            await channel_layer.new_channel(
-                channel_name,
-                {
-                    'type': 'realtime',
-                    'django_asgi_redis': True,
-                'consuming_groups': 'dashboard',
-                    'channel_layers': [],
-                'consuming_channels': ['realtime_updates']
-                }
-            )
-
-            await self.channel_layer.send({
-                'type': 'subscribed',
-                'dashboard_id': dashboard_id,
-                'message': f'Subscribed to {channel_name}'
-            })
-
-            # 监听该通道
-            await channel_layer.group_send(f'dashboard:{dashboard_id}')
-            await self.channel_layer.group_add(f'dashboard:{dashboard_id}', self.channel_name)
+            group = DashboardBroadcaster.group_name(dashboard_id)
+            await self.channel_layer.group_add(group, self.channel_name)
+            self.dashboard_groups.add(group)
 
+            snapshot = await database_sync_to_async(DashboardBroadcaster().snapshot)(dashboard_id)
+            await self.send(
+                text_data=json.dumps(
+                    {
+                        'type': 'subscribed',
+                        'dashboard_id': dashboard_id,
+                        'widgets': [
+                            {'widget_id': widget_id, 'data': widget_data}
+                            for widget_id, widget_data in snapshot.items()
+                        ],
+                    },
+                    default=str,
+                )
+            )
         except Exception as e:
+            logger.error(f"Dashboard subscription failed: {e}")
             await self.send(
                 text_data=json.dumps(
                     {"type": "error", "message": f"Subscription failed: {str(e)}"}
@@ -95,44 +100,53 @@ class DashboardConsumer(AsyncWebsocketConsumer):
 
     async def unsubscribe(self, data):
         """取消订阅大屏数据"""
-        from asgire_redis.consumers import get_channel_layer
-        channel_layer = get_channel_layer('dashboard')
-
-        if data.get('action') != 'unsubscribe':
-            await self.send(text_data({'type': 'error', 'message': 'Invalid action'}))
+        dashboard_id = self._dashboard_id(data)
+        if dashboard_id is None:
+            await self.send(text_data=json.dumps({'type': 'error', 'message': 'Invalid dashboard_id'}))
             return
 
-        dashboard_id = data.get('dashboard_id')
+        group = DashboardBroadcaster.group_name(dashboard_id)
+        await self.channel_layer.group_discard(group, self.channel_name)
+        self.dashboard_groups.discard(group)
 
-        try:
-            channel_name = f"dashboard:{dashboard_id}"
-
-            await channel_layer.send({
-                'type': 'unsubscribed',
-                'dashboard_id': dashboard_id,
-                'message': f'Unsubscribed from {channel_name}'
-            })
-
-            await channel_layer.group_discard(f'dashboard:{dashboard_id}', self.channel_name)
-
-            await self.send(text_data=json.dumps({'type': 'success', 'message': f'Unsubscribed from {channel_name}'}))
-
-        except Exception as e:
-            await self.send(text_data=json.dumps({'type': 'error', 'message': f'Unsubscription failed: {str(e)}'}))
+        await self.send(text_data=json.dumps({'type': 'unsubscribed', 'dashboard_id': dashboard_id}))
 
     async def refresh(self, data):
-        """刷新大屏数据"""
-        from .services import RealtimeDashboardService
-
-        dashboard_id = data.get('dashboard_id')
-        dashboard_data = RealtimeDashboardService.get_dashboard_data(dashboard_id)
+        """刷新大屏数据（返回缓存聚合的快照，不触发重新计算）"""
+        dashboard_id = self._dashboard_id(data)
+        snapshot = await database_sync_to_async(DashboardBroadcaster().snapshot)(dashboard_id)
 
-        await self.send(text_data({'type': 'refresh', 'dashboard_data': dashboard_data}))
+        await self.send(
+            text_data=json.dumps(
+                {
+                    'type': 'refresh',
+                    'dashboard_id': dashboard_id,
+                    'widgets': [
+                        {'widget_id': widget_id, 'data': widget_data}
+                        for widget_id, widget_data in snapshot.items()
+                    ],
+                },
+                default=str,
+            )
+        )
 
     async def ping(self, data):
         """心跳检测"""
         await self.send(text_data=json.dumps({'type': 'pong', 'message': 'pong'}))
 
+    async def dashboard_update(self, event):
+        """分组消息：广播器推送的组件增量"""
+        await self.send(
+            text_data=json.dumps(
+                {
+                    'type': 'dashboard_update',
+                    'dashboard_id': event['dashboard_id'],
+                    'widgets': event['widgets'],
+                },
+                default=str,
+            )
+        )
+
 
 class MetricCardConsumer(AsyncWebsocketConsumer):
     """指标卡WebSocket消费者"""
@@ -0,0 +1,12 @@
+"""
+实时大屏WebSocket路由
+"""
+
+from django.urls import re_path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r"^ws/bi/dashboard/$", consumers.DashboardConsumer.as_asgi()),
+    re_path(r"^ws/bi/metric/$", consumers.MetricCardConsumer.as_asgi()),
+]
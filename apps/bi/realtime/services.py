@@ -4,15 +4,20 @@
 
 import logging
 from datetime import date, datetime
+from decimal import Decimal
 from typing import Dict
 
-from bi.models import SalesSummary
 from core.models import Platform, Shop
-from django.db.models import Avg, Coalesce, Count, Q, Sum
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from ecomm_sync.models import PlatformOrder
 
-from .models import Dashboard, RealtimeData
+from apps.bi.analytics.models import RealtimeData, RealtimeWidgetConfig
+from apps.bi.models import PlatformComparison, SalesSummary
+
+from .broadcaster import DashboardBroadcaster
+from .models import RealtimeDashboard as Dashboard
 
 logger = logging.getLogger(__name__)
 
@@ -289,23 +294,25 @@ class RealtimeDashboardService:
         }
 
     def _get_widget_realtime_data(self, widget) -> Dict:
-        """获取组件实时数据"""
+        """
+        获取组件实时数据
+
+        销售与库存组件读取事件驱动维护的缓存聚合，不再每次请求重新统计和写库。
+        """
         service = RealtimeDataService()
 
         # 根据数据源获取实时数据
-        if widget.data_source == "SalesSummary":
-            data = service.update_sales_realtime_data(
-                platform_id=widget.dashboard.platform_id,
-                limit=widget.data_params.get("limit", 100),
-            )
-        elif widget.data_source == "InventoryAnalysis":
-            data = service.update_inventory_realtime_data(
-                shop_id=widget.dashboard.shop_id,
-                limit=widget.data_params.get("limit", 100),
-            )
+        if widget.data_source in DashboardBroadcaster.SOURCES:
+            kind, param = DashboardBroadcaster.SOURCES[widget.data_source]
+            data = {
+                "widget_id": widget.id,
+                "widget_name": widget.name,
+                "data": DashboardBroadcaster().compute(kind, (widget.data_params or {}).get(param)),
+                "timestamp": timezone.now().isoformat(),
+            }
         elif widget.data_source == "PlatformComparison":
             data = service.update_platform_comparison_realtime_data(
-                platform_id=widget.dashboard.platform_id,
+                platform_id=widget.data_params.get("platform_id"),
                 limit=widget.data_params.get("limit", 100),
             )
         else:
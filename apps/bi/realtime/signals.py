@@ -0,0 +1,162 @@
+"""
+实时大屏领域事件
+
+平台订单与库存记录保存/删除前读取数据库中的原始状态，提交事务时计算增量，
+更新实时聚合并通知广播器。
+
+只在 BI_REALTIME_ENABLED=True 时由 BIConfig.ready() 调用 connect_realtime_signals() 绑定，
+未启用实时大屏时订单和库存写入没有额外开销。
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.utils import timezone
+from ecomm_sync.models import PlatformOrder
+from inventory.models import InventoryStock
+
+from apps.bi.models import Dashboard, DashboardWidget, DashboardWidgetConfig
+
+from .broadcaster import DashboardBroadcaster, RealtimeAggregates, order_state, stock_state
+
+logger = logging.getLogger(__name__)
+
+ORDER_FIELDS = ("order_status", "order_amount")
+STOCK_FIELDS = ("quantity", "is_low_stock_flag", "is_deleted")
+
+# 原始状态未知（未经过 pre_save/pre_delete）时的标记
+UNKNOWN = object()
+
+
+def _current_stock_state(stock):
+    return None if stock.is_deleted else stock_state(stock)
+
+
+def _stored_state(sender, instance, fields, state_func):
+    """数据库中的原始状态（新建或记录不存在时为 None）"""
+    if instance._state.adding or instance.pk is None:
+        return None
+    stored = sender._base_manager.filter(pk=instance.pk).only(*fields).first()
+    return None if stored is None else state_func(stored)
+
+
+def remember_order_state(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._realtime_state = _stored_state(sender, instance, ORDER_FIELDS, order_state)
+
+
+def remember_stock_state(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._realtime_state = _stored_state(
+            sender, instance, STOCK_FIELDS, _current_stock_state
+        )
+
+
+def _dispatch(apply, instance, old_state, new_state, prefixes, topic):
+    """事务提交后更新聚合并通知大屏；实时推送失败不能影响业务写入"""
+
+    def run():
+        try:
+            if old_state is UNKNOWN:
+                # 无法计算增量：作废相关聚合，下次读取时重新播种
+                for prefix in prefixes:
+                    RealtimeAggregates.invalidate(prefix)
+                topics = [topic]
+            else:
+                topics = apply(instance, old_state, new_state)
+            if topics:
+                DashboardBroadcaster().notify(topics)
+        except Exception as e:
+            logger.warning(f"更新实时大屏数据失败: {str(e)}")
+
+    transaction.on_commit(run)
+
+
+def _dispatch_order(order, old_state, new_state):
+    day = timezone.localdate(order.created_at) if order.created_at else timezone.localdate()
+    prefixes = [RealtimeAggregates.sales_prefix(day, pid) for pid in (order.platform_id, None)]
+    _dispatch(
+        RealtimeAggregates.apply_order,
+        order,
+        old_state,
+        new_state,
+        prefixes,
+        ("sales", order.platform_id),
+    )
+
+
+def _dispatch_stock(stock, old_state, new_state):
+    prefixes = [RealtimeAggregates.inventory_prefix(wid) for wid in (stock.warehouse_id, None)]
+    _dispatch(
+        RealtimeAggregates.apply_stock,
+        stock,
+        old_state,
+        new_state,
+        prefixes,
+        ("inventory", stock.warehouse_id),
+    )
+
+
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_state = None if created else instance.__dict__.pop("_realtime_state", UNKNOWN)
+    _dispatch_order(instance, old_state, order_state(instance))
+
+
+def order_deleted(sender, instance, **kwargs):
+    old_state = instance.__dict__.pop("_realtime_state", UNKNOWN)
+    _dispatch_order(instance, old_state, None)
+
+
+def stock_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_state = None if created else instance.__dict__.pop("_realtime_state", UNKNOWN)
+    _dispatch_stock(instance, old_state, _current_stock_state(instance))
+
+
+def stock_deleted(sender, instance, **kwargs):
+    old_state = instance.__dict__.pop("_realtime_state", UNKNOWN)
+    _dispatch_stock(instance, old_state, None)
+
+
+def widget_config_changed(sender, **kwargs):
+    DashboardBroadcaster.invalidate_index()
+
+
+def _receivers():
+    """(信号, 接收函数, 发送者) 列表"""
+    receivers = [
+        (pre_save, remember_order_state, PlatformOrder),
+        (pre_delete, remember_order_state, PlatformOrder),
+        (post_save, order_saved, PlatformOrder),
+        (post_delete, order_deleted, PlatformOrder),
+        (pre_save, remember_stock_state, InventoryStock),
+        (pre_delete, remember_stock_state, InventoryStock),
+        (post_save, stock_saved, InventoryStock),
+        (post_delete, stock_deleted, InventoryStock),
+    ]
+    for model in (Dashboard, DashboardWidget, DashboardWidgetConfig):
+        receivers += [
+            (post_save, widget_config_changed, model),
+            (post_delete, widget_config_changed, model),
+        ]
+    return receivers
+
+
+def _dispatch_uid(signal, func, sender):
+    return f"bi_realtime_{func.__name__}_{sender._meta.label_lower}_{id(signal)}"
+
+
+def connect_realtime_signals():
+    """绑定实时大屏信号（重复调用不会重复绑定）"""
+    for signal, func, sender in _receivers():
+        signal.connect(func, sender=sender, dispatch_uid=_dispatch_uid(signal, func, sender))
+
+
+def disconnect_realtime_signals():
+    """解除实时大屏信号"""
+    for signal, func, sender in _receivers():
+        signal.disconnect(func, sender=sender, dispatch_uid=_dispatch_uid(signal, func, sender))
@@ -0,0 +1,672 @@
+"""
+BI销售汇总引擎
+
+以 PlatformOrder 为数据源，按（平台、账号、日期）一次 GROUP BY 生成日汇总事实行：
+1. 日汇总批量写入 SalesSummary（report_period="daily"），已存在的行 bulk_update
+2. 周/月汇总由日汇总行推导，不再扫描订单表
+3. 平台对比的增长率、排名基于日汇总行在内存中计算
+4. 历史区间回填按日期分块，多线程并行执行
+"""
+
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.models import Platform
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ecomm_sync.models import PlatformAccount, PlatformOrder, PlatformOrderItem
+
+from .models import PlatformComparison, SalesSummary
+
+logger = logging.getLogger(__name__)
+
+# 汇总行键：(platform_id, platform_account_id, report_date)，platform_account_id 为 None 表示平台合计
+SummaryKey = Tuple[int, Optional[int], date]
+
+# 订单状态 -> 汇总字段
+STATUS_FIELDS = {
+    "paid": "paid_orders",
+    "shipped": "shipped_orders",
+    "delivered": "delivered_orders",
+    "cancelled": "cancelled_orders",
+    "refunded": "refunded_orders",
+}
+
+# 计入转化的订单状态
+CONVERTED_STATUSES = ("paid", "shipped", "delivered")
+
+# 可累加的汇总字段
+ADDITIVE_FIELDS = ("total_orders", "total_amount", "total_quantity") + tuple(STATUS_FIELDS.values())
+
+# 汇总行写入的字段
+SUMMARY_FIELDS = ADDITIVE_FIELDS + (
+    "avg_order_value",
+    "conversion_rate",
+    "repeat_purchase_rate",
+)
+
+COMPARISON_FIELDS = (
+    "order_count",
+    "order_growth_rate",
+    "sales_amount",
+    "sales_growth_rate",
+    "conversion_rate",
+    "avg_order_value",
+    "sales_rank",
+    "order_rank",
+)
+
+# 百分比字段为 DecimalField(max_digits=5, decimal_places=2)
+MAX_RATE = Decimal("999.99")
+
+TWO_PLACES = Decimal("0.00")
+
+
+def percent(numerator, denominator) -> Decimal:
+    """计算百分比（保留两位小数，限制在字段可存储范围内）"""
+    if not denominator:
+        return Decimal("0")
+    value = (Decimal(numerator) * 100 / Decimal(denominator)).quantize(TWO_PLACES)
+    return max(-MAX_RATE, min(MAX_RATE, value))
+
+
+def growth_rate(current, previous) -> Decimal:
+    """计算环比增长率"""
+    if not previous:
+        return Decimal("0") if not current else Decimal("100")
+    return percent(Decimal(current) - Decimal(previous), previous)
+
+
+def period_range(report_date: date, period: str) -> Tuple[date, date]:
+    """
+    报表周期的日期范围（截至 report_date）
+
+    Args:
+        report_date: 报表日期
+        period: 报表周期（daily, weekly, monthly）
+
+    Returns:
+        (开始日期, 结束日期)
+    """
+    if period == "weekly":
+        return report_date - timedelta(days=report_date.weekday()), report_date
+    if period == "monthly":
+        return report_date.replace(day=1), report_date
+    return report_date, report_date
+
+
+def previous_period_range(report_date: date, period: str) -> Tuple[date, date]:
+    """
+    上一周期的同期日期范围
+
+    Args:
+        report_date: 报表日期
+        period: 报表周期（daily, weekly, monthly）
+
+    Returns:
+        (开始日期, 结束日期)
+    """
+    if period == "weekly":
+        start, end = period_range(report_date, period)
+        return start - timedelta(days=7), end - timedelta(days=7)
+    if period == "monthly":
+        previous_month_end = report_date.replace(day=1) - timedelta(days=1)
+        return (
+            previous_month_end.replace(day=1),
+            previous_month_end.replace(day=min(report_date.day, previous_month_end.day)),
+        )
+    previous_day = report_date - timedelta(days=1)
+    return previous_day, previous_day
+
+
+def iter_dates(start: date, end: date) -> Iterable[date]:
+    """按天遍历日期区间（含首尾）"""
+    for offset in range((end - start).days + 1):
+        yield start + timedelta(days=offset)
+
+
+def _new_fact() -> Dict[str, object]:
+    fact = {field: 0 for field in ADDITIVE_FIELDS}
+    fact["total_amount"] = Decimal("0")
+    fact["buyers"] = 0
+    fact["repeat_buyers"] = 0
+    return fact
+
+
+def _finalize(fact: Dict[str, object]) -> Dict[str, object]:
+    """由累加字段计算均值与比率"""
+    total_orders = fact["total_orders"]
+    fact["avg_order_value"] = (
+        (fact["total_amount"] / total_orders).quantize(TWO_PLACES) if total_orders else Decimal("0")
+    )
+    fact["conversion_rate"] = percent(
+        sum(fact[STATUS_FIELDS[status]] for status in CONVERTED_STATUSES), total_orders
+    )
+    fact["repeat_purchase_rate"] = percent(fact["repeat_buyers"], fact["buyers"])
+    return fact
+
+
+class SalesRollupEngine:
+    """
+    销售汇总引擎
+
+    日汇总一次扫描订单表，同时生成账号级和平台合计行；周/月汇总、
+    平台对比只读取日汇总行。
+    """
+
+    # 回填时每个工作线程处理的天数
+    DEFAULT_CHUNK_DAYS = 31
+
+    # 回填并行线程数
+    DEFAULT_WORKERS = 4
+
+    # 批量写入批次大小
+    BATCH_SIZE = 500
+
+    def __init__(self, chunk_days: Optional[int] = None, workers: Optional[int] = None):
+        """
+        初始化汇总引擎
+
+        Args:
+            chunk_days: 回填分块天数（可选）
+            workers: 回填并行线程数（可选）
+        """
+        self.chunk_days = chunk_days or self.DEFAULT_CHUNK_DAYS
+        self.workers = workers or self.DEFAULT_WORKERS
+
+    # ==================== 日汇总 ====================
+
+    def rollup_range(self, start: date, end: date) -> int:
+        """
+        汇总日期区间内的订单并写入日汇总行
+
+        Args:
+            start: 开始日期
+            end: 结束日期
+
+        Returns:
+            写入的汇总行数
+        """
+        facts = self.collect_daily_facts(start, end)
+        return self.write_summaries(facts, "daily")
+
+    def collect_daily_facts(self, start: date, end: date) -> Dict[SummaryKey, Dict]:
+        """
+        一次 GROUP BY 计算区间内每个平台/账号/日期的汇总指标
+
+        启用的平台和账号即使当天没有订单也会生成零值行。
+
+        Args:
+            start: 开始日期
+            end: 结束日期
+
+        Returns:
+            {(platform_id, account_id, date): 指标字典}
+        """
+        facts: Dict[SummaryKey, Dict] = defaultdict(_new_fact)
+
+        platform_ids = list(Platform.objects.filter(is_active=True).values_list("id", flat=True))
+        accounts = list(
+            PlatformAccount.objects.filter(is_active=True, platform__is_active=True).values_list(
+                "platform_id", "id"
+            )
+        )
+        for day in iter_dates(start, end):
+            for platform_id in platform_ids:
+                facts[(platform_id, None, day)]
+            for platform_id, account_id in accounts:
+                facts[(platform_id, account_id, day)]
+
+        orders = PlatformOrder.objects.filter(
+            created_at__date__gte=start, created_at__date__lte=end, is_deleted=False
+        ).annotate(day=TruncDate("created_at"))
+
+        status_counts = {
+            field: Count("id", filter=Q(order_status=status))
+            for status, field in STATUS_FIELDS.items()
+        }
+        rows = orders.values("platform_id", "account_id", "day").annotate(
+            total_orders=Count("id"), total_amount=Sum("order_amount"), **status_counts
+        )
+        for row in rows:
+            for key in self._keys(row["platform_id"], row["account_id"], row["day"]):
+                fact = facts[key]
+                fact["total_orders"] += row["total_orders"]
+                fact["total_amount"] += row["total_amount"] or Decimal("0")
+                for field in STATUS_FIELDS.values():
+                    fact[field] += row[field]
+
+        quantities = (
+            PlatformOrderItem.objects.filter(
+                order__created_at__date__gte=start,
+                order__created_at__date__lte=end,
+                order__is_deleted=False,
+                is_deleted=False,
+            )
+            .annotate(day=TruncDate("order__created_at"))
+            .values("order__platform_id", "order__account_id", "day")
+            .annotate(quantity=Sum("quantity"))
+        )
+        for row in quantities:
+            for key in self._keys(row["order__platform_id"], row["order__account_id"], row["day"]):
+                facts[key]["total_quantity"] += max(row["quantity"] or 0, 0)
+
+        self._apply_buyer_counts(facts, orders, by_day=True)
+
+        return {key: _finalize(fact) for key, fact in facts.items()}
+
+    def summarize_all_platforms(self, report_date: date) -> SalesSummary:
+        """
+        所有平台合计的日汇总
+
+        SalesSummary.platform 不可为空，合计行不落库：累加当天各平台合计行，
+        买家数跨平台重新统计（同一买家在不同平台各下一单计为复购）。
+
+        Args:
+            report_date: 报表日期（需已生成日汇总）
+
+        Returns:
+            未保存的 SalesSummary（platform 为空）
+        """
+        fact = _new_fact()
+        platform_rows = SalesSummary.objects.filter(
+            report_period="daily",
+            report_date=report_date,
+            platform_account__isnull=True,
+            is_deleted=False,
+        ).values(*ADDITIVE_FIELDS)
+        for row in platform_rows:
+            for field in ADDITIVE_FIELDS:
+                fact[field] += row[field]
+
+        buyer_order_counts = (
+            PlatformOrder.objects.filter(created_at__date=report_date, is_deleted=False)
+            .exclude(buyer_email="")
+            .values("buyer_email")
+            .annotate(order_count=Count("id"))
+            .values_list("order_count", flat=True)
+        )
+        for count in buyer_order_counts:
+            fact["buyers"] += 1
+            if count > 1:
+                fact["repeat_buyers"] += 1
+
+        fact = _finalize(fact)
+        return SalesSummary(
+            report_date=report_date,
+            report_period="daily",
+            **{field: fact[field] for field in SUMMARY_FIELDS},
+        )
+
+    # ==================== 周/月汇总 ====================
+
+    def derive_period(self, report_date: date, period: str) -> int:
+        """
+        由日汇总行推导周/月汇总（截至 report_date）
+
+        复购率按周期内的买家重新统计，其余指标直接累加日汇总行。
+
+        Args:
+            report_date: 报表日期
+            period: 报表周期（weekly, monthly）
+
+        Returns:
+            写入的汇总行数
+        """
+        start, end = period_range(report_date, period)
+        facts: Dict[SummaryKey, Dict] = defaultdict(_new_fact)
+
+        daily_rows = SalesSummary.objects.filter(
+            report_period="daily", report_date__gte=start, report_date__lte=end
+        ).values("platform_id", "platform_account_id", *ADDITIVE_FIELDS)
+        for row in daily_rows:
+            fact = facts[(row["platform_id"], row["platform_account_id"], report_date)]
+            for field in ADDITIVE_FIELDS:
+                fact[field] += row[field]
+
+        orders = PlatformOrder.objects.filter(
+            created_at__date__gte=start, created_at__date__lte=end, is_deleted=False
+        )
+        self._apply_buyer_counts(facts, orders, by_day=False, report_date=report_date)
+
+        return self.write_summaries({key: _finalize(fact) for key, fact in facts.items()}, period)
+
+    # ==================== 平台对比 ====================
+
+    def build_platform_comparison(
+        self, report_date: date, period: str = "daily"
+    ) -> List[PlatformComparison]:
+        """
+        基于日汇总行生成平台对比数据（增长率、排名在内存中计算）
+
+        Args:
+            report_date: 报表日期
+            period: 报表周期（daily, weekly, monthly）
+
+        Returns:
+            平台对比数据列表
+        """
+        current_start, current_end = period_range(report_date, period)
+        previous_start, previous_end = previous_period_range(report_date, period)
+        self.ensure_daily_facts(previous_start, current_end)
+
+        totals = defaultdict(lambda: {"current": _new_fact(), "previous": _new_fact()})
+        for account_id, platform_id in PlatformAccount.objects.filter(
+            is_active=True, platform__is_active=True
+        ).values_list("id", "platform_id"):
+            totals[(platform_id, account_id)]
+
+        daily_rows = SalesSummary.objects.filter(
+            report_period="daily",
+            report_date__gte=previous_start,
+            report_date__lte=current_end,
+            platform_account__isnull=False,
+            platform_account__is_active=True,
+            platform__is_active=True,
+        ).values("platform_id", "platform_account_id", "report_date", *ADDITIVE_FIELDS)
+        for row in daily_rows:
+            if current_start <= row["report_date"] <= current_end:
+                window = "current"
+            elif previous_start <= row["report_date"] <= previous_end:
+                window = "previous"
+            else:
+                continue
+            fact = totals[(row["platform_id"], row["platform_account_id"])][window]
+            for field in ADDITIVE_FIELDS:
+                fact[field] += row[field]
+
+        values = {}
+        for key, windows in totals.items():
+            current = _finalize(windows["current"])
+            previous = windows["previous"]
+            values[key] = {
+                "order_count": current["total_orders"],
+                "order_growth_rate": growth_rate(current["total_orders"], previous["total_orders"]),
+                "sales_amount": current["total_amount"],
+                "sales_growth_rate": growth_rate(current["total_amount"], previous["total_amount"]),
+                "conversion_rate": current["conversion_rate"],
+                "avg_order_value": current["avg_order_value"],
+            }
+
+        for rank_field, metric in (("sales_rank", "sales_amount"), ("order_rank", "order_count")):
+            ranked = sorted(values, key=lambda key: values[key][metric], reverse=True)
+            for rank, key in enumerate(ranked, start=1):
+                values[key][rank_field] = rank
+
+        return self._write_comparisons(report_date, period, values)
+
+    def ensure_daily_facts(self, start: date, end: date) -> int:
+        """
+        补齐区间内尚未汇总的日期
+
+        今天及以后的日期仍会有新订单，已有汇总行也重新计算。
+
+        Args:
+            start: 开始日期
+            end: 结束日期
+
+        Returns:
+            写入的汇总行数
+        """
+        today = timezone.localdate()
+        existing = set(
+            SalesSummary.objects.filter(
+                report_period="daily",
+                report_date__gte=start,
+                report_date__lte=min(end, today - timedelta(days=1)),
+            )
+            .values_list("report_date", flat=True)
+            .distinct()
+        )
+        written = 0
+        for missing_start, missing_end in self._missing_ranges(start, end, existing):
+            written += self.rollup_range(missing_start, missing_end)
+        return written
+
+    # ==================== 历史回填 ====================
+
+    def backfill(self, start: date, end: date, workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        回填历史区间的日汇总及周/月汇总
+
+        日汇总按 chunk_days 分块并行执行；全部完成后，在每个周末、月末
+        （以及区间最后一天）推导周/月汇总。
+
+        Args:
+            start: 开始日期
+            end: 结束日期
+            workers: 并行线程数（可选，1表示在当前线程顺序执行）
+
+        Returns:
+            回填统计
+        """
+        workers = workers or self.workers
+
+        chunks = []
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + timedelta(days=self.chunk_days - 1), end)
+            chunks.append((self.rollup_range, chunk_start, chunk_end))
+            chunk_start = chunk_end + timedelta(days=1)
+
+        derived = []
+        for day in iter_dates(start, end):
+            if day.weekday() == 6 or day == end:
+                derived.append((self.derive_period, day, "weekly"))
+            if (day + timedelta(days=1)).day == 1 or day == end:
+                derived.append((self.derive_period, day, "monthly"))
+
+        stats = {"chunks": len(chunks), "daily_rows": 0, "period_rows": 0, "failed": 0}
+        stats["daily_rows"], failed = self._run_jobs(chunks, workers)
+        stats["failed"] += failed
+        stats["period_rows"], failed = self._run_jobs(derived, workers)
+        stats["failed"] += failed
+
+        logger.info(
+            f"销售汇总回填完成: {start} ~ {end}, 日汇总 {stats['daily_rows']} 行, "
+            f"周/月汇总 {stats['period_rows']} 行, 失败 {stats['failed']} 个分块"
+        )
+        return stats
+
+    # ==================== 写入 ====================
+
+    def write_summaries(self, facts: Dict[SummaryKey, Dict], period: str) -> int:
+        """
+        批量写入汇总行（已存在的行 bulk_update，其余 bulk_create）
+
+        Args:
+            facts: {(platform_id, account_id, date): 指标字典}
+            period: 报表周期
+
+        Returns:
+            写入的汇总行数
+        """
+        if not facts:
+            return 0
+
+        dates = [key[2] for key in facts]
+        now = timezone.now()
+
+        with transaction.atomic():
+            existing = {
+                (row.platform_id, row.platform_account_id, row.report_date): row
+                for row in SalesSummary.objects.select_for_update().filter(
+                    report_period=period,
+                    report_date__gte=min(dates),
+                    report_date__lte=max(dates),
+                    platform_id__in={key[0] for key in facts},
+                )
+            }
+
+            to_create, to_update = [], []
+            for key, fact in facts.items():
+                values = {field: fact[field] for field in SUMMARY_FIELDS}
+                summary = existing.get(key)
+                if summary is None:
+                    to_create.append(
+                        SalesSummary(
+                            platform_id=key[0],
+                            platform_account_id=key[1],
+                            report_date=key[2],
+                            report_period=period,
+                            **values,
+                        )
+                    )
+                    continue
+                for field, value in values.items():
+                    setattr(summary, field, value)
+                summary.is_deleted = False
+                summary.updated_at = now
+                to_update.append(summary)
+
+            SalesSummary.objects.bulk_create(to_create, batch_size=self.BATCH_SIZE)
+            SalesSummary.objects.bulk_update(
+                to_update,
+                list(SUMMARY_FIELDS) + ["is_deleted", "updated_at"],
+                batch_size=self.BATCH_SIZE,
+            )
+
+        return len(to_create) + len(to_update)
+
+    def _write_comparisons(
+        self, report_date: date, period: str, values: Dict[Tuple[int, int], Dict]
+    ) -> List[PlatformComparison]:
+        now = timezone.now()
+
+        with transaction.atomic():
+            existing = {
+                (row.platform_id, row.platform_account_id): row
+                for row in PlatformComparison.objects.select_for_update().filter(
+                    report_date=report_date, report_period=period
+                )
+            }
+
+            to_create, to_update = [], []
+            for key, fields in values.items():
+                comparison = existing.get(key)
+                if comparison is None:
+                    to_create.append(
+                        PlatformComparison(
+                            report_date=report_date,
+                            report_period=period,
+                            platform_id=key[0],
+                            platform_account_id=key[1],
+                            **fields,
+                        )
+                    )
+                    continue
+                for field, value in fields.items():
+                    setattr(comparison, field, value)
+                comparison.updated_at = now
+                to_update.append(comparison)
+
+            PlatformComparison.objects.bulk_create(to_create, batch_size=self.BATCH_SIZE)
+            PlatformComparison.objects.bulk_update(
+                to_update, list(COMPARISON_FIELDS) + ["updated_at"], batch_size=self.BATCH_SIZE
+            )
+
+        return sorted(to_create + to_update, key=lambda item: item.sales_rank)
+
+    # ==================== 内部方法 ====================
+
+    @staticmethod
+    def _keys(platform_id: int, account_id: Optional[int], day: date) -> set:
+        """订单分组对应的汇总行：账号行 + 平台合计行"""
+        return {(platform_id, account_id, day), (platform_id, None, day)}
+
+    def _apply_buyer_counts(
+        self,
+        facts: Dict[SummaryKey, Dict],
+        orders,
+        by_day: bool,
+        report_date: Optional[date] = None,
+    ):
+        """
+        统计每个汇总行的买家数与复购买家数（下单超过一次）
+
+        账号行与平台合计行分别统计：同一买家在同一平台的不同账号各下一单，
+        在平台合计行中计为复购。
+        """
+        group_fields = ["platform_id", "account_id", "buyer_email"]
+        if by_day:
+            group_fields.append("day")
+
+        order_counts = defaultdict(int)
+        rows = (
+            orders.exclude(buyer_email="").values(*group_fields).annotate(order_count=Count("id"))
+        )
+        for row in rows:
+            day = row["day"] if by_day else report_date
+            for platform_id, account_id, key_day in self._keys(
+                row["platform_id"], row["account_id"], day
+            ):
+                order_counts[(platform_id, account_id, key_day, row["buyer_email"])] += row[
+                    "order_count"
+                ]
+
+        for (platform_id, account_id, day, _), count in order_counts.items():
+            fact = facts[(platform_id, account_id, day)]
+            fact["buyers"] += 1
+            if count > 1:
+                fact["repeat_buyers"] += 1
+
+    @staticmethod
+    def _missing_ranges(start: date, end: date, existing: set) -> List[Tuple[date, date]]:
+        """把缺失的日期合并为连续区间"""
+        ranges = []
+        range_start = None
+        for day in iter_dates(start, end):
+            if day in existing:
+                if range_start is not None:
+                    ranges.append((range_start, day - timedelta(days=1)))
+                    range_start = None
+            elif range_start is None:
+                range_start = day
+        if range_start is not None:
+            ranges.append((range_start, end))
+        return ranges
+
+    def _run_jobs(self, jobs: List[tuple], workers: int) -> Tuple[int, int]:
+        """
+        执行汇总任务（workers>1 时使用线程池并行）
+
+        Returns:
+            (写入行数, 失败任务数)
+        """
+        written, failed = 0, 0
+
+        if workers <= 1 or len(jobs) <= 1:
+            for func, *args in jobs:
+                try:
+                    written += func(*args)
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"销售汇总任务失败 {args}: {str(e)}", exc_info=True)
+            return written, failed
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._run_in_thread, func, *args): args for func, *args in jobs
+            }
+            for future in as_completed(futures):
+                try:
+                    written += future.result()
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"销售汇总任务失败 {futures[future]}: {str(e)}", exc_info=True)
+
+        return written, failed
+
+    @staticmethod
+    def _run_in_thread(func, *args) -> int:
+        """工作线程执行完毕后关闭其数据库连接"""
+        try:
+            return func(*args)
+        finally:
+            connection.close()
@@ -6,110 +6,56 @@ from datetime import date, timedelta
 from decimal import Decimal
 from typing import List, Optional
 
-from core.models import Platform, Shop
-from django.db.models import Avg, Count, F, Q, Sum
-from ecomm_sync.models import PlatformOrder, PlatformOrderItem
+from core.models import Shop
+from django.db.models import Avg, Count, F, Sum
+from ecomm_sync.models import PlatformOrderItem
 from products.models import Product
 
 from .models import InventoryAnalysis, PlatformComparison, ProductSales, SalesSummary
+from .rollup import SalesRollupEngine
 
 
 class SalesReportService:
     """销售报表服务"""
 
+    def __init__(self):
+        self.rollup_engine = SalesRollupEngine()
+
     def generate_daily_sales_summary(
         self,
         platform_id: Optional[int] = None,
         platform_account_id: Optional[int] = None,
         report_date: date = None,
-    ) -> SalesSummary:
+    ) -> Optional[SalesSummary]:
         """
         生成日销售汇总
 
+        一次汇总当天所有平台/账号的订单并批量写入，再返回请求的汇总行。
+
         Args:
-            platform_id: 平台ID
-            platform_account_id: 平台账号ID
+            platform_id: 平台ID（与账号都为空时返回所有平台合计）
+            platform_account_id: 平台账号ID（为空表示平台合计）
             report_date: 报表日期
 
         Returns:
-            SalesSummary: 销售汇总对象
+            SalesSummary: 销售汇总对象（所有平台合计不落库）
         """
         if report_date is None:
             report_date = date.today()
 
-        # 查询平台订单
-        queryset = PlatformOrder.objects.filter(created_at__date=report_date)
+        self.rollup_engine.rollup_range(report_date, report_date)
 
-        if platform_id:
-            queryset = queryset.filter(platform_id=platform_id)
-        if platform_account_id:
-            queryset = queryset.filter(platform_account_id=platform_account_id)
-
-        # 聚合数据
-        orders_data = queryset.aggregate(
-            total_orders=Count("id"),
-            total_amount=Sum("amount"),
-            total_quantity=Sum(F("items__received_quantity")),
-            paid_orders=Count("id", filter=Q(status="paid")),
-            shipped_orders=Count("id", filter=Q(status="shipped")),
-            delivered_orders=Count("id", filter=Q(status="delivered")),
-            cancelled_orders=Count("id", filter=Q(status="cancelled")),
-            refunded_orders=Count("id", filter=Q(status="refunded")),
-        )
-
-        # 计算平均订单金额
-        total_orders_count = orders_data["total_orders"] or 0
-        total_amount_value = orders_data["total_amount"] or Decimal("0")
-        avg_order_value = (
-            total_amount_value / total_orders_count if total_orders_count > 0 else Decimal("0")
-        )
+        if platform_id is None and platform_account_id is None:
+            return self.rollup_engine.summarize_all_platforms(report_date)
 
-        # 计算转化率和复购率
-        conversion_rate = self._calculate_conversion_rate(queryset)
-        repeat_purchase_rate = self._calculate_repeat_purchase_rate(queryset)
-
-        # 获取或创建销售汇总
-        platform = Platform.objects.filter(id=platform_id).first() if platform_id else None
-
-        sales_summary, created = SalesSummary.objects.update_or_create(
-            platform=platform,
+        summaries = SalesSummary.objects.filter(
             platform_account_id=platform_account_id,
             report_date=report_date,
             report_period="daily",
-            defaults={
-                "total_orders": orders_data["total_orders"] or 0,
-                "total_amount": total_amount_value,
-                "total_quantity": orders_data["total_quantity"] or 0,
-                "avg_order_value": avg_order_value,
-                "paid_orders": orders_data["paid_orders"] or 0,
-                "shipped_orders": orders_data["shipped_orders"] or 0,
-                "delivered_orders": orders_data["delivered_orders"] or 0,
-                "cancelled_orders": orders_data["cancelled_orders"] or 0,
-                "refunded_orders": orders_data["refunded_orders"] or 0,
-                "conversion_rate": conversion_rate,
-                "repeat_purchase_rate": repeat_purchase_rate,
-            },
         )
-
-        # 如果已存在，更新数据
-        if not created:
-            for field, value in {
-                "total_orders": orders_data["total_orders"] or 0,
-                "total_amount": total_amount_value,
-                "total_quantity": orders_data["total_quantity"] or 0,
-                "avg_order_value": avg_order_value,
-                "paid_orders": orders_data["paid_orders"] or 0,
-                "shipped_orders": orders_data["shipped_orders"] or 0,
-                "delivered_orders": orders_data["delivered_orders"] or 0,
-                "cancelled_orders": orders_data["cancelled_orders"] or 0,
-                "refunded_orders": orders_data["refunded_orders"] or 0,
-                "conversion_rate": conversion_rate,
-                "repeat_purchase_rate": repeat_purchase_rate,
-            }.items():
-                setattr(sales_summary, field, value)
-            sales_summary.save()
-
-        return sales_summary
+        if platform_id is not None:
+            summaries = summaries.filter(platform_id=platform_id)
+        return summaries.first()
 
     def generate_product_sales_report(
         self,
@@ -383,12 +329,17 @@ class InventoryReportService:
 class PlatformComparisonService:
     """平台对比服务"""
 
+    def __init__(self):
+        self.rollup_engine = SalesRollupEngine()
+
     def generate_platform_comparison(
         self, report_date: date = None, report_period: str = "daily"
     ) -> List[PlatformComparison]:
         """
         生成平台对比数据
 
+        指标、增长率和排名均由日汇总行计算，缺失的日汇总会先补齐。
+
         Args:
             report_date: 报表日期
             report_period: 报表周期（daily, weekly, monthly）
@@ -399,142 +350,7 @@ class PlatformComparisonService:
         if report_date is None:
             report_date = date.today()
 
-        # 获取所有活跃平台
-        platforms = Platform.objects.filter(is_active=True)
-
-        comparison_list = []
-
-        for platform in platforms:
-            # 查询平台账号
-            platform_accounts = platform.accounts.filter(is_active=True)
-
-            for account in platform_accounts:
-                # 查询订单数据
-                queryset = PlatformOrder.objects.filter(platform=platform, platform_account=account)
-
-                # 根据周期过滤日期
-                if report_period == "daily":
-                    queryset = queryset.filter(created_at__date=report_date)
-                elif report_period == "weekly":
-                    week_start = report_date - timedelta(days=report_date.weekday())
-                    queryset = queryset.filter(
-                        created_at__date__gte=week_start,
-                        created_at__date__lte=report_date,
-                    )
-                elif report_period == "monthly":
-                    month_start = report_date.replace(day=1)
-                    queryset = queryset.filter(
-                        created_at__date__gte=month_start,
-                        created_at__date__lte=report_date,
-                    )
-
-                # 聚合数据
-                data = queryset.aggregate(
-                    order_count=Count("id"),
-                    sales_amount=Sum("amount"),
-                )
-
-                # 计算增长率（与上期对比）
-                order_growth_rate = self._calculate_growth_rate(
-                    platform, account, "order", report_date, report_period
-                )
-                sales_growth_rate = self._calculate_growth_rate(
-                    platform, account, "sales", report_date, report_period
-                )
-
-                # 计算转化率和平均订单金额
-                conversion_rate = SalesReportService._calculate_conversion_rate(None, queryset)
-                avg_order_value = (data["sales_amount"] or Decimal("0")) / (
-                    data["order_count"] or 1
-                )
-
-                # 创建平台对比数据
-                comparison = PlatformComparison.objects.create(
-                    report_date=report_date,
-                    report_period=report_period,
-                    platform=platform,
-                    platform_account=account,
-                    order_count=data["order_count"] or 0,
-                    order_growth_rate=order_growth_rate,
-                    sales_amount=data["sales_amount"] or Decimal("0"),
-                    sales_growth_rate=sales_growth_rate,
-                    conversion_rate=conversion_rate,
-                    avg_order_value=avg_order_value,
-                )
-
-                comparison_list.append(comparison)
-
-        # 计算排名
-        self._calculate_rankings(comparison_list, report_date, report_period)
-
-        return comparison_list
-
-    def _calculate_growth_rate(
-        self, platform, account, metric_type: str, current_date: date, period: str
-    ) -> Decimal:
-        """计算增长率"""
-        # 获取上期数据
-        if period == "daily":
-            previous_date = current_date - timedelta(days=1)
-        elif period == "weekly":
-            previous_date = current_date - timedelta(days=7)
-        elif period == "monthly":
-            previous_date = current_date - timedelta(days=30)
-        else:
-            return Decimal("0")
-
-        try:
-            # 查询当前期数据
-            current_queryset = PlatformOrder.objects.filter(
-                platform=platform,
-                platform_account=account,
-                created_at__date__lte=current_date,
-            )
-
-            # 查询上期数据
-            previous_queryset = PlatformOrder.objects.filter(
-                platform=platform,
-                platform_account=account,
-                created_at__date__lte=previous_date,
-            )
-
-            if metric_type == "order":
-                current_value = current_queryset.count()
-                previous_value = previous_queryset.count()
-            elif metric_type == "sales":
-                current_value = current_queryset.aggregate(total=Sum("amount"))["total"] or Decimal(
-                    "0"
-                )
-                previous_value = previous_queryset.aggregate(total=Sum("amount"))[
-                    "total"
-                ] or Decimal("0")
-            else:
-                return Decimal("0")
-
-            # 计算增长率
-            if previous_value == 0:
-                return Decimal("0") if current_value == 0 else Decimal("100")
-
-            growth_rate = ((current_value - previous_value) / previous_value) * 100
-            return growth_rate.quantize(Decimal("0.00"))
-        except BaseException:
-            return Decimal("0")
-
-    def _calculate_rankings(
-        self, comparison_list: List[PlatformComparison], report_date: date, period: str
-    ):
-        """计算排名"""
-        # 按销售金额排名
-        sorted_by_sales = sorted(comparison_list, key=lambda x: x.sales_amount, reverse=True)
-        for idx, item in enumerate(sorted_by_sales):
-            item.sales_rank = idx + 1
-            item.save()
-
-        # 按订单数排名
-        sorted_by_orders = sorted(comparison_list, key=lambda x: x.order_count, reverse=True)
-        for idx, item in enumerate(sorted_by_orders):
-            item.order_rank = idx + 1
-            item.save()
+        return self.rollup_engine.build_platform_comparison(report_date, report_period)
 
 
 class ReportGenerator:
@@ -557,13 +373,19 @@ class ReportGenerator:
             "platform_comparisons": [],
         }
 
-        # 生成销售汇总
-        platforms = Platform.objects.filter(is_active=True)
-        for platform in platforms:
-            sales_summary = self.sales_service.generate_daily_sales_summary(
-                platform_id=platform.id, report_date=report_date
-            )
-            results["sales_summaries"].append(sales_summary)
+        # 生成销售汇总（一次汇总所有平台/账号，周/月汇总由日汇总推导）
+        rollup_engine = self.sales_service.rollup_engine
+        rollup_engine.rollup_range(report_date, report_date)
+        rollup_engine.derive_period(report_date, "weekly")
+        rollup_engine.derive_period(report_date, "monthly")
+        results["sales_summaries"].extend(
+            SalesSummary.objects.filter(
+                report_date=report_date,
+                report_period="daily",
+                platform__is_active=True,
+                platform_account__isnull=True,
+            ).select_related("platform")
+        )
 
         # 生成商品销售报表
         product_sales_list = self.sales_service.generate_product_sales_report(
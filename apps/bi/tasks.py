@@ -0,0 +1,66 @@
+"""
+BI报表异步任务
+"""
+
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def push_dashboard_update(dashboard_id: int):
+    """
+    Celery任务：推送大屏实时数据（防抖窗口结束后执行）
+
+    Args:
+        dashboard_id: 大屏ID
+    """
+    from apps.bi.realtime.broadcaster import DashboardBroadcaster
+
+    try:
+        DashboardBroadcaster().flush(dashboard_id)
+    except Exception as e:
+        logger.error(f"推送大屏 {dashboard_id} 数据失败: {e}")
+
+
+@shared_task(ignore_result=False)
+def rebuild_realtime_aggregates():
+    """
+    Celery任务：从数据库重建实时大屏聚合
+
+    校正批量写入、queryset.update 等绕过信号的变更，并推送给所有相关大屏。
+    """
+    from apps.bi.realtime.broadcaster import DashboardBroadcaster, RealtimeAggregates
+
+    try:
+        result = RealtimeAggregates.rebuild()
+        topics = [("sales", None), ("inventory", None)]
+        broadcaster = DashboardBroadcaster()
+        for dashboard_id in broadcaster.dashboards_for(topics):
+            broadcaster.flush(dashboard_id)
+        logger.info(f"实时大屏聚合重建完成: {result}")
+        return {"status": "success", "result": result}
+    except Exception as e:
+        logger.error(f"实时大屏聚合重建失败: {e}")
+        return {"status": "failed", "error": str(e)}
+
+
+@shared_task(ignore_result=False)
+def forecast_product_demand(workers: int = None):
+    """
+    Celery任务：批量生成商品需求预测（截至昨天的日销量）
+
+    Args:
+        workers: 并行线程数（可选）
+    """
+    from apps.bi.forecasting import DemandForecastEngine
+
+    try:
+        count = DemandForecastEngine(workers=workers).run()
+        logger.info(f"需求预测完成: {count} 条序列")
+        return {"status": "success", "count": count}
+    except Exception as e:
+        logger.error(f"需求预测失败: {e}")
+        return {"status": "failed", "error": str(e)}
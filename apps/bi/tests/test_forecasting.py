@@ -0,0 +1,128 @@
+"""
+BI需求预测引擎测试
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from apps.bi.forecasting import SEASON, DemandForecastEngine, fit_parallel, fit_series
+from apps.bi.management.commands.benchmark_forecasting import synthetic_series
+from apps.bi.models import DemandForecast, ProductSales
+
+
+class TestFitSeries:
+    """测试向量化拟合（不访问数据库）"""
+
+    def test_constant_series_forecast_exactly(self):
+        """常数序列预测值等于常数，误差为0"""
+        Y = np.full((3, 28), 10.0) * np.array([[1], [2], [3]])
+        result = fit_series(Y, horizon=5)
+
+        np.testing.assert_allclose(result["forecast"], np.repeat([[10], [20], [30]], 5, axis=1))
+        np.testing.assert_allclose(result["mae"], 0, atol=1e-9)
+        np.testing.assert_allclose(result["wape"], 0, atol=1e-9)
+
+    def test_weekly_pattern_selects_seasonal_model(self):
+        """周季节序列选择季节模型并延续周期"""
+        pattern = np.array([5, 5, 5, 5, 5, 20, 20], dtype=float)
+        Y = np.tile(pattern, 8)[None, :]
+        result = fit_series(Y, horizon=SEASON)
+
+        assert result["gamma"][0] > 0
+        np.testing.assert_allclose(result["forecast"][0], pattern, atol=0.5)
+
+    def test_parallel_matches_single_thread_and_beats_naive(self):
+        """分块并行结果与单线程一致，预测准确度优于朴素季节预测"""
+        train, actual = synthetic_series(300, 84, 14, seed=1)
+        single = fit_series(train, 14)
+        parallel = fit_parallel(train, 14, workers=3, chunk_rows=70)
+
+        for key in ("alpha", "beta", "gamma", "forecast", "mae", "rmse"):
+            np.testing.assert_allclose(parallel[key], single[key])
+
+        naive = np.tile(train[:, -SEASON:], (1, 2))
+        assert np.abs(single["forecast"] - actual).sum() < np.abs(naive - actual).sum()
+
+
+@pytest.fixture
+def sales_history():
+    from core.models import Platform
+    from products.models import Product
+
+    platform = Platform.objects.create(
+        platform_name="Shopee", platform_code="shopee", platform_type="ecommerce"
+    )
+    steady = Product.objects.create(name="常销品", code="FC-A")
+    weekly = Product.objects.create(name="周末品", code="FC-B")
+    idle = Product.objects.create(name="滞销品", code="FC-C")
+
+    end = date(2026, 3, 31)
+    rows = []
+    for offset in range(28):
+        day = end - timedelta(days=offset)
+        rows.append(
+            ProductSales(product=steady, platform=platform, report_date=day, sold_quantity=8)
+        )
+        if day.weekday() >= 5:
+            rows.append(
+                ProductSales(product=weekly, platform=platform, report_date=day, sold_quantity=30)
+            )
+    rows.append(ProductSales(product=idle, platform=platform, report_date=end, sold_quantity=0))
+    # 周汇总不参与预测
+    rows.append(
+        ProductSales(
+            product=steady,
+            platform=platform,
+            report_date=end,
+            report_period="weekly",
+            sold_quantity=56,
+        )
+    )
+    ProductSales.objects.bulk_create(rows)
+    return end, platform, steady, weekly
+
+
+@pytest.mark.django_db
+class TestDemandForecastEngine:
+    """测试预测生成与写入"""
+
+    def test_run_writes_forecasts_for_active_series(self, sales_history):
+        """有销量的序列写入预测，重复执行覆盖结果"""
+        end, platform, steady, weekly = sales_history
+        engine = DemandForecastEngine(history_days=28, horizon=7, workers=1)
+
+        assert engine.run(end) == 2
+        assert engine.run(end) == 2
+
+        forecasts = {f.product_id: f for f in DemandForecast.objects.filter(forecast_date=end)}
+        assert set(forecasts) == {steady.id, weekly.id}
+
+        flat = forecasts[steady.id]
+        assert flat.platform_id == platform.id
+        assert flat.history_days == 28 and flat.horizon_days == 7
+        assert float(flat.forecast_total) == pytest.approx(56, abs=0.1)
+        assert float(flat.mae) == 0
+
+        seasonal = forecasts[weekly.id]
+        assert seasonal.method == "holt_winters"
+        weekend = [
+            value
+            for offset, value in enumerate(seasonal.forecast_values, start=1)
+            if (end + timedelta(days=offset)).weekday() >= 5
+        ]
+        assert min(weekend) > max(set(seasonal.forecast_values) - set(weekend))
+
+    def test_load_series_single_query(self, sales_history, django_assert_num_queries):
+        """一次查询构造稠密矩阵，缺失日期按0计"""
+        end, _, steady, weekly = sales_history
+        engine = DemandForecastEngine(history_days=14)
+
+        with django_assert_num_queries(1):
+            keys, Y = engine.load_series(end)
+
+        assert Y.shape == (3, 14)
+        rows = {product_id: Y[i] for i, (product_id, _) in enumerate(keys.tolist())}
+        assert rows[steady.id].tolist() == [8.0] * 14
+        assert rows[weekly.id].sum() == 4 * 30
@@ -0,0 +1,235 @@
+"""
+BI实时大屏推送测试
+"""
+
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+
+from apps.bi.realtime.broadcaster import DashboardBroadcaster, RealtimeAggregates
+from apps.bi.realtime.signals import connect_realtime_signals, disconnect_realtime_signals
+
+WIDGETS = [
+    {"id": 1, "dashboard_id": 10, "data_source": "SalesSummary", "data_params": {}},
+    {"id": 2, "dashboard_id": 10, "data_source": "InventoryAnalysis", "data_params": {}},
+    {
+        "id": 3,
+        "dashboard_id": 20,
+        "data_source": "SalesSummary",
+        "data_params": {"platform_id": -1},
+    },
+]
+
+
+@pytest.fixture(autouse=True)
+def realtime_signals():
+    cache.clear()
+    connect_realtime_signals()
+    yield
+    disconnect_realtime_signals()
+    cache.clear()
+
+
+@pytest.fixture
+def widgets():
+    with mock.patch.object(DashboardBroadcaster, "_load_widget_index", return_value=WIDGETS):
+        yield
+
+
+@pytest.fixture
+def platform():
+    from core.models import Platform
+
+    return Platform.objects.create(
+        platform_name="Shopee", platform_code="shopee", platform_type="ecommerce"
+    )
+
+
+def _order(platform, order_id, amount, status="paid"):
+    from ecomm_sync.models import PlatformOrder
+
+    return PlatformOrder.objects.create(
+        platform=platform,
+        platform_order_id=order_id,
+        order_status=status,
+        order_amount=Decimal(amount),
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("widgets")
+class TestRealtimeAggregates:
+    """测试事件驱动的实时聚合"""
+
+    def test_order_events_update_seeded_aggregates(
+        self, platform, django_capture_on_commit_callbacks
+    ):
+        """订单新增与状态变化增量更新聚合，无需重新统计"""
+        _order(platform, "O1", "100")
+        assert RealtimeAggregates.sales_snapshot(platform.id)["total_orders"] == 1
+        assert RealtimeAggregates.sales_snapshot()["total_orders"] == 1
+
+        with mock.patch.object(RealtimeAggregates, "seed_sales") as seed:
+            with django_capture_on_commit_callbacks(execute=True):
+                order = _order(platform, "O2", "50.50")
+            with django_capture_on_commit_callbacks(execute=True):
+                order.order_status = "cancelled"
+                order.save()
+            snapshot = RealtimeAggregates.sales_snapshot(platform.id)
+            total = RealtimeAggregates.sales_snapshot()
+
+        seed.assert_not_called()
+        assert snapshot["total_orders"] == 2
+        assert snapshot["total_amount"] == 150.5
+        assert snapshot["paid_orders"] == 1
+        assert snapshot["cancelled_orders"] == 1
+        assert snapshot["recent_orders"][0]["platform_order_id"] == "O2"
+        assert total["total_orders"] == 2
+
+    def test_deferred_load_keeps_exact_delta(self, platform, django_capture_on_commit_callbacks):
+        """原始状态保存前从数据库读取，只加载部分字段的订单也按增量更新"""
+        from ecomm_sync.models import PlatformOrder
+
+        order = _order(platform, "O1", "100")
+        assert RealtimeAggregates.sales_snapshot(platform.id)["paid_orders"] == 1
+        assert RealtimeAggregates.sales_snapshot()["paid_orders"] == 1
+
+        with mock.patch.object(RealtimeAggregates, "seed_sales") as seed:
+            with django_capture_on_commit_callbacks(execute=True):
+                deferred = PlatformOrder.objects.only("id").get(pk=order.pk)
+                deferred.order_status = "refunded"
+                deferred.save()
+            snapshot = RealtimeAggregates.sales_snapshot(platform.id)
+
+        seed.assert_not_called()
+        assert snapshot["paid_orders"] == 0
+        assert snapshot["refunded_orders"] == 1
+        assert snapshot["total_orders"] == 1
+
+    def test_stock_change_updates_inventory(self, django_capture_on_commit_callbacks):
+        """库存数量变化按差值累加"""
+        from inventory.models import InventoryStock, Warehouse
+        from products.models import Product
+
+        warehouse = Warehouse.objects.create(name="主仓", code="WH01")
+        product = Product.objects.create(code="P001", name="激光器")
+        stock = InventoryStock.objects.create(product=product, warehouse=warehouse, quantity=10)
+        assert RealtimeAggregates.inventory_snapshot(warehouse.id)["total_quantity"] == 10
+
+        with django_capture_on_commit_callbacks(execute=True):
+            stock = InventoryStock.objects.get(pk=stock.pk)
+            stock.quantity = 4
+            stock.is_low_stock_flag = True
+            stock.save()
+
+        snapshot = RealtimeAggregates.inventory_snapshot(warehouse.id)
+        assert snapshot == {"total_quantity": 4, "low_stock_items": 1}
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("widgets")
+class TestDashboardBroadcaster:
+    """测试大屏广播"""
+
+    def test_topics_map_to_subscribed_dashboards(self):
+        """只有订阅了对应数据源和范围的大屏会被通知"""
+        broadcaster = DashboardBroadcaster()
+        assert broadcaster.dashboards_for([("sales", 5)]) == [10]
+        assert broadcaster.dashboards_for([("sales", -1)]) == [10, 20]
+        assert broadcaster.dashboards_for([("inventory", 3)]) == [10]
+
+    @override_settings(CELERY_BROKER_URL="memory://")
+    def test_notify_debounces_per_dashboard(self):
+        """防抖窗口内多次事件只调度一次推送"""
+        with mock.patch("apps.bi.tasks.push_dashboard_update.apply_async") as apply_async:
+            broadcaster = DashboardBroadcaster()
+            assert broadcaster.notify([("sales", 5)]) == [10]
+            assert broadcaster.notify([("sales", 5), ("inventory", 1)]) == []
+
+        apply_async.assert_called_once_with((10,), countdown=DashboardBroadcaster.DEBOUNCE_SECONDS)
+
+    def test_flush_sends_only_changed_widgets(self, platform, django_capture_on_commit_callbacks):
+        """新订单只推送变化的组件，重复刷新不再发送"""
+        with mock.patch.object(DashboardBroadcaster, "_group_send") as group_send:
+            assert DashboardBroadcaster().flush(10) == [1, 2]
+
+            with django_capture_on_commit_callbacks(execute=True):
+                _order(platform, "O1", "10")
+
+            assert DashboardBroadcaster().flush(10) == []
+
+        assert group_send.call_count == 2
+        dashboard_id, message = group_send.call_args[0]
+        assert dashboard_id == 10
+        assert message["type"] == "dashboard.update"
+        assert [widget["widget_id"] for widget in message["widgets"]] == [1]
+        assert message["widgets"][0]["data"]["total_orders"] == 1
+
+
+@pytest.mark.django_db
+class TestWidgetIndex:
+    """测试从仪表盘组件配置构建推送索引"""
+
+    @pytest.fixture
+    def user(self):
+        from django.contrib.auth import get_user_model
+
+        return get_user_model().objects.create_user(username="bi_viewer", password="x")
+
+    def _widget(self, name, data_source, **kwargs):
+        from apps.bi.models import DashboardWidget
+
+        return DashboardWidget.objects.create(
+            name=name, widget_type="metric", title=name, data_source=data_source, **kwargs
+        )
+
+    def _place(self, dashboard, widget, order=0):
+        from apps.bi.models import DashboardWidgetConfig
+
+        return DashboardWidgetConfig.objects.create(dashboard=dashboard, widget=widget, order=order)
+
+    def test_index_built_from_dashboard_widgets(self, user):
+        """只收录可推送数据源且自动刷新的组件，同一组件可出现在多个仪表盘"""
+        from apps.bi.models import Dashboard
+
+        sales = Dashboard.objects.create(name="销售", created_by=user)
+        ops = Dashboard.objects.create(name="运营", created_by=user)
+        all_sales = self._widget("全部销售", "SalesSummary")
+        shopee = self._widget("Shopee销售", "SalesSummary", data_params={"platform_id": 7})
+        stock = self._widget("库存", "InventoryAnalysis")
+        manual = self._widget("手动刷新", "SalesSummary", refresh_interval=0)
+        other = self._widget("利润", "ProfitAnalysis")
+        self._place(sales, shopee, order=1)
+        self._place(sales, all_sales, order=0)
+        self._place(sales, manual)
+        self._place(sales, other)
+        self._place(ops, stock)
+        self._place(ops, shopee, order=1)
+
+        broadcaster = DashboardBroadcaster()
+        assert [(w["dashboard_id"], w["id"]) for w in broadcaster.widget_index()] == [
+            (sales.id, all_sales.id),
+            (sales.id, shopee.id),
+            (ops.id, stock.id),
+            (ops.id, shopee.id),
+        ]
+        assert broadcaster.dashboards_for([("sales", 7)]) == [sales.id, ops.id]
+        assert broadcaster.dashboards_for([("sales", 8)]) == [sales.id]
+        assert broadcaster.dashboards_for([("inventory", 1)]) == [ops.id]
+
+    def test_widget_changes_invalidate_index(self, user):
+        """组件配置变化后重新加载索引，软删除的仪表盘不再推送"""
+        from apps.bi.models import Dashboard
+
+        dashboard = Dashboard.objects.create(name="销售", created_by=user)
+        broadcaster = DashboardBroadcaster()
+        assert broadcaster.dashboards_for([("sales", 1)]) == []
+
+        self._place(dashboard, self._widget("全部销售", "SalesSummary"))
+        assert broadcaster.dashboards_for([("sales", 1)]) == [dashboard.id]
+
+        dashboard.delete()
+        assert broadcaster.dashboards_for([("sales", 1)]) == []
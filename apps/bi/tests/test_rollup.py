@@ -0,0 +1,174 @@
+"""
+BI销售汇总引擎测试
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from apps.bi.models import PlatformComparison, SalesSummary
+from apps.bi.rollup import SalesRollupEngine, growth_rate, previous_period_range
+from apps.bi.services import SalesReportService
+
+
+def _order(platform, account, day, order_id, amount, status="paid", email="", quantity=1):
+    from ecomm_sync.models import PlatformOrder, PlatformOrderItem
+
+    order = PlatformOrder.objects.create(
+        platform=platform,
+        account=account,
+        platform_order_id=order_id,
+        order_status=status,
+        order_amount=Decimal(amount),
+        buyer_email=email,
+    )
+    created_at = timezone.make_aware(datetime(day.year, day.month, day.day, 12))
+    PlatformOrder.objects.filter(pk=order.pk).update(created_at=created_at)
+    PlatformOrderItem.objects.create(
+        order=order,
+        sku=f"SKU-{order_id}",
+        product_name="商品",
+        quantity=quantity,
+        unit_price=Decimal(amount),
+        total_price=Decimal(amount),
+    )
+    return order
+
+
+@pytest.fixture
+def platform_accounts():
+    from core.models import Platform
+    from ecomm_sync.models import PlatformAccount
+
+    platform = Platform.objects.create(
+        platform_name="Shopee", platform_code="shopee", platform_type="ecommerce"
+    )
+    account_a = PlatformAccount.objects.create(
+        account_type="shopee", platform=platform, account_name="A店"
+    )
+    account_b = PlatformAccount.objects.create(
+        account_type="shopee", platform=platform, account_name="B店"
+    )
+    return platform, account_a, account_b
+
+
+@pytest.mark.django_db
+class TestSalesRollupEngine:
+    """测试销售汇总引擎"""
+
+    def test_daily_rollup_account_and_platform_rows(self, platform_accounts):
+        """一次汇总同时生成账号行和平台合计行"""
+        platform, account_a, account_b = platform_accounts
+        day = date(2024, 3, 5)
+        _order(platform, account_a, day, "O1", "100", email="x@example.com", quantity=2)
+        _order(platform, account_b, day, "O2", "50", status="cancelled", email="x@example.com")
+
+        SalesRollupEngine().rollup_range(day, day)
+
+        row_a = SalesSummary.objects.get(platform_account=account_a, report_date=day)
+        assert row_a.total_orders == 1
+        assert row_a.total_quantity == 2
+        assert row_a.conversion_rate == Decimal("100.00")
+
+        total = SalesSummary.objects.get(
+            platform=platform, platform_account__isnull=True, report_date=day
+        )
+        assert total.total_orders == 2
+        assert total.total_amount == Decimal("150.00")
+        assert total.cancelled_orders == 1
+        assert total.repeat_purchase_rate == Decimal("100.00")
+
+    def test_rollup_is_idempotent(self, platform_accounts):
+        """重复汇总更新已有行，不产生重复数据"""
+        platform, account_a, _ = platform_accounts
+        day = date(2024, 3, 5)
+        _order(platform, account_a, day, "O1", "100")
+
+        engine = SalesRollupEngine()
+        engine.rollup_range(day, day)
+        _order(platform, account_a, day, "O2", "20")
+        engine.rollup_range(day, day)
+
+        rows = SalesSummary.objects.filter(platform_account=account_a, report_date=day)
+        assert rows.count() == 1
+        assert rows.get().total_amount == Decimal("120.00")
+
+    def test_ensure_daily_facts_recomputes_today(self, platform_accounts):
+        """今天的汇总行已存在时仍重新计算，历史日期只补缺失"""
+        platform, account_a, _ = platform_accounts
+        today = timezone.localdate()
+        _order(platform, account_a, today, "O1", "100")
+
+        engine = SalesRollupEngine()
+        engine.ensure_daily_facts(today, today)
+        _order(platform, account_a, today, "O2", "20")
+        engine.ensure_daily_facts(today, today)
+
+        row = SalesSummary.objects.get(platform_account=account_a, report_date=today)
+        assert row.total_amount == Decimal("120.00")
+
+    def test_all_platform_daily_summary(self, platform_accounts):
+        """未指定平台和账号时返回所有平台合计"""
+        from core.models import Platform
+        from ecomm_sync.models import PlatformAccount
+
+        platform, account_a, _ = platform_accounts
+        other = Platform.objects.create(
+            platform_name="Lazada", platform_code="lazada", platform_type="ecommerce"
+        )
+        account_c = PlatformAccount.objects.create(
+            account_type="lazada", platform=other, account_name="C店"
+        )
+        day = date(2024, 3, 5)
+        _order(platform, account_a, day, "O1", "100", email="x@example.com")
+        _order(other, account_c, day, "O2", "50", email="x@example.com")
+
+        summary = SalesReportService().generate_daily_sales_summary(report_date=day)
+
+        assert summary.platform_id is None
+        assert summary.total_orders == 2
+        assert summary.total_amount == Decimal("150.00")
+        assert summary.repeat_purchase_rate == Decimal("100.00")
+
+    def test_monthly_derived_from_daily_facts(self, platform_accounts):
+        """月汇总由日汇总行累加"""
+        platform, account_a, _ = platform_accounts
+        _order(platform, account_a, date(2024, 3, 1), "O1", "10")
+        _order(platform, account_a, date(2024, 3, 9), "O2", "30")
+
+        stats = SalesRollupEngine(chunk_days=3).backfill(
+            date(2024, 3, 1), date(2024, 3, 10), workers=1
+        )
+
+        assert stats["failed"] == 0
+        monthly = SalesSummary.objects.get(
+            platform_account=account_a, report_period="monthly", report_date=date(2024, 3, 10)
+        )
+        assert monthly.total_orders == 2
+        assert monthly.total_amount == Decimal("40.00")
+
+    def test_platform_comparison_growth_and_rank(self, platform_accounts):
+        """增长率与排名基于日汇总在内存中计算"""
+        platform, account_a, account_b = platform_accounts
+        _order(platform, account_a, date(2024, 3, 4), "O1", "100")
+        _order(platform, account_a, date(2024, 3, 5), "O2", "150")
+        _order(platform, account_b, date(2024, 3, 5), "O3", "50")
+
+        comparisons = SalesRollupEngine().build_platform_comparison(date(2024, 3, 5))
+
+        assert [item.platform_account_id for item in comparisons] == [account_a.id, account_b.id]
+        assert comparisons[0].sales_rank == 1
+        assert comparisons[0].sales_growth_rate == Decimal("50.00")
+        assert PlatformComparison.objects.filter(report_date=date(2024, 3, 5)).count() == 2
+
+    def test_period_helpers(self):
+        """上期范围与增长率"""
+        assert previous_period_range(date(2024, 3, 31), "monthly") == (
+            date(2024, 2, 1),
+            date(2024, 2, 29),
+        )
+        assert growth_rate(0, 0) == Decimal("0")
+        assert growth_rate(5, 0) == Decimal("100")
+        assert growth_rate(100000, 1) == Decimal("999.99")
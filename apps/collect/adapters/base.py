@@ -12,7 +12,12 @@ from typing import Any, Dict, List
 import requests
 from core.services.monitor import get_monitor
 from core.services.rate_limiter import get_rate_limiter
-from core.services.retry_manager import get_retry_manager
+from core.services.retry_manager import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    get_retry_manager,
+    request_timeout,
+)
 
 from ..exceptions import (
     APIResponseException,
@@ -55,7 +60,7 @@ class BaseCollectAdapter(ABC):
 
         # 集成核心服务
         self.rate_limiter = get_rate_limiter(self.platform_code)
-        self.retry_manager = get_retry_manager()
+        self.retry_manager = get_retry_manager(platform=self.platform_code)
         self.monitor = get_monitor()
 
     @abstractmethod
@@ -85,16 +90,20 @@ class BaseCollectAdapter(ABC):
             dict: 标准化采集数据
 
         Raises:
-            CollectException: 采集异常
+            CollectException: 采集异常（超过时间预算、平台熔断转换为 NetworkException）
         """
-
-        async def _collect_impl():
+        if not self.retry_manager:
             return self.collect_item(item_url)
 
-        if self.retry_manager:
-            return await self.retry_manager.execute_with_retry(_collect_impl)
-        else:
-            return await _collect_impl()
+        try:
+            # 采集是只读请求，允许对冲；整体不超过一次请求超时的3倍
+            return await self.retry_manager.execute_with_deadline(
+                self.collect_item, item_url, budget=self.timeout * 3, hedge=True
+            )
+        except DeadlineExceeded as e:
+            raise NetworkException(f"{self.platform_name} 采集超时: {str(e)}") from e
+        except CircuitOpenError as e:
+            raise NetworkException(f"{self.platform_name} 接口暂不可用: {str(e)}") from e
 
     def sign(self, params: Dict[str, Any]) -> str:
         """
@@ -134,6 +143,7 @@ class BaseCollectAdapter(ABC):
         Raises:
             NetworkException: 网络异常
             APIResponseException: API响应异常
+            DeadlineExceeded: 超过调用方的时间预算
         """
         import aiohttp
 
@@ -143,12 +153,13 @@ class BaseCollectAdapter(ABC):
         # 限流检查
         if self.rate_limiter:
             await self.rate_limiter.acquire()
+        timeout = request_timeout(self.timeout)
 
         try:
             async with aiohttp.ClientSession() as session:
                 if method.upper() == "GET":
                     async with session.get(
-                        url, params=params, headers=headers, timeout=self.timeout
+                        url, params=params, headers=headers, timeout=timeout
                     ) as response:
                         response.raise_for_status()
                         data = await response.json()
@@ -158,7 +169,7 @@ class BaseCollectAdapter(ABC):
                         json=json_data,
                         params=params,
                         headers=headers,
-                        timeout=self.timeout,
+                        timeout=timeout,
                     ) as response:
                         response.raise_for_status()
                         data = await response.json()
@@ -232,6 +243,7 @@ class BaseCollectAdapter(ABC):
         Raises:
             NetworkException: 网络异常
             APIResponseException: API响应异常
+            DeadlineExceeded: 超过调用方的时间预算
         """
         start_time = time.time()
         endpoint = url.split("/")[-1] if "/" in url else url
@@ -239,17 +251,18 @@ class BaseCollectAdapter(ABC):
         # 限流检查
         if self.rate_limiter:
             self.rate_limiter.acquire_sync()
+        timeout = request_timeout(self.timeout)
 
         try:
             if method.upper() == "GET":
-                response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
+                response = requests.get(url, params=params, headers=headers, timeout=timeout)
             elif method.upper() == "POST":
                 response = requests.post(
                     url,
                     json=json_data,
                     params=params,
                     headers=headers,
-                    timeout=self.timeout,
+                    timeout=timeout,
                 )
             else:
                 raise NetworkException(f"不支持的HTTP方法: {method}")
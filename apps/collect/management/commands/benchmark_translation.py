@@ -0,0 +1,72 @@
+"""
+翻译记忆与批量翻译压测（离线翻译器，不访问网络）
+运行方式：python manage.py benchmark_translation --segments 5000 --unique 500 --latency 0.05
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from collect.models import TranslationMemory
+from collect.services import BatchTranslator, StubTranslator
+
+# 压测数据使用独立的目标语言，结束后清理
+BENCH_LANGUAGE = "bench"
+
+
+class Command(BaseCommand):
+    help = "用离线翻译器评估翻译记忆命中率和批量翻译吞吐量"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--segments", type=int, default=5000, help="每轮翻译的文本条数")
+        parser.add_argument("--unique", type=int, default=500, help="其中不同文本的数量")
+        parser.add_argument("--rounds", type=int, default=2, help="轮数（第2轮起命中翻译记忆）")
+        parser.add_argument("--latency", type=float, default=0.05, help="每次请求的模拟延迟（秒）")
+        parser.add_argument(
+            "--workers", type=int, default=BatchTranslator.DEFAULT_WORKERS, help="并发请求数"
+        )
+        parser.add_argument("--keep", action="store_true", help="保留压测写入的翻译记忆")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        pool = [f"测试商品标题 {i} 加厚款 包邮" for i in range(options["unique"])]
+        texts = [rng.choice(pool) for _ in range(options["segments"])]
+
+        naive_seconds = options["segments"] * options["latency"]
+        self.stdout.write(
+            f"{options['segments']} 条文本（{options['unique']} 条不同），"
+            f"逐条翻译预计 {options['segments']} 次请求 / {naive_seconds:.1f}s"
+        )
+
+        TranslationMemory.objects.filter(target_language=BENCH_LANGUAGE).delete()
+        BatchTranslator.clear_l1()
+
+        try:
+            for round_no in range(1, options["rounds"] + 1):
+                stub = StubTranslator(latency=options["latency"])
+                translator = BatchTranslator(
+                    translator=stub, translator_type="stub", workers=options["workers"]
+                )
+                if round_no == options["rounds"] and options["rounds"] > 2:
+                    # 最后一轮模拟新进程：只命中数据库中的翻译记忆
+                    BatchTranslator.clear_l1()
+
+                started = time.perf_counter()
+                translator.translate_many(texts, BENCH_LANGUAGE, "zh")
+                elapsed = time.perf_counter() - started
+
+                stats = translator.stats
+                hits = stats["l1_hits"] + stats["db_hits"]
+                self.stdout.write(
+                    f"第{round_no}轮: {elapsed:.3f}s，{stub.request_count} 次请求，"
+                    f"{stats['segments'] / elapsed:.0f} 条/秒，"
+                    f"去重后命中 {hits}/{hits + stats['translated'] + stats['failed']}"
+                    f"（L1 {stats['l1_hits']}，数据库 {stats['db_hits']}）"
+                )
+        finally:
+            if not options["keep"]:
+                TranslationMemory.objects.filter(target_language=BENCH_LANGUAGE).delete()
+                BatchTranslator.clear_l1()
+
+        self.stdout.write(self.style.SUCCESS("✅ 压测完成"))
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.9 on 2026-10-19 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("collect", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TranslationMemory",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source_hash", models.CharField(max_length=64, verbose_name="原文哈希")),
+                ("source_language", models.CharField(max_length=16, verbose_name="源语言")),
+                ("target_language", models.CharField(max_length=16, verbose_name="目标语言")),
+                ("source_text", models.TextField(verbose_name="原文")),
+                ("translated_text", models.TextField(verbose_name="译文")),
+                (
+                    "translator_type",
+                    models.CharField(blank=True, max_length=16, verbose_name="翻译器"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "翻译记忆",
+                "verbose_name_plural": "翻译记忆",
+                "db_table": "collect_translation_memory",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("source_hash", "source_language", "target_language"),
+                        name="uniq_translation_memory_source_lang",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -354,3 +354,29 @@ class PricingRule(BaseModel):
             price = self.max_price
 
         return price
+
+
+class TranslationMemory(models.Model):
+    """翻译记忆：按（原文哈希，语言对）保存译文，相同文本只调用一次翻译接口"""
+
+    source_hash = models.CharField("原文哈希", max_length=64)
+    source_language = models.CharField("源语言", max_length=16)
+    target_language = models.CharField("目标语言", max_length=16)
+    source_text = models.TextField("原文")
+    translated_text = models.TextField("译文")
+    translator_type = models.CharField("翻译器", max_length=16, blank=True)
+    created_at = models.DateTimeField("创建时间", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "翻译记忆"
+        verbose_name_plural = "翻译记忆"
+        db_table = "collect_translation_memory"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source_hash", "source_language", "target_language"],
+                name="uniq_translation_memory_source_lang",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.source_language}→{self.target_language}: {self.source_text[:50]}"
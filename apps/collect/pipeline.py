@@ -0,0 +1,266 @@
+"""
+采集落地流水线
+
+采集任务按批次依次经过三个阶段：
+1. 并发采集：asyncio 信号量限制并发，在线程中调用适配器采集商品详情
+2. 并发下载图片：整批图片去重后由共享连接池的线程池下载，按内容哈希存入媒体存储
+3. 批量落地：预先批量生成ERP SKU，bulk_create 产品与采集子项
+
+落地成功的产品登记对图片的引用；每批完成后用 F() 原子累加任务的成功/失败计数，
+页面可实时查看进度。
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.models import MediaBlob
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from products.models import Product
+
+from .adapters import get_collect_adapter
+from .exceptions import CollectException, ProductCreateException
+from .models import CollectItem, CollectTask
+from .services import ImageDownloader
+from .tasks import apply_field_map_rules, generate_erp_skus, load_field_map_rules
+
+logger = logging.getLogger(__name__)
+
+# (采集链接, 采集数据, 失败原因)
+FetchResult = Tuple[str, Optional[Dict[str, Any]], str]
+
+
+class CollectLandPipeline:
+    """采集落地流水线"""
+
+    FETCH_CONCURRENCY = 8
+    IMAGE_WORKERS = 8
+    BATCH_SIZE = 100
+
+    def __init__(
+        self,
+        collect_task: CollectTask,
+        adapter=None,
+        fetch_concurrency: int = FETCH_CONCURRENCY,
+        image_workers: int = IMAGE_WORKERS,
+        batch_size: int = BATCH_SIZE,
+    ):
+        self.collect_task = collect_task
+        self.platform_code = collect_task.platform.platform_code
+        self.adapter = adapter or get_collect_adapter(collect_task.platform)
+        self.fetch_concurrency = fetch_concurrency
+        self.image_workers = image_workers
+        self.batch_size = batch_size
+        self.rules = load_field_map_rules(self.platform_code, "product")
+        self.downloader = ImageDownloader(pool_size=image_workers)
+
+    def run(self, urls: List[str]) -> Dict[str, int]:
+        """
+        执行流水线
+
+        Returns:
+            dict: success_num、fail_num
+        """
+        totals = {"success_num": 0, "fail_num": 0}
+
+        for start in range(0, len(urls), self.batch_size):
+            batch = urls[start : start + self.batch_size]
+
+            fetched = asyncio.run(self.fetch_all(batch))
+            images = self.download_images(fetched)
+            success_num, fail_num = self.land(fetched, images)
+
+            self._add_progress(success_num, fail_num)
+            totals["success_num"] += success_num
+            totals["fail_num"] += fail_num
+
+        return totals
+
+    # ------------------------------------------------------------------
+    # 阶段1：并发采集
+    # ------------------------------------------------------------------
+
+    async def fetch_all(self, urls: List[str]) -> List[FetchResult]:
+        """并发采集一批商品，结果顺序与 urls 一致"""
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+
+        async def fetch(url: str) -> FetchResult:
+            async with semaphore:
+                try:
+                    data = await asyncio.to_thread(self.adapter.collect_item, url)
+                    return url, data, ""
+                except CollectException as e:
+                    return url, None, f"采集失败：{e.msg}"
+                except Exception as e:
+                    return url, None, f"未知错误：{str(e)[:200]}"
+
+        return await asyncio.gather(*(fetch(url) for url in urls))
+
+    # ------------------------------------------------------------------
+    # 阶段2：并发下载图片
+    # ------------------------------------------------------------------
+
+    def download_images(self, fetched: List[FetchResult]) -> Dict[str, MediaBlob]:
+        """下载整批商品的图片，返回 {原始URL: 媒体文件}"""
+        urls = [url for _, data, _ in fetched if data for url in data.get("images") or []]
+        try:
+            return self.downloader.store.fetch_many(urls, workers=self.image_workers)
+        except Exception as e:
+            logger.warning(f"批量下载图片失败，使用原始图片URL: {e}")
+            return {}
+
+    # ------------------------------------------------------------------
+    # 阶段3：批量落地
+    # ------------------------------------------------------------------
+
+    def land(self, fetched: List[FetchResult], images: Dict[str, MediaBlob]) -> Tuple[int, int]:
+        """
+        批量创建产品和采集子项
+
+        Returns:
+            tuple: (成功数, 失败数)
+        """
+        now = timezone.now()
+        items = []
+        landing = []
+
+        for url, data, error in fetched:
+            item = CollectItem(
+                collect_task=self.collect_task,
+                collect_url=url,
+                created_by=self.collect_task.created_by,
+                updated_by=self.collect_task.updated_by,
+            )
+            items.append(item)
+
+            if data is None:
+                item.collect_status = "failed"
+                item.land_error = error
+                continue
+
+            item.collect_data = data
+            item.item_name = (data.get("product_name") or "")[:200]
+            item.item_sku = (data.get("source_sku") or "")[:64]
+            item.collect_status = "success"
+            item.collected_at = now
+
+            mapped_data = apply_field_map_rules(data, self.platform_code, "product", self.rules)
+            downloaded = [images[url].url for url in data.get("images") or [] if url in images]
+            if downloaded:
+                mapped_data["images"] = downloaded
+                mapped_data["main_image"] = downloaded[0]
+            landing.append((item, mapped_data))
+
+        landing, skus = self._generate_skus(landing)
+        products = [
+            self._build_product(mapped_data, sku) for (_, mapped_data), sku in zip(landing, skus)
+        ]
+
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create(products)
+                product_ids = dict(Product.objects.filter(code__in=skus).values_list("code", "id"))
+                for (item, _), sku in zip(landing, skus):
+                    self._mark_landed(item, product_ids[sku], now)
+                CollectItem.objects.bulk_create(items)
+        except Exception as e:
+            # 整批写入失败时逐条落地，隔离出错的商品
+            logger.warning(f"批量落地失败，改为逐条落地: {e}")
+            self._land_one_by_one(items, landing, products, now)
+
+        self._acquire_images(items, images)
+        success_num = sum(1 for item in items if item.land_status == "success")
+        return success_num, len(items) - success_num
+
+    def _generate_skus(self, landing):
+        """
+        批量生成ERP SKU，批量生成失败时逐条生成
+
+        Returns:
+            tuple: (生成成功的落地项, 对应的SKU)，生成失败的商品标记为落地失败
+        """
+        try:
+            return landing, generate_erp_skus(
+                self.platform_code, [item.item_sku for item, _ in landing]
+            )
+        except ProductCreateException as e:
+            logger.warning(f"批量生成ERP SKU失败，改为逐条生成: {e.msg}")
+
+        generated, skus = [], []
+        for item, mapped_data in landing:
+            try:
+                skus.extend(generate_erp_skus(self.platform_code, [item.item_sku]))
+            except ProductCreateException as e:
+                self._mark_failed(item, e.msg)
+                continue
+            generated.append((item, mapped_data))
+        return generated, skus
+
+    def _land_one_by_one(self, items, landing, products, now):
+        """逐条落地：产品与采集子项在同一事务中写入，失败只影响当前商品"""
+        product_for = {id(item): product for (item, _), product in zip(landing, products)}
+
+        for item in items:
+            product = product_for.get(id(item))
+            try:
+                with transaction.atomic():
+                    if product is not None:
+                        product.pk = None
+                        product.save()
+                        self._mark_landed(item, product.pk, now)
+                    item.save()
+                continue
+            except Exception as e:
+                self._mark_failed(item, f"未知错误：{str(e)[:200]}")
+
+            # 记录失败的采集子项，便于重试
+            try:
+                with transaction.atomic():
+                    item.pk = None
+                    item.save()
+            except Exception as e:
+                logger.error(f"保存采集子项失败: {item.collect_url}, 错误: {e}")
+
+    def _mark_failed(self, item: CollectItem, error: str):
+        item.product_id = None
+        item.land_status = "failed"
+        item.land_error = error
+
+    def _acquire_images(self, items: List[CollectItem], images: Dict[str, MediaBlob]):
+        """登记落地产品对图片的引用，未被引用的图片会被垃圾回收"""
+        refs = {}
+        for item in items:
+            if item.land_status != "success" or not images:
+                continue
+            blobs = [images[url] for url in item.collect_data.get("images") or [] if url in images]
+            if blobs:
+                refs[f"{Product._meta.label}:{item.product_id}"] = blobs
+        self.downloader.store.acquire_many(refs)
+
+    def _mark_landed(self, item: CollectItem, product_id: int, now):
+        item.product_id = product_id
+        item.land_status = "success"
+        item.landed_at = now
+
+    def _build_product(self, mapped_data: Dict[str, Any], sku: str) -> Product:
+        return Product(
+            name=(mapped_data.get("product_name") or "")[:200],
+            code=sku,
+            main_image=mapped_data.get("main_image", ""),
+            selling_price=mapped_data.get("price", 0),
+            track_inventory=False,
+            description=mapped_data.get("description", ""),
+            specifications="",
+            created_by=self.collect_task.created_by,
+            updated_by=self.collect_task.updated_by,
+        )
+
+    def _add_progress(self, success_num: int, fail_num: int):
+        """原子累加任务进度，避免覆盖其他进程写入的计数"""
+        CollectTask.objects.filter(pk=self.collect_task.pk).update(
+            success_num=F("success_num") + success_num,
+            fail_num=F("fail_num") + fail_num,
+            updated_at=timezone.now(),
+        )
@@ -3,12 +3,15 @@
 """
 
 from .image_downloader import ImageConverter, ImageDownloader, download_product_images
+from .translation_memory import BatchTranslator
 from .translator import (
     BaiduTranslator,
     BaseTranslator,
     GoogleTranslator,
+    StubTranslator,
     TranslatorFactory,
     translate_product_data,
+    translate_products_data,
     translate_text,
 )
 
@@ -19,7 +22,10 @@ __all__ = [
     "BaseTranslator",
     "GoogleTranslator",
     "BaiduTranslator",
+    "StubTranslator",
     "TranslatorFactory",
+    "BatchTranslator",
     "translate_text",
     "translate_product_data",
+    "translate_products_data",
 ]
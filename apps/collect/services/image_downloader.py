@@ -3,40 +3,53 @@
 支持图片下载、转换、上传到本地或云存储
 """
 
-import hashlib
-import os
 from typing import Dict, List, Optional
 
 import requests
-from django.core.files.base import ContentFile
-from django.utils import timezone
+from core.services.media_store import MediaStore
+from requests.adapters import HTTPAdapter
 
-from .exceptions import ImageDownloadException
+from ..exceptions import ImageDownloadException
 
 
 class ImageDownloader:
     """图片下载器"""
 
-    def __init__(self, upload_to="collect/images/"):
+    # 未指定引用方时登记的引用方：返回的图片URL可能已被调用方保存，不能被垃圾回收
+    DEFAULT_OWNER = "collect.ImageDownloader"
+
+    def __init__(self, upload_to="collect/images/", pool_size: int = 10):
         """
         初始化图片下载器
 
         Args:
-            upload_to: 上传路径
+            upload_to: 上传路径（图片已统一保存到媒体存储，保留参数兼容旧调用）
+            pool_size: 每个域名的连接池大小，并发下载时应不小于线程数
         """
         self.upload_to = upload_to
+        self.pool_size = pool_size
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.session.headers.update(
             {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
         )
+        self.store = MediaStore(session=self.session, pool_size=pool_size)
 
-    def download_image(self, image_url: str, save_to_local: bool = True) -> Optional[str]:
+    def download_image(
+        self, image_url: str, save_to_local: bool = True, owner: str = None
+    ) -> Optional[str]:
         """
         下载单张图片
 
+        图片按内容哈希保存在共享媒体存储中，不同URL的相同图片只保存一份，
+        并登记引用方对图片的引用。
+
         Args:
             image_url: 图片URL
             save_to_local: 是否保存到本地
+            owner: 引用方标识（如 MediaStore.owner_key(product)），默认 DEFAULT_OWNER
 
         Returns:
             str: 本地路径或CDN URL
@@ -47,23 +60,14 @@ class ImageDownloader:
         if not image_url:
             return None
 
+        if not save_to_local:
+            # 返回原始URL
+            return image_url
+
         try:
-            # 下载图片
-            response = self.session.get(image_url, timeout=30)
-            response.raise_for_status()
-
-            # 生成文件名
-            file_hash = hashlib.sha256(image_url.encode()).hexdigest()[:8]
-            ext = self._get_extension(response.headers.get("content-type", ""))
-            filename = f"{file_hash}{ext}"
-
-            if save_to_local:
-                # 保存到本地
-                file_path = self._save_to_local(filename, response.content)
-                return file_path
-            else:
-                # 返回原始URL
-                return image_url
+            blob = self.store.fetch(image_url)
+            self.store.acquire(owner or self.DEFAULT_OWNER, [blob])
+            return blob.url
 
         except requests.exceptions.Timeout:
             raise ImageDownloadException(image_url, "下载超时")
@@ -72,13 +76,16 @@ class ImageDownloader:
         except Exception as e:
             raise ImageDownloadException(image_url, f"处理失败: {str(e)}")
 
-    def download_images(self, image_urls: List[str], save_to_local: bool = True) -> List[str]:
+    def download_images(
+        self, image_urls: List[str], save_to_local: bool = True, owner: str = None
+    ) -> List[str]:
         """
         批量下载图片
 
         Args:
             image_urls: 图片URL列表
             save_to_local: 是否保存到本地
+            owner: 引用方标识，默认 DEFAULT_OWNER
 
         Returns:
             list: 成功下载的图片路径列表
@@ -87,7 +94,7 @@ class ImageDownloader:
 
         for url in image_urls:
             try:
-                image_path = self.download_image(url, save_to_local)
+                image_path = self.download_image(url, save_to_local, owner)
                 if image_path:
                     results.append(image_path)
             except ImageDownloadException as e:
@@ -97,49 +104,32 @@ class ImageDownloader:
 
         return results
 
-    def _save_to_local(self, filename: str, content: bytes) -> str:
+    def download_many(
+        self,
+        image_urls: List[str],
+        save_to_local: bool = True,
+        workers: int = None,
+        owner: str = None,
+    ) -> Dict[str, str]:
         """
-        保存图片到本地
+        并发下载图片（共享同一连接池），重复URL只下载一次
 
         Args:
-            filename: 文件名
-            content: 图片内容
-
-        Returns:
-            str: 相对路径
-        """
-        from django.core.files.storage import default_storage
-
-        # 构造完整路径
-        date_path = timezone.now().strftime("%Y/%m/%d")
-        file_path = os.path.join(self.upload_to, date_path, filename)
-
-        # 保存文件
-        default_storage.save(file_path, ContentFile(content))
-
-        # 返回URL
-        return default_storage.url(file_path)
-
-    def _get_extension(self, content_type: str) -> str:
-        """
-        根据Content-Type获取文件扩展名
-
-        Args:
-            content_type: Content-Type
+            image_urls: 图片URL列表
+            save_to_local: 是否保存到本地
+            workers: 并发线程数，默认等于连接池大小
+            owner: 引用方标识，默认 DEFAULT_OWNER
 
         Returns:
-            str: 文件扩展名
+            dict: 成功下载的 {原始URL: 图片路径}
         """
-        ext_map = {
-            "image/jpeg": ".jpg",
-            "image/jpg": ".jpg",
-            "image/png": ".png",
-            "image/gif": ".gif",
-            "image/webp": ".webp",
-            "image/bmp": ".bmp",
-        }
+        urls = list(dict.fromkeys(url for url in image_urls if url))
+        if not save_to_local:
+            return {url: url for url in urls}
 
-        return ext_map.get(content_type.lower(), ".jpg")
+        blobs = self.store.fetch_many(urls, workers=workers)
+        self.store.acquire(owner or self.DEFAULT_OWNER, blobs.values())
+        return {url: blob.url for url, blob in blobs.items()}
 
     def optimize_image(self, image_path: str, max_width: int = 1200, quality: int = 85) -> str:
         """
@@ -244,7 +234,7 @@ class ImageConverter:
 
 
 def download_product_images(
-    image_urls: List[str], save_to_local: bool = True
+    image_urls: List[str], save_to_local: bool = True, owner: str = None
 ) -> Dict[str, List[str]]:
     """
     下载产品所有图片的便捷函数
@@ -252,6 +242,7 @@ def download_product_images(
     Args:
         image_urls: 图片URL列表
         save_to_local: 是否保存到本地
+        owner: 引用方标识（如 MediaStore.owner_key(product)），默认 ImageDownloader.DEFAULT_OWNER
 
     Returns:
         dict: {
@@ -264,7 +255,7 @@ def download_product_images(
 
     for url in image_urls:
         try:
-            path = downloader.download_image(url, save_to_local)
+            path = downloader.download_image(url, save_to_local, owner)
             if path:
                 results["success"].append(path)
         except ImageDownloadException:
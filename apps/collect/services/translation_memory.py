@@ -0,0 +1,211 @@
+"""
+翻译记忆与批量翻译
+相同文本按（原文哈希，语言对）只翻译一次，未命中的文本打包成批并发请求翻译接口
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from ..exceptions import TranslationException
+from ..models import TranslationMemory
+from .translator import BaseTranslator, TranslatorFactory
+
+logger = logging.getLogger(__name__)
+
+# (原文哈希, 源语言, 目标语言)
+MemoryKey = Tuple[str, str, str]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class BatchTranslator:
+    """
+    带翻译记忆的批量翻译器
+
+    查询顺序：
+    1. L1 进程内 LRU 缓存
+    2. 翻译记忆表（一次查询）
+    3. 翻译接口：按接口的条数/字符数限制打包，线程池并发请求
+
+    新译文写回翻译记忆表和 L1 缓存；翻译失败的文本返回原文且不写入记忆。
+    """
+
+    DEFAULT_WORKERS = 4
+    L1_MAX_SIZE = 10000
+
+    # 进程内共享的 L1 缓存
+    _l1: "OrderedDict[MemoryKey, str]" = OrderedDict()
+    _l1_lock = threading.Lock()
+
+    def __init__(
+        self,
+        translator: BaseTranslator = None,
+        translator_type: str = "baidu",
+        workers: int = DEFAULT_WORKERS,
+    ):
+        """
+        Args:
+            translator: 翻译器实例，不传则按 translator_type 创建
+            translator_type: 翻译器类型（google, baidu, stub）
+            workers: 并发请求数
+        """
+        self.translator = translator or TranslatorFactory.get_translator(translator_type)
+        self.translator_type = translator_type
+        self.workers = workers
+        self.stats = {
+            "segments": 0,
+            "l1_hits": 0,
+            "db_hits": 0,
+            "translated": 0,
+            "failed": 0,
+            "requests": 0,
+        }
+
+    def translate_many(
+        self, texts: List[str], target_language: str, source_language: str = "auto"
+    ) -> List[str]:
+        """
+        批量翻译
+
+        Returns:
+            list: 与 texts 顺序一致的译文（空文本和翻译失败的文本返回原文）
+        """
+        self.stats["segments"] += len(texts)
+        unique = list(dict.fromkeys(text for text in texts if text and text.strip()))
+        keys = {text: (text_hash(text), source_language, target_language) for text in unique}
+
+        results = {}
+        missing = []
+        for text in unique:
+            translated = self._l1_get(keys[text])
+            if translated is None:
+                missing.append(text)
+            else:
+                results[text] = translated
+        self.stats["l1_hits"] += len(unique) - len(missing)
+
+        if missing:
+            stored = self._load_memory([keys[text] for text in missing])
+            remaining = []
+            for text in missing:
+                translated = stored.get(keys[text])
+                if translated is None:
+                    remaining.append(text)
+                else:
+                    results[text] = translated
+                    self._l1_set(keys[text], translated)
+            self.stats["db_hits"] += len(missing) - len(remaining)
+
+            if remaining:
+                translated = self._translate_remote(remaining, target_language, source_language)
+                self._save_memory(translated, keys)
+                results.update(translated)
+
+        return [results.get(text, text) for text in texts]
+
+    def pack(self, texts: List[str]) -> List[List[str]]:
+        """按翻译接口的条数和字符数限制分组（超长文本单独成组）"""
+        max_segments = max(1, self.translator.max_batch_segments)
+        max_chars = self.translator.max_batch_chars
+
+        batches = []
+        batch, chars = [], 0
+        for text in texts:
+            if batch and (len(batch) >= max_segments or chars + len(text) > max_chars):
+                batches.append(batch)
+                batch, chars = [], 0
+            batch.append(text)
+            chars += len(text)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _translate_remote(
+        self, texts: List[str], target_language: str, source_language: str
+    ) -> Dict[str, str]:
+        batches = self.pack(texts)
+        self.stats["requests"] += len(batches)
+
+        def translate(batch):
+            try:
+                return self.translator.translate_batch(batch, target_language, source_language)
+            except TranslationException as e:
+                logger.warning(f"批量翻译失败（{len(batch)}条）: {e.msg}")
+            except Exception as e:
+                logger.warning(f"批量翻译失败（{len(batch)}条）: {e}")
+            return None
+
+        max_workers = max(1, min(self.workers, len(batches)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outputs = list(executor.map(translate, batches))
+
+        translated = {}
+        for batch, output in zip(batches, outputs):
+            if output is None:
+                self.stats["failed"] += len(batch)
+                continue
+            translated.update(zip(batch, output))
+        self.stats["translated"] += len(translated)
+        return translated
+
+    # ------------------------------------------------------------------
+    # 翻译记忆
+    # ------------------------------------------------------------------
+
+    def _load_memory(self, keys: List[MemoryKey]) -> Dict[MemoryKey, str]:
+        _, source_language, target_language = keys[0]
+        rows = TranslationMemory.objects.filter(
+            source_hash__in=[key[0] for key in keys],
+            source_language=source_language,
+            target_language=target_language,
+        ).values_list("source_hash", "translated_text")
+        return {
+            (source_hash, source_language, target_language): translated_text
+            for source_hash, translated_text in rows
+        }
+
+    def _save_memory(self, translated: Dict[str, str], keys: Dict[str, MemoryKey]):
+        entries = []
+        for text, translated_text in translated.items():
+            key = keys[text]
+            self._l1_set(key, translated_text)
+            entries.append(
+                TranslationMemory(
+                    source_hash=key[0],
+                    source_language=key[1],
+                    target_language=key[2],
+                    source_text=text,
+                    translated_text=translated_text,
+                    translator_type=self.translator_type,
+                )
+            )
+        # 并发任务可能同时写入相同文本，以先写入的为准
+        TranslationMemory.objects.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+
+    @classmethod
+    def _l1_get(cls, key: MemoryKey) -> Optional[str]:
+        with cls._l1_lock:
+            value = cls._l1.get(key)
+            if value is not None:
+                cls._l1.move_to_end(key)
+            return value
+
+    @classmethod
+    def _l1_set(cls, key: MemoryKey, value: str):
+        with cls._l1_lock:
+            cls._l1[key] = value
+            cls._l1.move_to_end(key)
+            while len(cls._l1) > cls.L1_MAX_SIZE:
+                cls._l1.popitem(last=False)
+
+    @classmethod
+    def clear_l1(cls):
+        """清空 L1 缓存"""
+        with cls._l1_lock:
+            cls._l1.clear()
@@ -3,17 +3,23 @@
 支持多语言翻译
 """
 
-from typing import Dict, Optional
+import threading
+import time
+from typing import Dict, List, Optional
 
 import requests
 from django.conf import settings
 
-from .exceptions import TranslationException
+from ..exceptions import TranslationException
 
 
 class BaseTranslator:
     """翻译器基类"""
 
+    # 单次请求最多包含的文本条数和总字符数，批量翻译按此分组
+    max_batch_segments = 1
+    max_batch_chars = 5000
+
     def translate(self, text: str, target_language: str, source_language: str = "auto") -> str:
         """
         翻译文本
@@ -28,10 +34,24 @@ class BaseTranslator:
         """
         raise NotImplementedError("子类必须实现 translate 方法")
 
+    def translate_batch(
+        self, texts: List[str], target_language: str, source_language: str = "auto"
+    ) -> List[str]:
+        """
+        批量翻译（默认逐条调用 translate）
+
+        Returns:
+            list: 与 texts 顺序一致的译文
+        """
+        return [self.translate(text, target_language, source_language) for text in texts]
+
 
 class GoogleTranslator(BaseTranslator):
     """Google翻译器"""
 
+    max_batch_segments = 128
+    max_batch_chars = 5000
+
     def __init__(self, api_key: str = None):
         """
         初始化Google翻译器
@@ -54,24 +74,35 @@ class GoogleTranslator(BaseTranslator):
         Returns:
             str: 翻译结果
         """
+        return self.translate_batch([text], target_language, source_language)[0]
+
+    def translate_batch(
+        self, texts: List[str], target_language: str, source_language: str = "auto"
+    ) -> List[str]:
+        """一次请求翻译多条文本（q 参数可重复）"""
+        text = texts[0] if texts else ""
         if not self.api_key:
             raise TranslationException(text, target_language, "未配置Google翻译API密钥")
 
         try:
-            params = {"q": text, "target": target_language, "key": self.api_key}
+            data = {"q": list(texts), "target": target_language, "format": "text"}
 
             if source_language != "auto":
-                params["source"] = source_language
+                data["source"] = source_language
 
-            response = requests.post(self.base_url, params=params, timeout=30)
+            response = requests.post(
+                self.base_url, params={"key": self.api_key}, data=data, timeout=30
+            )
             response.raise_for_status()
             result = response.json()
 
-            if "data" in result and "translations" in result["data"]:
-                return result["data"]["translations"][0]["translatedText"]
-            else:
+            translations = result.get("data", {}).get("translations") or []
+            if len(translations) != len(texts):
                 raise TranslationException(text, target_language, "翻译API响应格式错误")
+            return [item["translatedText"] for item in translations]
 
+        except TranslationException:
+            raise
         except requests.exceptions.RequestException as e:
             raise TranslationException(text, target_language, f"翻译请求失败: {str(e)}")
         except Exception as e:
@@ -81,6 +112,10 @@ class GoogleTranslator(BaseTranslator):
 class BaiduTranslator(BaseTranslator):
     """百度翻译器"""
 
+    # 百度翻译单次请求建议不超过6000字节，多条文本以换行分隔
+    max_batch_segments = 100
+    max_batch_chars = 2000
+
     def __init__(self, app_id: str = None, secret_key: str = None):
         """
         初始化百度翻译器
@@ -105,20 +140,49 @@ class BaiduTranslator(BaseTranslator):
         Returns:
             str: 翻译结果
         """
+        return self.translate_batch([text], target_language, source_language)[0]
+
+    def translate_batch(
+        self, texts: List[str], target_language: str, source_language: str = "auto"
+    ) -> List[str]:
+        """
+        一次请求翻译多条文本
+
+        百度按行返回译文且忽略空行，这里把所有文本的非空行拼接后发送，再按行还原。
+        """
+        text = texts[0] if texts else ""
         if not self.app_id or not self.secret_key:
             raise TranslationException(text, target_language, "未配置百度翻译APP ID或密钥")
 
         import hashlib
         import random
 
+        # 每条文本各行在请求中的位置，空行为 None
+        layouts = []
+        lines = []
+        for item in texts:
+            layout = []
+            for line in item.split("\n"):
+                if line.strip():
+                    layout.append(len(lines))
+                    lines.append(line)
+                else:
+                    layout.append(None)
+            layouts.append(layout)
+
+        if not lines:
+            return list(texts)
+
+        query = "\n".join(lines)
+
         try:
             # 构造请求参数
             salt = str(random.randint(32768, 65536))
-            sign_str = self.app_id + text + salt + self.secret_key
+            sign_str = self.app_id + query + salt + self.secret_key
             sign = hashlib.md5(sign_str.encode()).hexdigest()
 
             params = {
-                "q": text,
+                "q": query,
                 "from": source_language,
                 "to": target_language,
                 "appid": self.app_id,
@@ -126,7 +190,7 @@ class BaiduTranslator(BaseTranslator):
                 "sign": sign,
             }
 
-            response = requests.get(self.base_url, params=params, timeout=30)
+            response = requests.post(self.base_url, data=params, timeout=30)
             response.raise_for_status()
             result = response.json()
 
@@ -134,17 +198,56 @@ class BaiduTranslator(BaseTranslator):
                 error_msg = result.get("error_msg", "未知错误")
                 raise TranslationException(text, target_language, f"百度翻译API错误: {error_msg}")
 
-            if "trans_result" in result and len(result["trans_result"]) > 0:
-                return result["trans_result"][0]["dst"]
-            else:
+            translated = [item["dst"] for item in result.get("trans_result") or []]
+            if len(translated) != len(lines):
                 raise TranslationException(text, target_language, "翻译API响应格式错误")
 
+            return [
+                "\n".join("" if index is None else translated[index] for index in layout)
+                for layout in layouts
+            ]
+
+        except TranslationException:
+            raise
         except requests.exceptions.RequestException as e:
             raise TranslationException(text, target_language, f"翻译请求失败: {str(e)}")
         except Exception as e:
             raise TranslationException(text, target_language, f"翻译失败: {str(e)}")
 
 
+class StubTranslator(BaseTranslator):
+    """
+    离线翻译器
+
+    不访问网络，返回带目标语言标记的原文，可模拟接口延迟。
+    用于测试和评估翻译记忆命中率、批量翻译吞吐量。
+    """
+
+    max_batch_segments = 100
+    max_batch_chars = 5000
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency: 每次请求的模拟延迟（秒）
+        """
+        self.latency = latency
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def translate(self, text: str, target_language: str, source_language: str = "auto") -> str:
+        return self.translate_batch([text], target_language, source_language)[0]
+
+    def translate_batch(
+        self, texts: List[str], target_language: str, source_language: str = "auto"
+    ) -> List[str]:
+        with self._lock:
+            self.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [f"[{target_language}] {text}" for text in texts]
+
+
 class TranslatorFactory:
     """翻译器工厂"""
 
@@ -154,7 +257,7 @@ class TranslatorFactory:
         获取翻译器实例
 
         Args:
-            translator_type: 翻译器类型（google, baidu）
+            translator_type: 翻译器类型（google, baidu, stub）
 
         Returns:
             BaseTranslator: 翻译器实例
@@ -162,6 +265,7 @@ class TranslatorFactory:
         translators = {
             "google": GoogleTranslator,
             "baidu": BaiduTranslator,
+            "stub": StubTranslator,
         }
 
         if translator_type not in translators:
@@ -192,6 +296,15 @@ def translate_text(
     return translator.translate(text, target_language, source_language)
 
 
+# 产品数据中需要翻译的字段
+PRODUCT_TRANSLATE_FIELDS = [
+    "product_name",
+    "listing_title",
+    "description",
+    "specifications",
+]
+
+
 def translate_product_data(
     product_data: Dict[str, any], target_language: str, translator_type: str = "baidu"
 ) -> Dict[str, any]:
@@ -206,25 +319,48 @@ def translate_product_data(
     Returns:
         dict: 翻译后的产品数据
     """
-    # 需要翻译的字段
-    fields_to_translate = [
-        "product_name",
-        "listing_title",
-        "description",
-        "specifications",
-    ]
+    return translate_products_data([product_data], target_language, translator_type)[0]
 
-    translated_data = product_data.copy()
-    translator = TranslatorFactory.get_translator(translator_type)
 
-    for field in fields_to_translate:
-        if field in translated_data and translated_data[field]:
-            try:
-                translated_data[f"{field}_translated"] = translator.translate(
-                    translated_data[field], target_language, "zh"  # 假设源语言为中文
-                )
-            except TranslationException as e:
-                print(f"翻译失败: {e.msg}")
-                translated_data[f"{field}_translated"] = translated_data[field]
-
-    return translated_data
+def translate_products_data(
+    products_data: List[Dict[str, any]],
+    target_language: str,
+    translator_type: str = "baidu",
+    translator: Optional[BaseTranslator] = None,
+) -> List[Dict[str, any]]:
+    """
+    批量翻译多个产品的数据
+
+    所有产品的待翻译字段合并后经翻译记忆去重，只有未翻译过的文本才会打包请求翻译接口；
+    翻译失败的字段保留原文。
+
+    Args:
+        products_data: 产品数据字典列表
+        target_language: 目标语言
+        translator_type: 翻译器类型
+        translator: 翻译器实例（可选）
+
+    Returns:
+        list: 翻译后的产品数据，顺序与输入一致
+    """
+    from .translation_memory import BatchTranslator
+
+    translated_list = [product_data.copy() for product_data in products_data]
+    slots = [
+        (translated_data, field)
+        for translated_data in translated_list
+        for field in PRODUCT_TRANSLATE_FIELDS
+        if translated_data.get(field) and isinstance(translated_data[field], str)
+    ]
+    if not slots:
+        return translated_list
+
+    batch_translator = BatchTranslator(translator=translator, translator_type=translator_type)
+    # 假设源语言为中文
+    translations = batch_translator.translate_many(
+        [data[field] for data, field in slots], target_language, "zh"
+    )
+    for (translated_data, field), translated in zip(slots, translations):
+        translated_data[f"{field}_translated"] = translated
+
+    return translated_list
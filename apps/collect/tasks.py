@@ -3,24 +3,22 @@ Celery异步任务模块
 实现采集、落地、同步的全链路异步处理
 """
 
+import logging
 import uuid
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from celery import shared_task
+from core.models import Platform, Shop
 from django.db import transaction
 from django.utils import timezone
+from ecomm_sync.models import ProductListing
 from products.models import Product
 
-from .adapters import get_collect_adapter
-from .exceptions import (
-    CollectException,
-    ImageDownloadException,
-    ProductCreateException,
-    SyncException,
-    TranslationException,
-)
-from .models import CollectItem, CollectTask, Platform, PricingRule, ProductListing, Shop
-from .services import ImageDownloader, TranslatorFactory, translate_product_data
+from .exceptions import ProductCreateException, SyncException
+from .models import CollectItem, CollectTask, PricingRule
+from .services import BatchTranslator, translate_product_data
+
+logger = logging.getLogger(__name__)
 
 
 def generate_erp_sku(source_platform: str, source_sku: str) -> str:
@@ -39,8 +37,58 @@ def generate_erp_sku(source_platform: str, source_sku: str) -> str:
     return f"{platform_prefix}_{source_sku}_{random_suffix}"
 
 
+def generate_erp_skus(source_platform: str, source_skus: List[str]) -> List[str]:
+    """
+    批量生成ERP统一SKU
+
+    一次查询排除产品库中已存在的编码，仅对冲突项重新生成。
+
+    Args:
+        source_platform: 源平台（taobao/1688）
+        source_skus: 源平台SKU列表（为空时使用随机值）
+
+    Returns:
+        list: 与 source_skus 一一对应且互不重复的ERP SKU
+    """
+    skus = [
+        generate_erp_sku(source_platform, source_sku or uuid.uuid4().hex[:8])
+        for source_sku in source_skus
+    ]
+
+    for _ in range(5):
+        taken = set(Product.objects.filter(code__in=skus).values_list("code", flat=True))
+        seen = set()
+        conflicts = []
+        for index, sku in enumerate(skus):
+            if sku in taken or sku in seen:
+                conflicts.append(index)
+            seen.add(sku)
+        if not conflicts:
+            return skus
+        for index in conflicts:
+            skus[index] = generate_erp_sku(
+                source_platform, source_skus[index] or uuid.uuid4().hex[:8]
+            )
+
+    raise ProductCreateException("生成ERP SKU失败：编码冲突次数过多")
+
+
+def load_field_map_rules(platform_code: str, target_type: str = "product") -> list:
+    """加载启用的字段映射规则（批量处理时只查询一次）"""
+    from .models import FieldMapRule
+
+    return list(
+        FieldMapRule.objects.filter(
+            collect_platform=platform_code, target_type=target_type, is_active=True
+        ).order_by("sort_order")
+    )
+
+
 def apply_field_map_rules(
-    collect_data: Dict[str, Any], platform_code: str, target_type: str = "product"
+    collect_data: Dict[str, Any],
+    platform_code: str,
+    target_type: str = "product",
+    rules: Optional[list] = None,
 ) -> Dict[str, Any]:
     """
     应用字段映射规则
@@ -49,16 +97,14 @@ def apply_field_map_rules(
         collect_data: 采集的原始数据
         platform_code: 平台编码
         target_type: 目标类型（product/listing）
+        rules: 预先加载的映射规则（为空时查询数据库）
 
     Returns:
         dict: 映射后的数据
     """
-    from .models import FieldMapRule
-
     # 获取映射规则
-    rules = FieldMapRule.objects.filter(
-        collect_platform=platform_code, target_type=target_type, is_active=True
-    ).order_by("sort_order")
+    if rules is None:
+        rules = load_field_map_rules(platform_code, target_type)
 
     mapped_data = collect_data.copy()
 
@@ -95,131 +141,43 @@ def collect_and_land_task(self, collect_task_id: int):
     Args:
         collect_task_id: CollectTask模型ID
     """
+    from .pipeline import CollectLandPipeline
+
     try:
         # 1. 获取采集任务
         collect_task = CollectTask.objects.get(id=collect_task_id, is_deleted=False)
 
-        # 更新任务状态为采集中
-        collect_task.collect_status = "running"
-        collect_task.started_at = timezone.now()
-        collect_task.save()
-
-        # 获取平台配置和适配器
-        platform_config = collect_task.platform
-        adapter = get_collect_adapter(platform_config)
-
         # 拆分采集链接
         collect_urls = [url.strip() for url in collect_task.collect_urls.split("\n") if url.strip()]
+
+        # 更新任务状态为采集中，重置进度计数（重试时从头开始）
+        collect_task.collect_status = "running"
+        collect_task.land_status = "running"
+        collect_task.started_at = timezone.now()
         collect_task.collect_num = len(collect_urls)
+        collect_task.success_num = 0
+        collect_task.fail_num = 0
         collect_task.save()
 
-        success_num = 0
-        fail_num = 0
-
-        # 2. 批量采集+落地
-        for url in collect_urls:
-            # 创建采集子项
-            collect_item = CollectItem.objects.create(
-                collect_task=collect_task,
-                collect_url=url,
-                create_user=collect_task.created_by,
-                update_user=collect_task.updated_by,
-            )
-
-            try:
-                # 3. 调用适配器采集单个商品
-                collect_data = adapter.collect_item(url)
-                collect_item.collect_data = collect_data
-                collect_item.item_name = collect_data.get("product_name", "")
-                collect_item.item_sku = collect_data.get("source_sku", "")
-                collect_item.collect_status = "success"
-                collect_item.collected_at = timezone.now()
-
-                # 4. 应用字段映射规则
-                mapped_data = apply_field_map_rules(
-                    collect_data, platform_config.platform_code, "product"
-                )
-
-                # 5. 下载图片
-                try:
-                    image_downloader = ImageDownloader()
-                    images = collect_data.get("images", [])
-                    if images:
-                        downloaded_images = image_downloader.download_images(
-                            images, save_to_local=True
-                        )
-                        mapped_data["images"] = downloaded_images
-                        if downloaded_images:
-                            mapped_data["main_image"] = downloaded_images[0]
-                except ImageDownloadException as e:
-                    print(f"图片下载失败: {e.msg}")
-                    # 使用原始图片URL
-                    pass
-
-                # 6. 落地到产品库（事务保证原子性）
-                with transaction.atomic():
-                    # 生成ERP SKU
-                    erp_sku = generate_erp_sku(
-                        platform_config.platform_code,
-                        collect_data.get("source_sku", str(uuid.uuid4().hex[:8])),
-                    )
-
-                    # 创建产品库产品
-                    product = Product.objects.create(
-                        name=mapped_data.get("product_name", ""),
-                        code=erp_sku,
-                        main_image=mapped_data.get("main_image", ""),
-                        selling_price=mapped_data.get("price", 0),
-                        track_inventory=False,
-                        description=mapped_data.get("description", ""),
-                        specifications="",
-                        created_by=collect_task.created_by,
-                        updated_by=collect_task.updated_by,
-                    )
-
-                    # 关联采集子项和产品
-                    collect_item.product = product
-                    collect_item.land_status = "success"
-                    collect_item.landed_at = timezone.now()
-
-                success_num += 1
-
-            except CollectException as e:
-                # 采集失败
-                collect_item.collect_status = "failed"
-                collect_item.land_error = f"采集失败：{e.msg}"
-                fail_num += 1
-            except ProductCreateException as e:
-                # 落地失败
-                collect_item.collect_status = "success" if collect_item.collect_data else "failed"
-                collect_item.land_status = "failed"
-                collect_item.land_error = f"落地失败：{e.msg}"
-                fail_num += 1
-            except Exception as e:
-                # 其他异常
-                collect_item.collect_status = "success" if collect_item.collect_data else "failed"
-                collect_item.land_status = "failed"
-                collect_item.land_error = f"未知错误：{str(e)[:200]}"
-                fail_num += 1
-            finally:
-                collect_item.save()
-
-        # 7. 更新任务统计
-        collect_task.success_num = success_num
-        collect_task.fail_num = fail_num
+        # 2. 并发采集 + 并发下载图片 + 批量落地，进度按批次原子累加
+        stats = CollectLandPipeline(collect_task).run(collect_urls)
+        success_num = stats["success_num"]
+        fail_num = stats["fail_num"]
 
+        # 3. 更新任务状态
         if success_num > 0 and fail_num == 0:
-            collect_task.collect_status = "success"
-            collect_task.land_status = "success"
+            status = "success"
         elif success_num > 0 and fail_num > 0:
-            collect_task.collect_status = "partial"
-            collect_task.land_status = "partial"
+            status = "partial"
         else:
-            collect_task.collect_status = "failed"
-            collect_task.land_status = "failed"
+            status = "failed"
 
-        collect_task.completed_at = timezone.now()
-        collect_task.save()
+        CollectTask.objects.filter(pk=collect_task.pk).update(
+            collect_status=status,
+            land_status=status,
+            completed_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
 
     except Exception as e:
         # 任务整体失败，更新状态
@@ -292,17 +250,16 @@ def create_listing_task(
         else:
             listing_data["price"] = product.selling_price
 
-        # 翻译
+        # 翻译（经翻译记忆，标题和描述合并为一次请求，失败时保留原文并在结果中标记）
+        translation_failed = False
         if translate:
-            try:
-                translator = TranslatorFactory.get_translator("baidu")
-                listing_data["title"] = translator.translate(product.name, target_language)
-                if product.description:
-                    listing_data["description"] = translator.translate(
-                        product.description, target_language
-                    )
-            except TranslationException as e:
-                print(f"翻译失败: {e.msg}")
+            translator = BatchTranslator(translator_type="baidu")
+            listing_data["title"], listing_data["description"] = translator.translate_many(
+                [product.name, listing_data["description"]], target_language
+            )
+            translation_failed = translator.stats["failed"] > 0
+            if translation_failed:
+                logger.warning(f"翻译失败，产品 {product.code} 保留原文")
 
         # 创建Listing
         with transaction.atomic():
@@ -324,7 +281,11 @@ def create_listing_task(
                 updated_by=product.updated_by,
             )
 
-        return {"listing_id": listing.id, "status": "created"}
+        return {
+            "listing_id": listing.id,
+            "status": "created",
+            "translation_failed": translation_failed,
+        }
 
     except Exception as e:
         self.retry(exc=e, countdown=3)
@@ -0,0 +1,49 @@
+"""
+采集适配器测试
+"""
+
+import asyncio
+from unittest import mock
+
+from collect.adapters.base import BaseCollectAdapter
+from collect.exceptions import CollectException, NetworkException
+from core.services.retry_manager import CircuitOpenError, DeadlineExceeded
+from django.test import SimpleTestCase
+
+
+class FakeCollectAdapter(BaseCollectAdapter):
+    def collect_item(self, item_url):
+        return {"item_url": item_url}
+
+
+class CollectItemAsyncTest(SimpleTestCase):
+    """异步采集的时间预算和熔断异常转换为采集异常"""
+
+    def setUp(self):
+        config = mock.Mock(
+            api_key="key",
+            api_secret="secret",
+            api_url="https://api.example.com",
+            platform_name="测试平台",
+            platform_code="test",
+        )
+        self.adapter = FakeCollectAdapter(config)
+
+    def collect(self, error):
+        execute = mock.AsyncMock(side_effect=error)
+        with mock.patch.object(self.adapter.retry_manager, "execute_with_deadline", execute):
+            return asyncio.run(self.adapter.collect_item_async("https://item.example.com/1"))
+
+    def test_deadline_and_open_breaker_raise_collect_exception(self):
+        for error in (DeadlineExceeded("超过时间预算"), CircuitOpenError("test", 30)):
+            with self.subTest(error=type(error).__name__):
+                with self.assertRaises(NetworkException) as raised:
+                    self.collect(error)
+                self.assertIsInstance(raised.exception, CollectException)
+                self.assertIs(raised.exception.__cause__, error)
+
+    def test_success(self):
+        self.assertEqual(
+            asyncio.run(self.adapter.collect_item_async("https://item.example.com/1")),
+            {"item_url": "https://item.example.com/1"},
+        )
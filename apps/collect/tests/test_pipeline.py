@@ -0,0 +1,177 @@
+"""
+采集落地流水线测试
+"""
+
+from unittest import mock
+
+from collect.exceptions import DataParseException, ProductCreateException
+from collect.models import CollectItem, CollectTask
+from collect.pipeline import CollectLandPipeline
+from collect.services import ImageDownloader
+from collect.tasks import generate_erp_skus
+from core.models import MediaBlob, Platform
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import TestCase
+from products.models import Product
+
+User = get_user_model()
+
+
+class FakeAdapter:
+    """按链接返回预置数据的采集适配器"""
+
+    def collect_item(self, item_url):
+        if "bad" in item_url:
+            raise DataParseException(f"无法从链接中提取商品ID: {item_url}")
+        item_id = item_url.rsplit("=", 1)[-1]
+        return {
+            "product_name": f"商品{item_id}",
+            "price": 10,
+            "source_sku": item_id,
+            "images": [
+                f"https://img.example.com/{item_id}.jpg",
+                "https://img.example.com/shared.jpg",
+            ],
+        }
+
+
+class CollectLandPipelineTest(TestCase):
+    """采集落地流水线测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.platform = Platform.objects.create(
+            platform_name="淘宝",
+            platform_code="taobao",
+            platform_type="collect",
+            created_by=self.user,
+        )
+        self.collect_task = CollectTask.objects.create(
+            task_name="测试采集",
+            collect_platform="taobao",
+            platform=self.platform,
+            collect_urls="",
+            created_by=self.user,
+        )
+
+    def _pipeline(self, **kwargs):
+        return CollectLandPipeline(self.collect_task, adapter=FakeAdapter(), **kwargs)
+
+    @staticmethod
+    def _fake_fetch_many(urls, workers=None):
+        blobs = {}
+        for url in urls:
+            name = url.rsplit("/", 1)[-1]
+            blobs[url], _ = MediaBlob.objects.get_or_create(sha256=name, path=name)
+        return blobs
+
+    def test_run_lands_products_in_batches(self):
+        """批量落地产品和采集子项，进度计数原子累加"""
+        urls = [f"https://item.taobao.com/item.htm?id={i}" for i in range(1, 6)]
+        urls.append("https://item.taobao.com/bad")
+
+        pipeline = self._pipeline(batch_size=4)
+        with mock.patch.object(
+            pipeline.downloader.store, "fetch_many", side_effect=self._fake_fetch_many
+        ) as fetch_many:
+            stats = pipeline.run(urls)
+
+        self.assertEqual(stats, {"success_num": 5, "fail_num": 1})
+        self.assertEqual(fetch_many.call_count, 2)
+        # 落地的产品登记图片引用，共享图片被5个产品引用
+        self.assertEqual(MediaBlob.objects.get(sha256="shared.jpg").ref_count, 5)
+        self.assertEqual(MediaBlob.objects.get(sha256="3.jpg").ref_count, 1)
+
+        self.collect_task.refresh_from_db()
+        self.assertEqual(self.collect_task.success_num, 5)
+        self.assertEqual(self.collect_task.fail_num, 1)
+
+        items = CollectItem.objects.filter(collect_task=self.collect_task)
+        self.assertEqual(items.count(), 6)
+        failed = items.get(collect_status="failed")
+        self.assertIn("采集失败", failed.land_error)
+
+        landed = items.get(item_sku="3")
+        self.assertEqual(landed.land_status, "success")
+        self.assertEqual(landed.product.name, "商品3")
+        self.assertTrue(landed.product.code.startswith("TAOBAO_3_"))
+        self.assertEqual(landed.product.main_image.name, "/media/3.jpg")
+        self.assertEqual(Product.objects.count(), 5)
+
+    def _run_with_fake_images(self, urls):
+        pipeline = self._pipeline()
+        with mock.patch.object(
+            pipeline.downloader.store, "fetch_many", side_effect=self._fake_fetch_many
+        ):
+            return pipeline.run(urls)
+
+    def test_sku_generation_failure_fails_only_that_item(self):
+        """批量生成SKU失败时逐条生成，只有生成失败的商品落地失败"""
+
+        def generate(platform_code, source_skus):
+            if len(source_skus) > 1 or source_skus[0] == "2":
+                raise ProductCreateException("生成ERP SKU失败：编码冲突次数过多")
+            return [f"TAOBAO_{source_skus[0]}_abcdef"]
+
+        urls = [f"https://item.taobao.com/item.htm?id={i}" for i in range(1, 4)]
+        with mock.patch("collect.pipeline.generate_erp_skus", side_effect=generate):
+            stats = self._run_with_fake_images(urls)
+
+        self.assertEqual(stats, {"success_num": 2, "fail_num": 1})
+        failed = CollectItem.objects.get(item_sku="2")
+        self.assertEqual(failed.land_status, "failed")
+        self.assertIn("编码冲突", failed.land_error)
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_item_write_failure_isolated_in_fallback(self):
+        """逐条落地时采集子项写入失败，只回滚该商品的产品，其余商品正常落地"""
+        original_save = CollectItem.save
+
+        def save(item, *args, **kwargs):
+            if item.item_sku == "2" and item.land_status == "success":
+                raise IntegrityError("采集子项写入失败")
+            return original_save(item, *args, **kwargs)
+
+        urls = [f"https://item.taobao.com/item.htm?id={i}" for i in range(1, 4)]
+        with mock.patch.object(
+            Product.objects, "bulk_create", side_effect=IntegrityError("批量写入失败")
+        ), mock.patch.object(CollectItem, "save", autospec=True, side_effect=save):
+            stats = self._run_with_fake_images(urls)
+
+        self.assertEqual(stats, {"success_num": 2, "fail_num": 1})
+        failed = CollectItem.objects.get(item_sku="2")
+        self.assertEqual(failed.land_status, "failed")
+        self.assertIsNone(failed.product_id)
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertFalse(Product.objects.filter(name="商品2").exists())
+
+    def test_image_downloader_acquires_downloaded_images(self):
+        """单独下载的图片登记引用，不会被垃圾回收"""
+        downloader = ImageDownloader()
+        blob = MediaBlob.objects.create(sha256="a.jpg", path="a.jpg")
+
+        with mock.patch.object(downloader.store, "fetch", return_value=blob):
+            downloader.download_image("https://img.example.com/a.jpg")
+            downloader.download_image("https://img.example.com/a.jpg", owner="products.Product:1")
+
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(downloader.store.references(ImageDownloader.DEFAULT_OWNER), [blob])
+
+    def test_generate_erp_skus_avoids_existing_codes(self):
+        """批量生成的SKU互不重复且不与已有产品冲突"""
+        Product.objects.create(code="TAOBAO_1_aaaaaa", name="已有")
+
+        with mock.patch(
+            "uuid.uuid4",
+            side_effect=[
+                mock.Mock(hex="aaaaaa"),
+                mock.Mock(hex="aaaaaa"),
+                mock.Mock(hex="bbbbbb"),
+                mock.Mock(hex="cccccc"),
+            ],
+        ):
+            skus = generate_erp_skus("taobao", ["1", "1"])
+
+        self.assertEqual(skus, ["TAOBAO_1_bbbbbb", "TAOBAO_1_cccccc"])
@@ -0,0 +1,165 @@
+"""
+翻译记忆与批量翻译测试
+"""
+
+from unittest import mock
+
+from collect.exceptions import TranslationException
+from collect.models import TranslationMemory
+from collect.services import BaiduTranslator, BatchTranslator, StubTranslator
+from collect.services.translator import translate_products_data
+from django.test import TestCase
+
+
+class FailingTranslator(StubTranslator):
+    """含 "bad" 的批次翻译失败"""
+
+    def translate_batch(self, texts, target_language, source_language="auto"):
+        if any("bad" in text for text in texts):
+            raise TranslationException(texts[0], target_language, "接口错误")
+        return super().translate_batch(texts, target_language, source_language)
+
+
+class BatchTranslatorTest(TestCase):
+    """批量翻译测试"""
+
+    def setUp(self):
+        BatchTranslator.clear_l1()
+        self.stub = StubTranslator()
+        self.stub.max_batch_segments = 3
+        self.stub.max_batch_chars = 10
+
+    def tearDown(self):
+        BatchTranslator.clear_l1()
+
+    def test_pack_respects_segment_and_char_limits(self):
+        """按条数和字符数分组，超长文本单独成组"""
+        translator = BatchTranslator(translator=self.stub)
+        batches = translator.pack(["a", "b", "c", "d", "eeeeeeee", "ffff", "g" * 20, "h"])
+        self.assertEqual(batches, [["a", "b", "c"], ["d", "eeeeeeee"], ["ffff"], ["g" * 20], ["h"]])
+
+    def test_translation_memory_hits(self):
+        """重复文本只翻译一次，之后依次命中 L1 缓存和翻译记忆表"""
+        texts = ["标题", "描述", "标题", "", "规格"]
+        translator = BatchTranslator(translator=self.stub, translator_type="stub")
+        result = translator.translate_many(texts, "en", "zh")
+
+        self.assertEqual(result, ["[en] 标题", "[en] 描述", "[en] 标题", "", "[en] 规格"])
+        self.assertEqual(self.stub.request_count, 1)
+        self.assertEqual(TranslationMemory.objects.count(), 3)
+        self.assertEqual(translator.stats["translated"], 3)
+
+        translator = BatchTranslator(translator=self.stub)
+        self.assertEqual(translator.translate_many(["标题", "新文本"], "en", "zh")[0], "[en] 标题")
+        self.assertEqual(translator.stats["l1_hits"], 1)
+        self.assertEqual(self.stub.request_count, 2)
+
+        # 模拟新进程：L1 为空时一次查询命中翻译记忆表
+        BatchTranslator.clear_l1()
+        translator = BatchTranslator(translator=self.stub)
+        with self.assertNumQueries(1):
+            result = translator.translate_many(["标题", "描述", "新文本"], "en", "zh")
+        self.assertEqual(result, ["[en] 标题", "[en] 描述", "[en] 新文本"])
+        self.assertEqual(translator.stats["db_hits"], 3)
+        self.assertEqual(self.stub.request_count, 2)
+
+        # 语言对不同不命中
+        BatchTranslator(translator=self.stub).translate_many(["标题"], "ja", "zh")
+        self.assertEqual(self.stub.request_count, 3)
+
+    def test_failed_batch_falls_back_to_source(self):
+        """失败批次返回原文，不写入翻译记忆"""
+        failing = FailingTranslator()
+        failing.max_batch_segments = 2
+        translator = BatchTranslator(translator=failing, workers=2)
+
+        result = translator.translate_many(["a", "bad", "c", "d"], "en")
+
+        self.assertEqual(result, ["a", "bad", "[en] c", "[en] d"])
+        self.assertEqual(translator.stats["failed"], 2)
+        self.assertEqual(
+            sorted(TranslationMemory.objects.values_list("source_text", flat=True)), ["c", "d"]
+        )
+
+    def test_translate_products_data(self):
+        """多个产品的字段合并翻译"""
+        products = [
+            {"product_name": "杯子", "description": "好用", "specifications": {"颜色": "红"}},
+            {"product_name": "杯子", "listing_title": ""},
+        ]
+        result = translate_products_data(products, "en", translator=self.stub)
+
+        self.assertEqual(result[0]["product_name_translated"], "[en] 杯子")
+        self.assertEqual(result[0]["description_translated"], "[en] 好用")
+        self.assertNotIn("specifications_translated", result[0])
+        self.assertEqual(result[1]["product_name_translated"], "[en] 杯子")
+        self.assertNotIn("product_name_translated", products[0])
+        self.assertEqual(self.stub.request_count, 1)
+
+
+class CreateListingTranslationTest(TestCase):
+    """创建Listing时的翻译结果"""
+
+    def setUp(self):
+        BatchTranslator.clear_l1()
+
+    def tearDown(self):
+        BatchTranslator.clear_l1()
+
+    def _create_listing(self, translator):
+        from collect import tasks
+
+        product = mock.Mock(code="P1", description="好用", main_image=None, selling_price=10)
+        product.name = "bad 杯子"
+        listing_model = mock.Mock()
+        listing_model.objects.filter.return_value.first.return_value = None
+        listing_model.objects.create.return_value.id = 1
+        with mock.patch.object(tasks, "Product") as product_model, mock.patch.object(
+            tasks, "Platform"
+        ), mock.patch.object(tasks, "Shop"), mock.patch.object(
+            tasks, "ProductListing", listing_model
+        ), mock.patch(
+            "collect.services.translation_memory.TranslatorFactory.get_translator",
+            return_value=translator,
+        ):
+            product_model.objects.get.return_value = product
+            result = tasks.create_listing_task.apply(args=(1, 1, 1), kwargs={"translate": True})
+        return result.get(), listing_model.objects.create.call_args.kwargs
+
+    def test_translation_failure_is_flagged(self):
+        """翻译失败时保留原文、记录警告并在任务结果中标记"""
+        with self.assertLogs("collect.tasks", "WARNING") as logs:
+            result, created = self._create_listing(FailingTranslator())
+
+        self.assertIn("翻译失败，产品 P1 保留原文", logs.output[0])
+
+        self.assertTrue(result["translation_failed"])
+        self.assertEqual(created["title"], "bad 杯子")
+        self.assertEqual(created["description"], "好用")
+
+    def test_translated_listing(self):
+        result, created = self._create_listing(StubTranslator())
+
+        self.assertFalse(result["translation_failed"])
+        self.assertEqual(created["title"], "[en] bad 杯子")
+
+
+class BaiduTranslatorBatchTest(TestCase):
+    """百度翻译批量请求测试"""
+
+    def test_multiline_texts_packed_into_one_request(self):
+        """多条文本按行拼接为一次请求，空行原样保留"""
+        response = mock.Mock()
+        response.json.return_value = {
+            "trans_result": [
+                {"src": s, "dst": d} for s, d in [("一", "one"), ("二", "two"), ("三", "three")]
+            ]
+        }
+        translator = BaiduTranslator(app_id="app", secret_key="secret")
+
+        with mock.patch("collect.services.translator.requests.post", return_value=response) as post:
+            result = translator.translate_batch(["一", "二\n\n三"], "en", "zh")
+
+        self.assertEqual(result, ["one", "two\n\nthree"])
+        post.assert_called_once()
+        self.assertEqual(post.call_args.kwargs["data"]["q"], "一\n二\n三")
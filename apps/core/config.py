@@ -90,6 +90,14 @@ DEFAULT_RATE_LIMIT = {
     "burst": 10,
 }
 
+# 进程本地令牌租约：每次从Redis全局桶批量租用令牌，本地消耗
+RATE_LIMIT_LEASE_CONFIG = {
+    "lease_fraction": 0.25,  # 每次租用桶容量的比例（至少1个令牌）
+    "lease_ttl": 1.0,  # 租约有效期（秒），过期未用完的令牌归还全局桶
+    "fallback_share": 0.25,  # Redis不可用时本地桶按该比例的速率和容量限流
+    "fallback_retry": 5,  # Redis不可用后多久重试（秒）
+}
+
 
 # ============================================
 # 重试配置
@@ -114,6 +122,24 @@ RETRY_CONFIG = {
         "invalid_request",
         "not_found",
     ],
+    # 重试预算（同 gRPC retryThrottling）：失败扣1个令牌，成功补 token_ratio 个，
+    # 令牌不超过 max_tokens 的一半时停止重试和对冲，防止重试风暴
+    "retry_budget": {
+        "max_tokens": 10,
+        "token_ratio": 0.1,
+    },
+    # 对冲请求：幂等请求超过近期延迟分位数仍未返回时再发一个请求
+    "hedging": {
+        "percentile": 95,
+        "min_samples": 20,  # 样本不足时不对冲
+        "sample_size": 200,  # 每个端点保留的最近延迟样本数
+    },
+    # 熔断器（状态保存在Redis，所有进程共享）
+    "circuit_breaker": {
+        "failure_threshold": 5,  # 窗口内连续失败次数达到阈值后打开
+        "window": 60,  # 失败计数窗口（秒）
+        "open_seconds": 30,  # 打开后多久放行一个探测请求（秒）
+    },
 }
 
 
@@ -240,6 +266,9 @@ MONITOR_CONFIG = {
             "enabled": True,
             "window_size": 60,  # 异常检测窗口大小（分钟）
             "threshold_factor": 3.0,  # 异常阈值因子
+            "ewma_span": 60,  # 滑动统计的等效样本数（EWMA 系数 2/(span+1)）
+            "min_samples": 10,  # 样本数不足时不判断异常
+            "history_hours": 24,  # 指标历史保留时间（小时）
         },
         "alert_correlation": {
             "enabled": True,
@@ -370,6 +399,7 @@ DISTRIBUTED_LOCK_CONFIG = {
     "auto_renewal": True,  # 自动续期
     "renewal_interval": 10,  # 续期间隔（秒）
     "max_lock_time": 300,  # 最大锁持有时长（秒）
+    "wait_slice": 1.0,  # 等待者单次阻塞上限（秒），超时后重试并刷新排队心跳
 }
 
 
@@ -0,0 +1,143 @@
+"""
+分布式锁竞争基准
+
+多个线程争用同一把锁，对比固定间隔轮询（原实现：SET NX + 100ms 休眠）与
+排队唤醒（DistributedLock）的交接延迟和每次获取锁的 Redis 命令数。
+
+运行方式：python manage.py benchmark_distributed_lock --workers 8 --rounds 10 --hold-ms 5
+"""
+
+import threading
+import time
+import uuid
+from statistics import median
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.services.distributed_lock import DistributedLock
+from apps.core.utils.redis_client import get_redis_client
+
+
+class CommandCounter:
+    """统计客户端发出的 Redis 命令数（包装 execute_command）"""
+
+    def __init__(self, client):
+        self.count = 0
+        self._lock = threading.Lock()
+        execute_command = client.execute_command
+
+        def counted(*args, **kwargs):
+            with self._lock:
+                self.count += 1
+            return execute_command(*args, **kwargs)
+
+        client.execute_command = counted
+        self.client = client
+
+    def detach(self):
+        del self.client.execute_command
+
+
+def percentile(values, p: float) -> float:
+    """已排序列表的分位数"""
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def spin_acquire(client, key: str, ttl: int = 30) -> str:
+    """原实现：键存在时固定休眠 100ms 后重试"""
+    value = uuid.uuid4().hex
+    while not client.set(key, value, nx=True, ex=ttl):
+        time.sleep(0.1)
+    return value
+
+
+def spin_release(client, key: str, value: str):
+    if client.get(key) in (value, value.encode()):
+        client.delete(key)
+
+
+class Command(BaseCommand):
+    help = "分布式锁竞争基准：交接延迟与每次获取的 Redis 命令数"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="并发线程数")
+        parser.add_argument("--rounds", type=int, default=10, help="每个线程获取锁的次数")
+        parser.add_argument("--hold-ms", type=float, default=5, help="每次持有锁的时间（毫秒）")
+        parser.add_argument("--fake", action="store_true", help="使用 fakeredis（需安装 lupa 以支持 Lua）")
+
+    def handle(self, *args, **options):
+        if options["fake"]:
+            import fakeredis
+
+            client = fakeredis.FakeRedis()
+        else:
+            client = get_redis_client()
+        if client is None:
+            raise CommandError("未配置Redis，可使用 --fake 运行")
+
+        self.stdout.write(
+            f"{options['workers']} 个线程 × {options['rounds']} 次，持有 {options['hold_ms']}ms"
+        )
+        for name, runner in (("轮询", self._run_spin), ("排队唤醒", self._run_handoff)):
+            counter = CommandCounter(client)
+            key = f"benchmark:{uuid.uuid4().hex[:8]}"
+            started = time.perf_counter()
+            events = self._contend(runner, client, key, options)
+            elapsed = time.perf_counter() - started
+            counter.detach()
+
+            # 交接延迟：每次获取距上一次释放的时间；等待时间：发起获取到获取成功
+            events.sort(key=lambda event: event[1])
+            handoffs = sorted(
+                (current[1] - previous[2]) * 1000 for previous, current in zip(events, events[1:])
+            )
+            waits = sorted((acquired - requested) * 1000 for requested, acquired, _ in events)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{name}: 总耗时 {elapsed:.2f}s，"
+                    f"交接延迟 中位数 {median(handoffs):.1f}ms / P95 {percentile(handoffs, 0.95):.1f}ms，"
+                    f"等待 P95 {percentile(waits, 0.95):.1f}ms / 最大 {waits[-1]:.1f}ms，"
+                    f"每次获取 {counter.count / len(events):.1f} 条 Redis 命令"
+                )
+            )
+
+    @staticmethod
+    def _contend(runner, client, key, options):
+        """并发争用，返回 [(发起时间, 获取时间, 释放时间), ...]"""
+        events = []
+        events_lock = threading.Lock()
+        hold = options["hold_ms"] / 1000
+
+        def worker():
+            for _ in range(options["rounds"]):
+                event = runner(client, key, hold)
+                with events_lock:
+                    events.append(event)
+
+        threads = [threading.Thread(target=worker) for _ in range(options["workers"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return events
+
+    @staticmethod
+    def _run_spin(client, key, hold):
+        requested = time.perf_counter()
+        value = spin_acquire(client, key)
+        acquired = time.perf_counter()
+        time.sleep(hold)
+        released = time.perf_counter()
+        spin_release(client, key, value)
+        return requested, acquired, released
+
+    @staticmethod
+    def _run_handoff(client, key, hold):
+        requested = time.perf_counter()
+        lock = DistributedLock(key, redis_client=client, auto_renewal=False)
+        lock.acquire_sync()
+        acquired = time.perf_counter()
+        time.sleep(hold)
+        released = time.perf_counter()
+        lock.release_sync()
+        return requested, acquired, released
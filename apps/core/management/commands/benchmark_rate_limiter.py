@@ -0,0 +1,90 @@
+"""
+限流器 Redis 开销基准
+
+多个限流器实例（模拟多个进程）共享同一个全局令牌桶，各自发起调用，
+对比逐个令牌访问Redis（原实现，相当于租约大小为1）与批量租用令牌的
+每 1000 次调用 Redis 命令数，以及实际通过速率与配置速率的偏差。
+
+运行方式：python manage.py benchmark_rate_limiter --processes 4 --calls 1000 --rate 2000 --call-ms 4
+"""
+
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.services.rate_limiter import RateLimiter
+from apps.core.utils.redis_client import get_redis_client
+
+from .benchmark_distributed_lock import CommandCounter
+
+
+class Command(BaseCommand):
+    help = "限流器基准：每 1000 次调用的 Redis 命令数（逐令牌 vs 批量租约）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=4, help="限流器实例数（模拟进程数）")
+        parser.add_argument("--calls", type=int, default=1000, help="每个实例的调用次数")
+        parser.add_argument("--rate", type=int, default=2000, help="全局速率（令牌/秒）")
+        parser.add_argument("--burst", type=int, default=200, help="全局桶容量")
+        parser.add_argument("--call-ms", type=float, default=4, help="每次调用的模拟接口耗时（毫秒，0为持续满负荷）")
+        parser.add_argument("--fake", action="store_true", help="使用 fakeredis（需安装 lupa 以支持 Lua）")
+
+    def handle(self, *args, **options):
+        if options["fake"]:
+            import fakeredis
+
+            client = fakeredis.FakeRedis()
+        else:
+            client = get_redis_client()
+        if client is None:
+            raise CommandError("未配置Redis，可使用 --fake 运行")
+
+        total = options["processes"] * options["calls"]
+        self.stdout.write(
+            f"{options['processes']} 个实例 × {options['calls']} 次调用，"
+            f"全局速率 {options['rate']}/s，容量 {options['burst']}，接口耗时 {options['call_ms']}ms"
+        )
+        for name, lease_tokens in (("逐令牌", 1), ("批量租约", None)):
+            platform = f"benchmark_{uuid.uuid4().hex[:8]}"
+            limiters = []
+            for _ in range(options["processes"]):
+                limiter = RateLimiter(
+                    platform, rate=options["rate"], burst=options["burst"], redis_client=client
+                )
+                if lease_tokens:
+                    limiter.lease_tokens = lease_tokens
+                limiters.append(limiter)
+
+            counter = CommandCounter(client)
+            started = time.perf_counter()
+            threads = [
+                threading.Thread(
+                    target=self._call, args=(limiter, options["calls"], options["call_ms"] / 1000)
+                )
+                for limiter in limiters
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            counter.detach()
+
+            # 超出初始容量的部分按配置速率计算理论耗时
+            expected = max(total - options["burst"], 0) / options["rate"]
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{name}（每次租用 {limiters[0].lease_tokens} 个）: "
+                    f"每 1000 次调用 {counter.count * 1000 / total:.0f} 条 Redis 命令，"
+                    f"耗时 {elapsed:.2f}s（按配置速率至少 {expected:.2f}s）"
+                )
+            )
+
+    @staticmethod
+    def _call(limiter, calls, call_seconds):
+        for _ in range(calls):
+            limiter.acquire_sync(timeout=10)
+            if call_seconds:
+                time.sleep(call_seconds)
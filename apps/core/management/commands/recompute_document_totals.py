@@ -0,0 +1,181 @@
+"""
+批量重算单据金额
+
+税率或折扣调整后，按块重算受影响单据的小计、税额、总金额：
+每块一次查询（明细小计以 SUM 子查询注解），用模型的 calculate_totals 计算，
+只 bulk_update 金额有变化的单据。
+
+默认只重算尚未审核的单据（草稿/待审核等）：已审核单据的金额已计入应收/应付，
+重算会使其与账款不一致，需要时用 --include-approved 显式包含。
+已取消、已拒绝等未入账的关闭状态不默认重算，可用 --status 指定。
+
+运行方式：
+    python manage.py recompute_document_totals --documents sales_order quote --tax-rate 13
+    python manage.py recompute_document_totals --documents purchase_order --since 2026-01-01
+    python manage.py recompute_document_totals --include-approved --dry-run
+"""
+
+from decimal import Decimal
+
+from core.signals import bump_version
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+# 单据类型 -> (模型, 日期字段, 明细过滤条件, 重算的金额字段, 默认重算的未审核状态,
+#             未入账的关闭状态)
+DOCUMENTS = {
+    "sales_order": (
+        "sales.SalesOrder",
+        "order_date",
+        {},
+        ["subtotal", "discount_amount", "tax_amount", "total_amount"],
+        ["draft", "pending"],
+        ["cancelled"],
+    ),
+    "quote": (
+        "sales.Quote",
+        "quote_date",
+        {},
+        ["subtotal", "tax_amount", "total_amount", "total_amount_cny"],
+        ["draft", "sent"],
+        ["rejected", "expired"],
+    ),
+    "purchase_order": (
+        "purchase.PurchaseOrder",
+        "order_date",
+        {"is_deleted": False},
+        ["subtotal", "tax_amount", "discount_amount", "total_amount"],
+        ["draft"],
+        ["cancelled"],
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = "按明细批量重算单据金额（税率、折扣调整后使用）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--documents",
+            nargs="+",
+            choices=list(DOCUMENTS),
+            default=list(DOCUMENTS),
+            help="单据类型（默认全部）",
+        )
+        parser.add_argument("--tax-rate", type=Decimal, help="只重算该税率(%)的单据")
+        parser.add_argument("--discounted", action="store_true", help="只重算有整单折扣的单据")
+        parser.add_argument("--since", help="只重算该日期（YYYY-MM-DD）之后的单据")
+        parser.add_argument("--status", nargs="+", help="只重算这些状态的单据（默认未审核状态）")
+        parser.add_argument(
+            "--include-approved",
+            action="store_true",
+            help="包含已审核单据（其金额已计入应收/应付，重算后需核对账款）",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500, help="每个事务处理的单据数")
+        parser.add_argument("--dry-run", action="store_true", help="只统计需要更新的单据，不写入")
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = parse_date(options["since"])
+            if since is None:
+                raise CommandError(f"日期格式错误: {options['since']}")
+
+        for key in options["documents"]:
+            model_label, date_field, item_filters, fields, open_statuses, closed = DOCUMENTS[key]
+            model = apps.get_model(model_label)
+            statuses = options["status"] or (None if options["include_approved"] else open_statuses)
+
+            choices = {value for value, _ in model._meta.get_field("status").choices}
+            unknown = set(statuses or []) - choices
+            if unknown:
+                raise CommandError(
+                    f"{model._meta.verbose_name}没有状态 {', '.join(sorted(unknown))}，"
+                    f"可选: {', '.join(sorted(choices))}"
+                )
+            approved = set(statuses or []) - set(open_statuses) - set(closed)
+            if approved and not options["include_approved"]:
+                raise CommandError(
+                    f"{model._meta.verbose_name}状态 {', '.join(sorted(approved))} 已审核，"
+                    f"金额已计入账款，需要重算请加 --include-approved"
+                )
+
+            queryset = model.objects.filter(is_deleted=False)
+            if options["tax_rate"] is not None:
+                queryset = queryset.filter(tax_rate=options["tax_rate"])
+            if options["discounted"]:
+                queryset = queryset.filter(Q(discount_rate__gt=0) | Q(discount_amount__gt=0))
+            if since:
+                queryset = queryset.filter(**{f"{date_field}__gte": since})
+            if statuses:
+                queryset = queryset.filter(status__in=statuses)
+
+            checked, changed = self._recompute(
+                model, queryset, item_filters, fields, options["chunk_size"], options["dry_run"]
+            )
+            action = "需要更新" if options["dry_run"] else "已更新"
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{model._meta.verbose_name}: 检查 {checked} 张，{action} {changed} 张"
+                )
+            )
+
+    @staticmethod
+    def _annotate_subtotal(model, queryset, item_filters):
+        """以 SUM 子查询注解每张单据的明细小计"""
+        relation = model._meta.get_field("items")
+        parent_field = relation.field.name
+        item_totals = (
+            relation.related_model.objects.filter(**{parent_field: OuterRef("pk")}, **item_filters)
+            .order_by()
+            .values(parent_field)
+            .annotate(total=Sum("line_total"))
+            .values("total")
+        )
+        output = DecimalField(max_digits=14, decimal_places=2)
+        return queryset.annotate(
+            items_subtotal=Coalesce(
+                Subquery(item_totals, output_field=output), Value(Decimal("0")), output_field=output
+            )
+        )
+
+    def _recompute(self, model, queryset, item_filters, fields, chunk_size, dry_run):
+        queryset = self._annotate_subtotal(model, queryset, item_filters).order_by("pk")
+        places = {name: model._meta.get_field(name).decimal_places for name in fields}
+
+        checked = changed = 0
+        last_pk = 0
+        while True:
+            documents = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not documents:
+                break
+            last_pk = documents[-1].pk
+            checked += len(documents)
+
+            now = timezone.now()
+            updates = []
+            for document in documents:
+                before = [getattr(document, name) for name in fields]
+                document.calculate_totals(subtotal=document.items_subtotal)
+                after = [
+                    Decimal(getattr(document, name)).quantize(Decimal(1).scaleb(-places[name]))
+                    for name in fields
+                ]
+                if after != before:
+                    for name, value in zip(fields, after):
+                        setattr(document, name, value)
+                    document.updated_at = now
+                    updates.append(document)
+
+            changed += len(updates)
+            if updates and not dry_run:
+                with transaction.atomic():
+                    model.objects.bulk_update(updates, fields + ["updated_at"])
+                    bump_version(model)
+
+        return checked, changed
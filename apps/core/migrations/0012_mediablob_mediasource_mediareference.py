@@ -0,0 +1,159 @@
+# Generated by Django 5.0.9 on 2026-10-19 05:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0011_add_company_description_en"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "sha256",
+                    models.CharField(max_length=64, unique=True, verbose_name="内容哈希"),
+                ),
+                ("path", models.CharField(max_length=255, verbose_name="存储路径")),
+                (
+                    "content_type",
+                    models.CharField(blank=True, max_length=100, verbose_name="MIME类型"),
+                ),
+                (
+                    "size",
+                    models.PositiveIntegerField(default=0, verbose_name="文件大小(字节)"),
+                ),
+                (
+                    "ref_count",
+                    models.PositiveIntegerField(default=0, verbose_name="引用数"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "媒体文件",
+                "verbose_name_plural": "媒体文件",
+                "db_table": "core_media_blob",
+                "indexes": [
+                    models.Index(
+                        fields=["ref_count", "updated_at"],
+                        name="core_media__ref_cou_d0070e_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="MediaSource",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "url_hash",
+                    models.CharField(max_length=64, unique=True, verbose_name="URL哈希"),
+                ),
+                ("url", models.TextField(verbose_name="来源URL")),
+                (
+                    "etag",
+                    models.CharField(blank=True, max_length=255, verbose_name="ETag"),
+                ),
+                (
+                    "last_modified",
+                    models.CharField(blank=True, max_length=64, verbose_name="Last-Modified"),
+                ),
+                (
+                    "checked_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="最后检查时间"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+                (
+                    "blob",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="sources",
+                        to="core.mediablob",
+                        verbose_name="媒体文件",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "媒体来源",
+                "verbose_name_plural": "媒体来源",
+                "db_table": "core_media_source",
+            },
+        ),
+        migrations.CreateModel(
+            name="MediaReference",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.CharField(db_index=True, max_length=100, verbose_name="引用方"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "blob",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="references",
+                        to="core.mediablob",
+                        verbose_name="媒体文件",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "媒体引用",
+                "verbose_name_plural": "媒体引用",
+                "db_table": "core_media_reference",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("blob", "owner"), name="uniq_media_reference_blob_owner"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -498,3 +498,103 @@ class Shop(BaseModel):
 
     def __str__(self):
         return f"{self.shop_name} ({self.platform.platform_name})"
+
+
+# ============================================
+# Media Store Models (内容寻址图片存储)
+# ============================================
+class MediaBlob(models.Model):
+    """
+    按内容哈希存储的媒体文件
+
+    相同内容的图片无论来自哪个URL都只保存一份，ref_count 为引用方数量，
+    为0的文件由垃圾回收任务清理。
+    """
+
+    sha256 = models.CharField("内容哈希", max_length=64, unique=True)
+    path = models.CharField("存储路径", max_length=255)
+    content_type = models.CharField("MIME类型", max_length=100, blank=True)
+    size = models.PositiveIntegerField("文件大小(字节)", default=0)
+    ref_count = models.PositiveIntegerField("引用数", default=0)
+    created_at = models.DateTimeField("创建时间", auto_now_add=True)
+    updated_at = models.DateTimeField("更新时间", auto_now=True)
+
+    class Meta:
+        verbose_name = "媒体文件"
+        verbose_name_plural = "媒体文件"
+        db_table = "core_media_blob"
+        indexes = [
+            models.Index(fields=["ref_count", "updated_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count})"
+
+    @property
+    def url(self):
+        from django.core.files.storage import default_storage
+
+        return default_storage.url(self.path)
+
+
+class MediaSource(models.Model):
+    """
+    媒体来源URL
+
+    记录URL对应的内容以及服务端返回的 ETag/Last-Modified，
+    再次下载时发送条件请求，未变化（304）则直接复用已有文件。
+    """
+
+    url_hash = models.CharField("URL哈希", max_length=64, unique=True)
+    url = models.TextField("来源URL")
+    blob = models.ForeignKey(
+        MediaBlob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="sources",
+        verbose_name="媒体文件",
+    )
+    etag = models.CharField("ETag", max_length=255, blank=True)
+    last_modified = models.CharField("Last-Modified", max_length=64, blank=True)
+    checked_at = models.DateTimeField("最后检查时间", null=True, blank=True)
+    created_at = models.DateTimeField("创建时间", auto_now_add=True)
+    updated_at = models.DateTimeField("更新时间", auto_now=True)
+
+    class Meta:
+        verbose_name = "媒体来源"
+        verbose_name_plural = "媒体来源"
+        db_table = "core_media_source"
+
+    def __str__(self):
+        return self.url[:100]
+
+
+class MediaReference(models.Model):
+    """
+    媒体文件引用
+
+    owner 为引用方标识（如 "products.Product:12"），同一引用方对同一文件只记一次。
+    """
+
+    blob = models.ForeignKey(
+        MediaBlob,
+        on_delete=models.CASCADE,
+        related_name="references",
+        verbose_name="媒体文件",
+    )
+    owner = models.CharField("引用方", max_length=100, db_index=True)
+    created_at = models.DateTimeField("创建时间", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "媒体引用"
+        verbose_name_plural = "媒体引用"
+        db_table = "core_media_reference"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["blob", "owner"], name="uniq_media_reference_blob_owner"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} -> {self.blob_id}"
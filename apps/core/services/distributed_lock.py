@@ -1,38 +1,214 @@
 """
 分布式锁 - 基于Redis实现
-支持锁续期、死锁检测、超时自动释放
+支持锁续期、公平排队、释放即唤醒、防护令牌（fencing token）和读写锁
+
+存储结构（lock_key = distributed_lock:{名称}）：
+- {lock_key}               STRING  写锁（独占）持有者，带过期时间
+- {lock_key}:readers       ZSET    读锁持有者 -> 租约到期时间(ms)
+- {lock_key}:queue         LIST    等待队列（FIFO），元素为 "w:{id}" / "r:{id}"
+- {lock_key}:waiters       ZSET    等待者 -> 心跳截止时间(ms)，等待者失联后被清出队列
+- {lock_key}:fence         STRING  防护令牌计数器，每次获取锁递增
+- {lock_key}:wake:{id}     LIST    唤醒信号，释放锁时向队首等待者推送，等待者 BLPOP 阻塞
+
+获取、释放、取消等待均为单个 Lua 脚本（EVALSHA）原子执行。等待者不再轮询，
+释放锁时直接唤醒队首；持有者崩溃未释放时，等待者在锁过期后醒来重试。
 """
 
 import asyncio
 import logging
 import time
 import uuid
-from typing import Optional, contextmanager
-
-from django.core.cache import cache
+from contextlib import asynccontextmanager, contextmanager
+from typing import List, Optional, Tuple
 
 from ..config import DISTRIBUTED_LOCK_CONFIG
 
 logger = logging.getLogger(__name__)
 
 
+# 公共函数：清理失联的队首等待者、唤醒队首
+_LUA_HELPERS = """
+local function prune_queue(now)
+    while true do
+        local head = redis.call("lindex", KEYS[3], 0)
+        if not head then
+            return
+        end
+        local deadline = tonumber(redis.call("zscore", KEYS[4], head))
+        if deadline and deadline > now then
+            return
+        end
+        redis.call("lpop", KEYS[3])
+        redis.call("zrem", KEYS[4], head)
+    end
+end
+
+local function wake_head(signal_ttl)
+    local head = redis.call("lindex", KEYS[3], 0)
+    if head then
+        local wake_key = KEYS[1] .. ":wake:" .. string.sub(head, 3)
+        redis.call("rpush", wake_key, 1)
+        redis.call("pexpire", wake_key, signal_ttl)
+    end
+    return head
+end
+"""
+
+# KEYS: 锁, 读者, 队列, 等待者, 令牌
+# ARGV: 持有者ID, 模式(w/r), 租约ms, 当前时间ms, 等待心跳截止ms, 未获取时是否排队(1/0), 唤醒信号ms
+# 返回: {防护令牌, 0} 或 {0, 建议等待ms}
+_ACQUIRE_SCRIPT = (
+    _LUA_HELPERS
+    + """
+local owner, mode, now = ARGV[1], ARGV[2], tonumber(ARGV[4])
+local entry = mode .. ":" .. owner
+
+redis.call("zremrangebyscore", KEYS[2], "-inf", now)
+prune_queue(now)
+
+local free = redis.call("exists", KEYS[1]) == 0
+local eligible = true
+if mode == "w" then
+    free = free and redis.call("zcard", KEYS[2]) == 0
+    local head = redis.call("lindex", KEYS[3], 0)
+    eligible = (not head) or head == entry
+else
+    -- 读锁：排在自己前面（未排队时为整个队列）没有写等待者即可进入
+    for _, item in ipairs(redis.call("lrange", KEYS[3], 0, -1)) do
+        if item == entry then
+            break
+        end
+        if string.sub(item, 1, 2) == "w:" then
+            eligible = false
+            break
+        end
+    end
+end
+
+if free and eligible then
+    redis.call("lrem", KEYS[3], 1, entry)
+    redis.call("zrem", KEYS[4], entry)
+    redis.call("del", KEYS[1] .. ":wake:" .. owner)
+    local fence = redis.call("incr", KEYS[5])
+    if mode == "w" then
+        redis.call("set", KEYS[1], owner, "px", ARGV[3])
+    else
+        redis.call("zadd", KEYS[2], now + tonumber(ARGV[3]), owner)
+        if redis.call("pttl", KEYS[2]) < tonumber(ARGV[3]) then
+            redis.call("pexpire", KEYS[2], ARGV[3])
+        end
+        -- 连续排队的读者依次唤醒，批量进入
+        local head = redis.call("lindex", KEYS[3], 0)
+        if head and string.sub(head, 1, 2) == "r:" then
+            wake_head(ARGV[7])
+        end
+    end
+    return {fence, 0}
+end
+
+if ARGV[6] == "1" then
+    if not redis.call("zscore", KEYS[4], entry) then
+        redis.call("rpush", KEYS[3], entry)
+    end
+    redis.call("zadd", KEYS[4], ARGV[5], entry)
+end
+
+-- 建议等待时间：写锁剩余租约，或最早到期的读租约
+local wait = redis.call("pttl", KEYS[1])
+if wait < 0 then
+    local first = redis.call("zrange", KEYS[2], 0, 0, "withscores")
+    wait = first[2] and math.max(tonumber(first[2]) - now, 0) or 0
+end
+return {0, wait}
+"""
+)
+
+# KEYS: 同上；ARGV: 持有者ID, 模式, 当前时间ms, 唤醒信号ms
+_RELEASE_SCRIPT = (
+    _LUA_HELPERS
+    + """
+local owner, mode, now = ARGV[1], ARGV[2], tonumber(ARGV[3])
+local released = 0
+if mode == "w" then
+    if redis.call("get", KEYS[1]) == owner then
+        released = redis.call("del", KEYS[1])
+    end
+else
+    released = redis.call("zrem", KEYS[2], owner)
+    redis.call("zremrangebyscore", KEYS[2], "-inf", now)
+    if redis.call("zcard", KEYS[2]) > 0 then
+        return released
+    end
+end
+prune_queue(now)
+wake_head(ARGV[4])
+return released
+"""
+)
+
+# KEYS: 同上；ARGV: 持有者ID, 模式, 当前时间ms, 唤醒信号ms
+_CANCEL_SCRIPT = (
+    _LUA_HELPERS
+    + """
+local entry = ARGV[2] .. ":" .. ARGV[1]
+local was_head = redis.call("lindex", KEYS[3], 0) == entry
+redis.call("lrem", KEYS[3], 1, entry)
+redis.call("zrem", KEYS[4], entry)
+redis.call("del", KEYS[1] .. ":wake:" .. ARGV[1])
+-- 队首放弃等待且锁空闲时，把唤醒信号传给下一个等待者
+if was_head and redis.call("exists", KEYS[1]) == 0 then
+    prune_queue(tonumber(ARGV[3]))
+    wake_head(ARGV[4])
+end
+return 1
+"""
+)
+
+# KEYS: 同上；ARGV: 持有者ID, 模式, 当前时间ms, 租约ms
+_RENEW_SCRIPT = """
+if ARGV[2] == "w" then
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("pexpire", KEYS[1], ARGV[4])
+    end
+    return 0
+end
+if redis.call("zscore", KEYS[2], ARGV[1]) then
+    redis.call("zadd", KEYS[2], "xx", tonumber(ARGV[3]) + tonumber(ARGV[4]), ARGV[1])
+    if redis.call("pttl", KEYS[2]) < tonumber(ARGV[4]) then
+        redis.call("pexpire", KEYS[2], ARGV[4])
+    end
+    return 1
+end
+return 0
+"""
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
 class DistributedLock:
     """
     Redis分布式锁
 
     实现原理：
-    - 使用 SET key value NX PX timeout 原子操作获取锁
-    - 唯一标识（UUID）防止误删其他客户端的锁
-    - 支持自动续期（防止任务超时导致锁提前释放）
-    - 超时自动释放（防止死锁）
+    - 获取锁为单个 Lua 脚本：锁空闲且自己位于等待队列队首时写入持有者并设置过期时间
+    - 获取失败时进入 FIFO 等待队列，BLPOP 阻塞在自己的唤醒列表上，
+      持有者释放锁时唤醒队首（不再按固定间隔轮询）
+    - 每次获取锁返回单调递增的防护令牌（fence_token），下游写入携带令牌，
+      拒绝比已见令牌更小的写入，防止锁过期后旧持有者的延迟写入覆盖新数据
+    - 唯一标识防止误删其他客户端的锁，超时自动释放防止死锁
 
     优势：
     - 互斥性：同时只有一个客户端能持有锁
-    - 避免死锁：锁超时自动释放
-    - 可重入：支持同一线程多次获取锁
-    - 安全性：唯一标识防止误删
+    - 公平性：按到达顺序获取锁，高竞争下不会饿死
+    - 低延迟：释放后等待者立即被唤醒，每次获取只需常数次 Redis 操作
+    - 安全性：唯一标识防止误删，防护令牌保护下游写入
     """
 
+    # 锁模式：w 独占，r 共享（读锁）
+    MODE = "w"
+
     def __init__(
         self,
         lock_key: str,
@@ -47,18 +223,20 @@ class DistributedLock:
             lock_key: 锁的键名（如 'sync_products:123'）
             ttl: 锁过期时间（秒），默认从配置读取
             auto_renewal: 是否自动续期，默认从配置读取
-            redis_client: Redis客户端（可选）
+            redis_client: Redis客户端（可选，默认使用缓存配置的Redis）
 
         Example:
             >>> lock = DistributedLock('sync_products:123', ttl=30)
             >>> async with lock:
             ...     # 执行需要加锁的操作
-            ...     await sync_products()
+            ...     await sync_products(fence=lock.fence_token)
         """
+        self.name = lock_key
         self.lock_key = f"distributed_lock:{lock_key}"
         self._lock_value = None
         self._locked = False
         self._renewal_task = None
+        self.fence_token = None
 
         # 配置参数
         config = DISTRIBUTED_LOCK_CONFIG
@@ -66,14 +244,40 @@ class DistributedLock:
         self.auto_renewal = auto_renewal if auto_renewal is not None else config["auto_renewal"]
         self.renewal_interval = config["renewal_interval"]
         self.max_lock_time = config["max_lock_time"]
+        self.wait_slice = config.get("wait_slice", 1.0)
 
         # Redis客户端
-        self.redis_client = redis_client or cache
+        if redis_client is None:
+            from ..utils.redis_client import get_redis_client
+
+            redis_client = get_redis_client()
+        if redis_client is None:
+            raise RuntimeError("分布式锁需要Redis，请配置 REDIS_HOST")
+        self.redis_client = redis_client
+
+        self._acquire_script = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._release_script = redis_client.register_script(_RELEASE_SCRIPT)
+        self._cancel_script = redis_client.register_script(_CANCEL_SCRIPT)
+        self._renew_script = redis_client.register_script(_RENEW_SCRIPT)
 
         logger.debug(
             f"初始化分布式锁: key={lock_key}, ttl={self.ttl}, " f"auto_renewal={self.auto_renewal}"
         )
 
+    @property
+    def _keys(self) -> List[str]:
+        return [
+            self.lock_key,
+            f"{self.lock_key}:readers",
+            f"{self.lock_key}:queue",
+            f"{self.lock_key}:waiters",
+            f"{self.lock_key}:fence",
+        ]
+
+    @property
+    def _signal_ttl_ms(self) -> int:
+        return int(self.wait_slice * 3000)
+
     async def __aenter__(self):
         """异步上下文管理器入口"""
         await self.acquire()
@@ -92,6 +296,60 @@ class DistributedLock:
         """同步上下文管理器出口"""
         self.release_sync()
 
+    # ==================== 获取 ====================
+
+    def _try_acquire(self, enqueue: bool) -> Tuple[bool, float]:
+        """
+        尝试获取一次锁
+
+        Returns:
+            tuple: (是否获取成功, 建议等待秒数)
+        """
+        now = _now_ms()
+        fence, wait_ms = self._acquire_script(
+            keys=self._keys,
+            args=[
+                self._lock_value,
+                self.MODE,
+                self.ttl * 1000,
+                now,
+                now + self._signal_ttl_ms,
+                1 if enqueue else 0,
+                self._signal_ttl_ms,
+            ],
+        )
+        if fence:
+            self.fence_token = int(fence)
+            self._locked = True
+            logger.info(f"成功获取锁: {self.lock_key} (fence={self.fence_token})")
+            return True, 0.0
+        return False, int(wait_ms) / 1000
+
+    def _wait_slice(self, wait: float, deadline: Optional[float]) -> Optional[float]:
+        """本次阻塞等待时长，已超时返回 None"""
+        seconds = min(wait or self.wait_slice, self.wait_slice)
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            seconds = min(seconds, remaining)
+        # BLPOP 超时为0表示永久阻塞
+        return max(seconds, 0.01)
+
+    def _wait_for_handoff(self, seconds: float):
+        """阻塞等待释放锁时的唤醒信号（超时后重试，用于持有者崩溃等场景）"""
+        self.redis_client.blpop([f"{self.lock_key}:wake:{self._lock_value}"], timeout=seconds)
+
+    def _cancel_wait(self):
+        """放弃等待：退出队列，必要时把唤醒信号传给下一个等待者"""
+        try:
+            self._cancel_script(
+                keys=self._keys,
+                args=[self._lock_value, self.MODE, _now_ms(), self._signal_ttl_ms],
+            )
+        except Exception as e:
+            logger.error(f"退出锁等待队列失败: {self.lock_key}, error: {e}")
+
     async def acquire(self, timeout: Optional[float] = None) -> bool:
         """
         获取锁（异步版本）
@@ -111,47 +369,30 @@ class DistributedLock:
             >>> # 最多等待5秒
             >>> success = await lock.acquire(timeout=5)
         """
-        start_time = time.time()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._lock_value = uuid.uuid4().hex
 
         while True:
-            # 生成唯一标识
-            self._lock_value = str(uuid.uuid4())
-
             try:
-                # 使用SET NX EX原子操作获取锁
-                acquired = self.redis_client.set(
-                    self.lock_key,
-                    self._lock_value,
-                    nx=True,
-                    ex=self.ttl,  # 仅当键不存在时设置  # 过期时间（秒）
-                )
-
+                acquired, wait = self._try_acquire(enqueue=timeout != 0)
                 if acquired:
-                    self._locked = True
-                    logger.info(f"成功获取锁: {self.lock_key}")
-
                     # 启动自动续期任务
                     if self.auto_renewal:
                         self._start_renewal_task()
-
                     return True
 
-                # 未获取到锁
-                if timeout is not None:
-                    # 检查是否超时
-                    elapsed = time.time() - start_time
-                    if elapsed >= timeout:
-                        logger.warning(f"获取锁超时: {self.lock_key}")
-                        return False
+                seconds = self._wait_slice(wait, deadline)
+                if seconds is None:
+                    logger.warning(f"获取锁超时: {self.lock_key}")
+                    self._cancel_wait()
+                    return False
 
-                    # 等待后重试
-                    await asyncio.sleep(0.1)
-                else:
-                    # 阻塞等待
-                    await asyncio.sleep(0.1)
+                # BLPOP 会阻塞连接，放到线程中等待
+                await asyncio.to_thread(self._wait_for_handoff, seconds)
 
             except Exception as e:
                 logger.error(f"获取锁失败: {self.lock_key}, error: {e}")
+                self._cancel_wait()
                 return False
 
     def acquire_sync(self, timeout: Optional[float] = None) -> bool:
@@ -159,89 +400,55 @@ class DistributedLock:
         获取锁（同步版本）
 
         Args:
-            timeout: 获取锁的超时时间（秒）
+            timeout: 获取锁的超时时间（秒），None表示阻塞等待
 
         Returns:
             bool: 是否成功获取锁
         """
-        start_time = time.time()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._lock_value = uuid.uuid4().hex
 
         while True:
-            self._lock_value = str(uuid.uuid4())
-
             try:
-                acquired = self.redis_client.set(
-                    self.lock_key, self._lock_value, nx=True, ex=self.ttl
-                )
-
+                acquired, wait = self._try_acquire(enqueue=timeout != 0)
                 if acquired:
-                    self._locked = True
-                    logger.info(f"成功获取锁: {self.lock_key}")
                     return True
 
-                if timeout is not None:
-                    elapsed = time.time() - start_time
-                    if elapsed >= timeout:
-                        logger.warning(f"获取锁超时: {self.lock_key}")
-                        return False
+                seconds = self._wait_slice(wait, deadline)
+                if seconds is None:
+                    logger.warning(f"获取锁超时: {self.lock_key}")
+                    self._cancel_wait()
+                    return False
 
-                    time.sleep(0.1)
-                else:
-                    time.sleep(0.1)
+                self._wait_for_handoff(seconds)
 
             except Exception as e:
                 logger.error(f"获取锁失败: {self.lock_key}, error: {e}")
+                self._cancel_wait()
                 return False
 
+    # ==================== 释放 ====================
+
     async def release(self):
         """释放锁（异步版本）"""
-        if not self._locked:
-            logger.warning(f"锁未持有: {self.lock_key}")
-            return
+        # 停止自动续期任务
+        if self._renewal_task:
+            self._renewal_task.cancel()
+            self._renewal_task = None
 
-        try:
-            # 停止自动续期任务
-            if self._renewal_task:
-                self._renewal_task.cancel()
-                self._renewal_task = None
-
-            # 使用Lua脚本确保只删除自己持有的锁
-            lua_script = """
-            if redis.call("get", KEYS[1]) == ARGV[1] then
-                return redis.call("del", KEYS[1])
-            else
-                return 0
-            end
-            """
-
-            result = self.redis_client.eval(lua_script, 1, self.lock_key, self._lock_value)
-
-            if result:
-                logger.info(f"成功释放锁: {self.lock_key}")
-            else:
-                logger.warning(f"锁已被其他人释放或已过期: {self.lock_key}")
-
-        except Exception as e:
-            logger.error(f"释放锁失败: {self.lock_key}, error: {e}")
-        finally:
-            self._locked = False
+        self.release_sync()
 
     def release_sync(self):
-        """释放锁（同步版本）"""
+        """释放锁（同步版本），并唤醒队首等待者"""
         if not self._locked:
             logger.warning(f"锁未持有: {self.lock_key}")
             return
 
         try:
-            lua_script = """
-            if redis.call("get", KEYS[1]) == ARGV[1] then
-                return redis.call("del", KEYS[1])
-            else
-                return 0
-            end
-            """
-
-            result = self.redis_client.eval(lua_script, 1, self.lock_key, self._lock_value)
+            result = self._release_script(
+                keys=self._keys,
+                args=[self._lock_value, self.MODE, _now_ms(), self._signal_ttl_ms],
+            )
 
             if result:
                 logger.info(f"成功释放锁: {self.lock_key}")
@@ -253,6 +460,8 @@ class DistributedLock:
         finally:
             self._locked = False
 
+    # ==================== 续期 ====================
+
     def _start_renewal_task(self):
         """启动自动续期任务"""
 
@@ -271,26 +480,32 @@ class DistributedLock:
 
     async def _renew_lock(self):
         """续期锁"""
+        self.extend()
+
+    def extend(self) -> bool:
+        """
+        续期锁（同步任务处理中定期调用）
+
+        Returns:
+            bool: 是否续期成功（锁已丢失时返回False）
+        """
         try:
-            lua_script = """
-            if redis.call("get", KEYS[1]) == ARGV[1] then
-                return redis.call("expire", KEYS[1], ARGV[2])
-            else
-                return 0
-            end
-            """
-
-            result = self.redis_client.eval(
-                lua_script, 1, self.lock_key, self._lock_value, self.ttl
+            result = self._renew_script(
+                keys=self._keys,
+                args=[self._lock_value, self.MODE, _now_ms(), self.ttl * 1000],
             )
 
             if result:
                 logger.debug(f"锁续期成功: {self.lock_key}")
             else:
                 logger.warning(f"锁续期失败（锁已丢失）: {self.lock_key}")
+            return bool(result)
 
         except Exception as e:
             logger.error(f"锁续期异常: {e}")
+            return False
+
+    # ==================== 状态 ====================
 
     def is_locked(self) -> bool:
         """
@@ -309,14 +524,23 @@ class DistributedLock:
             dict: 锁的状态信息
         """
         try:
-            ttl = self.redis_client.ttl(self.lock_key)
-            value = self.redis_client.get(self.lock_key)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.ttl(self.lock_key)
+            pipe.get(self.lock_key)
+            pipe.zcard(f"{self.lock_key}:readers")
+            pipe.llen(f"{self.lock_key}:queue")
+            ttl, value, readers, waiting = pipe.execute()
+            if isinstance(value, bytes):
+                value = value.decode()
 
             return {
                 "lock_key": self.lock_key,
                 "locked": self._locked,
                 "ttl": ttl,
                 "is_owner": value == self._lock_value if value else False,
+                "fence_token": self.fence_token,
+                "readers": readers,
+                "waiting": waiting,
             }
         except Exception as e:
             logger.error(f"获取锁信息失败: {e}")
@@ -326,6 +550,53 @@ class DistributedLock:
             }
 
 
+class DistributedReadLock(DistributedLock):
+    """
+    分布式读锁（共享）
+
+    多个读者可同时持有；写锁持有或写等待者排在前面时排队等待，
+    避免写者饥饿。与同名的 DistributedLock（写锁）互斥。
+    """
+
+    MODE = "r"
+
+
+class DistributedRWLock:
+    """
+    分布式读写锁
+
+    Example:
+        >>> rw = DistributedRWLock('catalog:shopee')
+        >>> with rw.read_lock():
+        ...     load_catalog()
+        >>> with rw.write_lock() as lock:
+        ...     rebuild_catalog(fence=lock.fence_token)
+    """
+
+    def __init__(self, lock_key: str, ttl: Optional[int] = None, redis_client=None):
+        """
+        Args:
+            lock_key: 锁的键名
+            ttl: 锁过期时间（秒）
+            redis_client: Redis客户端（可选）
+        """
+        self.lock_key = lock_key
+        self.ttl = ttl
+        self.redis_client = redis_client
+
+    def read_lock(self, **kwargs) -> DistributedReadLock:
+        """共享读锁（每次调用返回新的锁对象）"""
+        return DistributedReadLock(
+            self.lock_key, ttl=self.ttl, redis_client=self.redis_client, **kwargs
+        )
+
+    def write_lock(self, **kwargs) -> DistributedLock:
+        """独占写锁（每次调用返回新的锁对象）"""
+        return DistributedLock(
+            self.lock_key, ttl=self.ttl, redis_client=self.redis_client, **kwargs
+        )
+
+
 @contextmanager
 def distributed_lock(lock_key: str, ttl: Optional[int] = None, timeout: Optional[float] = None):
     """
@@ -337,9 +608,9 @@ def distributed_lock(lock_key: str, ttl: Optional[int] = None, timeout: Optional
         timeout: 获取锁的超时时间（秒）
 
     Example:
-        >>> with distributed_lock('sync_products', ttl=30):
+        >>> with distributed_lock('sync_products', ttl=30) as lock:
         ...     # 执行需要加锁的操作
-        ...     sync_products()
+        ...     sync_products(fence=lock.fence_token)
     """
     lock = DistributedLock(lock_key, ttl=ttl)
 
@@ -351,9 +622,11 @@ def distributed_lock(lock_key: str, ttl: Optional[int] = None, timeout: Optional
         yield lock
 
     finally:
-        lock.release_sync()
+        if lock.is_locked():
+            lock.release_sync()
 
 
+@asynccontextmanager
 async def async_distributed_lock(
     lock_key: str, ttl: Optional[int] = None, timeout: Optional[float] = None
 ):
@@ -380,4 +653,5 @@ async def async_distributed_lock(
         yield lock
 
     finally:
-        await lock.release()
+        if lock.is_locked():
+            await lock.release()
@@ -0,0 +1,477 @@
+"""
+内容寻址媒体存储
+按内容哈希去重保存图片，供采集、电商同步等模块共享
+
+功能：
+- 下载时边读边计算 SHA-256，相同内容只存一份
+- 记录来源URL的 ETag/Last-Modified，再次下载发送条件请求
+- 按需生成缩放/WebP衍生图并缓存
+- 按引用方计数，无引用的文件由垃圾回收清理
+"""
+
+import hashlib
+import logging
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from core.models import MediaBlob, MediaReference, MediaSource
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 下载结果：not_modified 为 True 时服务端返回304，其余字段为空
+Download = namedtuple(
+    "Download", ["not_modified", "file", "sha256", "size", "content_type", "etag", "last_modified"]
+)
+
+
+def url_hash(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 64 * 1024) -> str:
+    """分块计算文件 SHA-256，不整体读入内存"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaStore:
+    """内容寻址媒体存储"""
+
+    BLOB_PREFIX = "media_store/blobs"
+    VARIANT_PREFIX = "media_store/variants"
+
+    CHUNK_SIZE = 64 * 1024
+    # 内存中暂存的最大字节数，超过后落到临时文件
+    SPOOL_SIZE = 1024 * 1024
+    # 同一URL在该时间内不再发起请求
+    SOURCE_TTL = timedelta(hours=24)
+    # 无引用文件的保留时间，避免刚下载尚未登记引用的文件被回收
+    GC_GRACE = timedelta(days=1)
+    VARIANT_CACHE_TIMEOUT = 86400
+
+    EXTENSIONS = {
+        "image/jpeg": ".jpg",
+        "image/jpg": ".jpg",
+        "image/png": ".png",
+        "image/gif": ".gif",
+        "image/webp": ".webp",
+        "image/bmp": ".bmp",
+    }
+
+    def __init__(self, session: requests.Session = None, pool_size: int = 10, timeout: int = 30):
+        """
+        初始化媒体存储
+
+        Args:
+            session: 复用调用方的会话（含请求头和连接池），不传则新建
+            pool_size: 新建会话时每个域名的连接池大小
+            timeout: 请求超时（秒）
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"User-Agent": "Mozilla/5.0", "Accept": "image/*"})
+        self.session = session
+
+    # ------------------------------------------------------------------
+    # 下载
+    # ------------------------------------------------------------------
+
+    def fetch(self, url: str) -> MediaBlob:
+        """
+        获取URL对应的媒体文件，必要时下载
+
+        Raises:
+            requests.RequestException: 下载失败
+        """
+        source = self._sources([url]).get(url)
+        if self._is_fresh(source):
+            self._touch([source.blob])
+            return source.blob
+        return self._commit(url, source, self._download(url, source))
+
+    def fetch_many(self, urls: Iterable[str], workers: int = None) -> Dict[str, MediaBlob]:
+        """
+        并发获取多个URL，重复URL只处理一次，失败的URL记录日志后跳过
+
+        并发只用于网络下载和哈希计算，数据库与存储写入在当前线程完成。
+
+        Returns:
+            dict: {URL: MediaBlob}
+        """
+        urls = list(dict.fromkeys(url for url in urls if url))
+        sources = self._sources(urls)
+
+        results = {}
+        pending = []
+        for url in urls:
+            source = sources.get(url)
+            if self._is_fresh(source):
+                results[url] = source.blob
+            else:
+                pending.append(url)
+        self._touch(results.values())
+
+        if not pending:
+            return results
+
+        def download(url):
+            try:
+                return url, self._download(url, sources.get(url))
+            except Exception as e:
+                logger.error(f"图片下载失败: {url}, 错误: {e}")
+                return url, None
+
+        max_workers = max(1, min(workers or self.pool_size, len(pending)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            downloads = list(executor.map(download, pending))
+
+        for url, result in downloads:
+            if result is None:
+                continue
+            try:
+                results[url] = self._commit(url, sources.get(url), result)
+            except Exception as e:
+                logger.error(f"图片保存失败: {url}, 错误: {e}")
+
+        return results
+
+    def put(self, content: bytes, content_type: str = "") -> MediaBlob:
+        """保存已在内存中的内容（如上传文件）"""
+        digest = hashlib.sha256(content).hexdigest()
+        return self._save_blob(digest, ContentFile(content), len(content), content_type)
+
+    def blobs_for_urls(self, urls: Iterable[str]) -> Dict[str, MediaBlob]:
+        """查询已下载URL对应的媒体文件（不发起请求）"""
+        return {url: source.blob for url, source in self._sources(urls).items() if source.blob_id}
+
+    def _sources(self, urls: Iterable[str]) -> Dict[str, MediaSource]:
+        hashes = {url_hash(url): url for url in urls if url}
+        if not hashes:
+            return {}
+        sources = MediaSource.objects.filter(url_hash__in=list(hashes)).select_related("blob")
+        return {hashes[source.url_hash]: source for source in sources}
+
+    def _is_fresh(self, source: Optional[MediaSource]) -> bool:
+        return bool(
+            source
+            and source.blob_id
+            and source.checked_at
+            and timezone.now() - source.checked_at < self.SOURCE_TTL
+        )
+
+    def _download(self, url: str, source: Optional[MediaSource]) -> Download:
+        """流式下载到临时文件，同时计算内容哈希"""
+        headers = {}
+        if source and source.blob_id:
+            if source.etag:
+                headers["If-None-Match"] = source.etag
+            if source.last_modified:
+                headers["If-Modified-Since"] = source.last_modified
+
+        with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304 and headers:
+                return Download(True, None, "", 0, "", source.etag, source.last_modified)
+            response.raise_for_status()
+
+            digest = hashlib.sha256()
+            size = 0
+            tmp = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_SIZE)
+            try:
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            except Exception:
+                tmp.close()
+                raise
+
+            return Download(
+                False,
+                tmp,
+                digest.hexdigest(),
+                size,
+                response.headers.get("content-type", "").split(";")[0].strip().lower(),
+                response.headers.get("ETag", ""),
+                response.headers.get("Last-Modified", ""),
+            )
+
+    def _commit(self, url: str, source: Optional[MediaSource], result: Download) -> MediaBlob:
+        """登记下载结果并更新来源的验证信息"""
+        now = timezone.now()
+        if result.not_modified:
+            MediaSource.objects.filter(pk=source.pk).update(checked_at=now, updated_at=now)
+            self._touch([source.blob])
+            return source.blob
+
+        try:
+            result.file.seek(0)
+            blob = self._save_blob(
+                result.sha256, File(result.file), result.size, result.content_type
+            )
+        finally:
+            result.file.close()
+
+        MediaSource.objects.update_or_create(
+            url_hash=url_hash(url),
+            defaults={
+                "url": url,
+                "blob": blob,
+                "etag": result.etag[:255],
+                "last_modified": result.last_modified[:64],
+                "checked_at": now,
+            },
+        )
+        return blob
+
+    def _save_blob(self, digest: str, file, size: int, content_type: str) -> MediaBlob:
+        blob = MediaBlob.objects.filter(sha256=digest).first()
+        if blob:
+            self._touch([blob])
+            return blob
+
+        path = self.blob_path(digest, content_type)
+        saved = None
+        if not default_storage.exists(path):
+            path = saved = default_storage.save(path, file)
+
+        try:
+            with transaction.atomic():
+                return MediaBlob.objects.create(
+                    sha256=digest, path=path, content_type=content_type, size=size
+                )
+        except IntegrityError:
+            # 并发下载了相同内容，以先登记的为准
+            blob = MediaBlob.objects.get(sha256=digest)
+            if saved and saved != blob.path:
+                default_storage.delete(saved)
+            self._touch([blob])
+            return blob
+
+    @staticmethod
+    def _touch(blobs: Iterable[MediaBlob]):
+        """
+        刷新无引用文件的更新时间
+
+        已有文件（内容相同、未过期或304）再次返回给调用方时，从此刻重新计算保留期，
+        调用方登记引用前不会被垃圾回收。
+        """
+        blob_ids = {blob.pk for blob in blobs}
+        if blob_ids:
+            MediaBlob.objects.filter(pk__in=blob_ids, ref_count=0).update(updated_at=timezone.now())
+
+    def blob_path(self, digest: str, content_type: str = "") -> str:
+        ext = self.EXTENSIONS.get(content_type, ".jpg")
+        return f"{self.BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    @staticmethod
+    def local_path(blob: MediaBlob) -> str:
+        """文件的本地路径；存储后端不支持本地路径（如对象存储）时返回URL"""
+        try:
+            return default_storage.path(blob.path)
+        except NotImplementedError:
+            return blob.url
+
+    # ------------------------------------------------------------------
+    # 衍生图
+    # ------------------------------------------------------------------
+
+    def variant(
+        self,
+        blob: MediaBlob,
+        width: int = None,
+        height: int = None,
+        fmt: str = "webp",
+        quality: int = 80,
+    ) -> str:
+        """
+        获取缩放/转码后的衍生图URL，首次访问时生成
+
+        宽高只给一个时按比例缩放，不会放大原图。生成失败时返回原图URL。
+        """
+        fmt = fmt.lower()
+        name = f"{width or 0}x{height or 0}_q{quality}.{fmt}"
+        cache_key = f"media_variant:{blob.pk}:{name}"
+        url = cache.get(cache_key)
+        if url:
+            return url
+
+        path = f"{self.VARIANT_PREFIX}/{blob.sha256[:2]}/{blob.sha256}/{name}"
+        if not default_storage.exists(path):
+            # 同一衍生图只由一个进程生成
+            lock_key = f"{cache_key}:lock"
+            if not cache.add(lock_key, 1, 60):
+                return blob.url
+            try:
+                default_storage.save(path, self._render(blob, width, height, fmt, quality))
+            except Exception as e:
+                logger.error(f"生成衍生图失败: {blob.sha256} {name}, 错误: {e}")
+                return blob.url
+            finally:
+                cache.delete(lock_key)
+
+        url = default_storage.url(path)
+        cache.set(cache_key, url, self.VARIANT_CACHE_TIMEOUT)
+        return url
+
+    def _render(self, blob: MediaBlob, width, height, fmt: str, quality: int) -> ContentFile:
+        from io import BytesIO
+
+        from PIL import Image
+
+        with default_storage.open(blob.path, "rb") as f:
+            img = Image.open(f)
+            img.load()
+
+        if width or height:
+            img.thumbnail((width or img.width, height or img.height), Image.Resampling.LANCZOS)
+
+        pil_format = {"jpg": "JPEG", "jpeg": "JPEG"}.get(fmt, fmt.upper())
+        if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        buffer = BytesIO()
+        img.save(buffer, pil_format, quality=quality)
+        return ContentFile(buffer.getvalue())
+
+    # ------------------------------------------------------------------
+    # 引用计数
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def owner_key(obj) -> str:
+        """模型实例的引用方标识"""
+        return f"{obj._meta.label}:{obj.pk}"
+
+    def acquire(self, owner: str, blobs: Iterable[MediaBlob]):
+        """登记引用方对文件的引用"""
+        self.acquire_many({owner: blobs})
+
+    def acquire_many(self, refs: Dict[str, Iterable[MediaBlob]]):
+        """批量登记引用，{引用方: [MediaBlob]}"""
+        references = [
+            MediaReference(blob=blob, owner=owner)
+            for owner, blobs in refs.items()
+            for blob in blobs
+        ]
+        if not references:
+            return
+
+        with transaction.atomic():
+            MediaReference.objects.bulk_create(references, ignore_conflicts=True)
+            self._recount({ref.blob_id for ref in references})
+
+    def release(self, owner: str, blobs: Iterable[MediaBlob] = None):
+        """释放引用方的引用，不指定文件时释放全部"""
+        refs = MediaReference.objects.filter(owner=owner)
+        if blobs is not None:
+            refs = refs.filter(blob__in=list(blobs))
+
+        with transaction.atomic():
+            blob_ids = set(refs.values_list("blob_id", flat=True))
+            refs.delete()
+            self._recount(blob_ids)
+
+    def replace(self, owner: str, blobs: Iterable[MediaBlob]):
+        """将引用方的引用替换为给定文件（如重新导入商品图片），保持给定顺序"""
+        blobs = list(blobs)
+
+        with transaction.atomic():
+            refs = MediaReference.objects.filter(owner=owner)
+            blob_ids = set(refs.values_list("blob_id", flat=True))
+            refs.delete()
+            MediaReference.objects.bulk_create(
+                [MediaReference(blob=blob, owner=owner) for blob in blobs],
+                ignore_conflicts=True,
+            )
+            self._recount(blob_ids | {blob.pk for blob in blobs})
+
+    def references(self, owner: str) -> List[MediaBlob]:
+        """引用方引用的文件（按登记顺序）"""
+        refs = MediaReference.objects.filter(owner=owner).select_related("blob").order_by("id")
+        return [ref.blob for ref in refs]
+
+    def _recount(self, blob_ids):
+        """按引用表重算引用数，并发登记/释放也不会累积误差"""
+        if not blob_ids:
+            return
+        counts = (
+            MediaReference.objects.filter(blob=OuterRef("pk"))
+            .order_by()
+            .values("blob")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        MediaBlob.objects.filter(pk__in=list(blob_ids)).update(
+            ref_count=Coalesce(Subquery(counts), Value(0)), updated_at=timezone.now()
+        )
+
+    # ------------------------------------------------------------------
+    # 垃圾回收
+    # ------------------------------------------------------------------
+
+    def collect_garbage(self, grace: timedelta = None, limit: int = 1000) -> int:
+        """
+        删除无引用且超过保留时间的文件及其衍生图
+
+        Returns:
+            int: 删除的文件数
+        """
+        cutoff = timezone.now() - (grace if grace is not None else self.GC_GRACE)
+
+        with transaction.atomic():
+            orphans = list(
+                MediaBlob.objects.select_for_update()
+                .filter(ref_count=0, updated_at__lt=cutoff)
+                .order_by("id")[:limit]
+            )
+            MediaBlob.objects.filter(pk__in=[blob.pk for blob in orphans]).delete()
+
+        for blob in orphans:
+            self._delete_files(blob)
+
+        if orphans:
+            logger.info(f"媒体垃圾回收: 删除 {len(orphans)} 个无引用文件")
+        return len(orphans)
+
+    def _delete_files(self, blob: MediaBlob):
+        variant_dir = f"{self.VARIANT_PREFIX}/{blob.sha256[:2]}/{blob.sha256}"
+        try:
+            default_storage.delete(blob.path)
+            if default_storage.exists(variant_dir):
+                _, files = default_storage.listdir(variant_dir)
+                for name in files:
+                    default_storage.delete(f"{variant_dir}/{name}")
+        except Exception as e:
+            logger.warning(f"删除媒体文件失败: {blob.path}, 错误: {e}")
+
+
+_media_store_instance = None
+
+
+def get_media_store() -> MediaStore:
+    """获取共享的媒体存储实例"""
+    global _media_store_instance
+    if _media_store_instance is None:
+        _media_store_instance = MediaStore()
+    return _media_store_instance
@@ -32,6 +32,8 @@ class MonitorService:
       - total_duration: 总耗时（毫秒）
       - durations: 延迟列表（逗号分隔）
 
+    - metrics:{platform}:resilience:{date} - 哈希表，重试/对冲/熔断等事件计数
+
     - alerts:{platform} - 列表，存储告警记录
     """
 
@@ -155,6 +157,51 @@ class MonitorService:
             self.record_api_call, platform, endpoint, success, duration, error_code
         )
 
+    def record_event(self, platform: str, event: str, count: int = 1):
+        """
+        记录容错事件计数（重试、对冲请求、熔断拒绝等）
+
+        Args:
+            platform: 平台标识
+            event: 事件名称（如 'retry', 'hedge', 'breaker_rejected'）
+            count: 增加的次数
+
+        Example:
+            >>> monitor = MonitorService()
+            >>> monitor.record_event('taobao', 'retry')
+        """
+        try:
+            today = datetime.now().strftime("%Y-%m-%d")
+            key = f"metrics:{platform}:resilience:{today}"
+            self.redis_client.hincrby(key, event, count)
+            self.redis_client.expire(key, self.config["metrics_retention_days"] * 24 * 3600)
+        except Exception as e:
+            logger.error(f"记录容错事件失败: {e}")
+
+    def get_events(self, platform: str, time_range: str = "1d") -> Dict[str, int]:
+        """
+        获取容错事件计数
+
+        Args:
+            platform: 平台标识
+            time_range: 时间范围（'1d', '7d', '30d'）
+
+        Returns:
+            dict: 事件名称 -> 次数
+        """
+        events: Dict[str, int] = {}
+        for i in range(self._parse_time_range(time_range)):
+            date = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
+            try:
+                data = self.redis_client.hgetall(f"metrics:{platform}:resilience:{date}")
+            except Exception as e:
+                logger.error(f"获取容错事件失败: {e}")
+                continue
+            for event, count in data.items():
+                event = event.decode() if isinstance(event, bytes) else event
+                events[event] = events.get(event, 0) + int(count)
+        return events
+
     def get_metrics(
         self, platform: str, endpoint: Optional[str] = None, time_range: str = "1h"
     ) -> Dict:
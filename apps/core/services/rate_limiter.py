@@ -1,20 +1,85 @@
 """
 限流管理器 - 基于令牌桶算法
 支持多平台配额管理、Redis持久化、动态限流调整
+
+分层限流：
+- 全局令牌桶保存在Redis（rate_limiter:{platform}:bucket），所有进程共享
+- 每个进程一次 EVALSHA 从全局桶租用一批令牌，在本地无 I/O 消耗
+- 租约过期（默认1秒）未用完的令牌在下一次租用时归还全局桶
+- Redis不可用时退化为保守的进程内令牌桶（按比例降低速率），而不是放行全部请求
 """
 
 import asyncio
 import logging
+import threading
 import time
-from typing import Dict, Optional
-
-from django.core.cache import cache
+from typing import Dict, Optional, Tuple
 
-from ..config import DEFAULT_RATE_LIMIT, PLATFORM_RATE_LIMITS
+from ..config import DEFAULT_RATE_LIMIT, PLATFORM_RATE_LIMITS, RATE_LIMIT_LEASE_CONFIG
 
 logger = logging.getLogger(__name__)
 
 
+# KEYS: 令牌桶
+# ARGV: 至少需要的令牌数, 希望租用的令牌数, 归还的令牌数, 速率, 容量, 当前时间
+# 返回: {租到的令牌数, 需要等待的秒数}
+LEASE_SCRIPT = """
+local key = KEYS[1]
+local need = tonumber(ARGV[1])
+local want = tonumber(ARGV[2])
+local returned = tonumber(ARGV[3])
+local rate = tonumber(ARGV[4])
+local burst = tonumber(ARGV[5])
+local current_time = tonumber(ARGV[6])
+
+-- 获取当前桶状态
+local bucket = redis.call('HMGET', key, 'tokens', 'last_refill')
+local current_tokens = tonumber(bucket[1]) or burst
+local last_refill = tonumber(bucket[2]) or current_time
+
+-- 补充令牌并归还未用完的租约（不超过桶容量）
+-- 各进程时间戳可能略有先后，补充时间只前进不后退，避免重复补充
+local elapsed = math.max(current_time - last_refill, 0)
+last_refill = math.max(last_refill, current_time)
+current_tokens = math.min(burst, current_tokens + elapsed * rate + returned)
+
+local granted = 0
+local wait_time = 0
+if need > 0 then
+    if current_tokens >= need then
+        granted = math.min(want, math.floor(current_tokens))
+        current_tokens = current_tokens - granted
+    else
+        wait_time = (need - current_tokens) / rate
+    end
+end
+
+redis.call('HSET', key, 'tokens', tostring(current_tokens), 'last_refill', tostring(last_refill))
+redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+return {granted, tostring(wait_time)}
+"""
+
+
+class LocalTokenBucket:
+    """进程内令牌桶（未配置Redis或Redis不可用时使用）"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+
+    def try_acquire(self, tokens: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True, 0.0
+        return False, (tokens - self.tokens) / self.rate
+
+
 class RateLimiter:
     """
     令牌桶限流器
@@ -44,7 +109,7 @@ class RateLimiter:
             platform: 平台标识（如 'taobao', 'amazon'）
             rate: 每秒生成的令牌数（默认从配置读取）
             burst: 桶的容量（默认从配置读取）
-            redis_client: Redis客户端（可选，默认使用Django cache）
+            redis_client: Redis客户端（可选，默认使用缓存配置的Redis）
         """
         self.platform = platform
 
@@ -53,17 +118,44 @@ class RateLimiter:
         self.rate = rate or config["rate"]
         self.burst = burst or config["burst"]
 
-        # Redis客户端（支持传入自定义client）
+        # Redis客户端（支持传入自定义client），未配置Redis时只做进程内限流
         self.redis_client = redis_client
         if self.redis_client is None:
-            # 使用Django cache作为Redis client
-            self.redis_client = cache
+            from ..utils.redis_client import get_redis_client
+
+            self.redis_client = get_redis_client()
+        self._lease_script = (
+            self.redis_client.register_script(LEASE_SCRIPT) if self.redis_client else None
+        )
 
         # Redis键前缀
         self._key_prefix = f"rate_limiter:{platform}"
 
+        # 本地租约状态
+        self._lock = threading.Lock()
+        self._leased = 0
+        self._lease_expires = 0.0
+        self._degraded_until = 0.0
+        self._configure_local()
+
         logger.info(f"初始化限流器: platform={platform}, rate={self.rate}, burst={self.burst}")
 
+    def _configure_local(self):
+        """根据当前速率和容量计算租约大小和本地令牌桶"""
+        config = RATE_LIMIT_LEASE_CONFIG
+        self.lease_tokens = max(1, int(self.burst * config["lease_fraction"]))
+        self.lease_ttl = config["lease_ttl"]
+        self.fallback_retry = config["fallback_retry"]
+
+        if self.redis_client is None:
+            # 单进程部署：本地桶即全局桶
+            self._local_bucket = LocalTokenBucket(self.rate, self.burst)
+        else:
+            share = config["fallback_share"]
+            self._local_bucket = LocalTokenBucket(
+                max(self.rate * share, 0.1), max(1, int(self.burst * share))
+            )
+
     async def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
         """
         获取令牌（阻塞直到获取成功或超时）
@@ -140,68 +232,65 @@ class RateLimiter:
             # 同步等待
             time.sleep(remaining_wait)
 
-    def _try_acquire(self, tokens: int) -> tuple[bool, float]:
+    def _try_acquire(self, tokens: int) -> Tuple[bool, float]:
         """
         尝试获取令牌（核心逻辑）
 
+        优先消耗本地租约；租约不足或过期时归还剩余令牌并重新租用（一次Redis调用）。
+
         Returns:
             (success, wait_time): 是否成功，需要等待的时间
         """
-        current_time = time.time()
-        key = f"{self._key_prefix}:bucket"
-
-        # 使用Redis Lua脚本保证原子性
-        lua_script = """
-        local key = KEYS[1]
-        local tokens = tonumber(ARGV[1])
-        local rate = tonumber(ARGV[2])
-        local burst = tonumber(ARGV[3])
-        local current_time = tonumber(ARGV[4])
-
-        -- 获取当前桶状态
-        local bucket = redis.call('HMGET', key, 'tokens', 'last_refill')
-        local current_tokens = tonumber(bucket[1]) or burst
-        local last_refill = tonumber(bucket[2]) or current_time
-
-        -- 计算需要补充的令牌数
-        local elapsed = current_time - last_refill
-        local refill_tokens = math.floor(elapsed * rate)
-
-        -- 补充令牌（不超过桶容量）
-        current_tokens = math.min(burst, current_tokens + refill_tokens)
-
-        -- 检查是否有足够令牌
-        if current_tokens >= tokens then
-            -- 消耗令牌
-            current_tokens = current_tokens - tokens
-
-            -- 更新Redis
-            redis.call('HMSET', key, 'tokens', current_tokens, 'last_refill', current_time)
-            redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
-
-            return {1, 0}  -- 成功，等待时间0
-        else
-            -- 令牌不足，计算等待时间
-            local wait_time = (tokens - current_tokens) / rate
-            return {0, wait_time}  -- 失败，返回需要等待的时间
-        end
-        """
-
-        try:
-            # 执行Lua脚本
-            result = self.redis_client.eval(
-                lua_script, 1, key, tokens, self.rate, self.burst, current_time
-            )
-
-            success = bool(result[0])
-            wait_time = float(result[1])
-
-            return success, wait_time
-
-        except Exception as e:
-            logger.error(f"限流器Redis操作失败: {e}")
-            # Redis失败时降级：允许请求通过（避免阻塞业务）
-            return True, 0
+        with self._lock:
+            now = time.monotonic()
+            if now < self._lease_expires and self._leased >= tokens:
+                self._leased -= tokens
+                return True, 0.0
+
+            if self._lease_script is None or now < self._degraded_until:
+                return self._local_bucket.try_acquire(tokens)
+
+            try:
+                granted, wait_time = self._lease_script(
+                    keys=[f"{self._key_prefix}:bucket"],
+                    args=[
+                        tokens,
+                        max(tokens, self.lease_tokens),
+                        self._leased,
+                        self.rate,
+                        self.burst,
+                        time.time(),
+                    ],
+                )
+            except Exception as e:
+                # Redis失败时降级为保守的本地限流，一段时间后再重试Redis
+                logger.error(f"限流器Redis操作失败，降级为本地限流: {e}")
+                self._leased = 0
+                self._degraded_until = now + self.fallback_retry
+                return self._local_bucket.try_acquire(tokens)
+
+            granted = int(granted)
+            if granted < tokens:
+                self._leased = 0
+                return False, float(wait_time)
+
+            self._leased = granted - tokens
+            self._lease_expires = now + self.lease_ttl
+            return True, 0.0
+
+    def release_lease(self):
+        """立即归还本地未用完的令牌（如进程退出前）"""
+        with self._lock:
+            leased, self._leased = self._leased, 0
+            if not leased or self._lease_script is None:
+                return
+            try:
+                self._lease_script(
+                    keys=[f"{self._key_prefix}:bucket"],
+                    args=[0, 0, leased, self.rate, self.burst, time.time()],
+                )
+            except Exception as e:
+                logger.error(f"归还限流令牌失败: {e}")
 
     def get_status(self) -> Dict:
         """
@@ -213,7 +302,10 @@ class RateLimiter:
         key = f"{self._key_prefix}:bucket"
 
         try:
-            bucket = self.redis_client.hmget(key, "tokens", "last_refill")
+            if self.redis_client is None:
+                bucket = (self._local_bucket.tokens, time.time())
+            else:
+                bucket = self.redis_client.hmget(key, "tokens", "last_refill")
             current_tokens = float(bucket[0]) if bucket[0] else self.burst
             last_refill = float(bucket[1]) if bucket[1] else time.time()
 
@@ -228,6 +320,8 @@ class RateLimiter:
                 "available_tokens": int(current_tokens),
                 "usage_rate": round(usage_rate * 100, 2),  # 百分比
                 "last_refill": last_refill,
+                "leased_tokens": self._leased,
+                "degraded": time.monotonic() < self._degraded_until,
             }
 
         except Exception as e:
@@ -236,14 +330,19 @@ class RateLimiter:
                 "platform": self.platform,
                 "rate": self.rate,
                 "burst": self.burst,
+                "degraded": time.monotonic() < self._degraded_until,
                 "error": str(e),
             }
 
     def reset(self):
         """重置限流器（清空令牌桶）"""
         key = f"{self._key_prefix}:bucket"
+        with self._lock:
+            self._leased = 0
+            self._configure_local()
         try:
-            self.redis_client.delete(key)
+            if self.redis_client is not None:
+                self.redis_client.delete(key)
             logger.info(f"限流器已重置: platform={self.platform}")
         except Exception as e:
             logger.error(f"重置限流器失败: {e}")
@@ -1,19 +1,306 @@
 """
 重试管理器 - 基于指数退避算法
 支持智能错误判断、随机抖动、可配置重试策略
+
+截止时间感知执行（execute_with_deadline）：
+- 调用方给出整体时间预算，截止时间通过 contextvars 向下传递（含线程池中执行的同步函数），
+  嵌套调用共享同一截止时间，HTTP 超时用 request_timeout() 截断（预算用完时抛出 DeadlineExceeded）
+- 剩余时间不足以完成退避时不再重试；同步函数在线程池执行，不阻塞事件循环
+- 幂等请求超过该端点近期 P95 延迟仍未返回时发出对冲请求，取先成功的结果
+- 每个平台一个重试预算（令牌比例），防止故障时重试放大流量
+- 熔断器状态保存在Redis（circuit_breaker:{platform}），所有进程共享
+- 重试、对冲、熔断拒绝等事件通过 MonitorService 记录
 """
 
 import asyncio
 import logging
 import random
+import threading
 import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import wraps
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
 
 from ..config import RETRY_CONFIG
 
 logger = logging.getLogger(__name__)
 
+# 当前上下文的截止时间（time.monotonic()），None 表示不限时
+_deadline: ContextVar[Optional[float]] = ContextVar("retry_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """超过调用方的时间预算"""
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，拒绝调用"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"熔断器已打开: {name}，{retry_after:.1f}秒后重试")
+
+
+def remaining_time(default: Optional[float] = None) -> Optional[float]:
+    """
+    当前上下文剩余的时间预算（秒）
+
+    Args:
+        default: 没有截止时间时的返回值，同时作为上限（如HTTP超时）
+
+    Example:
+        >>> requests.get(url, timeout=remaining_time(self.timeout))
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    remaining = max(deadline - time.monotonic(), 0.0)
+    return remaining if default is None else min(remaining, default)
+
+
+def request_timeout(default: Optional[float] = None) -> Optional[float]:
+    """
+    HTTP 请求超时：剩余时间预算截断 default，预算已用完时抛出 DeadlineExceeded
+
+    与 remaining_time() 不同，不会返回0（requests/aiohttp 不接受0超时）。
+
+    Example:
+        >>> requests.get(url, timeout=request_timeout(self.timeout))
+
+    Raises:
+        DeadlineExceeded: 时间预算已用完
+    """
+    timeout = remaining_time(default)
+    if timeout is not None and timeout <= 0:
+        raise DeadlineExceeded("时间预算已用完")
+    return timeout
+
+
+@contextmanager
+def deadline_scope(budget: Optional[float]):
+    """
+    在上下文中设置时间预算（不超过外层已有的截止时间）
+
+    Args:
+        budget: 时间预算（秒），None 表示沿用外层截止时间
+    """
+    if budget is None:
+        yield
+        return
+    deadline = time.monotonic() + budget
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class RetryBudget:
+    """
+    重试预算（令牌比例，同 gRPC retryThrottling）
+
+    失败扣1个令牌，成功补 token_ratio 个，令牌不超过上限一半时不允许重试或对冲。
+    正常情况下令牌保持满额；持续失败时重试在几次失败后停止，恢复后逐步放开。
+    """
+
+    def __init__(self, max_tokens: float, token_ratio: float):
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def on_success(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.token_ratio)
+
+    def on_failure(self):
+        with self._lock:
+            self.tokens = max(0.0, self.tokens - 1)
+
+    def can_retry(self) -> bool:
+        return self.tokens > self.max_tokens / 2
+
+
+def circuit_transition(
+    state: Dict, op: str, now: float, threshold: int, window: float, open_seconds: float
+) -> Tuple[bool, float]:
+    """
+    熔断器状态转换（与 CircuitBreaker.SCRIPT 的 Lua 逻辑一致）
+
+    Args:
+        state: 状态字典（state/failures/window_start/opened_at），原地修改
+        op: 'allow'、'success' 或 'failure'
+        now: 当前时间戳
+
+    Returns:
+        tuple: (是否允许调用, 需要等待的秒数)
+    """
+    if op == "allow":
+        if state["state"] != "closed":
+            # 半开状态下探测请求在途，open_seconds 内未返回则再放行一个探测
+            if now - state["opened_at"] >= open_seconds:
+                state["state"] = "half_open"
+                state["opened_at"] = now
+            else:
+                return False, open_seconds - (now - state["opened_at"])
+    elif op == "success":
+        if state["state"] == "half_open":
+            state["state"] = "closed"
+        if state["state"] == "closed":
+            state["failures"] = 0
+            state["window_start"] = now
+    elif op == "failure":
+        if state["state"] == "half_open":
+            state["state"] = "open"
+            state["opened_at"] = now
+        elif state["state"] == "closed":
+            if now - state["window_start"] > window:
+                state["failures"] = 0
+                state["window_start"] = now
+            state["failures"] += 1
+            if state["failures"] >= threshold:
+                state["state"] = "open"
+                state["opened_at"] = now
+    return True, 0.0
+
+
+class CircuitBreaker:
+    """
+    跨进程共享的熔断器
+
+    - closed: 窗口内连续失败达到阈值后打开
+    - open: 拒绝调用，open_seconds 后放行一个探测请求（half_open）
+    - half_open: 探测成功后关闭，失败重新打开
+
+    状态保存在Redis哈希 circuit_breaker:{name}，每次判断/记录一次 EVALSHA；
+    未配置Redis时使用进程内状态，Redis操作失败时放行（不因熔断器本身故障拒绝业务）。
+    """
+
+    # KEYS: 熔断器哈希
+    # ARGV: 操作, 当前时间, 失败阈值, 计数窗口, 打开时长
+    # 返回: {是否允许, 状态, 需要等待的秒数}
+    SCRIPT = """
+    local op = ARGV[1]
+    local now = tonumber(ARGV[2])
+    local threshold = tonumber(ARGV[3])
+    local window = tonumber(ARGV[4])
+    local open_seconds = tonumber(ARGV[5])
+
+    local data = redis.call('HMGET', KEYS[1], 'state', 'failures', 'window_start', 'opened_at')
+    local state = data[1] or 'closed'
+    local failures = tonumber(data[2]) or 0
+    local window_start = tonumber(data[3]) or now
+    local opened_at = tonumber(data[4]) or 0
+    local allowed = 1
+    local retry_after = 0
+
+    if op == 'allow' then
+        if state ~= 'closed' then
+            if now - opened_at >= open_seconds then
+                state = 'half_open'
+                opened_at = now
+            else
+                allowed = 0
+                retry_after = open_seconds - (now - opened_at)
+            end
+        end
+    elseif op == 'success' then
+        if state == 'half_open' then
+            state = 'closed'
+        end
+        if state == 'closed' then
+            failures = 0
+            window_start = now
+        end
+    elseif op == 'failure' then
+        if state == 'half_open' then
+            state = 'open'
+            opened_at = now
+        elseif state == 'closed' then
+            if now - window_start > window then
+                failures = 0
+                window_start = now
+            end
+            failures = failures + 1
+            if failures >= threshold then
+                state = 'open'
+                opened_at = now
+            end
+        end
+    end
+
+    redis.call('HSET', KEYS[1], 'state', state, 'failures', failures,
+        'window_start', tostring(window_start), 'opened_at', tostring(opened_at))
+    redis.call('EXPIRE', KEYS[1], math.ceil(window + open_seconds) * 2)
+    return {allowed, state, tostring(retry_after)}
+    """
+
+    _local_lock = threading.Lock()
+    _local_states: Dict[str, Dict] = {}
+
+    def __init__(self, name: str, redis_client=None, config: Optional[Dict] = None):
+        """
+        Args:
+            name: 熔断器名称（通常为平台标识）
+            redis_client: Redis客户端（可选，默认使用缓存配置的Redis）
+            config: 熔断参数（默认 RETRY_CONFIG['circuit_breaker']）
+        """
+        config = config or RETRY_CONFIG["circuit_breaker"]
+        self.name = name
+        self.threshold = config["failure_threshold"]
+        self.window = config["window"]
+        self.open_seconds = config["open_seconds"]
+        self.state = "closed"
+
+        self.redis_client = redis_client
+        if self.redis_client is None:
+            from ..utils.redis_client import get_redis_client
+
+            self.redis_client = get_redis_client()
+        self._script = self.redis_client.register_script(self.SCRIPT) if self.redis_client else None
+
+    def allow(self) -> Tuple[bool, float]:
+        """判断是否允许调用，返回 (是否允许, 需要等待的秒数)"""
+        return self._apply("allow")
+
+    def record_success(self):
+        self._apply("success")
+
+    def record_failure(self):
+        self._apply("failure")
+
+    def _apply(self, op: str) -> Tuple[bool, float]:
+        now = time.time()
+        if self._script is None:
+            with self._local_lock:
+                state = self._local_states.setdefault(
+                    self.name,
+                    {"state": "closed", "failures": 0, "window_start": now, "opened_at": 0.0},
+                )
+                result = circuit_transition(
+                    state, op, now, self.threshold, self.window, self.open_seconds
+                )
+                self.state = state["state"]
+                return result
+
+        try:
+            allowed, state, retry_after = self._script(
+                keys=[f"circuit_breaker:{self.name}"],
+                args=[op, now, self.threshold, self.window, self.open_seconds],
+            )
+        except Exception as e:
+            logger.error(f"熔断器Redis操作失败，放行调用: name={self.name}, error={e}")
+            return True, 0.0
+
+        self.state = state.decode() if isinstance(state, bytes) else state
+        return bool(int(allowed)), float(retry_after)
+
 
 class RetryManager:
     """
@@ -30,12 +317,20 @@ class RetryManager:
     - 避免惊群：随机抖动分散重试时间
     """
 
+    # 进程内共享：每个平台的重试预算、每个端点的最近延迟样本
+    _shared_lock = threading.Lock()
+    _budgets: Dict[str, RetryBudget] = {}
+    _latencies: Dict[Tuple[str, str], Deque[float]] = {}
+
     def __init__(
         self,
         max_retries: Optional[int] = None,
         base_delay: Optional[float] = None,
         max_delay: Optional[float] = None,
         jitter: Optional[bool] = None,
+        platform: str = "default",
+        redis_client=None,
+        monitor=None,
     ):
         """
         初始化重试管理器
@@ -45,6 +340,9 @@ class RetryManager:
             base_delay: 基础退避时间（秒）
             max_delay: 最大退避时间（秒）
             jitter: 是否添加随机抖动
+            platform: 平台标识（重试预算和熔断器按平台区分）
+            redis_client: 熔断器使用的Redis客户端（可选）
+            monitor: 监控服务（可选，默认全局 MonitorService）
         """
         config = RETRY_CONFIG
 
@@ -56,6 +354,11 @@ class RetryManager:
         self.retryable_errors = set(config["retryable_errors"])
         self.non_retryable_errors = set(config["non_retryable_errors"])
 
+        self.platform = platform
+        self.redis_client = redis_client
+        self._monitor = monitor
+        self.hedging_config = config["hedging"]
+
         logger.debug(
             f"初始化重试管理器: max_retries={self.max_retries}, "
             f"base_delay={self.base_delay}, jitter={self.jitter}"
@@ -198,11 +501,11 @@ class RetryManager:
 
         for attempt in range(self.max_retries + 1):
             try:
-                # 执行函数
+                # 执行函数（同步函数在线程池执行，不阻塞事件循环）
                 if asyncio.iscoroutinefunction(func):
                     return await func(*args, **kwargs)
                 else:
-                    return func(*args, **kwargs)
+                    return await asyncio.to_thread(func, *args, **kwargs)
 
             except Exception as e:
                 last_error = e
@@ -224,6 +527,179 @@ class RetryManager:
         logger.error(f"达到最大重试次数({self.max_retries})，放弃重试: {last_error}")
         raise last_error
 
+    async def execute_with_deadline(
+        self,
+        func: Callable,
+        *args,
+        budget: Optional[float] = None,
+        endpoint: Optional[str] = None,
+        hedge: bool = False,
+        **kwargs,
+    ) -> Any:
+        """
+        在时间预算内执行函数，按需重试和对冲（异步版本）
+
+        截止时间对 func 及其内部的嵌套调用可见（remaining_time()）；同步函数在线程池执行。
+        重试受最大重试次数、剩余时间、平台重试预算和共享熔断器共同限制。
+
+        Args:
+            func: 要执行的函数（异步或同步）
+            budget: 整体时间预算（秒），None 表示沿用外层截止时间
+            endpoint: 端点名称（用于延迟统计，默认函数名）
+            hedge: 是否允许对冲请求（仅用于幂等请求，如查询）
+
+        Returns:
+            Any: 函数返回值
+
+        Raises:
+            DeadlineExceeded: 超过时间预算
+            CircuitOpenError: 平台熔断器打开
+            Exception: 不可重试或重试被限制时抛出最后一次异常
+
+        Example:
+            >>> manager = RetryManager(platform='taobao')
+            >>> result = await manager.execute_with_deadline(
+            ...     api_client.get_product, product_id='123', budget=10, hedge=True
+            ... )
+        """
+        endpoint = endpoint or getattr(func, "__name__", "call")
+        breaker = self.get_circuit_breaker()
+        retry_budget = self.get_retry_budget()
+
+        with deadline_scope(budget):
+            attempt = 0
+            while True:
+                if remaining_time() == 0:
+                    self._record_event("deadline_exceeded")
+                    raise DeadlineExceeded(f"超过时间预算: {self.platform}/{endpoint}")
+
+                allowed, retry_after = breaker.allow()
+                if not allowed:
+                    self._record_event("breaker_rejected")
+                    raise CircuitOpenError(self.platform, retry_after)
+
+                try:
+                    result = await self._hedged_attempt(func, args, kwargs, endpoint, hedge)
+                except Exception as e:
+                    retryable = isinstance(e, DeadlineExceeded) or (
+                        self._classify_error(e) in self.retryable_errors
+                    )
+                    if retryable:
+                        retry_budget.on_failure()
+                        previous_state = breaker.state
+                        breaker.record_failure()
+                        if breaker.state == "open" and previous_state != "open":
+                            self._record_event("breaker_opened")
+                            logger.warning(f"熔断器打开: platform={self.platform}")
+                    else:
+                        # 业务错误说明下游可用，不计入熔断
+                        breaker.record_success()
+
+                    if isinstance(e, DeadlineExceeded):
+                        self._record_event("deadline_exceeded")
+                        raise
+                    if not self.should_retry(e, attempt):
+                        raise
+                    if not retry_budget.can_retry():
+                        self._record_event("retry_budget_exhausted")
+                        logger.warning(f"重试预算耗尽，放弃重试: platform={self.platform}, {e}")
+                        raise
+
+                    backoff = self.calculate_backoff(attempt)
+                    remaining = remaining_time()
+                    if remaining is not None and backoff >= remaining:
+                        self._record_event("deadline_exceeded")
+                        raise DeadlineExceeded(
+                            f"剩余时间{remaining:.2f}秒不足以重试: {self.platform}/{endpoint}"
+                        ) from e
+
+                    self._record_event("retry")
+                    logger.warning(f"第{attempt + 1}次尝试失败: {e}, 等待{backoff:.2f}秒后重试...")
+                    await asyncio.sleep(backoff)
+                    attempt += 1
+                else:
+                    retry_budget.on_success()
+                    breaker.record_success()
+                    return result
+
+    async def _hedged_attempt(self, func, args, kwargs, endpoint: str, hedge: bool):
+        """执行一次尝试；允许对冲时，超过延迟分位数未返回则再发一个请求，取先成功的结果"""
+        primary = asyncio.create_task(self._timed_call(func, args, kwargs, endpoint))
+        tasks = {primary}
+        hedge_delay = self.hedge_delay(endpoint) if hedge else None
+        remaining = remaining_time()
+        try:
+            if hedge_delay is not None and (remaining is None or hedge_delay < remaining):
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done and self.get_retry_budget().can_retry():
+                    self._record_event("hedge")
+                    tasks.add(asyncio.create_task(self._timed_call(func, args, kwargs, endpoint)))
+
+            error = None
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining_time(), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise DeadlineExceeded(f"超过时间预算: {self.platform}/{endpoint}")
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._record_event("hedge_win")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # 线程池中的同步调用无法中断，结果会被丢弃
+            for task in tasks:
+                task.cancel()
+
+    async def _timed_call(self, func, args, kwargs, endpoint: str):
+        started = time.monotonic()
+        if asyncio.iscoroutinefunction(func):
+            result = await func(*args, **kwargs)
+        else:
+            result = await asyncio.to_thread(func, *args, **kwargs)
+
+        size = self.hedging_config["sample_size"]
+        with self._shared_lock:
+            samples = self._latencies.setdefault((self.platform, endpoint), deque(maxlen=size))
+            samples.append(time.monotonic() - started)
+        return result
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """端点近期成功调用延迟的分位数（秒），样本不足时返回 None（不对冲）"""
+        with self._shared_lock:
+            samples = sorted(self._latencies.get((self.platform, endpoint), ()))
+        if len(samples) < self.hedging_config["min_samples"]:
+            return None
+        index = int((len(samples) - 1) * self.hedging_config["percentile"] / 100)
+        return samples[index]
+
+    def get_retry_budget(self) -> RetryBudget:
+        """当前平台的重试预算（进程内共享）"""
+        with self._shared_lock:
+            if self.platform not in self._budgets:
+                config = RETRY_CONFIG["retry_budget"]
+                self._budgets[self.platform] = RetryBudget(
+                    config["max_tokens"], config["token_ratio"]
+                )
+            return self._budgets[self.platform]
+
+    def get_circuit_breaker(self) -> CircuitBreaker:
+        """当前平台的熔断器（状态跨进程共享）"""
+        if not hasattr(self, "_breaker"):
+            self._breaker = CircuitBreaker(self.platform, redis_client=self.redis_client)
+        return self._breaker
+
+    def _record_event(self, event: str):
+        if self._monitor is None:
+            from .monitor import get_monitor
+
+            self._monitor = get_monitor()
+        self._monitor.record_event(self.platform, event)
+
     def execute_with_retry_sync(self, func: Callable, *args, **kwargs) -> Any:
         """
         执行函数并自动重试（同步版本）
@@ -306,7 +782,9 @@ def retry(
 
 # 便捷函数
 def get_retry_manager(
-    max_retries: Optional[int] = None, base_delay: Optional[float] = None
+    max_retries: Optional[int] = None,
+    base_delay: Optional[float] = None,
+    platform: str = "default",
 ) -> RetryManager:
     """
     获取重试管理器实例（便捷函数）
@@ -314,8 +792,9 @@ def get_retry_manager(
     Args:
         max_retries: 最大重试次数
         base_delay: 基础退避时间
+        platform: 平台标识（重试预算和熔断器按平台区分）
 
     Returns:
         RetryManager: 重试管理器实例
     """
-    return RetryManager(max_retries=max_retries, base_delay=base_delay)
+    return RetryManager(max_retries=max_retries, base_delay=base_delay, platform=platform)
@@ -6,33 +6,191 @@
 - 告警关联分析
 - 告警风暴预防
 - 智能告警路由
+
+指标历史存储（Redis，每个样本一次 Lua 脚本原子写入）：
+- metric_series:{metric}:{platform}  ZSET  时间戳 -> 样本，写入时裁剪保留期之外的数据
+- metric_stats:{metric}:{platform}   HASH  count/mean/var 滑动统计
+
+滑动统计：前 1/alpha 个样本按 Welford 算法累计精确均值和方差，之后按 EWMA 衰减，
+异常检测用新样本相对写入前统计量的 Z-score，每个样本 O(1)，不读取历史窗口。
+未配置Redis时（如本地开发的LocMemCache）退化为进程内环形缓冲。
 """
 
 import json
 import logging
+import math
+import threading
 import time
+from collections import defaultdict, deque
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Deque, Dict, List, Optional, Tuple
 
 import numpy as np
 from django.core.cache import cache
 
-from .config import MONITOR_CONFIG
+from ..config import MONITOR_CONFIG
 
 logger = logging.getLogger(__name__)
 
 
+def update_running_stats(
+    count: int, mean: float, var: float, value: float, alpha: float, min_samples: int
+) -> Tuple[int, float, float, float]:
+    """
+    用一个新样本更新滑动统计（与 RedisMetricBackend 的 Lua 脚本逻辑一致）
+
+    权重取 max(alpha, 1/count)：样本较少时等价于 Welford 累计（总体方差），
+    之后退化为指数加权均值和方差。
+
+    Args:
+        count, mean, var: 写入前的样本数、均值、方差
+        value: 新样本
+        alpha: EWMA 系数
+        min_samples: 计算异常分数所需的最少样本数
+
+    Returns:
+        tuple: (样本数, 均值, 方差, 新样本相对写入前统计量的 Z-score)
+    """
+    score = 0.0
+    if count >= min_samples and var > 0:
+        score = abs(value - mean) / math.sqrt(var)
+
+    count += 1
+    weight = max(alpha, 1 / count)
+    diff = value - mean
+    increment = weight * diff
+    mean += increment
+    var = (1 - weight) * (var + diff * increment)
+    return count, mean, var, score
+
+
+class RedisMetricBackend:
+    """基于Redis有序集合和哈希的指标存储"""
+
+    # KEYS: 样本有序集合, 统计哈希
+    # ARGV: 时间戳, 样本值, 成员, 保留截止时间戳, 过期秒数, EWMA系数, 最少样本数
+    RECORD_SCRIPT = """
+    local value = tonumber(ARGV[2])
+    redis.call("zadd", KEYS[1], ARGV[1], ARGV[3])
+    redis.call("zremrangebyscore", KEYS[1], "-inf", "(" .. ARGV[4])
+    redis.call("expire", KEYS[1], ARGV[5])
+
+    local stats = redis.call("hmget", KEYS[2], "count", "mean", "var")
+    local count = tonumber(stats[1]) or 0
+    local mean = tonumber(stats[2]) or 0
+    local var = tonumber(stats[3]) or 0
+
+    local score = 0
+    if count >= tonumber(ARGV[7]) and var > 0 then
+        score = math.abs(value - mean) / math.sqrt(var)
+    end
+
+    count = count + 1
+    local weight = math.max(tonumber(ARGV[6]), 1 / count)
+    local diff = value - mean
+    local increment = weight * diff
+    mean = mean + increment
+    var = (1 - weight) * (var + diff * increment)
+
+    redis.call("hset", KEYS[2], "count", count, "mean", tostring(mean), "var", tostring(var))
+    redis.call("expire", KEYS[2], ARGV[5])
+    return {count, tostring(mean), tostring(var), tostring(score)}
+    """
+
+    def __init__(self, client):
+        self.client = client
+        # register_script 使用 EVALSHA，脚本未加载时自动回退 EVAL
+        self._record = client.register_script(self.RECORD_SCRIPT)
+
+    def record(
+        self,
+        key: str,
+        timestamp: float,
+        value: float,
+        retention: int,
+        alpha: float,
+        min_samples: int,
+    ) -> Tuple[int, float, float, float]:
+        count, mean, var, score = self._record(
+            keys=[f"metric_series:{key}", f"metric_stats:{key}"],
+            args=[
+                timestamp,
+                value,
+                f"{timestamp!r}:{value!r}",
+                timestamp - retention,
+                retention,
+                alpha,
+                min_samples,
+            ],
+        )
+        return int(count), float(mean), float(var), float(score)
+
+    def history(self, key: str, since: float) -> List[float]:
+        members = self.client.zrangebyscore(f"metric_series:{key}", since, "+inf")
+        return [float(_decode(member).rsplit(":", 1)[1]) for member in members]
+
+    def stats(self, key: str) -> Tuple[int, float, float]:
+        count, mean, var = self.client.hmget(f"metric_stats:{key}", "count", "mean", "var")
+        return int(count or 0), float(mean or 0), float(var or 0)
+
+
+class LocalMetricBackend:
+    """进程内指标存储（未配置Redis时使用）"""
+
+    _lock = threading.Lock()
+    _series: Dict[str, Deque[Tuple[float, float]]] = defaultdict(deque)
+    _stats: Dict[str, Tuple[int, float, float]] = {}
+
+    def record(
+        self,
+        key: str,
+        timestamp: float,
+        value: float,
+        retention: int,
+        alpha: float,
+        min_samples: int,
+    ) -> Tuple[int, float, float, float]:
+        with self._lock:
+            series = self._series[key]
+            series.append((timestamp, value))
+            while series and series[0][0] < timestamp - retention:
+                series.popleft()
+
+            count, mean, var = self._stats.get(key, (0, 0.0, 0.0))
+            result = update_running_stats(count, mean, var, value, alpha, min_samples)
+            self._stats[key] = result[:3]
+            return result
+
+    def history(self, key: str, since: float) -> List[float]:
+        with self._lock:
+            return [value for timestamp, value in self._series.get(key, ()) if timestamp >= since]
+
+    def stats(self, key: str) -> Tuple[int, float, float]:
+        with self._lock:
+            return self._stats.get(key, (0, 0.0, 0.0))
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._stats.clear()
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
 class SmartAlertService:
     """
     智能告警服务
     """
 
-    def __init__(self, redis_client=None):
+    def __init__(self, redis_client=None, metric_backend=None):
         """
         初始化智能告警服务
 
         Args:
             redis_client: Redis客户端（可选）
+            metric_backend: 指标历史存储（可选，默认Redis，不可用时使用进程内存储）
         """
         self.redis_client = redis_client or cache
         self.config = MONITOR_CONFIG.get("smart_alert", {})
@@ -40,12 +198,32 @@ class SmartAlertService:
         self.anomaly_config = self.config.get("anomaly_detection", {})
         self.correlation_config = self.config.get("alert_correlation", {})
         self.auto_resolution_config = self.config.get("auto_resolution", {})
+        self.metric_backend = metric_backend or self._default_metric_backend(redis_client)
+
+        # 滑动统计参数
+        self.ewma_alpha = 2 / (self.anomaly_config.get("ewma_span", 60) + 1)
+        self.min_samples = self.anomaly_config.get("min_samples", 10)
+        self.history_retention = self.anomaly_config.get("history_hours", 24) * 3600
 
         logger.debug("初始化智能告警服务")
 
+    @staticmethod
+    def _default_metric_backend(redis_client=None):
+        from ..utils.redis_client import get_redis_client
+
+        client = redis_client if hasattr(redis_client, "register_script") else get_redis_client()
+        if client is not None:
+            return RedisMetricBackend(client)
+        return LocalMetricBackend()
+
+    def _anomaly_enabled(self) -> bool:
+        return self.enabled and self.anomaly_config.get("enabled", False)
+
     def detect_anomalies(self, metric_name: str, values: List[float]) -> Tuple[bool, float]:
         """
-        检测异常值
+        检测异常值（最后一个值相对之前各值的滑动统计）
+
+        已记录到指标历史的样本应使用 record_metric，无需重新遍历窗口。
 
         Args:
             metric_name: 指标名称
@@ -54,36 +232,33 @@ class SmartAlertService:
         Returns:
             tuple: (是否异常, 异常分数)
         """
-        if not self.enabled or not self.anomaly_config.get("enabled", False):
+        if not self._anomaly_enabled():
             return False, 0.0
 
         try:
-            if len(values) < 10:  # 数据不足，无法检测
+            if len(values) < self.min_samples:  # 数据不足，无法检测
                 return False, 0.0
 
-            # 计算均值和标准差
-            mean = np.mean(values)
-            std = np.std(values)
-
-            if std == 0:  # 无波动，无法检测
-                return False, 0.0
-
-            # 计算最近值的Z-score
-            recent_value = values[-1]
-            z_score = abs((recent_value - mean) / std)
-
-            # 判断是否异常
-            threshold = self.anomaly_config.get("threshold_factor", 3.0)
-            is_anomaly = z_score > threshold
-
-            logger.debug(f"异常检测: {metric_name} - Z-score: {z_score:.2f}, 阈值: {threshold}")
-
-            return is_anomaly, z_score
+            count, mean, var = 0, 0.0, 0.0
+            for value in values[:-1]:
+                count, mean, var, _ = update_running_stats(
+                    count, mean, var, float(value), self.ewma_alpha, self.min_samples
+                )
+            _, _, _, z_score = update_running_stats(
+                count, mean, var, float(values[-1]), self.ewma_alpha, self.min_samples
+            )
+            return self._judge(metric_name, z_score)
 
         except Exception as e:
             logger.error(f"异常检测失败: {e}")
             return False, 0.0
 
+    def _judge(self, metric_name: str, z_score: float) -> Tuple[bool, float]:
+        threshold = self.anomaly_config.get("threshold_factor", 3.0)
+        is_anomaly = z_score > threshold
+        logger.debug(f"异常检测: {metric_name} - Z-score: {z_score:.2f}, 阈值: {threshold}")
+        return is_anomaly, z_score
+
     def correlate_alerts(self, alerts: List[Dict]) -> List[List[Dict]]:
         """
         关联相关告警
@@ -264,55 +439,71 @@ class SmartAlertService:
             minutes: 时间范围（分钟）
 
         Returns:
-            list: 指标值列表
+            list: 指标值列表（按时间升序）
         """
         try:
-            key = f"metric_history:{metric_name}:{platform}"
-            history = self.redis_client.get(key)
-
-            if history:
-                data = json.loads(history)
-                # 过滤时间范围内的数据
-                current_time = time.time()
-                cutoff_time = current_time - (minutes * 60)
-                return [v for t, v in data if t >= cutoff_time]
-
-            return []
+            since = time.time() - minutes * 60
+            return self.metric_backend.history(f"{metric_name}:{platform}", since)
 
         except Exception as e:
             logger.error(f"获取指标历史失败: {e}")
             return []
 
-    def update_metric_history(self, metric_name: str, platform: str, value: float):
+    def get_metric_stats(self, metric_name: str, platform: str) -> Dict:
         """
-        更新指标历史数据
+        获取指标滑动统计
+
+        Returns:
+            dict: {"count", "mean", "std"}
+        """
+        count, mean, var = self.metric_backend.stats(f"{metric_name}:{platform}")
+        return {"count": count, "mean": mean, "std": math.sqrt(max(var, 0.0))}
+
+    def record_metric(
+        self, metric_name: str, platform: str, value: float, timestamp: Optional[float] = None
+    ) -> Tuple[bool, float]:
+        """
+        记录指标样本并检测异常（单次原子写入，O(1)）
 
         Args:
             metric_name: 指标名称
             platform: 平台标识
             value: 指标值
+            timestamp: 样本时间戳（默认当前时间）
+
+        Returns:
+            tuple: (是否异常, 异常分数)
         """
         try:
-            key = f"metric_history:{metric_name}:{platform}"
-            history = self.redis_client.get(key)
-
-            data = []
-            if history:
-                data = json.loads(history)
+            _, _, _, z_score = self.metric_backend.record(
+                f"{metric_name}:{platform}",
+                timestamp or time.time(),
+                float(value),
+                self.history_retention,
+                self.ewma_alpha,
+                self.min_samples,
+            )
+        except Exception as e:
+            logger.error(f"更新指标历史失败: {e}")
+            return False, 0.0
 
-            # 添加新数据
-            current_time = time.time()
-            data.append([current_time, value])
+        if not self._anomaly_enabled():
+            return False, 0.0
+        return self._judge(metric_name, z_score)
 
-            # 保留最近24小时的数据
-            cutoff_time = current_time - (24 * 3600)
-            data = [[t, v] for t, v in data if t >= cutoff_time]
+    def update_metric_history(self, metric_name: str, platform: str, value: float):
+        """
+        更新指标历史数据
 
-            # 保存数据
-            self.redis_client.setex(key, 24 * 3600, json.dumps(data))
+        Args:
+            metric_name: 指标名称
+            platform: 平台标识
+            value: 指标值
 
-        except Exception as e:
-            logger.error(f"更新指标历史失败: {e}")
+        Returns:
+            tuple: (是否异常, 异常分数)
+        """
+        return self.record_metric(metric_name, platform, value)
 
     def analyze_alert_trend(self, alert_type: str, platform: str, days: int = 7) -> Dict:
         """
@@ -0,0 +1,224 @@
+"""
+数据库租约队列
+基于队列表的通用任务领取/完成/重试原语，供采购同步、库存同步等队列共享
+
+功能：
+- 批量领取：SELECT … FOR UPDATE SKIP LOCKED，多个 worker 并发领取互不阻塞、不重复
+- 租约：领取时写入 leased_by 和 lease_expires_at，超时未完成的任务重新可见；
+  批次处理中每个任务前调用 keep_alive，租约过半时为整批续租
+- 退避：失败任务按重试次数指数退避，写入 next_attempt_at 后再被领取
+- 批量状态流转：完成/失败按批更新，只更新仍由本 worker 持有租约的任务
+
+队列模型需包含字段：status（pending/processing/success/failed）、retry_count、
+max_retries、error_message、processed_at、next_attempt_at、lease_expires_at、leased_by，
+并建立 (status, next_attempt_at) 和 (status, lease_expires_at) 索引。
+"""
+
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import timedelta
+from typing import Iterable, List, Sequence, Tuple
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseQueue:
+    """数据库租约队列"""
+
+    # 租约（可见性超时）时长，超过后任务可被其他 worker 重新领取
+    LEASE_SECONDS = 300
+    # 指数退避：base * 2^(重试次数-1)，不超过 max
+    BACKOFF_BASE = 30
+    BACKOFF_MAX = 3600
+    # 退避时间的随机抖动比例，避免同批失败的任务同时重试
+    BACKOFF_JITTER = 0.1
+
+    def __init__(self, model, lease_seconds: int = None, worker_id: str = None):
+        """
+        初始化租约队列
+
+        Args:
+            model: 队列模型
+            lease_seconds: 租约时长（秒）
+            worker_id: worker 标识，默认 主机名:进程号:随机串
+        """
+        self.model = model
+        self.lease = timedelta(seconds=lease_seconds or self.LEASE_SECONDS)
+        self.worker_id = (
+            worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )[:100]
+        # 下次需要续租的时间（领取或续租后经过半个租约）
+        self.renew_at = None
+
+    def backoff(self, retry_count: int) -> timedelta:
+        """第 retry_count 次失败后的等待时间"""
+        delay = min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** max(retry_count - 1, 0))
+        jitter = delay * self.BACKOFF_JITTER
+        return timedelta(seconds=delay + random.uniform(-jitter, jitter))
+
+    def claim(self, limit: int = 100, select_related: Sequence[str] = ()) -> List:
+        """
+        批量领取到期任务
+
+        可领取：到了 next_attempt_at 的待处理任务，以及租约已过期的处理中任务
+        （worker 崩溃或超时，重新领取计为一次重试，超过最大重试次数的直接置为失败）。
+        租约字段加入前遗留的处理中任务没有 lease_expires_at，同样视为租约过期。
+
+        Returns:
+            list: 领取到的任务（已置为 processing）
+        """
+        now = timezone.now()
+        expired = Q(status="processing") & (
+            Q(lease_expires_at__lt=now) | Q(lease_expires_at__isnull=True)
+        )
+
+        with transaction.atomic():
+            exhausted = self.model.objects.filter(expired, retry_count__gte=F("max_retries") - 1)
+            abandoned = exhausted.update(
+                status="failed",
+                error_message="处理超时，租约过期",
+                retry_count=F("retry_count") + 1,
+                lease_expires_at=None,
+                leased_by="",
+                updated_at=now,
+            )
+            if abandoned:
+                logger.warning(f"{self.model.__name__}: {abandoned} 个任务租约过期且重试耗尽")
+
+            ids = list(
+                self.model.objects.select_for_update(skip_locked=True)
+                .filter(Q(status="pending", next_attempt_at__lte=now) | expired)
+                .order_by("next_attempt_at")
+                .values_list("id", flat=True)[:limit]
+            )
+            if not ids:
+                return []
+
+            self.model.objects.filter(id__in=ids).update(
+                status="processing",
+                retry_count=Case(
+                    When(status="processing", then=F("retry_count") + 1),
+                    default=F("retry_count"),
+                ),
+                leased_by=self.worker_id,
+                lease_expires_at=now + self.lease,
+                processed_at=now,
+                updated_at=now,
+            )
+        self.renew_at = now + self.lease / 2
+
+        return list(
+            self.model.objects.filter(id__in=ids, leased_by=self.worker_id)
+            .select_related(*select_related)
+            .order_by("next_attempt_at")
+        )
+
+    def _owned(self, items: Iterable):
+        """仍由本 worker 持有租约的任务"""
+        return self.model.objects.filter(
+            id__in=[item.pk for item in items], status="processing", leased_by=self.worker_id
+        )
+
+    def extend(self, items: Iterable) -> int:
+        """续租（长任务处理中定期调用）"""
+        now = timezone.now()
+        self.renew_at = now + self.lease / 2
+        return self._owned(items).update(lease_expires_at=now + self.lease)
+
+    def keep_alive(self, items: Sequence) -> int:
+        """
+        批次处理中每个任务前调用：领取或上次续租后超过半个租约时为整批续租
+
+        已处理完、等待批量完成的任务也一并续租，避免批次末尾的租约先过期被其他 worker 重复领取。
+
+        Returns:
+            int: 续租的任务数（未到续租时间时为 0）
+        """
+        if self.renew_at is None or timezone.now() < self.renew_at:
+            return 0
+        return self.extend(items)
+
+    def complete(self, items: Iterable, **fields) -> int:
+        """
+        批量标记完成
+
+        Args:
+            items: 任务列表
+            **fields: 同时更新的其他字段（如 completed_at）
+
+        Returns:
+            int: 更新的任务数（租约已被他人接管的任务不更新）
+        """
+        items = list(items)
+        if not items:
+            return 0
+        return self._owned(items).update(
+            status="success",
+            error_message="",
+            lease_expires_at=None,
+            leased_by="",
+            updated_at=timezone.now(),
+            **fields,
+        )
+
+    def fail(self, failures: Iterable[Tuple[object, str]], retry: bool = True) -> Tuple[int, int]:
+        """
+        批量标记失败
+
+        未达到最大重试次数的任务回到 pending 并按退避时间推迟 next_attempt_at，
+        否则置为 failed。
+
+        Args:
+            failures: [(任务, 错误信息), ...]
+            retry: 是否允许重试，False 时直接置为失败
+
+        Returns:
+            tuple: (等待重试数, 最终失败数)
+        """
+        errors = {item.pk: (item, message) for item, message in failures}
+        if not errors:
+            return 0, 0
+
+        now = timezone.now()
+        retrying = failed = 0
+        with transaction.atomic():
+            owned = self._owned(item for item, _ in errors.values()).select_for_update()
+            updates = []
+            for pk in owned.values_list("id", flat=True):
+                item, message = errors[pk]
+                item.retry_count += 1
+                item.error_message = str(message)[:2000]
+                item.lease_expires_at = None
+                item.leased_by = ""
+                item.updated_at = now
+                if retry and item.retry_count < item.max_retries:
+                    item.status = "pending"
+                    item.next_attempt_at = now + self.backoff(item.retry_count)
+                    retrying += 1
+                else:
+                    item.status = "failed"
+                    failed += 1
+                updates.append(item)
+
+            self.model.objects.bulk_update(
+                updates,
+                [
+                    "status",
+                    "retry_count",
+                    "error_message",
+                    "next_attempt_at",
+                    "lease_expires_at",
+                    "leased_by",
+                    "updated_at",
+                ],
+                batch_size=500,
+            )
+
+        return retrying, failed
@@ -3,8 +3,30 @@ Signals for the core app.
 """
 
 from django.core.cache import cache
-from django.db.models.signals import post_delete, post_save
-from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+# 批量写入（bulk_create/bulk_update/QuerySet.update）不触发 post_save/post_delete，
+# 批量写入方通过 bump_version() 发送该信号，参数 models 为变更的模型标签集合
+bulk_data_changed = Signal()
+
+
+def bump_version(*models):
+    """
+    通知依赖模型数据的缓存：这些模型已被批量写入
+
+    信号在当前事务提交后发送（不在事务中时立即发送），
+    避免其他请求在提交前按新版本号缓存旧数据。
+
+    Args:
+        models: 模型类或模型标签（app_label.ModelName）
+    """
+    labels = frozenset(model if isinstance(model, str) else model._meta.label for model in models)
+    if not labels:
+        return
+
+    transaction.on_commit(lambda: bulk_data_changed.send(sender=None, models=labels), robust=True)
 
 
 @receiver(post_save)
@@ -32,3 +54,41 @@ def clear_company_cache(sender, **kwargs):
             for lang in ["zh-hans", "zh-cn", "en"]:
                 cache_key = f"active_company_{lang}"
                 cache.delete(cache_key)
+
+
+@receiver(pre_save, sender="products.Product")
+def remember_product_deleted(sender, instance, raw=False, **kwargs):
+    """
+    记录已软删除产品在数据库中原本是否已删除，只在删除状态变化时释放图片
+
+    Args:
+        sender: Product
+        instance: 产品实例
+        kwargs: 信号参数
+    """
+    if raw or not instance.is_deleted or instance.pk is None:
+        return
+    instance._was_deleted = sender._base_manager.filter(pk=instance.pk, is_deleted=True).exists()
+
+
+@receiver(post_save, sender="products.Product")
+@receiver(post_delete, sender="products.Product")
+def release_product_media(sender, instance, **kwargs):
+    """
+    产品删除（软删除或物理删除）时释放其图片引用，无其他引用的图片由垃圾回收清理
+
+    已软删除产品的再次保存不重复释放。
+
+    Args:
+        sender: Product
+        instance: 产品实例
+        kwargs: 信号参数
+    """
+    if kwargs.get("signal") is post_save:
+        was_deleted = instance.__dict__.pop("_was_deleted", False)
+        if not instance.is_deleted or was_deleted:
+            return
+
+    from .services.media_store import MediaStore, get_media_store
+
+    get_media_store().release(MediaStore.owner_key(instance))
@@ -357,3 +357,17 @@ def collect_system_health():
     except Exception as e:
         logger.error(f"Failed to collect system health: {str(e)}")
         raise
+
+
+@shared_task
+@task_monitor
+def collect_media_garbage():
+    """清理无引用的媒体文件"""
+    try:
+        from .services.media_store import get_media_store
+
+        deleted_count = get_media_store().collect_garbage()
+        return f"Deleted {deleted_count} orphan media blobs"
+    except Exception as e:
+        logger.error(f"Failed to collect media garbage: {str(e)}")
+        raise
@@ -0,0 +1,41 @@
+"""
+测试用 fakeredis 客户端
+
+fakeredis（以及执行 Lua 脚本需要的 lupa）不在 requirements 中，
+未安装时依赖它们的测试用 requires_fakeredis / requires_lua_redis 跳过。
+"""
+
+import unittest
+
+
+def fake_redis(connected=True):
+    """
+    独立的 fakeredis 客户端，未安装 fakeredis 时返回 None
+
+    Args:
+        connected: False 时返回连接断开的客户端（每条命令抛出 ConnectionError）
+    """
+    try:
+        import fakeredis
+    except ImportError:
+        return None
+
+    server = fakeredis.FakeServer()
+    server.connected = connected
+    return fakeredis.FakeRedis(server=server)
+
+
+def lua_redis():
+    """支持 Lua 脚本的 fakeredis 客户端，不可用时返回 None"""
+    client = fake_redis()
+    if client is None:
+        return None
+    try:
+        client.eval("return 1", 0)
+    except Exception:
+        return None
+    return client
+
+
+requires_fakeredis = unittest.skipIf(fake_redis() is None, "需要安装 fakeredis")
+requires_lua_redis = unittest.skipIf(lua_redis() is None, "需要安装 fakeredis[lua]")
@@ -0,0 +1,120 @@
+"""
+Core模块 - 分布式锁测试
+测试排队唤醒、FIFO公平性、防护令牌和读写锁（需要支持 Lua 的 fakeredis）
+"""
+
+import threading
+import time
+
+from core.services.distributed_lock import DistributedLock, DistributedRWLock
+from core.tests.redis_helpers import lua_redis, requires_lua_redis
+from django.test import SimpleTestCase
+
+
+@requires_lua_redis
+class DistributedLockTest(SimpleTestCase):
+    """分布式锁测试"""
+
+    def setUp(self):
+        self.redis = lua_redis()
+        self.redis.flushall()
+
+    def lock(self, name="sync_products:1"):
+        return DistributedLock(name, ttl=5, auto_renewal=False, redis_client=self.redis)
+
+    def test_fence_token_increases_and_nonblocking_does_not_queue(self):
+        """每次获取防护令牌递增，非阻塞获取失败不进入等待队列"""
+        first = self.lock()
+        self.assertTrue(first.acquire_sync(timeout=0))
+        self.assertFalse(self.lock().acquire_sync(timeout=0))
+        self.assertEqual(self.redis.llen("distributed_lock:sync_products:1:queue"), 0)
+        first.release_sync()
+
+        second = self.lock()
+        self.assertTrue(second.acquire_sync(timeout=0))
+        self.assertGreater(second.fence_token, first.fence_token)
+        second.release_sync()
+
+    def test_waiters_woken_in_fifo_order_on_release(self):
+        """释放锁后按排队顺序唤醒，不等待轮询间隔"""
+        holder = self.lock()
+        holder.acquire_sync()
+        order = []
+
+        def waiter(index):
+            lock = self.lock()
+            lock.acquire_sync(timeout=5)
+            order.append(index)
+            lock.release_sync()
+
+        threads = []
+        for index in range(3):
+            thread = threading.Thread(target=waiter, args=(index,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.05)
+
+        released_at = time.monotonic()
+        holder.release_sync()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, [0, 1, 2])
+        # 全部交接在一个等待周期（1秒）内完成
+        self.assertLess(time.monotonic() - released_at, 0.5)
+        self.assertEqual(
+            self.redis.keys("distributed_lock:sync_products:1:*"),
+            [b"distributed_lock:sync_products:1:fence"],
+        )
+
+    def test_timed_out_head_passes_wakeup_to_next_waiter(self):
+        """队首等待超时退出后，下一个等待者仍能获取锁"""
+        holder = self.lock()
+        holder.acquire_sync()
+        results = {}
+
+        quitter = threading.Thread(
+            target=lambda: results.setdefault("quitter", self.lock().acquire_sync(timeout=0.1))
+        )
+        quitter.start()
+        time.sleep(0.02)
+        patient = threading.Thread(
+            target=lambda: results.setdefault("patient", self.lock().acquire_sync(timeout=3))
+        )
+        patient.start()
+        quitter.join()
+        holder.release_sync()
+        patient.join()
+
+        self.assertEqual(results, {"quitter": False, "patient": True})
+
+    def test_read_write_lock(self):
+        """读锁共享，写锁独占，写等待者之后的读者排队"""
+        rw = DistributedRWLock("catalog:shopee", ttl=5, redis_client=self.redis)
+        readers = [rw.read_lock(auto_renewal=False) for _ in range(2)]
+        for reader in readers:
+            self.assertTrue(reader.acquire_sync(timeout=0))
+
+        writer = rw.write_lock(auto_renewal=False)
+        self.assertFalse(writer.acquire_sync(timeout=0))
+
+        result = {}
+        thread = threading.Thread(
+            target=lambda: result.setdefault("writer", writer.acquire_sync(timeout=3))
+        )
+        thread.start()
+        time.sleep(0.05)
+
+        # 写者已排队，新读者不能插队
+        self.assertFalse(rw.read_lock(auto_renewal=False).acquire_sync(timeout=0))
+
+        readers[0].release_sync()
+        time.sleep(0.05)
+        self.assertEqual(result, {})
+        readers[1].release_sync()
+        thread.join()
+
+        self.assertTrue(result["writer"])
+        self.assertGreater(writer.fence_token, max(reader.fence_token for reader in readers))
+        writer.release_sync()
+        self.assertTrue(rw.read_lock(auto_renewal=False).acquire_sync(timeout=0))
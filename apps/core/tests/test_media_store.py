@@ -0,0 +1,238 @@
+"""
+Core模块 - 媒体存储测试
+测试内容寻址去重、条件请求、衍生图和引用计数回收
+"""
+
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from core.models import MediaBlob, MediaSource
+from core.services.media_store import MediaStore, get_media_store
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+
+def make_image(color, size=(40, 20)):
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+
+class FakeSession:
+    """按URL返回预置内容的会话，支持 If-None-Match"""
+
+    def __init__(self, contents):
+        self.contents = contents
+        self.calls = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        headers = headers or {}
+        self.calls.append((url, headers))
+        content = self.contents[url]
+        etag = f'"{len(content)}"'
+        if headers.get("If-None-Match") == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, content, {"content-type": "image/png", "ETag": etag})
+
+
+class MediaStoreTestCase(TestCase):
+    """媒体存储测试"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        cache.clear()
+
+        self.red = make_image("red")
+        self.session = FakeSession(
+            {
+                "https://cdn1.example.com/a.png": self.red,
+                "https://cdn2.example.com/a.png?x=1": self.red,
+                "https://cdn1.example.com/b.png": make_image("blue"),
+            }
+        )
+        self.store = MediaStore(session=self.session)
+        # 小分块确保按流读取
+        self.store.CHUNK_SIZE = 16
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_same_content_from_different_urls_stored_once(self):
+        """不同URL的相同内容只保存一份"""
+        blobs = self.store.fetch_many(
+            list(self.session.contents) + ["https://cdn1.example.com/b.png"]
+        )
+
+        self.assertEqual(len(self.session.calls), 3)
+        self.assertEqual(MediaBlob.objects.count(), 2)
+        self.assertEqual(
+            blobs["https://cdn1.example.com/a.png"], blobs["https://cdn2.example.com/a.png?x=1"]
+        )
+        blob = blobs["https://cdn1.example.com/a.png"]
+        self.assertEqual(blob.size, len(self.red))
+        self.assertTrue(blob.path.endswith(".png"))
+        with default_storage.open(blob.path, "rb") as f:
+            self.assertEqual(f.read(), self.red)
+
+    def test_conditional_request_reuses_blob(self):
+        """来源未过期不发请求，过期后发送条件请求，304 时复用已有文件"""
+        url = "https://cdn1.example.com/a.png"
+        blob = self.store.fetch(url)
+        self.assertEqual(self.store.fetch(url), blob)
+        self.assertEqual(len(self.session.calls), 1)
+
+        MediaSource.objects.update(checked_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(self.store.fetch(url), blob)
+
+        self.assertEqual(len(self.session.calls), 2)
+        self.assertEqual(self.session.calls[1][1]["If-None-Match"], f'"{len(self.red)}"')
+        self.assertGreater(
+            MediaSource.objects.get().checked_at, timezone.now() - timedelta(minutes=1)
+        )
+
+    def test_variant_generated_lazily_and_cached(self):
+        """衍生图首次访问时生成，之后直接使用缓存"""
+        from PIL import Image
+
+        blob = self.store.fetch("https://cdn1.example.com/a.png")
+        with mock.patch.object(self.store, "_render", wraps=self.store._render) as render:
+            url = self.store.variant(blob, width=10)
+            self.assertEqual(self.store.variant(blob, width=10), url)
+        render.assert_called_once()
+
+        self.assertTrue(url.endswith(".webp"))
+        path = f"{MediaStore.VARIANT_PREFIX}/{blob.sha256[:2]}/{blob.sha256}/10x0_q80.webp"
+        with default_storage.open(path, "rb") as f:
+            img = Image.open(f)
+            self.assertEqual((img.format, img.size), ("WEBP", (10, 5)))
+
+    def test_reference_counting_and_garbage_collection(self):
+        """引用数随登记/替换/释放变化，无引用的文件被回收"""
+        blobs = self.store.fetch_many(self.session.contents)
+        red = blobs["https://cdn1.example.com/a.png"]
+        blue = blobs["https://cdn1.example.com/b.png"]
+        self.store.variant(red, width=10)
+
+        self.store.acquire_many({"product:1": [red, blue], "product:2": [red]})
+        self.store.acquire("product:1", [red])
+        red.refresh_from_db()
+        self.assertEqual(red.ref_count, 2)
+
+        self.store.replace("product:1", [blue])
+        self.store.release("product:2")
+        red.refresh_from_db()
+        blue.refresh_from_db()
+        self.assertEqual((red.ref_count, blue.ref_count), (0, 1))
+        self.assertEqual(self.store.references("product:1"), [blue])
+
+        # 保留期内不回收
+        self.assertEqual(self.store.collect_garbage(), 0)
+        self.assertEqual(self.store.collect_garbage(grace=timedelta(0)), 1)
+
+        self.assertFalse(MediaBlob.objects.filter(pk=red.pk).exists())
+        self.assertFalse(default_storage.exists(red.path))
+        self.assertFalse(
+            default_storage.exists(
+                f"{MediaStore.VARIANT_PREFIX}/{red.sha256[:2]}/{red.sha256}/10x0_q80.webp"
+            )
+        )
+        self.assertTrue(default_storage.exists(blue.path))
+        self.assertIsNone(MediaSource.objects.get(url="https://cdn1.example.com/a.png").blob)
+
+    def test_returned_blobs_refresh_grace_period(self):
+        """内容相同、304和未过期来源返回的无引用文件重新计算保留期"""
+        url = "https://cdn1.example.com/a.png"
+        blob = self.store.fetch(url)
+        expired = timezone.now() - timedelta(days=2)
+
+        MediaBlob.objects.update(updated_at=expired)
+        self.assertEqual(self.store.put(self.red), blob)
+        self.assertEqual(self.store.collect_garbage(), 0)
+
+        MediaBlob.objects.update(updated_at=expired)
+        MediaSource.objects.update(checked_at=expired)
+        self.assertEqual(self.store.fetch(url), blob)
+        self.assertEqual(self.session.calls[-1][1]["If-None-Match"], f'"{len(self.red)}"')
+        self.assertEqual(self.store.collect_garbage(), 0)
+
+        MediaBlob.objects.update(updated_at=expired)
+        self.assertEqual(self.store.fetch_many([url]), {url: blob})
+        self.assertEqual(self.store.collect_garbage(), 0)
+        self.assertTrue(default_storage.exists(blob.path))
+
+    def test_product_delete_releases_references(self):
+        """产品软删除或物理删除时释放其图片引用，只在删除状态变化时释放"""
+        from products.models import Product
+
+        blob = self.store.fetch("https://cdn1.example.com/a.png")
+        store = get_media_store()
+        soft = Product.objects.create(code="P1", name="软删除")
+        hard = Product.objects.create(code="P2", name="物理删除")
+        store.acquire_many({MediaStore.owner_key(soft): [blob], MediaStore.owner_key(hard): [blob]})
+
+        soft.save()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+
+        soft.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+        # 已软删除产品再次保存不重复释放
+        store.acquire_many({MediaStore.owner_key(soft): [blob]})
+        soft.save()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+        store.release(MediaStore.owner_key(soft))
+
+        hard.hard_delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+
+    def test_ecomm_sync_downloads_return_local_paths(self):
+        """电商同步下载返回本地路径，去重清理不会删除共享文件"""
+        from ecomm_sync.image_module.manager import ImageDownloader, ImageManager
+        from ecomm_sync.services.image_downloader import delete_duplicate_images
+
+        downloader = ImageDownloader()
+        downloader.store = self.store
+        urls = ["https://cdn1.example.com/a.png", "https://cdn2.example.com/a.png?x=1"]
+
+        result = downloader.download_product_images(urls, "SKU1")
+        path = default_storage.path(MediaBlob.objects.get().path)
+        self.assertEqual(result["paths"], [path, path])
+        self.assertEqual(ImageManager(downloader).get_image_path("SKU1"), path)
+
+        self.assertEqual(delete_duplicate_images(result["paths"]), 0)
+        self.assertTrue(default_storage.exists(MediaBlob.objects.get().path))
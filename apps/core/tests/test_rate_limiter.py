@@ -0,0 +1,80 @@
+"""
+Core模块 - 限流器测试
+测试进程本地令牌租约、全局速率和Redis不可用时的降级
+"""
+
+
+from core.services.rate_limiter import RateLimiter
+from core.tests.redis_helpers import fake_redis, lua_redis, requires_fakeredis, requires_lua_redis
+from django.test import SimpleTestCase
+
+
+@requires_lua_redis
+class RateLimiterLeaseTest(SimpleTestCase):
+    """令牌租约测试"""
+
+    def setUp(self):
+        self.redis = lua_redis()
+        self.redis.flushall()
+
+    def limiter(self):
+        return RateLimiter("taobao", rate=1, burst=20, redis_client=self.redis)
+
+    def test_lease_served_locally_without_redis_calls(self):
+        """一次租用后，租约内的获取不访问Redis"""
+        limiter = self.limiter()
+        self.assertTrue(limiter.acquire_sync(timeout=0))
+        self.assertEqual(limiter.lease_tokens, 5)
+
+        calls = []
+        limiter._lease_script = lambda **kwargs: calls.append(kwargs)
+        for _ in range(4):
+            self.assertTrue(limiter.acquire_sync(timeout=0))
+        self.assertEqual(calls, [])
+        self.assertEqual(limiter.get_status()["leased_tokens"], 0)
+
+    def test_processes_share_global_bucket(self):
+        """多个实例共享全局桶，总获取数不超过桶容量"""
+        limiters = [self.limiter() for _ in range(3)]
+        acquired = 0
+        for _ in range(10):
+            for limiter in limiters:
+                acquired += limiter.acquire_sync(timeout=0)
+        self.assertEqual(acquired, 20)
+
+    def test_release_lease_returns_tokens(self):
+        """归还未用完的令牌后其他实例可以使用"""
+        first, second = self.limiter(), self.limiter()
+        for _ in range(4):
+            first.acquire_sync(timeout=0)
+            second.acquire_sync(timeout=0)
+        # 两个实例各持有租约剩余的令牌
+        remaining = 20 - 10
+        taken = sum(second.acquire_sync(timeout=0) for _ in range(20))
+        self.assertEqual(taken, 1 + remaining)
+
+        first.release_lease()
+        self.assertEqual(first.get_status()["leased_tokens"], 0)
+        self.assertTrue(second.acquire_sync(timeout=0))
+
+
+class RateLimiterFallbackTest(SimpleTestCase):
+    """Redis不可用时的降级测试"""
+
+    @requires_fakeredis
+    def test_redis_failure_falls_back_to_conservative_local_bucket(self):
+        """Redis连接失败时按比例缩小的本地桶限流，而不是全部放行"""
+        limiter = RateLimiter("taobao", rate=1, burst=20, redis_client=fake_redis(connected=False))
+
+        acquired = sum(limiter.acquire_sync(timeout=0) for _ in range(20))
+        self.assertEqual(acquired, 5)
+        self.assertTrue(limiter.get_status()["degraded"])
+
+    def test_local_only_without_redis(self):
+        """未配置Redis时本地桶按完整速率和容量限流"""
+        limiter = RateLimiter("taobao", rate=1, burst=8)
+        self.assertIsNone(limiter.redis_client)
+
+        acquired = sum(limiter.acquire_sync(timeout=0) for _ in range(20))
+        self.assertEqual(acquired, 8)
+        self.assertEqual(limiter.get_status()["available_tokens"], 0)
@@ -0,0 +1,181 @@
+"""
+Core模块 - 重试管理器测试
+测试截止时间传递、对冲请求、重试预算和共享熔断器
+"""
+
+import asyncio
+import time
+import uuid
+
+from core.services.retry_manager import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    RetryManager,
+    deadline_scope,
+    remaining_time,
+    request_timeout,
+)
+from core.tests.redis_helpers import lua_redis, requires_lua_redis
+from django.test import SimpleTestCase
+
+
+class RecordingMonitor:
+    def __init__(self):
+        self.events = []
+
+    def record_event(self, platform, event, count=1):
+        self.events.append(event)
+
+
+class ExecuteWithDeadlineTest(SimpleTestCase):
+    """截止时间感知执行测试"""
+
+    def setUp(self):
+        self.monitor = RecordingMonitor()
+        self.manager = RetryManager(
+            max_retries=5,
+            base_delay=0.2,
+            jitter=False,
+            platform=f"test_{uuid.uuid4().hex[:8]}",
+            monitor=self.monitor,
+        )
+
+    def test_deadline_caps_retries_and_reaches_sync_calls(self):
+        """剩余时间不足以退避时停止重试；线程池中的同步函数可见剩余时间"""
+        seen = []
+
+        def fetch():
+            seen.append(remaining_time())
+            raise TimeoutError("timeout")
+
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(self.manager.execute_with_deadline(fetch, budget=0.5))
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        # 第一次重试等待0.2秒，第二次需要0.4秒，超过剩余时间
+        self.assertEqual(len(seen), 2)
+        self.assertTrue(all(0 < remaining <= 0.5 for remaining in seen))
+        self.assertEqual(self.monitor.events, ["retry", "deadline_exceeded"])
+
+    def test_request_timeout_raises_when_budget_spent(self):
+        """请求超时按剩余时间截断，预算用完时抛出 DeadlineExceeded 而不是返回0"""
+        self.assertEqual(request_timeout(30), 30)
+        with deadline_scope(5):
+            self.assertLessEqual(request_timeout(30), 5)
+            with deadline_scope(0):
+                self.assertEqual(remaining_time(30), 0)
+                with self.assertRaises(DeadlineExceeded):
+                    request_timeout(30)
+
+    def test_slow_attempt_cut_off_at_deadline(self):
+        """单次调用超过时间预算时抛出 DeadlineExceeded"""
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(self.manager.execute_with_deadline(slow, budget=0.1))
+
+    def test_hedged_request_after_p95_latency(self):
+        """超过近期延迟分位数未返回时发出对冲请求，取先返回的结果"""
+        for _ in range(20):
+            asyncio.run(self.manager.execute_with_deadline(asyncio.sleep, 0.01, endpoint="get"))
+        calls = []
+
+        async def get():
+            calls.append(time.monotonic())
+            await asyncio.sleep(1 if len(calls) == 1 else 0.01)
+            return len(calls)
+
+        started = time.monotonic()
+        result = asyncio.run(self.manager.execute_with_deadline(get, endpoint="get", hedge=True))
+
+        self.assertEqual(result, 2)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(self.monitor.events, ["hedge", "hedge_win"])
+
+    def test_retry_budget_stops_retry_storm(self):
+        """连续失败耗尽重试预算后不再重试"""
+        self.manager.base_delay = 0.001
+        self.manager.max_retries = 2
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            raise ConnectionError("connection refused")
+
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                asyncio.run(self.manager.execute_with_deadline(fetch))
+
+        # 预算10个令牌，每次失败扣1个，降到5个时停止重试：第二次调用只重试一次
+        self.assertEqual(len(calls), 3 + 2)
+        self.assertEqual(self.monitor.events[-1], "retry_budget_exhausted")
+
+    def test_non_retryable_error_does_not_trip_breaker(self):
+        """业务错误不重试，也不计入熔断"""
+
+        def fetch():
+            raise ValueError("invalid sku")
+
+        for _ in range(10):
+            with self.assertRaises(ValueError):
+                asyncio.run(self.manager.execute_with_deadline(fetch))
+        self.assertEqual(self.manager.get_circuit_breaker().state, "closed")
+
+
+class CircuitBreakerLocalTest(SimpleTestCase):
+    """熔断器进程内状态测试（未配置Redis）"""
+
+    def test_open_half_open_close(self):
+        name = f"test_{uuid.uuid4().hex[:8]}"
+        config = {"failure_threshold": 2, "window": 60, "open_seconds": 0.1}
+        breaker = CircuitBreaker(name, config=config)
+        self.assertIsNone(breaker.redis_client)
+
+        breaker.record_failure()
+        breaker.record_failure()
+        allowed, retry_after = CircuitBreaker(name, config=config).allow()
+        self.assertFalse(allowed)
+        self.assertGreater(retry_after, 0)
+
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow()[0])
+        # 探测请求在途时不放行其他调用
+        self.assertFalse(breaker.allow()[0])
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow()[0])
+
+
+@requires_lua_redis
+class SharedCircuitBreakerTest(SimpleTestCase):
+    """Redis共享熔断器测试"""
+
+    def test_breaker_state_shared_between_processes(self):
+        """一个进程触发熔断后，其他进程的调用直接被拒绝"""
+        redis = lua_redis()
+        redis.flushall()
+        first = RetryManager(
+            max_retries=1,
+            base_delay=0.001,
+            platform="shopee",
+            redis_client=redis,
+            monitor=RecordingMonitor(),
+        )
+
+        def fetch():
+            raise ConnectionError("connection reset")
+
+        # 每次调用失败2次，第3次调用的首次失败达到阈值5
+        for _ in range(3):
+            with self.assertRaises(ConnectionError):
+                asyncio.run(first.execute_with_deadline(fetch))
+        self.assertIn("breaker_opened", first._monitor.events)
+
+        second = RetryManager(platform="shopee", redis_client=redis, monitor=RecordingMonitor())
+        with self.assertRaises(CircuitOpenError):
+            asyncio.run(second.execute_with_deadline(lambda: "ok"))
+        self.assertEqual(redis.hget("circuit_breaker:shopee", "state"), b"open")
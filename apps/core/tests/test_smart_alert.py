@@ -0,0 +1,80 @@
+"""
+Core模块 - 智能告警指标历史测试
+测试滑动统计、环形缓冲裁剪和逐样本异常检测
+"""
+
+import math
+
+import numpy as np
+from core.services.smart_alert import LocalMetricBackend, SmartAlertService, update_running_stats
+from django.test import SimpleTestCase
+
+
+class RunningStatsTest(SimpleTestCase):
+    """滑动统计测试"""
+
+    def test_warmup_matches_exact_mean_and_variance(self):
+        """样本数少于 1/alpha 时等价于 Welford 累计"""
+        values = [3.0, 7.0, 1.0, 9.0, 4.0, 6.0]
+        count, mean, var = 0, 0.0, 0.0
+        for value in values:
+            count, mean, var, _ = update_running_stats(count, mean, var, value, 0.01, 3)
+
+        self.assertEqual(count, 6)
+        self.assertAlmostEqual(mean, np.mean(values))
+        self.assertAlmostEqual(var, np.var(values))
+
+    def test_score_uses_stats_before_sample(self):
+        """异常分数基于写入前的统计量，样本不足时为0"""
+        self.assertEqual(update_running_stats(2, 10.0, 4.0, 20.0, 0.1, 3)[3], 0.0)
+        self.assertEqual(update_running_stats(3, 10.0, 4.0, 20.0, 0.1, 3)[3], 5.0)
+
+
+class SmartAlertMetricTest(SimpleTestCase):
+    """指标记录与异常检测测试（进程内存储）"""
+
+    def setUp(self):
+        self.backend = LocalMetricBackend()
+        self.backend.clear()
+        self.service = SmartAlertService(metric_backend=self.backend)
+
+    def tearDown(self):
+        self.backend.clear()
+
+    def test_record_metric_flags_spike(self):
+        """平稳序列后的突增判定为异常"""
+        for value in 100 + 5 * np.sin(np.arange(40)):
+            is_anomaly, _ = self.service.record_metric("p95_latency", "shopee", value)
+            self.assertFalse(is_anomaly)
+
+        is_anomaly, score = self.service.record_metric("p95_latency", "shopee", 160)
+        self.assertTrue(is_anomaly)
+        self.assertGreater(score, 3.0)
+
+        stats = self.service.get_metric_stats("p95_latency", "shopee")
+        self.assertEqual(stats["count"], 41)
+        self.assertTrue(math.isfinite(stats["std"]))
+
+    def test_history_window_and_retention(self):
+        """历史按时间窗口读取，超出保留期的样本被裁剪"""
+        now = 1_000_000.0
+        retention = self.service.history_retention
+        self.service.record_metric("error_rate", "amazon", 1, timestamp=now - retention - 10)
+        self.service.record_metric("error_rate", "amazon", 2, timestamp=now - 7200)
+        self.service.record_metric("error_rate", "amazon", 3, timestamp=now)
+
+        self.assertEqual(self.backend.history("error_rate:amazon", 0), [2.0, 3.0])
+        self.assertEqual(self.backend.history("error_rate:amazon", now - 60), [3.0])
+        self.assertEqual(self.service.get_metric_stats("error_rate", "amazon")["count"], 3)
+
+    def test_detect_anomalies_on_value_list(self):
+        """列表接口与逐样本记录结果一致"""
+        values = [10.0, 11.0, 9.0, 10.5, 9.5, 10.0, 10.2, 9.8, 10.1, 9.9, 30.0]
+        is_anomaly, score = self.service.detect_anomalies("cpu_usage", values)
+
+        for value in values:
+            recorded = self.service.record_metric("cpu_usage", "system", value)
+
+        self.assertTrue(is_anomaly)
+        self.assertAlmostEqual(score, recorded[1])
+        self.assertEqual(self.service.detect_anomalies("cpu_usage", values[:5]), (False, 0.0))
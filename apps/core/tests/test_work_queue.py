@@ -0,0 +1,127 @@
+"""
+Core模块 - 数据库租约队列测试
+测试批量领取、租约过期重新领取、指数退避和批量状态流转
+"""
+
+from datetime import timedelta
+
+from core.models import Platform
+from core.services.work_queue import LeaseQueue
+from django.test import TestCase
+from django.utils import timezone
+from ecomm_sync.models import PlatformAccount, StockSyncQueue
+from products.models import Product
+
+
+class LeaseQueueTest(TestCase):
+    """租约队列测试"""
+
+    def setUp(self):
+        self.platform = Platform.objects.create(
+            platform_name="Shopee", platform_code="shopee", platform_type="cross"
+        )
+        self.account = PlatformAccount.objects.create(
+            account_type="shopee", platform=self.platform, account_name="测试店铺"
+        )
+        self.product = Product.objects.create(name="队列商品", code="QUEUE001")
+        self.jobs = [self.create_job(quantity) for quantity in range(3)]
+
+    def create_job(self, quantity, **kwargs):
+        return StockSyncQueue.objects.create(
+            product=self.product,
+            platform=self.platform,
+            account=self.account,
+            sync_type="push",
+            quantity=quantity,
+            **kwargs,
+        )
+
+    def test_workers_claim_disjoint_batches(self):
+        """多个 worker 领取的任务互不重复，未到期的任务不会被领取"""
+        self.create_job(9, next_attempt_at=timezone.now() + timedelta(minutes=5))
+        first = LeaseQueue(StockSyncQueue, worker_id="worker-1")
+        second = LeaseQueue(StockSyncQueue, worker_id="worker-2")
+
+        claimed = first.claim(limit=2)
+        rest = second.claim(limit=10)
+
+        self.assertEqual([job.quantity for job in claimed], [0, 1])
+        self.assertEqual([job.quantity for job in rest], [2])
+        self.assertEqual(second.claim(limit=10), [])
+        self.assertTrue(all(job.status == "processing" for job in claimed + rest))
+        self.assertEqual({job.leased_by for job in claimed}, {"worker-1"})
+
+        self.assertEqual(first.complete(claimed), 2)
+        self.assertEqual(StockSyncQueue.objects.filter(status="success").count(), 2)
+
+    def test_failed_jobs_back_off_until_max_retries(self):
+        """失败任务指数退避后重试，达到最大重试次数置为失败"""
+        queue = LeaseQueue(StockSyncQueue, worker_id="worker-1")
+        queue.BACKOFF_JITTER = 0
+
+        job = queue.claim(limit=1)[0]
+        self.assertEqual(queue.fail([(job, "平台超时")]), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.retry_count, job.leased_by), ("pending", 1, ""))
+        delay = job.next_attempt_at - timezone.now()
+        self.assertAlmostEqual(delay.total_seconds(), queue.BACKOFF_BASE, delta=5)
+        self.assertNotIn(job.pk, [item.pk for item in queue.claim(limit=10)])
+
+        self.assertEqual(queue.backoff(3), timedelta(seconds=queue.BACKOFF_BASE * 4))
+        self.assertEqual(queue.backoff(20), timedelta(seconds=queue.BACKOFF_MAX))
+
+        StockSyncQueue.objects.filter(pk=job.pk).update(
+            retry_count=2, next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+        job = queue.claim(limit=1)[0]
+        self.assertEqual(queue.fail([(job, "平台超时")]), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.retry_count, job.error_message), ("failed", 3, "平台超时"))
+
+    def test_expired_lease_is_reclaimed(self):
+        """租约过期的任务被其他 worker 重新领取，原 worker 的完成不再生效"""
+        stale = LeaseQueue(StockSyncQueue, worker_id="worker-1")
+        claimed = stale.claim(limit=3)
+        StockSyncQueue.objects.filter(pk=claimed[0].pk).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        StockSyncQueue.objects.filter(pk=claimed[1].pk).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1), retry_count=2
+        )
+
+        fresh = LeaseQueue(StockSyncQueue, worker_id="worker-2")
+        reclaimed = fresh.claim(limit=10)
+
+        self.assertEqual([job.pk for job in reclaimed], [claimed[0].pk])
+        self.assertEqual(reclaimed[0].retry_count, 1)
+        self.assertEqual(StockSyncQueue.objects.get(pk=claimed[1].pk).status, "failed")
+
+        self.assertEqual(stale.complete(claimed), 1)
+        self.assertEqual(fresh.extend(reclaimed), 1)
+        self.assertEqual(fresh.complete(reclaimed), 1)
+
+    def test_keep_alive_renews_batch_after_half_lease(self):
+        """批次处理超过半个租约时整批续租，之前不额外更新"""
+        queue = LeaseQueue(StockSyncQueue, lease_seconds=60, worker_id="worker-1")
+        claimed = queue.claim(limit=3)
+        self.assertEqual(queue.keep_alive(claimed), 0)
+
+        expires = timezone.now() + timedelta(seconds=10)
+        StockSyncQueue.objects.update(lease_expires_at=expires)
+        queue.renew_at = timezone.now() - timedelta(seconds=1)
+
+        self.assertEqual(queue.keep_alive(claimed), 3)
+        self.assertTrue(all(job.lease_expires_at > expires for job in StockSyncQueue.objects.all()))
+        self.assertEqual(queue.keep_alive(claimed), 0)
+
+    def test_legacy_processing_rows_are_reclaimed(self):
+        """租约字段加入前遗留的处理中任务（无租约到期时间）可被重新领取"""
+        StockSyncQueue.objects.filter(pk=self.jobs[0].pk).update(
+            status="processing", lease_expires_at=None
+        )
+        StockSyncQueue.objects.exclude(pk=self.jobs[0].pk).update(status="success")
+
+        reclaimed = LeaseQueue(StockSyncQueue, worker_id="worker-1").claim(limit=10)
+
+        self.assertEqual([job.pk for job in reclaimed], [self.jobs[0].pk])
+        self.assertEqual((reclaimed[0].retry_count, reclaimed[0].leased_by), (1, "worker-1"))
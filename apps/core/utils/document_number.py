@@ -339,6 +339,55 @@ class DocumentNumberGenerator:
 
         return document_number
 
+    @staticmethod
+    def generate_batch(prefix_key, count, date_value=None):
+        """
+        Generate ``count`` consecutive document numbers with a single sequence update.
+
+        Prefix, date format and sequence digits are read once and the sequence row is
+        locked once, instead of once per document. Numbers of deleted documents are not
+        reused (same as ``generate`` without ``model_class``).
+
+        Args:
+            prefix_key (str): Document type key or legacy prefix string
+            count (int): Number of document numbers to allocate
+            date_value (date, optional): Date for the documents. Defaults to today.
+
+        Returns:
+            list: Generated document numbers in sequence order
+
+        Example:
+            >>> DocumentNumberGenerator.generate_batch('delivery', 3)
+            ['OUT251108001', 'OUT251108002', 'OUT251108003']
+        """
+        if count <= 0:
+            return []
+        if date_value is None:
+            date_value = timezone.now().date()
+
+        prefix = DocumentNumberGenerator.get_prefix(prefix_key)
+        date_format = DocumentNumberGenerator.get_date_format()
+        sequence_digits = DocumentNumberGenerator.get_sequence_digits()
+        date_str = DocumentNumberGenerator.format_date(date_value, date_format)
+
+        from core.models import DocumentNumberSequence
+
+        with transaction.atomic():
+            (
+                sequence_obj,
+                created,
+            ) = DocumentNumberSequence.objects.select_for_update().get_or_create(
+                prefix=prefix, date_str=date_str, defaults={"current_number": 0}
+            )
+            start = sequence_obj.current_number + 1
+            sequence_obj.current_number += count
+            sequence_obj.save()
+
+        return [
+            f"{prefix}{date_str}{str(sequence).zfill(sequence_digits)}"
+            for sequence in range(start, start + count)
+        ]
+
     @staticmethod
     def _get_next_sequence(prefix, date_str, model_class=None, check_deleted=True):
         """
@@ -126,3 +126,41 @@ def optimize_queryset_for_list(
         queryset = queryset.only(*only_fields)
 
     return queryset
+
+
+def sum_related(instance, related_name, field, **filters):
+    """
+    汇总一对多关联对象的字段 - 单次SUM聚合，不加载关联对象
+
+    关联对象已通过 prefetch_related 预加载时直接在内存中求和，不再查询数据库。
+
+    Args:
+        instance: 模型实例
+        related_name: 反向关联名称，如 'items'
+        field: 汇总字段，如 'line_total'
+        **filters: 关联对象的等值过滤条件，如 is_deleted=False
+
+    Returns:
+        Decimal: 汇总值（没有关联对象时为0）
+
+    Example:
+        >>> subtotal = sum_related(order, 'items', 'line_total', is_deleted=False)
+    """
+    from decimal import Decimal
+
+    from django.db.models import Sum
+
+    prefetched = getattr(instance, "_prefetched_objects_cache", {}).get(related_name)
+    if prefetched is not None:
+        return sum(
+            (
+                getattr(obj, field)
+                for obj in prefetched
+                if all(getattr(obj, key) == value for key, value in filters.items())
+            ),
+            Decimal("0"),
+        )
+
+    manager = getattr(instance, related_name)
+    total = manager.filter(**filters).aggregate(total=Sum(field))["total"]
+    return total if total is not None else Decimal("0")
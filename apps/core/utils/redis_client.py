@@ -0,0 +1,53 @@
+"""
+Redis 客户端获取工具
+
+Django cache 只提供 get/set/incr 等通用接口，计数器哈希、有序集合、
+Lua脚本等需要直接使用底层 redis-py 客户端。
+"""
+
+import logging
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+def get_redis_client(alias: str = "default", write: bool = True):
+    """
+    获取 cache 别名对应的 redis-py 客户端
+
+    支持 Django 内置 RedisCache 和 django-redis 两种后端。
+    当前 cache 不是 Redis（如本地开发使用的 LocMemCache）时返回 None，
+    调用方应退化为进程内实现。
+
+    Args:
+        alias: CACHES 中的别名
+        write: 是否获取写连接（主从部署时）
+
+    Returns:
+        redis.Redis 实例或 None
+    """
+    try:
+        backend = caches[alias]
+    except Exception:
+        return None
+
+    # Django 内置 RedisCache
+    client_factory = getattr(backend, "_cache", None)
+    if client_factory is not None and hasattr(client_factory, "get_client"):
+        try:
+            return client_factory.get_client(write=write)
+        except Exception as e:
+            logger.warning(f"获取Redis客户端失败: {str(e)}")
+            return None
+
+    # django-redis
+    client = getattr(backend, "client", None)
+    if client is not None and hasattr(client, "get_client"):
+        try:
+            return client.get_client(write=write)
+        except Exception as e:
+            logger.warning(f"获取Redis客户端失败: {str(e)}")
+            return None
+
+    return None
@@ -1,12 +1,13 @@
 import logging
 import time
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from contextlib import contextmanager
+from typing import Dict, List, Optional
 
 import requests
 from core.services.monitor import get_monitor
 from core.services.rate_limiter import get_rate_limiter
-from core.services.retry_manager import get_retry_manager
+from core.services.retry_manager import deadline_scope, get_retry_manager, request_timeout
 from ecomm_sync.models import PlatformAccount
 
 logger = logging.getLogger(__name__)
@@ -26,16 +27,27 @@ class BaseAdapter(ABC):
         self.auth_config = account.auth_config
         self.base_url = ""
         self.timeout = 30
+        self._budget = None
 
         # 集成核心服务
         self.platform = account.account_type
         self.rate_limiter = get_rate_limiter(self.platform)
-        self.retry_manager = get_retry_manager()
+        self.retry_manager = get_retry_manager(platform=self.platform)
         self.monitor = get_monitor()
 
         self.session = requests.Session()
         self._setup_session()
 
+    @property
+    def budget(self) -> float:
+        """一次业务操作（可能包含分页、批量等多次请求）的默认时间预算（秒），默认为单次超时的3倍"""
+        return self._budget if self._budget is not None else self.timeout * 3
+
+    @budget.setter
+    def budget(self, value: Optional[float]):
+        """单独设置时间预算，设为 None 时恢复按单次超时计算"""
+        self._budget = value
+
     @abstractmethod
     def _setup_session(self):
         """设置Session（认证方式不同）"""
@@ -180,6 +192,21 @@ class BaseAdapter(ABC):
 
     # ========== 通用方法 ==========
 
+    @contextmanager
+    def deadline(self, budget: Optional[float] = None):
+        """
+        为一次业务操作设置整体时间预算，期间的请求超时按剩余时间截断
+
+        Args:
+            budget: 时间预算（秒），默认 self.budget；不超过外层已有的截止时间
+
+        Example:
+            >>> with adapter.deadline():
+            ...     adapter.update_inventory(sku, quantity)
+        """
+        with deadline_scope(budget or self.budget):
+            yield
+
     async def _make_request_async(
         self,
         method: str,
@@ -201,6 +228,7 @@ class BaseAdapter(ABC):
             API响应数据
 
         Raises:
+            DeadlineExceeded: 超过 deadline() 设置的时间预算
             Exception: 请求失败
         """
         import aiohttp
@@ -211,6 +239,7 @@ class BaseAdapter(ABC):
         # 限流检查
         if self.rate_limiter:
             await self.rate_limiter.acquire()
+        timeout = request_timeout(self.timeout)
 
         try:
             async with aiohttp.ClientSession() as session:
@@ -220,7 +249,7 @@ class BaseAdapter(ABC):
                     json=data,
                     params=params,
                     headers=headers,
-                    timeout=self.timeout,
+                    timeout=timeout,
                 ) as response:
                     response.raise_for_status()
                     result = await response.json()
@@ -313,6 +342,7 @@ class BaseAdapter(ABC):
             API响应数据
 
         Raises:
+            DeadlineExceeded: 超过 deadline() 设置的时间预算
             Exception: 请求失败
         """
         url = f"{self.base_url}/{endpoint.lstrip('/')}" if self.base_url else endpoint
@@ -321,6 +351,7 @@ class BaseAdapter(ABC):
         # 限流检查
         if self.rate_limiter:
             self.rate_limiter.acquire_sync()
+        timeout = request_timeout(self.timeout)
 
         try:
             response = self.session.request(
@@ -329,7 +360,7 @@ class BaseAdapter(ABC):
                 json=data,
                 params=params,
                 headers=headers,
-                timeout=self.timeout,
+                timeout=timeout,
             )
             response.raise_for_status()
             result = response.json()
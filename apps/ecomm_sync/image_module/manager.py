@@ -1,12 +1,17 @@
 import logging
-import os
 from typing import List
 
 import requests
+from core.services.media_store import MediaStore
 
 logger = logging.getLogger(__name__)
 
 
+def product_owner(product_code: str) -> str:
+    """商品图片在媒体存储中的引用方标识"""
+    return f"product_code:{product_code}"
+
+
 class ImageDownloader:
     """图片下载器"""
 
@@ -20,6 +25,7 @@ class ImageDownloader:
                 "Accept-Language": "zh-CN,zh;q=0.9",
             }
         )
+        self.store = MediaStore(session=self.session, timeout=timeout)
 
     def download_product_images(self, image_urls: List[str], product_code: str) -> dict:
         if not image_urls:
@@ -27,35 +33,13 @@ class ImageDownloader:
 
         logger.info(f"开始下载 {product_code} 的 {len(image_urls)} 张图片")
 
-        downloaded_paths = []
-        success_count = 0
-        failed_count = 0
-
-        for i, url in enumerate(image_urls, 1):
-            try:
-                logger.info(f"下载 {i}/{len(image_urls)}: {url[:80]}...")
-                filename = f"{product_code}_{i:04d}.jpg"
-                local_path = os.path.join("media/products/imported", filename)
-
-                os.makedirs(os.path.dirname(local_path), exist_ok=True)
-
-                response = self.session.get(url, timeout=self.timeout)
-                response.raise_for_status()
-
-                if response.status_code == 200:
-                    with open(local_path, "wb") as f:
-                        f.write(response.content)
-
-                    downloaded_paths.append(local_path)
-                    success_count += 1
-                    logger.info(f"下载成功: {local_path}")
-                else:
-                    failed_count += 1
-
-            except Exception as e:
-                failed_count += 1
-                logger.error(f"下载失败: {url}, 错误: {e}")
+        # 图片按内容哈希保存在共享媒体存储中，重复图片只保存一份
+        blobs = self.store.fetch_many(image_urls)
+        downloaded = [blobs[url] for url in image_urls if url in blobs]
+        self.store.replace(product_owner(product_code), downloaded)
 
+        success_count = len(downloaded)
+        failed_count = len(image_urls) - success_count
         logger.info(
             f"下载完成: 成功 {success_count}/{len(image_urls)}, 失败 {failed_count}/{len(image_urls)}"
         )
@@ -64,7 +48,7 @@ class ImageDownloader:
             "total": len(image_urls),
             "success": success_count,
             "failed": failed_count,
-            "paths": downloaded_paths,
+            "paths": [MediaStore.local_path(blob) for blob in downloaded],
         }
 
 
@@ -78,7 +62,8 @@ class ImageManager:
         return self.downloader.download_product_images(image_urls, product_code)
 
     def get_image_path(self, product_code: str, image_index: int = 0) -> str:
-        return f"media/products/imported/{product_code}_{image_index:04d}.jpg"
+        blobs = self.downloader.store.references(product_owner(product_code))
+        return MediaStore.local_path(blobs[image_index]) if image_index < len(blobs) else ""
 
     def test_connection(self) -> bool:
         return self.downloader.test_connection()
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.9 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ecomm_sync", "0006_alter_platformaccount_account_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ecommproduct",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="变更检测字段的整体指纹",
+                max_length=64,
+                verbose_name="内容指纹",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ecommproduct",
+            name="field_hashes",
+            field=models.JSONField(blank=True, default=dict, verbose_name="字段指纹"),
+        ),
+    ]
@@ -1,7 +1,41 @@
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Sequence
+
 from core.models import BaseModel, Platform
 from django.db import models
+from django.utils import timezone
 from products.models import Product
 
+# 参与变更检测的采集字段
+FINGERPRINT_FIELDS = ("price", "stock", "status", "description")
+
+
+def content_fingerprint(value) -> str:
+    """采集内容指纹（JSON 规范化后取 SHA-256）"""
+    raw = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def normalize_scrape_value(field: str, value):
+    """
+    规范化采集字段值，使指纹和 raw_data 与采集器返回的数值类型无关
+
+    价格统一为两位小数字符串（Decimal/float/str 均可），库存统一为整数；
+    无法转换的值保持原样。
+    """
+    if value is None or value == "":
+        return value
+    try:
+        if field == "price":
+            return str(Decimal(str(value)).quantize(Decimal("0.01")))
+        if field == "stock":
+            return int(Decimal(str(value)))
+    except (InvalidOperation, ValueError):
+        pass
+    return value
+
 
 class EcommProduct(BaseModel):
     """采集的商品数据（原始数据）"""
@@ -39,6 +73,10 @@ class EcommProduct(BaseModel):
     last_synced_at = models.DateTimeField("最后同步时间", null=True, blank=True)
     last_scraped_at = models.DateTimeField("最后采集时间", null=True, blank=True)
     is_delisted = models.BooleanField("是否下架", default=False, help_text="平台商品是否已下架")
+    content_hash = models.CharField(
+        "内容指纹", max_length=64, blank=True, default="", help_text="变更检测字段的整体指纹"
+    )
+    field_hashes = models.JSONField("字段指纹", default=dict, blank=True)
 
     class Meta:
         verbose_name = "电商商品"
@@ -54,6 +92,44 @@ class EcommProduct(BaseModel):
     def __str__(self):
         return f"{self.platform.name} - {self.external_id}"
 
+    @staticmethod
+    def combine_hashes(field_hashes: Dict[str, str]) -> str:
+        return content_fingerprint([field_hashes.get(field) for field in FINGERPRINT_FIELDS])
+
+    def stage_scrape(
+        self, scrape_result: Dict, fields: Sequence[str] = FINGERPRINT_FIELDS
+    ) -> List[str]:
+        """
+        按内容指纹对比最新采集数据，把变更字段合并进 raw_data 并刷新指纹（不保存）
+
+        检测全部字段时先比较整体指纹，一致则直接返回；
+        只合并变更的字段，不用整个采集结果覆盖原始数据；价格和库存先规范化类型。
+
+        Args:
+            scrape_result: 最新采集数据
+            fields: 检测的字段
+
+        Returns:
+            list: 变更的字段
+        """
+        values = {
+            field: normalize_scrape_value(field, scrape_result.get(field)) for field in fields
+        }
+        hashes = {field: content_fingerprint(value) for field, value in values.items()}
+        full_scan = hashes.keys() == set(FINGERPRINT_FIELDS)
+        if full_scan and self.combine_hashes(hashes) == self.content_hash:
+            return []
+
+        changed = [field for field in fields if self.field_hashes.get(field) != hashes[field]]
+        if changed:
+            self.field_hashes = {**self.field_hashes, **{field: hashes[field] for field in changed}}
+            self.content_hash = self.combine_hashes(self.field_hashes)
+            self.raw_data = {
+                **self.raw_data,
+                **{field: values[field] for field in changed},
+            }
+        return changed
+
 
 class SyncStrategy(BaseModel):
     """同步策略配置"""
@@ -427,6 +503,13 @@ class StockSyncQueue(BaseModel):
     max_retries = models.IntegerField("最大重试次数", default=3)
 
     processed_at = models.DateTimeField("处理时间", null=True, blank=True)
+    next_attempt_at = models.DateTimeField(
+        "下次处理时间", default=timezone.now, help_text="失败重试时按退避时间推迟"
+    )
+    lease_expires_at = models.DateTimeField(
+        "租约到期时间", null=True, blank=True, help_text="超时未完成的任务可被重新领取"
+    )
+    leased_by = models.CharField("处理节点", max_length=100, blank=True)
 
     class Meta:
         verbose_name = "库存同步队列"
@@ -436,6 +519,8 @@ class StockSyncQueue(BaseModel):
             models.Index(fields=["platform", "status"]),
             models.Index(fields=["status", "created_at"]),
             models.Index(fields=["sync_type", "status"]),
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["status", "lease_expires_at"]),
         ]
         ordering = ["-created_at"]
 
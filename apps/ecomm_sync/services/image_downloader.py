@@ -6,47 +6,33 @@ import logging
 import os
 
 import requests
+from core.services.media_store import MediaStore, get_media_store, hash_file
+from ecomm_sync.image_module.manager import product_owner
 
 logger = logging.getLogger(__name__)
 
 
 def download_product_images(image_urls, product_code):
-    """下载产品图片"""
+    """下载产品图片（按内容哈希保存在共享媒体存储中，返回本地图片路径列表）"""
     if not image_urls:
         logger.warning(f"产品 {product_code} 无图片URL")
         return []
 
     logger.info(f"开始下载 {product_code} 的 {len(image_urls)} 张图片")
 
-    downloaded_paths = []
-    success_count = 0
-    failed_count = 0
-
-    for idx, url in enumerate(image_urls):
-        try:
-            filename = f"{product_code}_{idx+1:04d}.jpg"
-            local_path = os.path.join("media/products/imported", filename)
-            os.makedirs("media/products/imported", exist_ok=True)
-
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-
-            with open(local_path, "wb") as f:
-                f.write(response.content)
-
-            downloaded_paths.append(local_path)
-            success_count += 1
-            logger.info(f"下载成功: {filename}")
-
-        except Exception as e:
-            failed_count += 1
-            logger.error(f"下载失败: {url}, 错误: {e}")
+    store = get_media_store()
+    blobs = store.fetch_many(image_urls)
+    downloaded = [blobs[url] for url in image_urls if url in blobs]
+    store.replace(product_owner(product_code), downloaded)
 
+    success_count = len(downloaded)
+    failed_count = len(image_urls) - success_count
     logger.info(
-        f"产品 {product_code} 下载完成: 成功 {success_count}/{len(image_urls)}, 失败 {failed_count}/{len(image_urls)}"
+        f"产品 {product_code} 下载完成: "
+        f"成功 {success_count}/{len(image_urls)}, 失败 {failed_count}/{len(image_urls)}"
     )
 
-    return downloaded_paths
+    return [MediaStore.local_path(blob) for blob in downloaded]
 
 
 def test_connection(test_url="https://www.baidu.com"):
@@ -62,14 +48,11 @@ def test_connection(test_url="https://www.baidu.com"):
 
 
 def get_image_hash(image_path):
-    """获取图片哈希值（8位）"""
+    """获取图片内容哈希值（SHA-256，分块读取）"""
     if not os.path.exists(image_path):
         return ""
 
-    with open(image_path, "rb") as f:
-        import hashlib
-
-        return hashlib.sha256(f.read()).hexdigest()[:8]
+    return hash_file(image_path)
 
 
 def get_image_size(image_path):
@@ -115,11 +98,16 @@ def compress_image(image_path, quality=85):
 
 
 def delete_duplicate_images(image_paths):
-    """删除重复图片"""
+    """
+    删除重复图片
+
+    仅用于清理接入媒体存储之前按URL命名保存的旧文件，新下载的图片已按内容去重。
+    同一路径出现多次时只处理一次，不会删除多个商品共享的文件。
+    """
     seen_hashes = {}
     deleted_count = 0
 
-    for path in image_paths:
+    for path in dict.fromkeys(image_paths):
         if not os.path.exists(path):
             continue
 
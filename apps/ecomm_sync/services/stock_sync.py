@@ -1,5 +1,6 @@
 import logging
 
+from core.services.work_queue import LeaseQueue
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -35,7 +36,10 @@ class StockSyncService:
             try:
                 adapter = get_adapter(listing.account)
 
-                success = adapter.update_inventory(sku=listing.platform_sku, quantity=total_stock)
+                with adapter.deadline():
+                    success = adapter.update_inventory(
+                        sku=listing.platform_sku, quantity=total_stock
+                    )
 
                 if success:
                     results["success"] += 1
@@ -78,7 +82,8 @@ class StockSyncService:
         for account in accounts:
             try:
                 adapter = get_adapter(account)
-                products = adapter.get_products()
+                with adapter.deadline():
+                    products = adapter.get_products()
 
                 for product_data in products:
                     sku = product_data["sku"]
@@ -115,69 +120,63 @@ class StockSyncService:
         from ecomm_sync.models import ProductListing, StockSyncQueue
         from inventory.models import ProductStock
 
-        queues = (
-            StockSyncQueue.objects.filter(status="pending")
-            .select_for_update()
-            .order_by("created_at")[:limit]
-        )
+        # 批量领取到期任务（SKIP LOCKED，并发 worker 不会重复处理）
+        queue = LeaseQueue(StockSyncQueue)
+        jobs = queue.claim(limit)
 
-        results = {"total": queues.count(), "success": 0, "failed": 0}
+        results = {"total": len(jobs), "success": 0, "failed": 0}
+        succeeded = []
+        failures = []
+        missing = []
 
-        for queue in queues:
+        for job in jobs:
+            # 批次耗时超过半个租约时续租，避免未处理完的任务被其他 worker 重新领取
+            queue.keep_alive(jobs)
             try:
-                queue.status = "processing"
-                queue.save()
-
-                if queue.sync_type == "push":
-                    stock = ProductStock.objects.filter(product__code=queue.product.code).first()
-                    if not stock:
-                        queue.status = "failed"
-                        queue.error_message = "库存不存在"
-                        queue.save()
-                        continue
+                stock = ProductStock.objects.filter(product_id=job.product_id).first()
+                if not stock:
+                    missing.append((job, "库存不存在"))
+                    results["failed"] += 1
+                    continue
 
+                if job.sync_type == "push":
                     listings = ProductListing.objects.filter(
-                        product=queue.product,
-                        platform=queue.platform,
+                        product_id=job.product_id,
+                        platform_id=job.platform_id,
                         sync_enabled=True,
-                    )
+                    ).select_related("account")
 
                     for listing in listings:
                         adapter = get_adapter(listing.account)
-                        success = adapter.update_inventory(
-                            sku=listing.platform_sku, quantity=queue.quantity
-                        )
+                        with adapter.deadline():
+                            success = adapter.update_inventory(
+                                sku=listing.platform_sku, quantity=job.quantity
+                            )
 
                         if success:
-                            listing.quantity = queue.quantity
+                            listing.quantity = job.quantity
                             listing.last_synced_at = timezone.now()
-                            listing.save()
+                            listing.save(update_fields=["quantity", "last_synced_at", "updated_at"])
                             results["success"] += 1
                         else:
                             results["failed"] += 1
 
-                elif queue.sync_type == "pull":
-                    stock = ProductStock.objects.filter(product__code=queue.product.code).first()
-                    if stock:
-                        stock.qty_in_stock = queue.quantity
-                        stock.save()
-                        results["success"] += 1
-                    else:
-                        results["failed"] += 1
+                elif job.sync_type == "pull":
+                    stock.qty_in_stock = job.quantity
+                    stock.save()
+                    results["success"] += 1
 
-                queue.status = "success"
-                queue.processed_at = timezone.now()
-                queue.save()
+                succeeded.append(job)
 
             except Exception as e:
-                logger.error(f"处理库存同步队列失败: {queue.id}, 错误: {e}")
-                queue.status = "failed"
-                queue.error_message = str(e)
-                queue.retry_count += 1
-                queue.save()
-
-                if queue.retry_count >= queue.max_retries:
-                    results["failed"] += 1
+                logger.error(f"处理库存同步队列失败: {job.id}, 错误: {e}")
+                failures.append((job, str(e)))
+
+        # 批量更新状态：异常任务按退避时间重试，库存不存在的任务直接置为失败
+        queue.complete(succeeded)
+        queue.fail(missing, retry=False)
+        _, exhausted = queue.fail(failures)
+        results["failed"] += exhausted
 
         return results
 
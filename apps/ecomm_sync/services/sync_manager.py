@@ -1,8 +1,18 @@
 import logging
-from typing import Dict
+from decimal import Decimal
+from typing import Dict, Sequence
 
+from django.db import transaction
 from django.utils import timezone
-from ecomm_sync.models import EcommPlatform, EcommProduct, ProductChangeLog, SyncLog
+from ecomm_sync.models import (
+    FINGERPRINT_FIELDS,
+    EcommPlatform,
+    EcommProduct,
+    ProductChangeLog,
+    SyncLog,
+    normalize_scrape_value,
+)
+from products.models import Product
 
 from .scrapers.hybrid import HybridScraper
 from .woocommerce.batch_sync import WooCommerceBatchSync
@@ -11,7 +21,16 @@ logger = logging.getLogger(__name__)
 
 
 class ChangeDetector:
-    """商品变更检测器"""
+    """
+    商品变更检测器
+
+    按 EcommProduct 上的内容指纹增量检测：整体指纹一致的商品直接跳过，
+    只对指纹变化的字段与 ERP 产品比较（详情仅在其指纹变化时才对比）。
+    有变更的电商产品暂存在 staged 中，由 flush 批量写入。
+    """
+
+    # flush 时批量更新的字段
+    STAGED_FIELDS = ["raw_data", "content_hash", "field_hashes", "last_scraped_at", "updated_at"]
 
     def __init__(self, platform: EcommPlatform):
         """
@@ -21,14 +40,21 @@ class ChangeDetector:
             platform: 电商平台
         """
         self.platform = platform
+        self.staged = []
 
-    def detect_changes(self, scrape_result: Dict, ecomm_product: EcommProduct) -> list:
+    def detect_changes(
+        self,
+        scrape_result: Dict,
+        ecomm_product: EcommProduct,
+        fields: Sequence[str] = FINGERPRINT_FIELDS,
+    ) -> list:
         """
         检测商品变更
 
         Args:
             scrape_result: 最新采集数据
-            ecomm_product: 电商产品实例
+            ecomm_product: 电商产品实例（需预加载 product）
+            fields: 检测的字段
 
         Returns:
             变更日志列表
@@ -39,64 +65,98 @@ class ChangeDetector:
         if not product:
             return changes
 
-        old_price = product.selling_price
-        new_price = float(str(scrape_result.get("price", 0)))
-
-        if abs(new_price - old_price) > 0.1:
-            changes.append(
-                ProductChangeLog(
-                    ecomm_product=ecomm_product,
-                    change_type="price",
-                    old_value={"price": str(old_price)},
-                    new_value={"price": str(new_price)},
+        # 先转换数值再暂存：转换失败时不刷新指纹，下次采集仍能检测到该变更
+        previous = ecomm_product.raw_data
+        if "price" in fields:
+            new_price = Decimal(str(scrape_result.get("price") or 0))
+        if "stock" in fields:
+            # 采集器可能返回 "12.0" 之类的字符串，与指纹使用相同的规范化
+            old_stock = int(normalize_scrape_value("stock", previous.get("stock")) or 0)
+            new_stock = int(normalize_scrape_value("stock", scrape_result.get("stock")) or 0)
+
+        changed = ecomm_product.stage_scrape(scrape_result, fields)
+        if not changed:
+            return changes
+        self.staged.append(ecomm_product)
+
+        if "price" in changed:
+            old_price = product.selling_price
+
+            if abs(new_price - old_price) > Decimal("0.1"):
+                changes.append(
+                    ProductChangeLog(
+                        ecomm_product=ecomm_product,
+                        change_type="price",
+                        old_value={"price": str(old_price)},
+                        new_value={"price": str(new_price)},
+                    )
                 )
-            )
-            logger.info(f"价格变更: {product.code} ¥{old_price} -> ¥{new_price}")
-
-        old_stock = ecomm_product.min_stock or 0
-        new_stock = int(scrape_result.get("stock", 0))
-
-        if old_stock != new_stock:
-            changes.append(
-                ProductChangeLog(
-                    ecomm_product=ecomm_product,
-                    change_type="stock",
-                    old_value={"stock": old_stock},
-                    new_value={"stock": new_stock},
+                logger.info(f"价格变更: {product.code} ¥{old_price} -> ¥{new_price}")
+
+        if "stock" in changed:
+            if old_stock != new_stock:
+                changes.append(
+                    ProductChangeLog(
+                        ecomm_product=ecomm_product,
+                        change_type="stock",
+                        old_value={"stock": old_stock},
+                        new_value={"stock": new_stock},
+                    )
                 )
-            )
-            logger.info(f"库存变更: {product.code} {old_stock} -> {new_stock}")
-
-        old_status = product.status
-        new_status = self._map_status(scrape_result.get("status"))
-
-        if old_status != new_status:
-            changes.append(
-                ProductChangeLog(
-                    ecomm_product=ecomm_product,
-                    change_type="status",
-                    old_value={"status": old_status},
-                    new_value={"status": new_status},
+                logger.info(f"库存变更: {product.code} {old_stock} -> {new_stock}")
+
+        if "status" in changed:
+            old_status = product.status
+            new_status = self._map_status(scrape_result.get("status"))
+
+            if old_status != new_status:
+                changes.append(
+                    ProductChangeLog(
+                        ecomm_product=ecomm_product,
+                        change_type="status",
+                        old_value={"status": old_status},
+                        new_value={"status": new_status},
+                    )
                 )
-            )
-            logger.info(f"状态变更: {product.code} {old_status} -> {new_status}")
-
-        old_desc = product.description
-        new_desc = scrape_result.get("description", "")
-
-        if old_desc != new_desc and len(new_desc) > 0:
-            changes.append(
-                ProductChangeLog(
-                    ecomm_product=ecomm_product,
-                    change_type="detail",
-                    old_value={"description": old_desc},
-                    new_value={"description": new_desc},
+                logger.info(f"状态变更: {product.code} {old_status} -> {new_status}")
+
+        if "description" in changed:
+            old_desc = product.description
+            new_desc = scrape_result.get("description") or ""
+
+            if old_desc != new_desc and len(new_desc) > 0:
+                changes.append(
+                    ProductChangeLog(
+                        ecomm_product=ecomm_product,
+                        change_type="detail",
+                        old_value={"description": old_desc},
+                        new_value={"description": new_desc},
+                    )
                 )
-            )
-            logger.info(f"详情变更: {product.code}")
+                logger.info(f"详情变更: {product.code}")
 
         return changes
 
+    def flush(self, changes: list) -> int:
+        """
+        批量写入变更日志和有变化的电商产品（只更新变更字段和指纹）
+
+        Returns:
+            int: 更新的电商产品数
+        """
+        now = timezone.now()
+        for ecomm_product in self.staged:
+            ecomm_product.last_scraped_at = now
+            ecomm_product.updated_at = now
+
+        with transaction.atomic():
+            ProductChangeLog.objects.bulk_create(changes, batch_size=500)
+            EcommProduct.objects.bulk_update(self.staged, self.STAGED_FIELDS, batch_size=500)
+
+        count = len(self.staged)
+        self.staged = []
+        return count
+
     def _map_status(self, status_str: str) -> str:
         """
         映射状态
@@ -160,11 +220,11 @@ class SyncManager:
             if strategy_type == "incremental":
                 ecomm_products = EcommProduct.objects.filter(
                     platform=platform, sync_status="synced", product__isnull=False
-                )[:limit]
+                ).select_related("product")[:limit]
             else:
                 ecomm_products = EcommProduct.objects.filter(
                     platform=platform, product__isnull=False
-                )[:limit]
+                ).select_related("product")[:limit]
 
             results = {
                 "total": ecomm_products.count(),
@@ -173,22 +233,14 @@ class SyncManager:
                 "errors": [],
             }
 
+            detector = ChangeDetector(platform)
+            changes = []
+
             for ecomm_product in ecomm_products:
                 try:
                     latest_data = await scraper.scrape_product(ecomm_product.external_id)
-
-                    detector = ChangeDetector(platform)
-                    changes = detector.detect_changes(latest_data, ecomm_product)
-
-                    if changes:
-                        ProductChangeLog.objects.bulk_create(changes)
-                        ecomm_product.raw_data = latest_data
-                        ecomm_product.last_scraped_at = timezone.now()
-                        ecomm_product.save()
-
-                        results["succeeded"] += 1
-                    else:
-                        results["succeeded"] += 1
+                    changes.extend(detector.detect_changes(latest_data, ecomm_product))
+                    results["succeeded"] += 1
 
                 except Exception as e:
                     logger.error(f"同步失败: {ecomm_product.external_id}, 错误: {e}")
@@ -197,6 +249,9 @@ class SyncManager:
                         {"external_id": ecomm_product.external_id, "error": str(e)}
                     )
 
+            updated = detector.flush(changes)
+            logger.info(f"内容有变化: {updated} 个商品, 变更日志 {len(changes)} 条")
+
             execution_time = (timezone.now() - start_time).total_seconds()
 
             SyncLog.update_sync_log(
@@ -251,33 +306,36 @@ class SyncManager:
             scraper = HybridScraper(platform)
             ecomm_products = EcommProduct.objects.filter(
                 platform=platform, sync_status="synced", product__isnull=False
-            )[:200]
+            ).select_related("product")[:200]
 
-            changes_detected = 0
+            detector = ChangeDetector(platform)
+            price_changes = []
 
             for ecomm_product in ecomm_products:
                 try:
                     latest_data = await scraper.scrape_product(ecomm_product.external_id)
 
-                    detector = ChangeDetector(platform)
-                    changes = detector.detect_changes(latest_data, ecomm_product)
-
-                    price_changes = [c for c in changes if c.change_type == "price"]
-
-                    if price_changes:
-                        changes_detected += 1
-                        ProductChangeLog.objects.bulk_create(price_changes)
+                    # 只检测价格，其他字段留给完整同步
+                    changes = detector.detect_changes(latest_data, ecomm_product, fields=["price"])
 
-                        ecomm_product.raw_data = latest_data
-                        ecomm_product.product.selling_price = float(latest_data.get("price", 0))
-                        ecomm_product.product.save()
-                        ecomm_product.last_scraped_at = timezone.now()
-                        ecomm_product.save()
+                    if changes:
+                        price_changes.extend(changes)
+                        product = ecomm_product.product
+                        product.selling_price = Decimal(changes[0].new_value["price"])
+                        product.updated_at = timezone.now()
 
                 except Exception as e:
                     logger.error(f"价格检测失败: {e}")
                     continue
 
+            changes_detected = len(price_changes)
+            if price_changes:
+                Product.objects.bulk_update(
+                    [change.ecomm_product.product for change in price_changes],
+                    ["selling_price", "updated_at"],
+                )
+            detector.flush(price_changes)
+
             execution_time = (timezone.now() - start_time).total_seconds()
 
             SyncLog.update_sync_log(
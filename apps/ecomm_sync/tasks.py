@@ -281,9 +281,13 @@ def process_purchase_sync_queue_task(self, limit: int = 100):
 
 
 @shared_task(bind=True, ignore_result=False)
-def auto_restock_alert_task(self):
+def auto_restock_alert_task(self, draft_requests: bool = False):
     """
     Celery任务：自动补货提醒
+
+    Args:
+        self: Celery任务实例
+        draft_requests: 是否批量生成采购申请草稿
     """
     from purchase.services.purchase_sync import PurchaseSyncService
 
@@ -291,7 +295,7 @@ def auto_restock_alert_task(self):
 
     try:
         service = PurchaseSyncService()
-        alerts = service.auto_restock_alert()
+        alerts = service.auto_restock_alert(draft_requests=draft_requests)
 
         logger.info(f"自动补货提醒完成: {len(alerts)}个提醒")
         return {"status": "success", "count": len(alerts)}
@@ -0,0 +1,93 @@
+"""
+电商商品内容指纹测试
+测试整体指纹短路、逐字段差异和原始数据的局部合并
+"""
+
+from decimal import Decimal
+
+from core.models import Platform
+from django.test import TestCase
+from ecomm_sync.models import EcommProduct
+
+
+class EcommProductFingerprintTest(TestCase):
+    """内容指纹测试"""
+
+    def setUp(self):
+        self.platform = Platform.objects.create(
+            platform_name="淘宝", platform_code="taobao", platform_type="collect"
+        )
+        self.ecomm_product = EcommProduct.objects.create(
+            platform=self.platform,
+            external_id="123456",
+            external_url="https://item.taobao.com/item.htm?id=123456",
+            raw_data={"title": "测试商品", "images": ["a.jpg"]},
+        )
+        self.scrape = {
+            "price": "99.00",
+            "stock": 10,
+            "status": "在售",
+            "description": "商品详情" * 500,
+            "title": "测试商品（新标题）",
+        }
+
+    def test_first_scrape_stages_all_fields(self):
+        """首次采集全部字段视为变更，只合并检测字段"""
+        changed = self.ecomm_product.stage_scrape(self.scrape)
+
+        self.assertEqual(changed, ["price", "stock", "status", "description"])
+        self.assertEqual(len(self.ecomm_product.content_hash), 64)
+        self.assertEqual(self.ecomm_product.raw_data["title"], "测试商品")
+        self.assertEqual(self.ecomm_product.raw_data["price"], "99.00")
+
+    def test_unchanged_scrape_short_circuits(self):
+        """整体指纹一致时不做逐字段比较"""
+        self.ecomm_product.stage_scrape(self.scrape)
+        self.ecomm_product.save()
+        self.ecomm_product.refresh_from_db()
+
+        self.assertEqual(self.ecomm_product.stage_scrape(dict(self.scrape)), [])
+
+    def test_only_changed_fields_are_merged(self):
+        """只有变化的字段刷新指纹并写入原始数据"""
+        self.ecomm_product.stage_scrape(self.scrape)
+        description_hash = self.ecomm_product.field_hashes["description"]
+        content_hash = self.ecomm_product.content_hash
+
+        changed = self.ecomm_product.stage_scrape({**self.scrape, "stock": 3})
+
+        self.assertEqual(changed, ["stock"])
+        self.assertEqual(self.ecomm_product.raw_data["stock"], 3)
+        self.assertEqual(self.ecomm_product.field_hashes["description"], description_hash)
+        self.assertNotEqual(self.ecomm_product.content_hash, content_hash)
+
+    def test_partial_fields(self):
+        """只检测部分字段时其他字段的指纹保持不变"""
+        self.ecomm_product.stage_scrape(self.scrape)
+        stock_hash = self.ecomm_product.field_hashes["stock"]
+
+        changed = self.ecomm_product.stage_scrape(
+            {**self.scrape, "price": "89.00", "stock": 0}, fields=["price"]
+        )
+
+        self.assertEqual(changed, ["price"])
+        self.assertEqual(self.ecomm_product.field_hashes["stock"], stock_hash)
+        self.assertEqual(self.ecomm_product.raw_data["stock"], 10)
+
+    def test_numeric_types_are_normalized(self):
+        """Decimal、浮点和字符串形式的相同价格/库存指纹一致，raw_data 可序列化"""
+        self.ecomm_product.stage_scrape(self.scrape)
+        self.ecomm_product.save()
+
+        changed = self.ecomm_product.stage_scrape(
+            {**self.scrape, "price": Decimal("99"), "stock": "10"}
+        )
+        self.assertEqual(changed, [])
+        self.assertEqual(self.ecomm_product.stage_scrape({**self.scrape, "price": 99.0}), [])
+
+        changed = self.ecomm_product.stage_scrape({**self.scrape, "price": Decimal("89.5")})
+        self.assertEqual(changed, ["price"])
+        self.assertEqual(self.ecomm_product.raw_data["price"], "89.50")
+        self.ecomm_product.save()
+        self.ecomm_product.refresh_from_db()
+        self.assertEqual(self.ecomm_product.raw_data["price"], "89.50")
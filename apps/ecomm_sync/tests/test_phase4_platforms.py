@@ -51,6 +51,15 @@ class TestShopeeAdapter:
         assert adapter._map_order_status("SHIPPED") == "shipped"
         assert adapter._map_order_status("COMPLETED") == "delivered"
 
+    def test_budget_follows_timeout(self, adapter):
+        """时间预算默认随单次超时变化，可单独设置"""
+        adapter.timeout = 10
+        assert adapter.budget == 30
+        adapter.budget = 5
+        assert adapter.budget == 5
+        adapter.budget = None
+        assert adapter.budget == 30
+
 
 class TestTikTokAdapter:
     """测试TikTok Shop适配器"""
@@ -1,13 +1,13 @@
 from unittest.mock import MagicMock, Mock, patch
 
+from core.models import Platform
 from django.contrib.auth import get_user_model
 from django.test import TestCase
+from ecomm_sync.models import EcommProduct, PlatformAccount, ProductChangeLog
 from ecomm_sync.woocommerce.api import WooCommerceAPI, WooCommerceAPIError
 from ecomm_sync.woocommerce.batch_sync import WooCommerceBatchSync
 from ecomm_sync.woocommerce.mapper import WooCommerceMapper
-
-from apps.core.models import EcommProduct, Platform, ProductChangeLog
-from apps.products.models import Product, ProductCategory, Unit
+from products.models import Product, ProductCategory, Unit
 
 User = get_user_model()
 
@@ -22,38 +22,36 @@ class WooCommerceAPITest(TestCase):
         )
 
         self.platform = Platform.objects.create(
-            platform_type="taobao",
-            name="淘宝",
-            base_url="https://item.taobao.com",
+            platform_name="淘宝", platform_code="taobao", platform_type="collect"
         )
 
-    def test_api_initialization(self):
-        """测试API初始化"""
-        from apps.ecomm_sync.models import WooShopConfig
-
-        config = WooShopConfig.objects.create(
-            shop_url="https://example.com",
-            consumer_key="test_key",
-            consumer_secret="test_secret",
+    def _account(self):
+        return PlatformAccount.objects.create(
+            account_type="woo",
+            platform=self.platform,
+            account_name="Woo店铺",
+            auth_config={
+                "shop_url": "https://example.com/",
+                "consumer_key": "test_key",
+                "consumer_secret": "test_secret",
+            },
             created_by=self.user,
         )
 
+    def test_api_initialization(self):
+        """测试API初始化"""
+        config = self._account()
+
         api = WooCommerceAPI(config)
 
         self.assertEqual(api.base_url, "https://example.com/wp-json/wc/v3")
         self.assertEqual(api.consumer_key, "test_key")
+        self.assertEqual(WooCommerceAPI.get_active().account, config)
 
     @patch("ecomm_sync.woocommerce.api.requests.Session")
     def test_get_products(self, mock_session):
         """测试获取产品列表"""
-        from apps.ecomm_sync.models import WooShopConfig
-
-        config = WooShopConfig.objects.create(
-            shop_url="https://example.com",
-            consumer_key="test_key",
-            consumer_secret="test_secret",
-            created_by=self.user,
-        )
+        config = self._account()
 
         mock_response = Mock()
         mock_response.json.return_value = [{"id": 1, "name": "Test Product"}]
@@ -72,14 +70,7 @@ class WooCommerceAPITest(TestCase):
     @patch("ecomm_sync.woocommerce.api.requests.Session.request")
     def test_api_error_handling(self, mock_request):
         """测试API错误处理"""
-        from apps.ecomm_sync.models import WooShopConfig
-
-        config = WooShopConfig.objects.create(
-            shop_url="https://example.com",
-            consumer_key="test_key",
-            consumer_secret="test_secret",
-            created_by=self.user,
-        )
+        config = self._account()
 
         class MockHTTPError(Exception):
             def __init__(self):
@@ -108,9 +99,7 @@ class WooCommerceMapperTest(TestCase):
         )
 
         self.platform = Platform.objects.create(
-            platform_type="taobao",
-            name="淘宝",
-            base_url="https://item.taobao.com",
+            platform_name="淘宝", platform_code="taobao", platform_type="collect"
         )
 
         self.category = ProductCategory.objects.create(
@@ -201,9 +190,7 @@ class WooCommerceBatchSyncTest(TestCase):
         )
 
         self.platform = Platform.objects.create(
-            platform_type="taobao",
-            name="淘宝",
-            base_url="https://item.taobao.com",
+            platform_name="淘宝", platform_code="taobao", platform_type="collect"
         )
 
         self.category = ProductCategory.objects.create(
@@ -275,7 +262,7 @@ class WooCommerceBatchSyncTest(TestCase):
     def test_sync_batch_products(self, mock_get_active):
         """测试批量同步产品"""
         mock_api = MagicMock()
-        mock_api.create_product.return_value = {"id": 123}
+        mock_api.batch_products.return_value = {"create": [{"id": 123}]}
         mock_get_active.return_value = mock_api
 
         syncer = WooCommerceBatchSync()
@@ -284,6 +271,58 @@ class WooCommerceBatchSyncTest(TestCase):
         self.assertEqual(results["total"], 1)
         self.assertEqual(results["succeeded"], 1)
         self.assertEqual(results["failed"], 0)
+        mock_api.batch_products.assert_called_once()
+        mock_api.create_product.assert_not_called()
+
+        self.ecomm_product.refresh_from_db()
+        self.assertEqual(self.ecomm_product.woo_product_id, 123)
+        self.assertEqual(self.ecomm_product.sync_status, "synced")
+
+    @patch("ecomm_sync.woocommerce.batch_sync.WooCommerceAPI.get_active")
+    def test_sync_batch_products_chunked(self, mock_get_active):
+        """测试按100条分块请求，并按顺序对应每条结果"""
+        products = [self.ecomm_product]
+        for index in range(249):
+            products.append(
+                EcommProduct.objects.create(
+                    platform=self.platform,
+                    external_id=f"batch-{index}",
+                    external_url=f"https://item.taobao.com/item.htm?id={index}",
+                    product=self.product,
+                    woo_product_id=1000 + index,
+                    created_by=self.user,
+                )
+            )
+
+        def batch_products(create=None, update=None):
+            # 第一个更新项返回错误
+            return {
+                "create": [{"id": 123} for _ in create or []],
+                "update": [
+                    (
+                        {"id": item["id"], "error": {"code": "invalid", "message": "价格无效"}}
+                        if item["id"] == 1000
+                        else {"id": item["id"]}
+                    )
+                    for item in update or []
+                ],
+            }
+
+        mock_api = MagicMock()
+        mock_api.batch_products.side_effect = batch_products
+        mock_get_active.return_value = mock_api
+
+        results = WooCommerceBatchSync(workers=2).sync_batch_products(products, update_type="price")
+
+        self.assertEqual(mock_api.batch_products.call_count, 3)
+        sizes = sorted(
+            len(call.kwargs["create"]) + len(call.kwargs["update"])
+            for call in mock_api.batch_products.call_args_list
+        )
+        self.assertEqual(sizes, [50, 100, 100])
+        self.assertEqual((results["succeeded"], results["failed"]), (249, 1))
+        self.assertEqual(results["errors"], ["价格无效"])
+        self.assertEqual(EcommProduct.objects.filter(sync_status="synced").count(), 249)
 
     @patch("ecomm_sync.woocommerce.batch_sync.WooCommerceAPI.get_active")
     def test_sync_change_logs(self, mock_get_active):
@@ -296,13 +335,20 @@ class WooCommerceBatchSyncTest(TestCase):
             created_by=self.user,
         )
 
+        self.ecomm_product.woo_product_id = 123
+        self.ecomm_product.save()
+
         mock_api = MagicMock()
-        mock_api.update_product.return_value = {"id": 123}
+        mock_api.batch_products.return_value = {"update": [{"id": 123}]}
         mock_get_active.return_value = mock_api
 
         syncer = WooCommerceBatchSync()
         results = syncer.sync_change_logs([change_log])
 
+        mock_api.batch_products.assert_called_once_with(
+            create=[], update=[{"id": 123, "regular_price": "99.99"}]
+        )
+
         self.assertEqual(results["total"], 1)
         self.assertEqual(results["succeeded"], 1)
 
@@ -2,7 +2,7 @@ from typing import Dict, List, Optional
 
 import requests
 from django.conf import settings
-from ecomm_sync.models import WooShopConfig
+from ecomm_sync.models import PlatformAccount
 
 
 class WooCommerceAPIError(Exception):
@@ -18,17 +18,21 @@ class WooCommerceAPIError(Exception):
 class WooCommerceAPI:
     """WooCommerce REST API客户端"""
 
-    def __init__(self, shop_config: WooShopConfig):
+    # 批量接口单次请求的最大条数
+    BATCH_LIMIT = 100
+
+    def __init__(self, account: PlatformAccount):
         """
         初始化WooCommerce API客户端
 
         Args:
-            shop_config: WooCommerce店铺配置
+            account: WooCommerce平台账号，auth_config 包含 shop_url、consumer_key、consumer_secret
         """
-        self.shop_config = shop_config
-        self.base_url = f"{shop_config.shop_url.rstrip('/')}/wp-json/wc/v3"
-        self.consumer_key = shop_config.consumer_key
-        self.consumer_secret = shop_config.consumer_secret
+        self.account = account
+        auth_config = account.auth_config or {}
+        self.base_url = f"{auth_config.get('shop_url', '').rstrip('/')}/wp-json/wc/v3"
+        self.consumer_key = auth_config.get("consumer_key")
+        self.consumer_secret = auth_config.get("consumer_secret")
         self.timeout = getattr(settings, "ECOMM_SYNC_TIMEOUT", 30)
 
         self.session = requests.Session()
@@ -149,7 +153,26 @@ class WooCommerceAPI:
         Returns:
             批量更新结果
         """
-        return self._request("POST", "/products/batch", data={"update": updates})
+        return self.batch_products(update=updates)
+
+    def batch_products(self, create: List[dict] = None, update: List[dict] = None) -> dict:
+        """
+        批量创建/更新产品（单次请求合计不超过 BATCH_LIMIT 条）
+
+        Args:
+            create: 新建产品数据列表
+            update: 更新数据列表（须包含 id）
+
+        Returns:
+            批量结果 {'create': [...], 'update': [...]}，按请求顺序返回，
+            失败项包含 error 字段
+        """
+        data = {}
+        if create:
+            data["create"] = create
+        if update:
+            data["update"] = update
+        return self._request("POST", "/products/batch", data=data)
 
     def delete_product(self, product_id: int, force: bool = False) -> dict:
         """
@@ -230,9 +253,9 @@ class WooCommerceAPI:
             激活的API客户端实例
         """
         try:
-            shop_config = WooShopConfig.objects.filter(is_active=True).first()
-            if shop_config:
-                return cls(shop_config)
+            account = PlatformAccount.objects.filter(account_type="woo", is_active=True).first()
+            if account:
+                return cls(account)
             return None
         except Exception:
             return None
@@ -1,5 +1,6 @@
 import logging
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
 
 from django.db import transaction
 from django.utils import timezone
@@ -10,20 +11,28 @@ from .mapper import WooCommerceMapper
 
 logger = logging.getLogger(__name__)
 
+# (电商产品, 更新类型, 对应的变更日志)
+SyncJob = Tuple[EcommProduct, str, List[ProductChangeLog]]
+
 
 class WooCommerceBatchSync:
     """WooCommerce批量同步器"""
 
-    def __init__(self, api: WooCommerceAPI = None):
+    BATCH_SIZE = WooCommerceAPI.BATCH_LIMIT
+    DEFAULT_WORKERS = 4
+
+    def __init__(self, api: WooCommerceAPI = None, workers: int = DEFAULT_WORKERS):
         """
         初始化批量同步器
 
         Args:
             api: WooCommerce API客户端（可选）
+            workers: 批量请求并发数
         """
         self.api = api or WooCommerceAPI.get_active()
         if not self.api:
             raise ValueError("未配置WooCommerce API")
+        self.workers = workers
 
     def sync_single_product(self, ecomm_product: EcommProduct, update_type: str = "full") -> dict:
         """
@@ -84,7 +93,7 @@ class WooCommerceBatchSync:
         self, ecomm_products: List[EcommProduct], update_type: str = "full"
     ) -> Dict:
         """
-        批量同步产品
+        批量同步产品（使用WooCommerce批量接口）
 
         Args:
             ecomm_products: 产品列表
@@ -93,22 +102,8 @@ class WooCommerceBatchSync:
         Returns:
             批量同步结果
         """
-        results = {
-            "total": len(ecomm_products),
-            "succeeded": 0,
-            "failed": 0,
-            "errors": [],
-        }
-
-        for ecomm_product in ecomm_products:
-            result = self.sync_single_product(ecomm_product, update_type)
-
-            if result["success"]:
-                results["succeeded"] += 1
-            else:
-                results["failed"] += 1
-                results["errors"].append(result["error"])
-
+        results = self._sync_jobs([(product, update_type, []) for product in ecomm_products])
+        results["errors"] = [error["error"] for error in results["errors"]]
         return results
 
     def sync_batch_using_woo_batch(self, updates: List[dict]) -> Dict:
@@ -140,36 +135,134 @@ class WooCommerceBatchSync:
         """
         同步变更日志到WooCommerce
 
+        同一产品的变更合并为一条批量数据，成功后对应的变更日志按块一次性标记为已同步
+
         Args:
             change_logs: 变更日志列表
 
         Returns:
             同步结果
         """
-        results = {"total": len(change_logs), "succeeded": 0, "failed": 0, "errors": []}
-
         grouped_changes = self._group_changes_by_product(change_logs)
+        jobs = [
+            (ecomm_product, self._determine_update_type(changes), changes)
+            for ecomm_product, changes in grouped_changes.items()
+        ]
 
-        for ecomm_product, changes in grouped_changes.items():
-            update_type = self._determine_update_type(changes)
+        results = self._sync_jobs(jobs)
+        results["total"] = len(change_logs)
+        return results
 
-            result = self.sync_single_product(ecomm_product, update_type)
+    def _sync_jobs(self, jobs: List[SyncJob]) -> Dict:
+        """
+        按批量接口同步产品
 
-            if result["success"]:
-                results["succeeded"] += 1
+        1. 生成批量数据（映射失败的产品直接记为失败）
+        2. 每 BATCH_SIZE 条一块，线程池并发请求（线程内只发请求）
+        3. 每块结果回写：产品 bulk_update，变更日志一次 update()
+        """
+        results = {"total": len(jobs), "succeeded": 0, "failed": 0, "errors": []}
+
+        items = []
+        for ecomm_product, update_type, changes in jobs:
+            try:
+                payload = WooCommerceMapper.create_batch_item(ecomm_product, update_type)
+            except Exception as e:
+                logger.error(f"生成批量数据失败: {ecomm_product.id}, 错误: {e}")
+                self._record_failure(results, ecomm_product, str(e))
+                continue
+            items.append((ecomm_product, changes, payload))
+
+        chunks = [
+            items[start : start + self.BATCH_SIZE]
+            for start in range(0, len(items), self.BATCH_SIZE)
+        ]
+        if not chunks:
+            return results
+
+        max_workers = max(1, min(self.workers, len(chunks)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._send_chunk, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    response = future.result()
+                except Exception as e:
+                    logger.error(f"批量同步失败（{len(chunk)}条）: {e}")
+                    for ecomm_product, _, _ in chunk:
+                        self._record_failure(results, ecomm_product, str(e))
+                    continue
+                self._apply_chunk_results(chunk, response, results)
+
+        logger.info(
+            f"批量同步完成: {results['succeeded']} 成功, {results['failed']} 失败, " f"{len(chunks)} 次请求"
+        )
+        return results
 
-                with transaction.atomic():
-                    for change in changes:
-                        change.synced_to_woo = True
-                        change.woo_synced_at = timezone.now()
-                        change.save()
+    def _send_chunk(self, chunk: List[Tuple]) -> dict:
+        """发送一块批量请求（不访问数据库）"""
+        create = [
+            payload for ecomm_product, _, payload in chunk if not ecomm_product.woo_product_id
+        ]
+        update = [payload for ecomm_product, _, payload in chunk if ecomm_product.woo_product_id]
+        return self.api.batch_products(create=create, update=update)
+
+    def _apply_chunk_results(self, chunk: List[Tuple], response: dict, results: Dict):
+        """按请求顺序把批量结果对应回产品和变更日志，并批量写库"""
+        created = iter(response.get("create") or [])
+        updated = {item.get("id"): item for item in response.get("update") or []}
+
+        now = timezone.now()
+        synced_products = []
+        synced_change_ids = []
+        for ecomm_product, changes, _ in chunk:
+            if ecomm_product.woo_product_id:
+                item = updated.get(ecomm_product.woo_product_id)
             else:
-                results["failed"] += 1
-                results["errors"].append(
-                    {"ecomm_product_id": ecomm_product.id, "error": result["error"]}
+                item = next(created, None)
+
+            error = self._item_error(item)
+            if error:
+                self._record_failure(results, ecomm_product, error)
+                continue
+
+            if not ecomm_product.woo_product_id:
+                ecomm_product.woo_product_id = item["id"]
+            ecomm_product.sync_status = "synced"
+            ecomm_product.last_synced_at = now
+            ecomm_product.updated_at = now
+            synced_products.append(ecomm_product)
+            synced_change_ids.extend(change.pk for change in changes)
+            for change in changes:
+                change.synced_to_woo = True
+                change.woo_synced_at = now
+            results["succeeded"] += 1
+
+        with transaction.atomic():
+            EcommProduct.objects.bulk_update(
+                synced_products, ["woo_product_id", "sync_status", "last_synced_at", "updated_at"]
+            )
+            if synced_change_ids:
+                ProductChangeLog.objects.filter(pk__in=synced_change_ids).update(
+                    synced_to_woo=True, woo_synced_at=now, updated_at=now
                 )
 
-        return results
+    @staticmethod
+    def _item_error(item: Optional[dict]) -> str:
+        """批量结果中单条数据的错误信息，成功返回空字符串"""
+        if not item:
+            return "批量接口未返回结果"
+        if item.get("error"):
+            error = item["error"]
+            return error.get("message", str(error)) if isinstance(error, dict) else str(error)
+        if not item.get("id"):
+            return "批量接口未返回产品ID"
+        return ""
+
+    @staticmethod
+    def _record_failure(results: Dict, ecomm_product: EcommProduct, error: str):
+        results["failed"] += 1
+        results["errors"].append({"ecomm_product_id": ecomm_product.id, "error": error})
 
     def _group_changes_by_product(
         self, change_logs: List[ProductChangeLog]
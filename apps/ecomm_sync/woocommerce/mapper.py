@@ -245,23 +245,40 @@ class WooCommerceMapper:
         Returns:
             批量更新数据列表
         """
-        updates = []
-
-        for ecomm_product in ecomm_products:
-            if not ecomm_product.woo_product_id:
-                continue
+        return [
+            WooCommerceMapper.create_batch_item(ecomm_product, update_type)
+            for ecomm_product in ecomm_products
+            if ecomm_product.woo_product_id
+        ]
 
-            update = {"id": ecomm_product.woo_product_id}
+    @staticmethod
+    def create_batch_item(ecomm_product, update_type: str = "full") -> dict:
+        """
+        创建单条批量数据
 
-            if update_type == "full":
-                update.update(WooCommerceMapper.map_to_woo(ecomm_product))
-            elif update_type == "price":
-                update.update(WooCommerceMapper.extract_price_update(ecomm_product))
-            elif update_type == "stock":
-                update.update(WooCommerceMapper.extract_stock_update(ecomm_product))
-            elif update_type == "status":
-                update.update(WooCommerceMapper.extract_status_update(ecomm_product))
+        已同步过的产品生成 update 数据（包含 id），未同步过的产品始终生成完整的 create 数据
 
-            updates.append(update)
+        Args:
+            ecomm_product: EcommProduct实例
+            update_type: 更新类型 (full, price, stock, status)
 
-        return updates
+        Returns:
+            批量数据
+        """
+        if not ecomm_product.woo_product_id:
+            return WooCommerceMapper.map_to_woo(ecomm_product)
+
+        item = {"id": ecomm_product.woo_product_id}
+
+        if update_type == "full":
+            item.update(WooCommerceMapper.map_to_woo(ecomm_product))
+        elif update_type == "price":
+            item.update(WooCommerceMapper.extract_price_update(ecomm_product))
+        elif update_type == "stock":
+            item.update(WooCommerceMapper.extract_stock_update(ecomm_product))
+        elif update_type == "status":
+            item.update(WooCommerceMapper.extract_status_update(ecomm_product))
+        else:
+            raise ValueError(f"不支持的更新类型: {update_type}")
+
+        return item
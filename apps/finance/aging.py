@@ -0,0 +1,206 @@
+"""
+往来账龄引擎
+
+按客户/供应商一次 GROUP BY + 条件聚合计算余额和逾期账龄分段：
+1. compute / totals: 实时计算（分组明细或合计），单次 SQL
+2. snapshot: 每晚把分组结果写入 AgingSnapshot，用于趋势图
+3. current_totals: 列表汇总 = 当日快照 + 快照后有变动的往来单位实时重算
+
+账龄按到期日计算逾期天数：未到期（含无到期日）、0-30、31-60、61-90、90天以上，
+只统计余额大于0的单据。
+"""
+
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import AgingSnapshot, CustomerAccount, SupplierAccount
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+
+# 账款类型 -> (主单模型, 往来单位字段, 往来单位名称字段)
+LEDGERS = {
+    "receivable": (CustomerAccount, "customer_id", "customer__name"),
+    "payable": (SupplierAccount, "supplier_id", "supplier__name"),
+}
+
+# 账龄分段：(字段, 逾期天数区间 (low, high])，None 表示不限
+BUCKETS = (
+    ("days_0_30", 0, 30),
+    ("days_31_60", 30, 60),
+    ("days_61_90", 60, 90),
+    ("days_over_90", 90, None),
+)
+
+BUCKET_FIELDS = ("not_due",) + tuple(field for field, _, _ in BUCKETS)
+AMOUNT_FIELDS = ("invoice_amount", "paid_amount", "balance") + BUCKET_FIELDS
+COUNT_FIELDS = ("account_count", "overdue_count")
+
+
+def overdue_q(as_of: Optional[date] = None) -> Q:
+    """逾期条件：到期日早于当天且余额大于0"""
+    return Q(due_date__lt=as_of or timezone.localdate(), balance__gt=0)
+
+
+def bucket_filters(as_of: date) -> Dict[str, Q]:
+    """各账龄分段的过滤条件（逾期天数 = as_of - 到期日）"""
+    filters = {
+        "not_due": Q(balance__gt=0) & (Q(due_date__isnull=True) | Q(due_date__gte=as_of)),
+    }
+    for field, low, high in BUCKETS:
+        condition = Q(balance__gt=0, due_date__lt=as_of - timedelta(days=low))
+        if high is not None:
+            condition &= Q(due_date__gte=as_of - timedelta(days=high))
+        filters[field] = condition
+    return filters
+
+
+class AgingEngine:
+    """往来账龄引擎"""
+
+    def __init__(self, ledger: str):
+        """
+        Args:
+            ledger: 账款类型（receivable 应收, payable 应付）
+        """
+        if ledger not in LEDGERS:
+            raise ValueError(f"未知的账款类型: {ledger}")
+        self.ledger = ledger
+        self.model, self.party_field, self.party_name_field = LEDGERS[ledger]
+
+    def queryset(self):
+        return self.model.objects.filter(is_deleted=False)
+
+    def aggregates(self, as_of: date) -> Dict:
+        """
+        单次聚合所需的全部表达式
+
+        别名加 agg_ 前缀，避免与主单的同名字段（balance 等）冲突
+        """
+        expressions = {
+            "account_count": Count("id"),
+            "overdue_count": Count("id", filter=overdue_q(as_of)),
+            "invoice_amount": Sum("invoice_amount", default=ZERO),
+            "paid_amount": Sum("paid_amount", default=ZERO),
+            "balance": Sum("balance", default=ZERO),
+        }
+        for field, condition in bucket_filters(as_of).items():
+            expressions[field] = Sum("balance", filter=condition, default=ZERO)
+        return {f"agg_{field}": expression for field, expression in expressions.items()}
+
+    @staticmethod
+    def _unprefix(row: Dict) -> Dict:
+        return {key.removeprefix("agg_"): value for key, value in row.items()}
+
+    def compute(self, as_of: Optional[date] = None, queryset=None) -> List[Dict]:
+        """
+        按往来单位分组计算账龄
+
+        Returns:
+            list: [{"party_id", "party_name", "account_count", ..., "days_over_90"}, ...]
+        """
+        as_of = as_of or timezone.localdate()
+        queryset = self.queryset() if queryset is None else queryset
+        rows = (
+            queryset.values(party_id=F(self.party_field))
+            .annotate(party_name=Max(self.party_name_field), **self.aggregates(as_of))
+            .order_by()
+        )
+        return [self._unprefix(row) for row in rows]
+
+    def totals(self, as_of: Optional[date] = None, queryset=None) -> Dict:
+        """计算合计（单次聚合）"""
+        as_of = as_of or timezone.localdate()
+        queryset = self.queryset() if queryset is None else queryset
+        return self._unprefix(queryset.aggregate(**self.aggregates(as_of)))
+
+    def snapshot(self, as_of: Optional[date] = None) -> int:
+        """
+        生成当天快照（重复执行会覆盖当天已有快照）
+
+        Returns:
+            int: 快照行数
+        """
+        as_of = as_of or timezone.localdate()
+        rows = [
+            AgingSnapshot(
+                snapshot_date=as_of,
+                ledger=self.ledger,
+                **{**row, "party_name": (row["party_name"] or "")[:200]},
+            )
+            for row in self.compute(as_of)
+        ]
+        with transaction.atomic():
+            AgingSnapshot.objects.filter(snapshot_date=as_of, ledger=self.ledger).delete()
+            AgingSnapshot.objects.bulk_create(rows, batch_size=500)
+        logger.info(f"账龄快照 {self.ledger} {as_of}: {len(rows)} 行")
+        return len(rows)
+
+    def current_totals(self) -> Dict:
+        """
+        列表页汇总：当日快照合计，快照之后有变动的往来单位实时重算替换
+
+        没有当日快照时退化为实时计算。主单的金额变动都会刷新 updated_at，
+        绕过 updated_at 的批量更新要到下一次快照才会体现。
+        """
+        today = timezone.localdate()
+        snapshots = AgingSnapshot.objects.filter(snapshot_date=today, ledger=self.ledger)
+        taken_at = snapshots.aggregate(taken_at=Min("created_at"))["taken_at"]
+        if taken_at is None:
+            return self.totals(today)
+
+        # 包含已删除的主单，删除同样会改变汇总
+        changed = set(
+            self.model.objects.filter(updated_at__gte=taken_at)
+            .values_list(self.party_field, flat=True)
+            .distinct()
+        )
+        if not changed:
+            return self._sum_snapshots(snapshots)
+
+        party_q = Q(**{f"{self.party_field}__in": changed - {None}})
+        snapshot_q = Q(party_id__in=changed - {None})
+        if None in changed:
+            party_q |= Q(**{f"{self.party_field}__isnull": True})
+            snapshot_q |= Q(party_id__isnull=True)
+
+        totals = self._sum_snapshots(snapshots.exclude(snapshot_q))
+        live = self.totals(today, self.queryset().filter(party_q))
+        return {field: totals[field] + live[field] for field in COUNT_FIELDS + AMOUNT_FIELDS}
+
+    def trend(self, days: int = 30) -> List[Dict]:
+        """
+        最近 N 天的账龄趋势
+
+        Returns:
+            list: [{"snapshot_date", "balance", "not_due", ...}, ...] 按日期升序
+        """
+        start = timezone.localdate() - timedelta(days=days - 1)
+        rows = (
+            AgingSnapshot.objects.filter(ledger=self.ledger, snapshot_date__gte=start)
+            .values("snapshot_date")
+            .annotate(**{f"agg_{field}": Sum(field) for field in ("balance",) + BUCKET_FIELDS})
+            .order_by("snapshot_date")
+        )
+        return [self._unprefix(row) for row in rows]
+
+    @classmethod
+    def _sum_snapshots(cls, snapshots) -> Dict:
+        return cls._unprefix(
+            snapshots.aggregate(
+                **{f"agg_{field}": Sum(field, default=0) for field in COUNT_FIELDS},
+                **{f"agg_{field}": Sum(field, default=ZERO) for field in AMOUNT_FIELDS},
+            )
+        )
+
+
+def snapshot_all(as_of: Optional[date] = None) -> Dict[str, int]:
+    """生成应收和应付的账龄快照"""
+    return {ledger: AgingEngine(ledger).snapshot(as_of) for ledger in LEDGERS}
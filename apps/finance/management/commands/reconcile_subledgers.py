@@ -0,0 +1,54 @@
+"""
+应收/应付子账批量对账
+运行方式：python manage.py reconcile_subledgers --ledger ap --fix
+"""
+
+from django.core.management.base import BaseCommand
+
+from finance.subledger import AccountsPayableLedger, AccountsReceivableLedger
+
+LEDGERS = {
+    "ap": ("应付", AccountsPayableLedger),
+    "ar": ("应收", AccountsReceivableLedger),
+}
+
+
+class Command(BaseCommand):
+    help = "按明细/收款记录分组重算所有主单，报告并可修正汇总偏差"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ledger",
+            choices=["ap", "ar", "all"],
+            default="all",
+            help="对账范围：ap 应付，ar 应收，all 全部",
+        )
+        parser.add_argument("--fix", action="store_true", help="按明细修正存在偏差的主单")
+        parser.add_argument("--limit", type=int, default=50, help="最多显示的偏差条数")
+
+    def handle(self, *args, **options):
+        """执行对账"""
+        keys = list(LEDGERS) if options["ledger"] == "all" else [options["ledger"]]
+        for key in keys:
+            label, ledger = LEDGERS[key]
+            self.stdout.write(f"开始{label}对账...")
+            drift = ledger.reconcile(fix=options["fix"])
+
+            if not drift:
+                self.stdout.write(self.style.SUCCESS(f"✅ {label}主单与明细一致"))
+                continue
+
+            for row in drift[: options["limit"]]:
+                self.stdout.write(
+                    f"  {row['label']} (ID: {row['account_id']}) {row['field']}: "
+                    f"¥{row['stored']} → ¥{row['expected']}"
+                )
+            if len(drift) > options["limit"]:
+                self.stdout.write(f"  ... 另有 {len(drift) - options['limit']} 条偏差未显示")
+
+            accounts = len({row["account_id"] for row in drift})
+            message = f"{label}对账发现 {accounts} 个主单存在偏差（{len(drift)} 个字段）"
+            if options["fix"]:
+                self.stdout.write(self.style.SUCCESS(f"✅ {message}，已修正"))
+            else:
+                self.stdout.write(self.style.WARNING(f"{message}，使用 --fix 修正"))
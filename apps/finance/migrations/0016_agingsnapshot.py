@@ -0,0 +1,114 @@
+# Generated by Django 5.0.9 on 2026-10-19 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("finance", "0015_invoice_is_credit_note_invoice_original_invoice_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AgingSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("snapshot_date", models.DateField(verbose_name="快照日期")),
+                (
+                    "ledger",
+                    models.CharField(
+                        choices=[("receivable", "应收"), ("payable", "应付")],
+                        max_length=20,
+                        verbose_name="账款类型",
+                    ),
+                ),
+                (
+                    "party_id",
+                    models.PositiveIntegerField(blank=True, null=True, verbose_name="往来单位ID"),
+                ),
+                (
+                    "party_name",
+                    models.CharField(blank=True, max_length=200, verbose_name="往来单位"),
+                ),
+                ("account_count", models.PositiveIntegerField(default=0, verbose_name="单据数")),
+                (
+                    "overdue_count",
+                    models.PositiveIntegerField(default=0, verbose_name="逾期单据数"),
+                ),
+                (
+                    "invoice_amount",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=15, verbose_name="单据金额"
+                    ),
+                ),
+                (
+                    "paid_amount",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=15, verbose_name="已收付金额"
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=15, verbose_name="余额"
+                    ),
+                ),
+                (
+                    "not_due",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=15, verbose_name="未到期"
+                    ),
+                ),
+                (
+                    "days_0_30",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=15, verbose_name="逾期0-30天"
+                    ),
+                ),
+                (
+                    "days_31_60",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=15, verbose_name="逾期31-60天"
+                    ),
+                ),
+                (
+                    "days_61_90",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=15, verbose_name="逾期61-90天"
+                    ),
+                ),
+                (
+                    "days_over_90",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=15, verbose_name="逾期90天以上"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "账龄快照",
+                "verbose_name_plural": "账龄快照",
+                "db_table": "finance_aging_snapshot",
+                "ordering": ["-snapshot_date", "ledger", "party_name"],
+                "indexes": [
+                    models.Index(
+                        fields=["ledger", "snapshot_date"], name="finance_agi_ledger_7e9c0c_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("snapshot_date", "ledger", "party_id"),
+                        name="uniq_aging_snapshot_date_ledger_party",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -413,7 +413,7 @@ class SupplierAccount(BaseModel):
         Returns:
             bool: 是否成功
         """
-        from decimal import Decimal
+        from .subledger import AccountsPayableLedger
 
         payment_amount = Decimal(str(payment_amount))
 
@@ -423,50 +423,23 @@ class SupplierAccount(BaseModel):
         if payment_amount > self.balance:
             return False
 
-        self.paid_amount += payment_amount
-        self.balance -= payment_amount
-        self.update_status()
-        self.save()
-        return True
+        return AccountsPayableLedger.settle(self, payment_amount) > 0
 
     def aggregate_from_details(self):
         """
-        从应付明细自动归集数据到主单。
+        从应付明细重新归集数据到主单（单次条件聚合）。
+
+        日常业务通过 finance.subledger.AccountsPayableLedger 增量过账，
+        本方法仅用于修复或重建。
 
         核心公式：
         - 实际应付 = 累计正应付 + 累计负应付
         - 已核销金额 = 累计已核销
         - 未付余额 = 实际应付 - 已核销
         """
-        from decimal import Decimal
-
-        # 获取所有明细
-        details = self.details.filter(is_deleted=False)
-
-        # 累计正应付（收货）
-        total_positive = details.filter(detail_type="receipt").aggregate(
-            total=models.Sum("amount")
-        )["total"] or Decimal("0")
-
-        # 累计负应付（退货）
-        total_negative = details.filter(detail_type="return").aggregate(total=models.Sum("amount"))[
-            "total"
-        ] or Decimal("0")
+        from .subledger import AccountsPayableLedger
 
-        # 发票金额 = 累计收货正应付（原始发票金额，不含退货）
-        self.invoice_amount = total_positive
-
-        # 已核销金额
-        self.paid_amount = details.aggregate(total=models.Sum("allocated_amount"))[
-            "total"
-        ] or Decimal("0")
-
-        # 未付余额 = 收货正应付 + 退货负应付 - 已核销金额
-        self.balance = total_positive + total_negative - self.paid_amount
-
-        # 更新状态
-        self.update_status()
-        self.save()
+        AccountsPayableLedger.rebuild(self)
 
     @classmethod
     def get_or_create_for_order(cls, purchase_order):
@@ -626,23 +599,9 @@ class SupplierAccountDetail(BaseModel):
         Returns:
             bool: 是否成功
         """
-        from decimal import Decimal
-
-        amount = Decimal(str(amount))
+        from .subledger import AccountsPayableLedger
 
-        if amount <= 0:
-            return False
-
-        if amount > self.balance:
-            return False
-
-        self.allocated_amount += amount
-        if self.is_fully_allocated:
-            self.status = "allocated"
-        else:
-            self.status = "partial"
-        self.save()
-        return True
+        return AccountsPayableLedger.allocate(self, amount)
 
     def direct_write_off(self, amount, write_off_by=None):
         """
@@ -658,49 +617,9 @@ class SupplierAccountDetail(BaseModel):
             amount: 核销金额(正数)
             write_off_by: 操作人
         """
-        from decimal import Decimal
-
-        from django.db import models as django_models
-        from django.utils import timezone
-
-        if self.amount >= 0:
-            raise ValueError("只有负应付明细才能直接核销")
-
-        # 查找同订单的正应付明细(未核销或部分核销)
-        positive_details = SupplierAccountDetail.objects.filter(
-            purchase_order=self.purchase_order,
-            detail_type="receipt",
-            amount__gt=0,
-            is_deleted=False,
-        ).exclude(
-            allocated_amount__gte=django_models.F("amount")  # 排除已全额核销的
-        )
-
-        remaining_to_write_off = -self.amount
+        from .subledger import AccountsPayableLedger
 
-        for detail in positive_details:
-            if remaining_to_write_off <= 0:
-                break
-
-            can_allocate = detail.amount - detail.allocated_amount
-            allocate_amount = min(can_allocate, remaining_to_write_off)
-
-            detail.allocated_amount += allocate_amount
-            if detail.allocated_amount >= detail.amount:
-                detail.status = "allocated"
-            detail.save()
-
-            remaining_to_write_off -= allocate_amount
-
-        # 更新负应付明细
-        self.allocated_amount = -Decimal(str(amount))
-        self.status = "allocated"
-        self.notes += f"\n直接核销金额:{amount}元,时间:{timezone.now()}"
-        self.save()
-
-        # 归集应付主单
-        if self.parent_account:
-            self.parent_account.aggregate_from_details()
+        AccountsPayableLedger.write_off(self, amount, write_off_by=write_off_by)
 
 
 class Payment(BaseModel):
@@ -1565,3 +1484,55 @@ class Expense(BaseModel):
                 pass
 
         return journal
+
+
+class AgingSnapshot(models.Model):
+    """
+    往来账龄快照。
+
+    每晚按客户/供应商各生成一行，记录余额及逾期账龄分段，
+    用于账龄趋势图和账款列表的汇总数据。
+    """
+
+    LEDGER_TYPES = [
+        ("receivable", "应收"),
+        ("payable", "应付"),
+    ]
+
+    snapshot_date = models.DateField("快照日期")
+    ledger = models.CharField("账款类型", max_length=20, choices=LEDGER_TYPES)
+    party_id = models.PositiveIntegerField("往来单位ID", null=True, blank=True)
+    party_name = models.CharField("往来单位", max_length=200, blank=True)
+
+    account_count = models.PositiveIntegerField("单据数", default=0)
+    overdue_count = models.PositiveIntegerField("逾期单据数", default=0)
+    invoice_amount = models.DecimalField("单据金额", max_digits=15, decimal_places=2, default=0)
+    paid_amount = models.DecimalField("已收付金额", max_digits=15, decimal_places=2, default=0)
+    balance = models.DecimalField("余额", max_digits=15, decimal_places=2, default=0)
+
+    # 账龄分段（按逾期天数）
+    not_due = models.DecimalField("未到期", max_digits=15, decimal_places=2, default=0)
+    days_0_30 = models.DecimalField("逾期0-30天", max_digits=15, decimal_places=2, default=0)
+    days_31_60 = models.DecimalField("逾期31-60天", max_digits=15, decimal_places=2, default=0)
+    days_61_90 = models.DecimalField("逾期61-90天", max_digits=15, decimal_places=2, default=0)
+    days_over_90 = models.DecimalField("逾期90天以上", max_digits=15, decimal_places=2, default=0)
+
+    created_at = models.DateTimeField("创建时间", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "账龄快照"
+        verbose_name_plural = "账龄快照"
+        db_table = "finance_aging_snapshot"
+        ordering = ["-snapshot_date", "ledger", "party_name"]
+        indexes = [
+            models.Index(fields=["ledger", "snapshot_date"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["snapshot_date", "ledger", "party_id"],
+                name="uniq_aging_snapshot_date_ledger_party",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.snapshot_date} {self.get_ledger_display()} {self.party_name} ¥{self.balance}"
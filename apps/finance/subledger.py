@@ -0,0 +1,511 @@
+"""
+应收/应付子账
+
+应付主单（SupplierAccount）的汇总字段由明细（SupplierAccountDetail）过账维护：
+收货、退货、核销、直接冲销都以带符号的增量通过 F() 原子更新主单，
+与明细写入处于同一事务，不再每次重新汇总全部明细。
+
+应收主单（CustomerAccount）没有明细表，以收款记录（Payment）为准。
+
+汇总公式：
+- 应付：实际应付 = 累计收货，已核销 = 累计已核销，未付余额 = 收货 + 退货 - 已核销
+- 应收：已收 = 累计收款，余额 = max(发票金额 - 已收, 0)
+"""
+
+import logging
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.db.models.functions import Greatest, Least
+from django.db.models.lookups import GreaterThan, LessThanOrEqual
+from django.utils import timezone
+
+from .models import CustomerAccount, Payment, SupplierAccount, SupplierAccountDetail
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+
+def to_money(value) -> Decimal:
+    """转换为两位小数金额"""
+    return Decimal(str(value or 0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _status_case(balance, paid_amount):
+    """与 SupplierAccount.update_status 一致的状态表达式"""
+    return Case(
+        When(LessThanOrEqual(balance, ZERO), then=Value("paid")),
+        When(GreaterThan(paid_amount, ZERO), then=Value("partially_paid")),
+        When(due_date__lt=timezone.now().date(), then=Value("overdue")),
+        default=Value("pending"),
+    )
+
+
+class AccountsPayableLedger:
+    """
+    应付子账
+
+    所有改变应付金额的操作都应通过本类完成，主单字段只做增量更新：
+    - record_detail: 新增收货/退货明细
+    - allocate / allocate_many: 付款核销明细
+    - write_off: 负应付直接冲销同订单正应付
+    - void_detail: 撤销明细
+    - settle: 不指定明细的主单核销（按业务日期分摊到收货明细）
+    - rebuild / reconcile: 按明细重建主单、批量对账
+    """
+
+    FIELDS = ["invoice_amount", "paid_amount", "balance"]
+
+    @staticmethod
+    def post(account_id, invoice=ZERO, returned=ZERO, paid=ZERO) -> int:
+        """
+        对应付主单过账增量
+
+        Args:
+            account_id: 应付主单ID
+            invoice: 实际应付增量（收货）
+            returned: 退货负应付增量（负数）
+            paid: 已核销增量
+
+        Returns:
+            int: 更新行数
+        """
+        if not account_id or not (invoice or returned or paid):
+            return 0
+
+        balance = F("balance") + (invoice + returned - paid)
+        paid_amount = F("paid_amount") + paid
+        return SupplierAccount.objects.filter(pk=account_id).update(
+            invoice_amount=F("invoice_amount") + invoice,
+            paid_amount=paid_amount,
+            balance=balance,
+            status=_status_case(balance, paid_amount),
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def record_detail(cls, **fields) -> SupplierAccountDetail:
+        """
+        新增应付明细并过账到主单
+
+        Args:
+            **fields: SupplierAccountDetail 字段
+
+        Returns:
+            SupplierAccountDetail: 新建的明细
+        """
+        with transaction.atomic():
+            detail = SupplierAccountDetail.objects.create(**fields)
+            cls.post(detail.parent_account_id, paid=detail.allocated_amount, **cls._amounts(detail))
+        return detail
+
+    @classmethod
+    def allocate(cls, detail: SupplierAccountDetail, amount) -> bool:
+        """
+        核销单个明细
+
+        Returns:
+            bool: 金额无效或超过未核销余额时返回 False
+        """
+        amount = Decimal(str(amount))
+        if amount <= 0:
+            return False
+
+        with transaction.atomic():
+            if not cls._allocate_detail(detail.pk, amount):
+                return False
+            cls.post(detail.parent_account_id, paid=amount)
+
+        detail.refresh_from_db(fields=["allocated_amount", "status", "updated_at"])
+        return True
+
+    @classmethod
+    def allocate_many(cls, allocations: Iterable[Tuple[SupplierAccountDetail, Decimal]]):
+        """
+        批量核销明细，每个主单只更新一次
+
+        Args:
+            allocations: (明细, 核销金额) 列表
+
+        Raises:
+            ValueError: 任一明细核销失败时整体回滚
+        """
+        paid = defaultdict(Decimal)
+        with transaction.atomic():
+            for detail, amount in allocations:
+                amount = Decimal(str(amount))
+                if amount <= 0 or not cls._allocate_detail(detail.pk, amount):
+                    raise ValueError(f"明细 {detail.detail_number} 的核销金额不能超过未核销余额")
+                paid[detail.parent_account_id] += amount
+
+            for account_id, amount in paid.items():
+                cls.post(account_id, paid=amount)
+
+    @classmethod
+    def write_off(cls, detail: SupplierAccountDetail, amount, write_off_by=None):
+        """
+        负应付明细直接冲销同订单的正应付明细
+
+        业务规则与原 direct_write_off 一致：
+        - 依次核销同订单未核销完的收货明细，合计不超过负应付金额
+        - 负应付明细的已核销金额记为 -amount
+        - 所涉及的主单按已核销增量过账
+        """
+        if detail.amount >= 0:
+            raise ValueError("只有负应付明细才能直接核销")
+
+        amount = Decimal(str(amount))
+        now = timezone.now()
+        paid = defaultdict(Decimal)
+
+        with transaction.atomic():
+            for account_id, allocated in cls._allocate_receipts(
+                -detail.amount, now, purchase_order_id=detail.purchase_order_id
+            ).items():
+                paid[account_id] += allocated
+
+            current = SupplierAccountDetail.objects.select_for_update().get(pk=detail.pk)
+            paid[current.parent_account_id] += -amount - current.allocated_amount
+            current.allocated_amount = -amount
+            current.status = "allocated"
+            current.notes += f"\n直接核销金额:{amount}元,时间:{now}"
+            if write_off_by:
+                current.updated_by = write_off_by
+            current.save(
+                update_fields=["allocated_amount", "status", "notes", "updated_by", "updated_at"]
+            )
+
+            for account_id, delta in paid.items():
+                cls.post(account_id, paid=delta)
+
+        detail.allocated_amount = current.allocated_amount
+        detail.status = current.status
+        detail.notes = current.notes
+
+    @classmethod
+    def void_detail(cls, detail: SupplierAccountDetail, user=None, note=""):
+        """
+        撤销（软删除）明细并冲回其对主单的影响
+
+        Raises:
+            ValueError: 明细已核销时不允许撤销
+        """
+        with transaction.atomic():
+            current = SupplierAccountDetail.objects.select_for_update().get(pk=detail.pk)
+            if current.is_deleted:
+                return
+            if current.allocated_amount > 0:
+                raise ValueError(f"应付明细 {current.detail_number} 已核销，无法撤销")
+
+            now = timezone.now()
+            current.is_deleted = True
+            current.deleted_at = now
+            current.deleted_by = user
+            if note:
+                current.notes += f"\n{note}"
+            current.save(
+                update_fields=["is_deleted", "deleted_at", "deleted_by", "notes", "updated_at"]
+            )
+
+            amounts = cls._amounts(current)
+            cls.post(
+                current.parent_account_id,
+                invoice=-amounts["invoice"],
+                returned=-amounts["returned"],
+                paid=-current.allocated_amount,
+            )
+
+        detail.is_deleted = True
+
+    @classmethod
+    def settle(cls, account: SupplierAccount, amount) -> Decimal:
+        """
+        不指定明细核销主单，超过未付余额的部分按余额结清
+
+        核销金额按业务日期依次分摊到主单未核销完的收货明细，使 rebuild/reconcile
+        按明细汇总的已核销金额与主单一致；没有明细的主单直接核销主单。
+
+        Returns:
+            Decimal: 实际核销金额
+        """
+        amount = to_money(amount)
+        if amount <= 0:
+            return ZERO
+
+        with transaction.atomic():
+            current = SupplierAccount.objects.select_for_update().get(pk=account.pk)
+            settled = min(amount, max(current.balance, ZERO))
+            if SupplierAccountDetail.objects.filter(
+                parent_account=account.pk, is_deleted=False
+            ).exists():
+                allocated = cls._allocate_receipts(
+                    settled, timezone.now(), parent_account=account.pk
+                )
+                settled = sum(allocated.values(), ZERO)
+            cls.post(account.pk, paid=settled)
+
+        account.refresh_from_db(fields=["paid_amount", "balance", "status", "updated_at"])
+        return settled
+
+    @staticmethod
+    def _allocate_receipts(amount: Decimal, now, **filters) -> Dict[int, Decimal]:
+        """
+        按业务日期依次核销未核销完的收货明细，合计不超过 amount
+
+        Args:
+            amount: 核销总额
+            now: 更新时间
+            **filters: 明细筛选条件（同订单或同主单）
+
+        Returns:
+            dict: {主单ID: 核销金额}
+        """
+        positive_details = (
+            SupplierAccountDetail.objects.select_for_update()
+            .filter(
+                detail_type="receipt",
+                amount__gt=0,
+                is_deleted=False,
+                allocated_amount__lt=F("amount"),
+                **filters,
+            )
+            .order_by("business_date", "pk")
+        )
+
+        remaining = amount
+        paid = defaultdict(Decimal)
+        updated = []
+        for positive in positive_details:
+            if remaining <= 0:
+                break
+            allocate_amount = min(positive.balance, remaining)
+            positive.allocated_amount += allocate_amount
+            positive.status = "allocated" if positive.is_fully_allocated else "partial"
+            positive.updated_at = now
+            updated.append(positive)
+            paid[positive.parent_account_id] += allocate_amount
+            remaining -= allocate_amount
+
+        SupplierAccountDetail.objects.bulk_update(
+            updated, ["allocated_amount", "status", "updated_at"]
+        )
+        return paid
+
+    @staticmethod
+    def _allocate_detail(detail_id, amount: Decimal) -> bool:
+        """条件更新明细的已核销金额，余额不足时不更新"""
+        return bool(
+            SupplierAccountDetail.objects.filter(
+                pk=detail_id,
+                is_deleted=False,
+                allocated_amount__lte=F("amount") - amount,
+            ).update(
+                allocated_amount=F("allocated_amount") + amount,
+                status=Case(
+                    When(allocated_amount__gte=F("amount") - amount, then=Value("allocated")),
+                    default=Value("partial"),
+                ),
+                updated_at=timezone.now(),
+            )
+        )
+
+    @staticmethod
+    def _amounts(detail: SupplierAccountDetail) -> Dict[str, Decimal]:
+        if detail.detail_type == "return":
+            return {"invoice": ZERO, "returned": detail.amount}
+        return {"invoice": detail.amount, "returned": ZERO}
+
+    # ------------------------------------------------------------------
+    # 重建与对账
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _detail_totals():
+        """按明细类型的一次性条件汇总"""
+        return {
+            "receipts": Sum("amount", filter=Q(detail_type="receipt"), default=ZERO),
+            "returns": Sum("amount", filter=Q(detail_type="return"), default=ZERO),
+            "allocated": Sum("allocated_amount", default=ZERO),
+        }
+
+    @staticmethod
+    def _expected(totals) -> Dict[str, Decimal]:
+        return {
+            "invoice_amount": to_money(totals["receipts"]),
+            "paid_amount": to_money(totals["allocated"]),
+            "balance": to_money(totals["receipts"] + totals["returns"] - totals["allocated"]),
+        }
+
+    @classmethod
+    def rebuild(cls, account: SupplierAccount):
+        """按明细重建主单汇总（单次聚合查询）"""
+        totals = SupplierAccountDetail.objects.filter(
+            parent_account=account, is_deleted=False
+        ).aggregate(**cls._detail_totals())
+
+        for field, value in cls._expected(totals).items():
+            setattr(account, field, value)
+        account.update_status()
+        account.save(update_fields=cls.FIELDS + ["status", "updated_at"])
+
+    @classmethod
+    def reconcile(cls, fix: bool = False) -> List[Dict]:
+        """
+        用一次分组查询重算所有有明细的应付主单，返回存在偏差的主单
+
+        Args:
+            fix: 是否按明细修正偏差
+
+        Returns:
+            list: [{"account_id", "label", "field", "stored", "expected"}, ...]
+        """
+        rows = (
+            SupplierAccountDetail.objects.filter(is_deleted=False, parent_account__isnull=False)
+            .values("parent_account_id")
+            .annotate(**cls._detail_totals())
+            .order_by()
+        )
+        expected = {row["parent_account_id"]: cls._expected(row) for row in rows}
+        accounts = SupplierAccount.objects.filter(pk__in=expected, is_deleted=False).only(
+            "id", "invoice_number", "invoice_amount", "paid_amount", "balance", "status", "due_date"
+        )
+        return _reconcile_accounts(SupplierAccount, accounts, expected, cls.FIELDS, fix)
+
+
+class AccountsReceivableLedger:
+    """应收子账：以收款记录为准维护 CustomerAccount 的已收和余额"""
+
+    FIELDS = ["paid_amount", "balance"]
+
+    @staticmethod
+    def settle(account: CustomerAccount, amount) -> Decimal:
+        """
+        核销应收主单，超过余额的部分按余额结清
+
+        Returns:
+            Decimal: 实际核销金额
+        """
+        amount = to_money(amount)
+        if amount <= 0:
+            return ZERO
+
+        with transaction.atomic():
+            current = CustomerAccount.objects.select_for_update().get(pk=account.pk)
+            settled = min(amount, max(current.balance, ZERO))
+            CustomerAccount.objects.filter(pk=account.pk).update(
+                paid_amount=Least(F("paid_amount") + amount, F("invoice_amount")),
+                balance=Greatest(F("invoice_amount") - F("paid_amount") - amount, Value(ZERO)),
+                updated_at=timezone.now(),
+            )
+
+        account.refresh_from_db(fields=["paid_amount", "balance", "updated_at"])
+        return settled
+
+    @staticmethod
+    def _payments():
+        return Payment.objects.filter(
+            is_deleted=False, payment_type="receipt", reference_type="customer_account"
+        )
+
+    @staticmethod
+    def _expected(invoice_amount, total_paid) -> Dict[str, Decimal]:
+        total_paid = to_money(total_paid)
+        return {
+            "paid_amount": total_paid,
+            "balance": max(to_money(invoice_amount) - total_paid, ZERO),
+        }
+
+    @classmethod
+    def rebuild(cls, account: CustomerAccount) -> bool:
+        """
+        按收款记录重建应收主单
+
+        Returns:
+            bool: 是否存在偏差并已修正
+        """
+        total_paid = (
+            cls._payments()
+            .filter(reference_id=str(account.id))
+            .aggregate(total=Sum("amount", default=ZERO))["total"]
+        )
+        expected = cls._expected(account.invoice_amount, total_paid)
+        if all(getattr(account, field) == value for field, value in expected.items()):
+            return False
+
+        for field, value in expected.items():
+            setattr(account, field, value)
+        account.save(update_fields=cls.FIELDS + ["updated_at"])
+        return True
+
+    @classmethod
+    def reconcile(cls, fix: bool = False) -> List[Dict]:
+        """用一次分组查询重算所有应收主单，返回存在偏差的主单"""
+        paid = dict(
+            cls._payments()
+            .values("reference_id")
+            .annotate(total=Sum("amount"))
+            .order_by()
+            .values_list("reference_id", "total")
+        )
+        accounts = list(
+            CustomerAccount.objects.filter(is_deleted=False).only(
+                "id", "invoice_number", "invoice_amount", "paid_amount", "balance"
+            )
+        )
+        expected = {
+            account.pk: cls._expected(account.invoice_amount, paid.get(str(account.pk)))
+            for account in accounts
+        }
+        return _reconcile_accounts(CustomerAccount, accounts, expected, cls.FIELDS, fix)
+
+
+def _reconcile_accounts(model, accounts, expected, fields, fix: bool) -> List[Dict]:
+    """
+    对比主单与期望值，fix 时批量修正
+
+    Args:
+        model: 主单模型，有 update_status 时一并更新状态
+        accounts: 主单列表
+        expected: {主单ID: {字段: 期望值}}
+        fields: 参与对比的金额字段
+        fix: 是否修正
+    """
+    update_status = hasattr(model, "update_status")
+    drift = []
+    changed = []
+    for account in accounts:
+        values = expected[account.pk]
+        drifted = [field for field in fields if getattr(account, field) != values[field]]
+        if not drifted:
+            continue
+
+        for field in drifted:
+            drift.append(
+                {
+                    "account_id": account.pk,
+                    "label": account.invoice_number or str(account.pk),
+                    "field": field,
+                    "stored": getattr(account, field),
+                    "expected": values[field],
+                }
+            )
+            setattr(account, field, values[field])
+        if update_status:
+            account.update_status()
+        changed.append(account)
+
+    if fix and changed:
+        now = timezone.now()
+        update_fields = list(fields) + ["updated_at"] + (["status"] if update_status else [])
+        for account in changed:
+            account.updated_at = now
+        with transaction.atomic():
+            model.objects.bulk_update(changed, update_fields, batch_size=500)
+        logger.info(f"子账对账修正 {len(changed)} 个主单")
+
+    return drift
@@ -0,0 +1,25 @@
+"""
+Finance tasks for the ERP system.
+"""
+
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def snapshot_account_aging():
+    """生成应收/应付账龄快照"""
+    try:
+        from .aging import snapshot_all
+
+        counts = snapshot_all()
+        return (
+            f"Aging snapshot: {counts['receivable']} receivable rows, "
+            f"{counts['payable']} payable rows"
+        )
+    except Exception as e:
+        logger.error(f"Failed to snapshot account aging: {str(e)}")
+        raise
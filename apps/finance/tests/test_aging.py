@@ -0,0 +1,94 @@
+"""
+往来账龄测试
+测试账龄分段、快照和列表汇总的当日增量
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from customers.models import Customer
+from django.test import TestCase
+from django.utils import timezone
+from finance.aging import AgingEngine, snapshot_all
+from finance.models import AgingSnapshot, CustomerAccount
+
+
+class AgingEngineTest(TestCase):
+    """账龄引擎测试"""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.alpha = Customer.objects.create(name="账龄客户A", code="AGEA")
+        self.beta = Customer.objects.create(name="账龄客户B", code="AGEB")
+        # (客户, 逾期天数, 余额)，None 表示无到期日
+        for customer, overdue_days, balance in [
+            (self.alpha, None, "100.00"),
+            (self.alpha, -5, "200.00"),
+            (self.alpha, 0, "50.00"),
+            (self.alpha, 1, "300.00"),
+            (self.alpha, 30, "400.00"),
+            (self.beta, 31, "500.00"),
+            (self.beta, 75, "600.00"),
+            (self.beta, 120, "700.00"),
+            (self.beta, 200, "0.00"),
+        ]:
+            self.create_account(customer, overdue_days, balance)
+        self.engine = AgingEngine("receivable")
+
+    def create_account(self, customer, overdue_days, balance):
+        due_date = None if overdue_days is None else self.today - timedelta(days=overdue_days)
+        return CustomerAccount.objects.create(
+            customer=customer,
+            due_date=due_date,
+            invoice_amount=Decimal("1000.00"),
+            paid_amount=Decimal("1000.00") - Decimal(balance),
+            balance=Decimal(balance),
+        )
+
+    def test_buckets_computed_per_party_in_one_query(self):
+        """按客户一次分组计算各账龄分段"""
+        with self.assertNumQueries(1):
+            rows = {row["party_name"]: row for row in self.engine.compute()}
+
+        alpha, beta = rows["账龄客户A"], rows["账龄客户B"]
+        self.assertEqual(alpha["not_due"], Decimal("350.00"))
+        self.assertEqual(alpha["days_0_30"], Decimal("700.00"))
+        self.assertEqual((alpha["account_count"], alpha["overdue_count"]), (5, 2))
+        self.assertEqual(
+            (beta["days_31_60"], beta["days_61_90"], beta["days_over_90"]),
+            (Decimal("500.00"), Decimal("600.00"), Decimal("700.00")),
+        )
+        self.assertEqual(beta["overdue_count"], 3)
+        self.assertEqual(beta["balance"], Decimal("1800.00"))
+
+    def test_current_totals_use_snapshot_plus_same_day_changes(self):
+        """有当日快照时只重算快照后有变动的客户"""
+        self.assertEqual(snapshot_all(), {"receivable": 2, "payable": 0})
+        self.assertEqual(AgingSnapshot.objects.filter(ledger="receivable").count(), 2)
+        live = self.engine.totals()
+
+        # 无变动：直接汇总快照
+        with self.assertNumQueries(3):
+            self.assertEqual(self.engine.current_totals(), live)
+
+        # 快照后新增账款和删除账款
+        self.create_account(self.alpha, 95, "1000.00")
+        CustomerAccount.objects.filter(customer=self.beta, balance=Decimal("700.00")).get().delete()
+
+        totals = self.engine.current_totals()
+        self.assertEqual(totals, self.engine.totals())
+        self.assertEqual(totals["days_over_90"], Decimal("1000.00"))
+        self.assertEqual(totals["account_count"], 9)
+
+    def test_trend_from_snapshots(self):
+        """趋势按快照日期汇总"""
+        snapshot_all(self.today - timedelta(days=1))
+        snapshot_all()
+
+        trend = AgingEngine("receivable").trend(days=7)
+
+        self.assertEqual(
+            [row["snapshot_date"] for row in trend], [self.today - timedelta(days=1), self.today]
+        )
+        self.assertEqual(trend[-1]["balance"], Decimal("2850.00"))
+        self.assertEqual(trend[-1]["days_over_90"], Decimal("700.00"))
@@ -0,0 +1,176 @@
+"""
+应收/应付子账测试
+测试增量过账、批量核销、直接冲销和批量对账
+"""
+
+from decimal import Decimal
+from io import StringIO
+
+from customers.models import Customer
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from finance.models import CustomerAccount, Payment, SupplierAccount
+from finance.subledger import AccountsPayableLedger, AccountsReceivableLedger
+from purchase.models import PurchaseOrder
+from suppliers.models import Supplier
+
+User = get_user_model()
+
+
+class AccountsPayableLedgerTest(TestCase):
+    """应付子账测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="ap", password="testpass123")
+        self.supplier = Supplier.objects.create(
+            name="子账供应商", code="SUPLEDGER", created_by=self.user
+        )
+        self.order = PurchaseOrder.objects.create(
+            supplier=self.supplier, order_date=timezone.now().date(), created_by=self.user
+        )
+        self.account = SupplierAccount.objects.create(
+            supplier=self.supplier, purchase_order=self.order, invoice_number="AP-001"
+        )
+        self.sequence = 0
+
+    def record(self, amount, detail_type="receipt"):
+        self.sequence += 1
+        return AccountsPayableLedger.record_detail(
+            detail_number=f"AD{self.sequence:04d}",
+            detail_type=detail_type,
+            supplier=self.supplier,
+            purchase_order=self.order,
+            amount=Decimal(amount),
+            parent_account=self.account,
+            business_date=timezone.now().date(),
+        )
+
+    def assertAccount(self, invoice, paid, balance, status):
+        self.account.refresh_from_db()
+        self.assertEqual(
+            (
+                self.account.invoice_amount,
+                self.account.paid_amount,
+                self.account.balance,
+                self.account.status,
+            ),
+            (Decimal(invoice), Decimal(paid), Decimal(balance), status),
+        )
+
+    def test_posting_keeps_account_in_sync(self):
+        """收货、核销、退货冲销、撤销都以增量更新主单，结果与全量重建一致"""
+        first = self.record("1000.00")
+        second = self.record("500.00")
+        self.assertAccount("1500.00", "0.00", "1500.00", "pending")
+
+        # 每个明细一次条件更新，主单只更新一次（另含保存点两条）
+        with self.assertNumQueries(5):
+            AccountsPayableLedger.allocate_many([(first, Decimal("400")), (second, "100")])
+        self.assertAccount("1500.00", "500.00", "1000.00", "partially_paid")
+
+        # 超过未核销余额时整体回滚
+        with self.assertRaises(ValueError):
+            AccountsPayableLedger.allocate_many([(second, "100"), (first, "700")])
+        self.assertAccount("1500.00", "500.00", "1000.00", "partially_paid")
+        self.assertFalse(first.allocate(Decimal("700")))
+
+        self.assertTrue(second.allocate(Decimal("400")))
+        self.assertEqual(second.status, "allocated")
+
+        returned = self.record("-200.00", detail_type="return")
+        self.assertAccount("1500.00", "900.00", "400.00", "partially_paid")
+        returned.direct_write_off(Decimal("200"), write_off_by=self.user)
+        self.assertAccount("1500.00", "900.00", "400.00", "partially_paid")
+        first.refresh_from_db()
+        self.assertEqual((first.allocated_amount, first.status), (Decimal("600.00"), "partial"))
+
+        third = self.record("300.00")
+        AccountsPayableLedger.void_detail(third, user=self.user, note="撤销")
+        self.assertAccount("1500.00", "900.00", "400.00", "partially_paid")
+
+        self.assertTrue(self.account.record_payment(Decimal("400")))
+        self.assertEqual(self.account.status, "paid")
+        self.assertEqual(self.account.balance, Decimal("0.00"))
+        first.refresh_from_db()
+        self.assertEqual((first.allocated_amount, first.status), (Decimal("1000.00"), "allocated"))
+
+        # 主单核销已分摊到明细，重建和对账结果不变
+        self.account.aggregate_from_details()
+        self.assertAccount("1500.00", "1300.00", "0.00", "paid")
+        self.assertEqual(AccountsPayableLedger.reconcile(), [])
+
+    def test_settle_allocates_oldest_receipts_first(self):
+        """不指定明细的核销按业务日期分摊到收货明细，超过余额的部分不核销"""
+        first = self.record("300.00")
+        second = self.record("500.00")
+
+        self.assertEqual(AccountsPayableLedger.settle(self.account, "400"), Decimal("400.00"))
+        self.assertEqual(AccountsPayableLedger.settle(self.account, "900"), Decimal("400.00"))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.allocated_amount, first.status), (Decimal("300.00"), "allocated"))
+        self.assertEqual((second.allocated_amount, second.status), (Decimal("500.00"), "allocated"))
+        self.assertAccount("800.00", "800.00", "0.00", "paid")
+        self.assertEqual(AccountsPayableLedger.reconcile(), [])
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        """一次分组查询重算所有主单，报告偏差并批量修正"""
+        self.record("800.00")
+        self.record("-100.00", detail_type="return")
+        SupplierAccount.objects.filter(pk=self.account.pk).update(balance=Decimal("800.00"))
+
+        drift = AccountsPayableLedger.reconcile()
+        self.assertEqual(
+            [(row["field"], row["stored"], row["expected"]) for row in drift],
+            [("balance", Decimal("800.00"), Decimal("700.00"))],
+        )
+        self.assertAccount("800.00", "0.00", "800.00", "pending")
+
+        out = StringIO()
+        call_command("reconcile_subledgers", "--ledger", "ap", "--fix", stdout=out)
+        self.assertIn("已修正", out.getvalue())
+        self.assertAccount("800.00", "0.00", "700.00", "pending")
+        self.assertEqual(AccountsPayableLedger.reconcile(), [])
+
+
+class AccountsReceivableLedgerTest(TestCase):
+    """应收子账测试"""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="子账客户", code="CUSLEDGER")
+        self.account = CustomerAccount.objects.create(
+            customer=self.customer,
+            invoice_number="AR-001",
+            invoice_amount=Decimal("1000.00"),
+            balance=Decimal("1000.00"),
+        )
+
+    def test_settle_clamps_to_invoice_amount(self):
+        """核销超过余额时按余额结清"""
+        self.assertEqual(AccountsReceivableLedger.settle(self.account, "600"), Decimal("600.00"))
+        self.assertEqual(AccountsReceivableLedger.settle(self.account, "600"), Decimal("400.00"))
+        self.assertEqual(self.account.paid_amount, Decimal("1000.00"))
+        self.assertEqual(self.account.balance, Decimal("0.00"))
+
+    def test_reconcile_from_payments(self):
+        """以收款记录为准重算已收和余额"""
+        for number, amount in [("RC001", "300.00"), ("RC002", "200.00")]:
+            Payment.objects.create(
+                payment_number=number,
+                payment_type="receipt",
+                customer=self.customer,
+                amount=Decimal(amount),
+                payment_date=timezone.now().date(),
+                reference_type="customer_account",
+                reference_id=str(self.account.pk),
+            )
+
+        drift = AccountsReceivableLedger.reconcile(fix=True)
+
+        self.assertEqual({row["field"] for row in drift}, {"paid_amount", "balance"})
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.paid_amount, Decimal("500.00"))
+        self.assertEqual(self.account.balance, Decimal("500.00"))
+        self.assertFalse(AccountsReceivableLedger.rebuild(self.account))
@@ -204,6 +204,7 @@ urlpatterns = [
     ),
     # 往来款项报表
     path("reports/accounts/", views.account_report, name="account_report"),
+    path("reports/accounts/aging-trend/", views.api_aging_trend, name="api_aging_trend"),
     # 费用管理
     path("expenses/", views_expense.expense_list, name="expense_list"),
     path("expenses/create/", views_expense.expense_create, name="expense_create"),
@@ -31,6 +31,8 @@ from .models import (
     SupplierPrepayment,
     TaxRate,
 )
+from .aging import AgingEngine, overdue_q
+from .subledger import AccountsPayableLedger, AccountsReceivableLedger
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -39,6 +41,23 @@ logger = logging.getLogger(__name__)
 # ==================== Helper Functions ====================
 
 
+def _list_totals(ledger, accounts, filtered):
+    """
+    账款列表汇总：无筛选条件时取账龄快照+当日增量，否则对筛选结果单次聚合。
+
+    Returns:
+        tuple: (totals, aging)，aging 为包含账龄分段的汇总
+    """
+    engine = AgingEngine(ledger)
+    aging = engine.totals(queryset=accounts) if filtered else engine.current_totals()
+    totals = {
+        "total_invoice": aging["invoice_amount"],
+        "total_paid": aging["paid_amount"],
+        "total_balance": aging["balance"],
+    }
+    return totals, aging
+
+
 def _generate_supplier_account_from_invoice(invoice):
     """
     从采购发票生成应付账款。
@@ -473,7 +492,7 @@ def customer_account_list(request):
     # Filter by overdue
     is_overdue = request.GET.get("is_overdue", "")
     if is_overdue == "true":
-        accounts = accounts.filter(due_date__lt=timezone.now().date(), balance__gt=0)
+        accounts = accounts.filter(overdue_q())
 
     # Sorting - 按创建时间降序（最新创建的在最上面）
     sort = request.GET.get("sort", "-created_at")
@@ -485,10 +504,8 @@ def customer_account_list(request):
     page_obj = paginator.get_page(page_number)
 
     # Calculate totals
-    totals = accounts.aggregate(
-        total_invoice=Sum("invoice_amount"),
-        total_paid=Sum("paid_amount"),
-        total_balance=Sum("balance"),
+    totals, aging = _list_totals(
+        "receivable", accounts, filtered=bool(search or customer_id or is_overdue == "true")
     )
 
     # 获取所有客户用于筛选下拉框
@@ -503,6 +520,7 @@ def customer_account_list(request):
         "is_overdue": is_overdue,
         "total_count": paginator.count,
         "totals": totals,
+        "aging": aging,
         "customers": customers,
     }
     return render(request, "modules/finance/customer_account_list.html", context)
@@ -526,22 +544,7 @@ def customer_account_detail(request, pk):
 
     # Recalculate paid amount from payments to ensure consistency
     try:
-        total_paid = payments.aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
-        total_paid = Decimal(total_paid).quantize(
-            Decimal("0.00"), rounding=ROUND_HALF_UP
-        )
-        expected_balance = (account.invoice_amount - total_paid).quantize(
-            Decimal("0.00"), rounding=ROUND_HALF_UP
-        )
-
-        if account.paid_amount != total_paid or account.balance != expected_balance:
-            account.paid_amount = total_paid
-            account.balance = (
-                expected_balance
-                if expected_balance > Decimal("0.00")
-                else Decimal("0.00")
-            )
-            account.save(update_fields=["paid_amount", "balance", "updated_at"])
+        AccountsReceivableLedger.rebuild(account)
     except Exception:
         pass
 
@@ -592,7 +595,14 @@ def supplier_account_list(request):
     # Filter by overdue
     is_overdue = request.GET.get("is_overdue", "")
     if is_overdue == "true":
-        accounts = accounts.filter(due_date__lt=timezone.now().date(), balance__gt=0)
+        accounts = accounts.filter(overdue_q())
+
+    # 无筛选条件时汇总取账龄快照
+    totals, aging = _list_totals(
+        "payable",
+        accounts,
+        filtered=bool(search or supplier_id or status or is_overdue == "true"),
+    )
 
     # 检查是否需要按供应商分组
     group_by_supplier = request.GET.get("group_by_supplier", "true") == "true"
@@ -620,13 +630,6 @@ def supplier_account_list(request):
         paginator = Paginator(supplier_list, 20)
         page_number = request.GET.get("page")
         page_obj = paginator.get_page(page_number)
-
-        # Calculate totals
-        totals = accounts.aggregate(
-            total_invoice=Sum("invoice_amount"),
-            total_paid=Sum("paid_amount"),
-            total_balance=Sum("balance"),
-        )
     else:
         # 不分组，显示所有记录
         # Sorting - 按创建时间降序（最新创建的在最上面）
@@ -644,13 +647,6 @@ def supplier_account_list(request):
                 detail_type="return"
             ).count()
 
-        # Calculate totals
-        totals = accounts.aggregate(
-            total_invoice=Sum("invoice_amount"),
-            total_paid=Sum("paid_amount"),
-            total_balance=Sum("balance"),
-        )
-
     # 获取所有供应商用于筛选下拉框
     from suppliers.models import Supplier
 
@@ -666,6 +662,7 @@ def supplier_account_list(request):
         "is_overdue": is_overdue,
         "total_count": paginator.count,
         "totals": totals,
+        "aging": aging,
         "status_choices": SupplierAccount.ACCOUNT_STATUS,
         "suppliers": suppliers,
         "group_by_supplier": group_by_supplier,
@@ -848,25 +845,12 @@ def customer_account_writeoff(request, pk):
                         created_by=request.user,
                     )
 
-                # 更新应收账款（处理进位误差，确保结清时置零）
-                paid = (account.paid_amount + total_offset).quantize(
-                    Decimal("0.00"), rounding=ROUND_HALF_UP
-                )
-                remaining = (account.invoice_amount - paid).quantize(
-                    Decimal("0.00"), rounding=ROUND_HALF_UP
-                )
-                if remaining <= Decimal("0.00"):
-                    account.paid_amount = account.invoice_amount.quantize(
-                        Decimal("0.00"), rounding=ROUND_HALF_UP
-                    )
-                    account.balance = Decimal("0.00")
-                else:
-                    account.paid_amount = paid
-                    account.balance = remaining
-                account.notes = account.notes or ""
+                # 更新应收账款（原子增量更新，超出余额时按余额结清）
+                AccountsReceivableLedger.settle(account, total_offset)
                 if notes:
+                    account.notes = account.notes or ""
                     account.notes += f"\n[{timezone.now().strftime('%Y-%m-%d')}] 核销 {amount}：{notes}"
-                account.save()
+                    account.save(update_fields=["notes", "updated_at"])
 
                 # 同步更新关联销售订单的付款状态
                 if account.sales_order_id:
@@ -1203,31 +1187,14 @@ def supplier_account_writeoff(request, pk):
                         # 计算当前账户可核销的金额
                         writeoff_amount = min(remaining_offset, account.balance)
 
-                        # 更新应付账款（处理进位误差，确保结清时置零）
-                        paid = (account.paid_amount + writeoff_amount).quantize(
-                            Decimal("0.00"), rounding=ROUND_HALF_UP
-                        )
-                        remaining = (account.invoice_amount - paid).quantize(
-                            Decimal("0.00"), rounding=ROUND_HALF_UP
-                        )
-                        if remaining <= Decimal("0.00"):
-                            account.paid_amount = account.invoice_amount.quantize(
-                                Decimal("0.00"), rounding=ROUND_HALF_UP
-                            )
-                            account.balance = Decimal("0.00")
-                        else:
-                            account.paid_amount = paid
-                            account.balance = remaining
+                        # 更新应付账款（原子增量更新，状态随余额同步）
+                        writeoff_amount = AccountsPayableLedger.settle(account, writeoff_amount)
 
                         # 更新备注
-                        account.notes = account.notes or ""
                         if notes:
+                            account.notes = account.notes or ""
                             account.notes += f"\n[{timezone.now().strftime('%Y-%m-%d')}] 统一核销 {writeoff_amount}：{notes}"
-
-                        # 更新状态
-                        if hasattr(account, "update_status"):
-                            account.update_status()
-                        account.save()
+                            account.save(update_fields=["notes", "updated_at"])
 
                         # 同步更新采购订单的付款状态
                         if account.purchase_order_id:
@@ -1309,21 +1276,8 @@ def supplier_account_writeoff(request, pk):
                             created_by=request.user,
                         )
 
-                    # 更新应付账款（处理进位误差，确保结清时置零）
-                    paid = (account.paid_amount + total_offset).quantize(
-                        Decimal("0.00"), rounding=ROUND_HALF_UP
-                    )
-                    remaining = (account.invoice_amount - paid).quantize(
-                        Decimal("0.00"), rounding=ROUND_HALF_UP
-                    )
-                    if remaining <= Decimal("0.00"):
-                        account.paid_amount = account.invoice_amount.quantize(
-                            Decimal("0.00"), rounding=ROUND_HALF_UP
-                        )
-                        account.balance = Decimal("0.00")
-                    else:
-                        account.paid_amount = paid
-                        account.balance = remaining
+                    # 更新应付账款（原子增量更新，超出余额时按余额结清）
+                    AccountsPayableLedger.settle(account, total_offset)
 
                     # 更新发票号（如果提供）
                     invoice_updated = False
@@ -1336,10 +1290,7 @@ def supplier_account_writeoff(request, pk):
                     if notes:
                         account.notes += f"\n[{timezone.now().strftime('%Y-%m-%d')}] 核销 {amount}：{notes}"
 
-                    # 更新状态
-                    if hasattr(account, "update_status"):
-                        account.update_status()
-                    account.save()
+                    account.save(update_fields=["invoice_number", "notes", "updated_at"])
 
                     # 同步更新采购订单的付款状态
                     if account.purchase_order_id:
@@ -3483,7 +3434,7 @@ def account_report(request):
     overdue_status = request.GET.get("overdue_status", "").strip()
     if overdue_status == "overdue":
         # 已逾期：到期日 < 今天 且 余额 > 0
-        accounts = accounts.filter(due_date__lt=timezone.now().date(), balance__gt=0)
+        accounts = accounts.filter(overdue_q())
     elif overdue_status == "not_overdue":
         # 未逾期：到期日 >= 今天 或 余额 = 0
         accounts = accounts.filter(
@@ -3499,26 +3450,15 @@ def account_report(request):
         # 未结清
         accounts = accounts.filter(balance__gt=0)
 
-    # 统计信息
-    stats = accounts.aggregate(
-        total_count=Count("id"),
-        total_amount=Sum("invoice_amount"),
-        total_paid=Sum("paid_amount"),
-        total_balance=Sum("balance"),
-    )
-
-    # 计算统计数据（避免None值）
-    if stats["total_count"] is None or stats["total_count"] == 0:
-        stats = {
-            "total_count": 0,
-            "total_amount": 0,
-            "total_paid": 0,
-            "total_balance": 0,
-        }
-    else:
-        for key in ["total_amount", "total_paid", "total_balance"]:
-            if stats[key] is None:
-                stats[key] = 0
+    # 统计信息及账龄分段（单次条件聚合）
+    ledger = "receivable" if account_type == "receivable" else "payable"
+    aging = AgingEngine(ledger).totals(queryset=accounts)
+    stats = {
+        "total_count": aging["account_count"],
+        "total_amount": aging["invoice_amount"],
+        "total_paid": aging["paid_amount"],
+        "total_balance": aging["balance"],
+    }
 
     # 分页
     paginator = Paginator(accounts, 20)
@@ -3528,6 +3468,7 @@ def account_report(request):
     context = {
         "page_obj": page_obj,
         "stats": stats,
+        "aging": aging,
         "account_type": account_type,
         # 保留筛选条件（用于表单回显）
         "filter_overdue_status": overdue_status,
@@ -3538,6 +3479,33 @@ def account_report(request):
     return render(request, "modules/finance/account_report.html", context)
 
 
+@login_required
+def api_aging_trend(request):
+    """账龄趋势（按日快照）"""
+    ledger = request.GET.get("account_type", "receivable")
+    if ledger not in ("receivable", "payable"):
+        return JsonResponse({"success": False, "message": "未知的账款类型"}, status=400)
+
+    try:
+        days = min(max(int(request.GET.get("days", 30)), 1), 366)
+    except ValueError:
+        days = 30
+
+    trend = AgingEngine(ledger).trend(days)
+    return JsonResponse(
+        {
+            "success": True,
+            "data": [
+                {
+                    "date": row["snapshot_date"].isoformat(),
+                    **{key: str(value) for key, value in row.items() if key != "snapshot_date"},
+                }
+                for row in trend
+            ],
+        }
+    )
+
+
 # ==================== Supplier Account Payment Allocation (按明细核销) ====================
 
 
@@ -3702,16 +3670,10 @@ def supplier_account_payment_allocate(request, pk):
                     created_by=request.user,
                 )
 
-                # 核销每个明细
-                for alloc in allocation_data:
-                    detail = alloc["detail"]
-                    amount = alloc["amount"]
-
-                    # 调用明细的核销方法
-                    detail.allocate(amount)
-
-                # 自动归集应付主单
-                account.aggregate_from_details()
+                # 核销明细并增量过账到应付主单
+                AccountsPayableLedger.allocate_many(
+                    (alloc["detail"], alloc["amount"]) for alloc in allocation_data
+                )
 
                 messages.success(
                     request,
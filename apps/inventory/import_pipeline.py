@@ -0,0 +1,590 @@
+"""
+库存数据导入页的批量导入流水线
+
+上传文件按块处理，每块：
+
+1. 用 pandas 向量化转换所有列
+2. 每个关联模型（分类/品牌/单位/仓库）一次查询解析
+3. bulk_create 新记录，已存在的编码 bulk_update（只更新文件中有值的列）
+4. 收集行级错误，不中断整个导入
+
+大文件作为 Celery 任务运行（见 ``tasks.run_data_import_job``），进度写入缓存；
+小文件直接在请求中导入。
+"""
+
+import hashlib
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from decimal import Decimal, InvalidOperation
+
+from core.signals import bump_version
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 每块处理的行数（一次预解析 + 一次批量写入）
+IMPORT_CHUNK_SIZE = 2000
+
+# 超过该大小的文件转为后台任务处理（字节）
+ASYNC_IMPORT_FILE_SIZE = 512 * 1024
+
+# 最多保留的行级错误数量（进度信息中）
+MAX_REPORTED_ERRORS = 200
+
+IMPORT_JOB_CACHE_PREFIX = "inventory:import_job:"
+IMPORT_JOB_CACHE_TIMEOUT = 24 * 3600
+
+
+# ============================================================
+# 向量化列转换
+# ============================================================
+
+
+def text_column(df, column, default=""):
+    """返回去除首尾空白的文本列，空单元格为 ``default``"""
+    import pandas as pd
+
+    if column not in df.columns:
+        return pd.Series([default] * len(df), index=df.index, dtype=object)
+    series = df[column]
+    result = series.astype(str).str.strip()
+    return result.where(series.notna() & (result != ""), default)
+
+
+def bool_column(df, column, default=True):
+    """把 是/否 单元格转换为布尔列"""
+    import pandas as pd
+
+    if column not in df.columns:
+        return pd.Series([default] * len(df), index=df.index, dtype=bool)
+    text = text_column(df, column, default="是" if default else "否")
+    return text == "是"
+
+
+def numeric_column(df, column, errors, label=None):
+    """
+    返回浮点列（空单元格为 NaN）
+
+    有值但不是数字的单元格记为行级错误，并按空值处理。
+    """
+    import pandas as pd
+
+    if column not in df.columns:
+        return pd.Series([float("nan")] * len(df), index=df.index, dtype=float)
+    raw = df[column]
+    values = pd.to_numeric(raw, errors="coerce")
+    invalid = raw.notna() & values.isna() & (raw.astype(str).str.strip() != "")
+    for idx in raw.index[invalid]:
+        errors.add(idx, f"{label or column} 不是有效数字：{raw[idx]}")
+    return values
+
+
+def to_decimal(value, default=Decimal("0"), places=2):
+    """把 ``numeric_column`` 的浮点值转换为 Decimal"""
+    if value is None or value != value:  # NaN
+        return default
+    try:
+        return Decimal(str(round(float(value), places)))
+    except (InvalidOperation, ValueError):
+        return default
+
+
+def to_int(value, default=0):
+    """把 ``numeric_column`` 的浮点值转换为整数"""
+    if value is None or value != value:  # NaN
+        return default
+    return int(value)
+
+
+# ============================================================
+# 错误与进度
+# ============================================================
+
+
+class ImportErrors:
+    """按 DataFrame 索引收集行级错误"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, idx, message):
+        # 只保留每行的第一个错误
+        self.rows.setdefault(idx, message)
+
+    def __contains__(self, idx):
+        return idx in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def messages(self, limit=None):
+        # DataFrame索引从0开始，Excel第1行为表头
+        items = sorted(self.rows.items())
+        if limit is not None:
+            items = items[:limit]
+        return [f"第{idx + 2}行：{message}" for idx, message in items]
+
+
+class ImportProgress:
+    """导入任务进度，保存在缓存中，任意 Web 进程都可以查询"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.key = f"{IMPORT_JOB_CACHE_PREFIX}{job_id}"
+
+    @classmethod
+    def new_job_id(cls):
+        return uuid.uuid4().hex
+
+    def get(self):
+        return cache.get(self.key)
+
+    def get_for_user(self, user):
+        """返回该用户可以查看的任务进度（任务发起人或超级用户），否则返回 None"""
+        state = self.get()
+        if state is None:
+            return None
+        if state.get("user_id") != user.pk and not user.is_superuser:
+            return None
+        return state
+
+    def update(self, **fields):
+        state = self.get() or {"job_id": self.job_id}
+        state.update(fields)
+        state["updated_at"] = timezone.now().isoformat()
+        cache.set(self.key, state, IMPORT_JOB_CACHE_TIMEOUT)
+        return state
+
+
+# ============================================================
+# 导入流水线
+# ============================================================
+
+
+class BaseImportPipeline(ABC):
+    """
+    分块导入流水线
+
+    子类实现 ``import_chunk``：向量化转换、每个关联模型一次查询解析、批量写入，
+    返回该块（事务提交后）新建和更新的记录数。
+    """
+
+    data_type = None
+    chunk_size = IMPORT_CHUNK_SIZE
+
+    # 模型字段 -> 表头；更新已有记录时只写入文件中存在且有值的列
+    COLUMNS = {}
+
+    def __init__(self, user, progress=None, update_existing=True):
+        self.user = user
+        self.progress = progress
+        self.update_existing = update_existing
+        self.errors = ImportErrors()
+        self.created_count = 0
+        self.updated_count = 0
+        self.processed_count = 0
+        self.total_count = 0
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def read_file(file_obj, file_name):
+        """把上传文件读取为原始单元格的 DataFrame"""
+        import pandas as pd
+
+        if file_name.endswith(".csv"):
+            return pd.read_csv(file_obj, encoding="utf-8-sig", dtype=object)
+        return pd.read_excel(file_obj, dtype=object)
+
+    def iter_chunks(self, df):
+        for start in range(0, len(df), self.chunk_size):
+            yield df.iloc[start : start + self.chunk_size]
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+
+    def run(self, df):
+        """按块导入整个 DataFrame，返回汇总信息"""
+        self.total_count = len(df)
+        self._report(status="running")
+
+        for chunk in self.iter_chunks(df):
+            try:
+                with transaction.atomic():
+                    created, updated = self.import_chunk(chunk)
+            except Exception as e:
+                logger.error(f"导入数据块失败: {str(e)}", exc_info=True)
+                for idx in chunk.index:
+                    if idx not in self.errors:
+                        self.errors.add(idx, f"批量写入失败：{str(e)}")
+            else:
+                # 事务提交后才计入
+                self.created_count += created
+                self.updated_count += updated
+            self.processed_count += len(chunk)
+            self._report(status="running")
+
+        return self._report(status="completed")
+
+    def summary(self, status):
+        return {
+            "status": status,
+            "data_type": self.data_type,
+            "total": self.total_count,
+            "processed": self.processed_count,
+            "created": self.created_count,
+            "updated": self.updated_count,
+            "success": self.created_count + self.updated_count,
+            "error_count": len(self.errors),
+            "errors": self.errors.messages(limit=MAX_REPORTED_ERRORS),
+        }
+
+    def _report(self, status):
+        summary = self.summary(status)
+        if self.progress is not None:
+            self.progress.update(**summary)
+        return summary
+
+    # ------------------------------------------------------------------
+    # 扩展点
+    # ------------------------------------------------------------------
+
+    @abstractmethod
+    def import_chunk(self, chunk):
+        """
+        导入一块数据（在事务中调用）
+
+        Returns:
+            tuple: (新建数, 更新数)
+        """
+
+    def audit_fields(self):
+        return {"created_by": self.user, "updated_by": self.user}
+
+    def present_columns(self, chunk):
+        """
+        返回文件中存在的列及其有值掩码
+
+        Returns:
+            dict: 模型字段 -> 该列各行是否有值（布尔 Series）
+        """
+        return {
+            field: text_column(chunk, column) != ""
+            for field, column in self.COLUMNS.items()
+            if column in chunk.columns
+        }
+
+    @staticmethod
+    def apply_values(instance, values, filled, idx):
+        """把文件中有值的列写入已有记录，空单元格保留原值"""
+        for field, mask in filled.items():
+            if mask[idx]:
+                setattr(instance, field, values[field])
+
+
+class ProductImportPipeline(BaseImportPipeline):
+    """产品导入：每块每个分类/品牌/单位模型一次查询"""
+
+    data_type = "products"
+
+    COLUMNS = {
+        "name": "产品名称",
+        "barcode": "条形码",
+        "category": "产品分类",
+        "brand": "品牌",
+        "unit": "单位",
+        "product_type": "产品类型",
+        "status": "状态",
+        "specifications": "规格",
+        "model": "型号",
+        "cost_price": "成本价",
+        "selling_price": "销售价",
+        "min_stock": "最小库存",
+        "max_stock": "最大库存",
+        "reorder_point": "再订货点",
+        "track_inventory": "库存管理",
+        "warranty_period": "保修期(月)",
+        "shelf_life": "保质期(天)",
+        "notes": "备注",
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 未填写编码的行按本次导入生成编码，避免与之前导入的自动编码冲突
+        self.auto_code_prefix = f"AUTO_{uuid.uuid4().hex[:8].upper()}_"
+
+    def resolve_lookups(self, category_names, brand_names, unit_symbols):
+        """解析本块引用的分类、品牌和单位，不存在的品牌自动创建"""
+        from products.models import Brand, ProductCategory, Unit
+
+        categories = {}
+        if category_names:
+            # 同名分类取第一个，与原逐行 .first() 行为一致
+            for category in ProductCategory.objects.filter(
+                name__in=category_names, is_deleted=False
+            ).order_by("pk"):
+                categories.setdefault(category.name, category)
+
+        units = {}
+        if unit_symbols:
+            units = {
+                unit.symbol: unit
+                for unit in Unit.objects.filter(symbol__in=unit_symbols, is_deleted=False)
+            }
+
+        brands = {}
+        if brand_names:
+            brands = {b.name: b for b in Brand.objects.filter(name__in=brand_names)}
+            missing = [name for name in brand_names if name not in brands]
+            if missing:
+                codes = self.brand_codes(missing)
+                Brand.objects.bulk_create(
+                    [Brand(name=name, code=codes[name], created_by=self.user) for name in missing],
+                    ignore_conflicts=True,
+                )
+                bump_version(Brand)
+                # 并发导入已创建的同名品牌也在这里取回
+                brands.update({b.name: b for b in Brand.objects.filter(name__in=missing)})
+
+        return categories, brands, units
+
+    @staticmethod
+    def brand_codes(names):
+        """
+        为新品牌生成代码
+
+        默认取名称前50个字符；与已有品牌或同批品牌冲突时改用名称前缀加名称摘要。
+        """
+        from products.models import Brand
+
+        codes = {name: name[:50] for name in names}
+        taken = set(Brand.objects.filter(code__in=codes.values()).values_list("code", flat=True))
+        for name in sorted(names):
+            code = codes[name]
+            if code in taken:
+                digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+                code = f"{name[:41]}-{digest}"
+                codes[name] = code
+            taken.add(code)
+        return codes
+
+    def import_chunk(self, chunk):
+        from products.models import Product
+
+        errors = self.errors
+
+        codes = text_column(chunk, "产品编码")
+        auto_codes = self.auto_code_prefix + chunk.index.to_series().astype(str)
+        codes = codes.where(codes != "", auto_codes)
+        names = text_column(chunk, "产品名称")
+        barcodes = text_column(chunk, "条形码")
+        category_names = text_column(chunk, "产品分类")
+        brand_names = text_column(chunk, "品牌")
+        unit_symbols = text_column(chunk, "单位")
+        product_types = text_column(chunk, "产品类型", default="finished")
+        statuses = text_column(chunk, "状态", default="active")
+        specifications = text_column(chunk, "规格")
+        models_ = text_column(chunk, "型号")
+        notes = text_column(chunk, "备注")
+        track_inventory = bool_column(chunk, "库存管理", default=True)
+        cost_prices = numeric_column(chunk, "成本价", errors)
+        selling_prices = numeric_column(chunk, "销售价", errors)
+        min_stocks = numeric_column(chunk, "最小库存", errors)
+        max_stocks = numeric_column(chunk, "最大库存", errors)
+        reorder_points = numeric_column(chunk, "再订货点", errors)
+        warranty_periods = numeric_column(chunk, "保修期(月)", errors)
+        shelf_lives = numeric_column(chunk, "保质期(天)", errors)
+        filled = self.present_columns(chunk)
+
+        # 行级校验（向量化）
+        for idx in chunk.index[names == ""]:
+            errors.add(idx, "产品名称不能为空")
+        for idx in chunk.index[codes.duplicated(keep="last")]:
+            errors.add(idx, f"产品编码 {codes[idx]} 在文件中重复，已使用最后一行")
+        nonempty_barcodes = barcodes[barcodes != ""]
+        for idx in nonempty_barcodes.index[nonempty_barcodes.duplicated(keep="first")]:
+            errors.add(idx, f"条形码 {barcodes[idx]} 在文件中重复")
+
+        categories, brands, units = self.resolve_lookups(
+            set(category_names[category_names != ""]),
+            set(brand_names[brand_names != ""]),
+            set(unit_symbols[unit_symbols != ""]),
+        )
+        for idx in chunk.index[(brand_names != "") & ~brand_names.isin(list(brands))]:
+            errors.add(idx, f"品牌 {brand_names[idx]} 创建失败（品牌代码冲突）")
+
+        valid_index = [idx for idx in chunk.index if idx not in errors]
+        existing = {
+            product.code: product
+            for product in Product.objects.filter(code__in=[codes[idx] for idx in valid_index])
+        }
+        barcode_owners = dict(
+            Product.objects.filter(
+                barcode__in=[barcodes[idx] for idx in valid_index if barcodes[idx]]
+            ).values_list("barcode", "code")
+        )
+
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        for idx in valid_index:
+            code = codes[idx]
+            barcode = barcodes[idx] or None
+            if barcode and barcode_owners.get(barcode, code) != code:
+                errors.add(idx, f"条形码 {barcode} 已被产品 {barcode_owners[barcode]} 使用")
+                continue
+
+            product = existing.get(code)
+            if product is not None and not self.update_existing:
+                errors.add(idx, f"产品编码 {code} 已存在")
+                continue
+
+            values = {
+                "name": names[idx],
+                "barcode": barcode,
+                "category": categories.get(category_names[idx]),
+                "brand": brands.get(brand_names[idx]),
+                "unit": units.get(unit_symbols[idx]),
+                "product_type": product_types[idx],
+                "status": statuses[idx],
+                "specifications": specifications[idx],
+                "model": models_[idx],
+                "cost_price": to_decimal(cost_prices[idx]),
+                "selling_price": to_decimal(selling_prices[idx]),
+                "min_stock": to_int(min_stocks[idx]),
+                "max_stock": to_int(max_stocks[idx]),
+                "reorder_point": to_int(reorder_points[idx]),
+                "track_inventory": bool(track_inventory[idx]),
+                "warranty_period": to_int(warranty_periods[idx]),
+                "shelf_life": to_int(shelf_lives[idx], default=None),
+                "notes": notes[idx],
+            }
+
+            if product is None:
+                to_create.append(Product(code=code, **values, **self.audit_fields()))
+            else:
+                self.apply_values(product, values, filled, idx)
+                product.updated_by = self.user
+                product.updated_at = now
+                to_update.append(product)
+
+        if to_create:
+            Product.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            Product.objects.bulk_update(
+                to_update, list(filled) + ["updated_by", "updated_at"], batch_size=500
+            )
+        if to_create or to_update:
+            bump_version(Product)
+        return len(to_create), len(to_update)
+
+
+class LocationImportPipeline(BaseImportPipeline):
+    """库位导入：每块一次仓库查询"""
+
+    data_type = "locations"
+
+    COLUMNS = {
+        "name": "库位名称",
+        "aisle": "通道",
+        "shelf": "货架",
+        "level": "层级",
+        "position": "位置",
+        "capacity": "容量",
+        "is_active": "是否启用",
+    }
+
+    def import_chunk(self, chunk):
+        from .models import Location, Warehouse
+
+        errors = self.errors
+
+        warehouse_codes = text_column(chunk, "仓库编码")
+        codes = text_column(chunk, "库位编码")
+        names = text_column(chunk, "库位名称")
+        aisles = text_column(chunk, "通道")
+        shelves = text_column(chunk, "货架")
+        levels = text_column(chunk, "层级")
+        positions = text_column(chunk, "位置")
+        is_active = bool_column(chunk, "是否启用", default=True)
+        capacities = numeric_column(chunk, "容量", errors)
+        filled = self.present_columns(chunk)
+
+        warehouses = {
+            w.code: w
+            for w in Warehouse.objects.filter(
+                code__in=set(warehouse_codes[warehouse_codes != ""]), is_deleted=False
+            )
+        }
+
+        for idx in chunk.index[codes == ""]:
+            errors.add(idx, "库位编码不能为空")
+        keys = warehouse_codes + "\x00" + codes
+        for idx in chunk.index[keys.duplicated(keep="last")]:
+            errors.add(idx, f"库位编码 {codes[idx]} 在文件中重复，已使用最后一行")
+        for idx in chunk.index:
+            if warehouse_codes[idx] not in warehouses:
+                errors.add(idx, f"找不到仓库 {warehouse_codes[idx]}")
+
+        valid_index = [idx for idx in chunk.index if idx not in errors]
+        existing = {
+            (location.warehouse_id, location.code): location
+            for location in Location.objects.filter(
+                warehouse__in=[warehouses[warehouse_codes[idx]] for idx in valid_index],
+                code__in=[codes[idx] for idx in valid_index],
+            )
+        }
+
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        for idx in valid_index:
+            warehouse = warehouses[warehouse_codes[idx]]
+            values = {
+                "name": names[idx],
+                "aisle": aisles[idx],
+                "shelf": shelves[idx],
+                "level": levels[idx],
+                "position": positions[idx],
+                "capacity": to_decimal(capacities[idx], default=None),
+                "is_active": bool(is_active[idx]),
+            }
+            location = existing.get((warehouse.pk, codes[idx]))
+            if location is None:
+                to_create.append(
+                    Location(warehouse=warehouse, code=codes[idx], **values, **self.audit_fields())
+                )
+            elif not self.update_existing:
+                errors.add(idx, f"库位编码 {codes[idx]} 已存在")
+            else:
+                self.apply_values(location, values, filled, idx)
+                location.updated_by = self.user
+                location.updated_at = now
+                to_update.append(location)
+
+        if to_create:
+            Location.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            Location.objects.bulk_update(
+                to_update, list(filled) + ["updated_by", "updated_at"], batch_size=500
+            )
+        if to_create or to_update:
+            bump_version(Location)
+        return len(to_create), len(to_update)
+
+
+IMPORT_PIPELINES = {
+    ProductImportPipeline.data_type: ProductImportPipeline,
+    LocationImportPipeline.data_type: LocationImportPipeline,
+}
+
+
+def get_import_pipeline(data_type):
+    """返回 ``data_type`` 对应的流水线类，不支持时返回 None"""
+    return IMPORT_PIPELINES.get(data_type)
@@ -231,3 +231,50 @@ def reconcile_inventory():
     except Exception as e:
         logger.error(f"Failed to reconcile inventory: {str(e)}")
         raise
+
+
+@shared_task
+def run_data_import_job(job_id, file_path, data_type, user_id):
+    """
+    Run a bulk data import in the background.
+
+    The uploaded file is read from default storage, imported chunk by chunk
+    by the matching import pipeline, and progress is published to the cache
+    under the job id (see ``import_pipeline.ImportProgress``).
+    """
+    from django.contrib.auth import get_user_model
+    from django.core.files.storage import default_storage
+
+    from .import_pipeline import ImportProgress, get_import_pipeline
+
+    progress = ImportProgress(job_id)
+
+    try:
+        User = get_user_model()
+        user = User.objects.get(pk=user_id)
+        pipeline_class = get_import_pipeline(data_type)
+        if pipeline_class is None:
+            raise ValueError(f"不支持的数据类型: {data_type}")
+
+        with default_storage.open(file_path, "rb") as f:
+            df = pipeline_class.read_file(f, file_path)
+
+        pipeline = pipeline_class(user, progress=progress)
+        summary = pipeline.run(df)
+
+        logger.info(
+            f"Data import job {job_id} completed: "
+            f"{summary['success']} imported, {summary['error_count']} errors"
+        )
+        return summary
+
+    except Exception as e:
+        logger.error(f"Data import job {job_id} failed: {str(e)}", exc_info=True)
+        progress.update(status="failed", message=str(e))
+        raise
+
+    finally:
+        try:
+            default_storage.delete(file_path)
+        except Exception:
+            pass
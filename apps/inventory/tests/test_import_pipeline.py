@@ -0,0 +1,191 @@
+"""
+Inventory模块 - 批量导入流水线测试
+测试ProductImportPipeline, LocationImportPipeline的分块导入、批量写入与行级错误收集
+"""
+
+from decimal import Decimal
+from unittest.mock import patch
+
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from inventory.import_pipeline import ImportProgress, LocationImportPipeline, ProductImportPipeline
+from inventory.models import Location, Warehouse
+from products.models import Brand, Product, ProductCategory, Unit
+
+User = get_user_model()
+
+
+class ProductImportPipelineTest(TestCase):
+    """产品批量导入测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="importer", password="testpass123", email="importer@example.com"
+        )
+        self.category = ProductCategory.objects.create(
+            name="激光设备", code="LASER", created_by=self.user
+        )
+        self.unit = Unit.objects.create(name="台", symbol="台", created_by=self.user)
+
+    def test_bulk_create_with_lookups(self):
+        """批量创建产品，关联分类/单位，自动创建品牌"""
+        df = pd.DataFrame(
+            [
+                {
+                    "产品编码": "P001",
+                    "产品名称": "激光器A",
+                    "产品分类": "激光设备",
+                    "品牌": "新品牌",
+                    "单位": "台",
+                    "成本价": "12.5",
+                },
+                {"产品编码": "P002", "产品名称": "激光器B", "产品分类": "激光设备", "品牌": "新品牌", "单位": "台", "销售价": 30},
+            ],
+            dtype=object,
+        )
+
+        pipeline = ProductImportPipeline(self.user)
+        pipeline.chunk_size = 1
+        summary = pipeline.run(df)
+
+        self.assertEqual(summary["created"], 2)
+        self.assertEqual(summary["error_count"], 0)
+        self.assertEqual(Brand.objects.filter(name="新品牌").count(), 1)
+
+        product = Product.objects.get(code="P001")
+        self.assertEqual(product.category, self.category)
+        self.assertEqual(product.unit, self.unit)
+        self.assertEqual(product.cost_price, Decimal("12.50"))
+        self.assertEqual(Product.objects.get(code="P002").selling_price, Decimal("30.00"))
+
+    def test_existing_codes_are_updated(self):
+        """已存在的产品编码走bulk_update"""
+        Product.objects.create(code="P001", name="旧名称", created_by=self.user)
+        df = pd.DataFrame([{"产品编码": "P001", "产品名称": "新名称"}], dtype=object)
+
+        summary = ProductImportPipeline(self.user).run(df)
+
+        self.assertEqual(summary["updated"], 1)
+        self.assertEqual(Product.objects.get(code="P001").name, "新名称")
+
+    def test_update_only_writes_columns_present_in_file(self):
+        """更新已有产品时只写入文件中有值的列"""
+        Product.objects.create(
+            code="P001",
+            name="旧名称",
+            cost_price=Decimal("50.00"),
+            selling_price=Decimal("80.00"),
+            notes="保留备注",
+            created_by=self.user,
+        )
+        df = pd.DataFrame([{"产品编码": "P001", "产品名称": "新名称", "销售价": None, "备注": ""}], dtype=object)
+
+        summary = ProductImportPipeline(self.user).run(df)
+
+        self.assertEqual(summary["updated"], 1)
+        product = Product.objects.get(code="P001")
+        self.assertEqual(product.name, "新名称")
+        self.assertEqual(product.cost_price, Decimal("50.00"))
+        self.assertEqual(product.selling_price, Decimal("80.00"))
+        self.assertEqual(product.notes, "保留备注")
+
+    def test_auto_codes_do_not_collide_across_imports(self):
+        """未填写编码的行每次导入生成不同编码"""
+        df = pd.DataFrame([{"产品名称": "无编码产品"}], dtype=object)
+
+        ProductImportPipeline(self.user).run(df)
+        summary = ProductImportPipeline(self.user).run(df)
+
+        self.assertEqual(summary["created"], 1)
+        self.assertEqual(Product.objects.filter(name="无编码产品").count(), 2)
+
+    def test_brand_code_conflict(self):
+        """新品牌代码与已有品牌冲突时生成其他代码"""
+        existing = Brand.objects.create(name="旧品牌", code="新品牌", created_by=self.user)
+        df = pd.DataFrame([{"产品编码": "P001", "产品名称": "激光器", "品牌": "新品牌"}], dtype=object)
+
+        summary = ProductImportPipeline(self.user).run(df)
+
+        self.assertEqual(summary["created"], 1)
+        brand = Product.objects.get(code="P001").brand
+        self.assertEqual(brand.name, "新品牌")
+        self.assertNotEqual(brand.pk, existing.pk)
+
+    def test_counts_only_committed_chunks(self):
+        """块写入失败回滚时不计入新建数"""
+        Product.objects.create(code="P001", name="旧名称", created_by=self.user)
+        df = pd.DataFrame(
+            [{"产品编码": "P001", "产品名称": "更新"}, {"产品编码": "P002", "产品名称": "新建"}],
+            dtype=object,
+        )
+
+        with patch.object(Product.objects, "bulk_update", side_effect=RuntimeError("写入失败")):
+            summary = ProductImportPipeline(self.user).run(df)
+
+        self.assertEqual(summary["created"], 0)
+        self.assertEqual(summary["updated"], 0)
+        self.assertEqual(summary["error_count"], 2)
+        self.assertFalse(Product.objects.filter(code="P002").exists())
+
+    def test_row_level_errors(self):
+        """无效行记录错误，其他行正常导入"""
+        df = pd.DataFrame(
+            [
+                {"产品编码": "P001", "产品名称": "正常", "成本价": "10"},
+                {"产品编码": "P002", "产品名称": "", "成本价": "10"},
+                {"产品编码": "P003", "产品名称": "价格错误", "成本价": "abc"},
+            ],
+            dtype=object,
+        )
+
+        summary = ProductImportPipeline(self.user).run(df)
+
+        self.assertEqual(summary["created"], 1)
+        self.assertEqual(summary["error_count"], 2)
+        self.assertTrue(summary["errors"][0].startswith("第3行"))
+        self.assertFalse(Product.objects.filter(code__in=["P002", "P003"]).exists())
+
+    def test_progress_is_published(self):
+        """导入进度写入缓存"""
+        progress = ImportProgress(ImportProgress.new_job_id())
+        df = pd.DataFrame([{"产品编码": "P001", "产品名称": "激光器"}], dtype=object)
+
+        ProductImportPipeline(self.user, progress=progress).run(df)
+
+        state = progress.get()
+        self.assertEqual(state["status"], "completed")
+        self.assertIsNone(progress.get_for_user(self.user))
+
+        progress.update(user_id=self.user.pk)
+        self.assertEqual(progress.get_for_user(self.user)["processed"], 1)
+        other = User.objects.create_user(username="other", password="testpass123")
+        self.assertIsNone(progress.get_for_user(other))
+        self.assertEqual(state["processed"], 1)
+        self.assertEqual(state["total"], 1)
+
+
+class LocationImportPipelineTest(TestCase):
+    """库位批量导入测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="importer", password="testpass123", email="importer@example.com"
+        )
+        self.warehouse = Warehouse.objects.create(name="主仓库", code="WH001", created_by=self.user)
+
+    def test_locations_resolve_warehouse(self):
+        df = pd.DataFrame(
+            [
+                {"仓库编码": "WH001", "库位编码": "A-01", "库位名称": "A区1号", "容量": 100},
+                {"仓库编码": "WH999", "库位编码": "A-02", "库位名称": "A区2号"},
+            ],
+            dtype=object,
+        )
+
+        summary = LocationImportPipeline(self.user).run(df)
+
+        self.assertEqual(summary["created"], 1)
+        self.assertEqual(summary["error_count"], 1)
+        location = Location.objects.get(warehouse=self.warehouse, code="A-01")
+        self.assertEqual(location.capacity, Decimal("100.00"))
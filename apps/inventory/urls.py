@@ -98,5 +98,10 @@ urlpatterns = [
     path("import/", views.stock_import, name="stock_import"),
     path("import/submit/", views.stock_import_submit, name="stock_import_submit"),
     path("data-import/", views.data_import, name="data_import"),
+    path(
+        "data-import/progress/<str:job_id>/",
+        views.data_import_progress,
+        name="data_import_progress",
+    ),
     path("data-export/", views.data_export, name="data_export"),
 ]
@@ -11,6 +11,7 @@ from django.db import transaction
 from django.db.models import Count, F, Q, Sum
 from django.db.models.functions import TruncDate
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.utils import timezone
 
 from .models import (
@@ -2629,6 +2630,7 @@ def stock_import(request):
     context = {
         "warehouses": warehouses,
         "products": products,
+        "import_job_id": request.GET.get("import_job", ""),
     }
     return render(request, "modules/inventory/stock_import.html", context)
 
@@ -3226,9 +3228,14 @@ def data_import(request):
         messages.error(request, "不支持的文件格式。请上传Excel (.xlsx, .xls) 或 CSV 文件")
         return redirect("inventory:stock_import")
 
-    try:
-        pass
+    # 产品、库位走分块批量导入流水线
+    from .import_pipeline import get_import_pipeline
+
+    pipeline_class = get_import_pipeline(data_type)
+    if pipeline_class is not None:
+        return _pipeline_data_import(request, pipeline_class, uploaded_file)
 
+    try:
         import pandas as pd
 
         # 读取文件
@@ -3253,111 +3260,7 @@ def data_import(request):
         success_count = 0
         error_messages = []
 
-        if data_type == "products":
-            # 导入产品
-            from products.models import Brand, Product, ProductCategory, Unit
-
-            for idx, row in df.iterrows():
-                try:
-                    # 查找关联对象
-                    category_code = str(row.get("产品分类", "")).strip()
-                    category = None
-                    if category_code:
-                        category = ProductCategory.objects.filter(
-                            name=category_code, is_deleted=False
-                        ).first()
-
-                    brand_name = str(row.get("品牌", "")).strip()
-                    brand = None
-                    if brand_name:
-                        brand, _ = Brand.objects.get_or_create(
-                            name=brand_name,
-                            defaults={
-                                "code": brand_name[:50],
-                                "created_by": request.user,
-                            },
-                        )
-
-                    unit_symbol = str(row.get("单位", "")).strip()
-                    unit = None
-                    if unit_symbol:
-                        unit = Unit.objects.filter(symbol=unit_symbol, is_deleted=False).first()
-
-                    # 创建产品
-                    product = Product.objects.create(
-                        code=str(row.get("产品编码", "")).strip() or f"AUTO_{idx}",
-                        name=str(row.get("产品名称", "")).strip(),
-                        barcode=str(row.get("条形码", "")).strip() or None,
-                        category=category,
-                        brand=brand,
-                        unit=unit,
-                        product_type=str(row.get("产品类型", "finished")).strip() or "finished",
-                        status=str(row.get("状态", "active")).strip() or "active",
-                        specifications=str(row.get("规格", "")).strip(),
-                        model=str(row.get("型号", "")).strip(),
-                        cost_price=(
-                            Decimal(str(row.get("成本价", 0)))
-                            if pd.notna(row.get("成本价"))
-                            else Decimal("0")
-                        ),
-                        selling_price=(
-                            Decimal(str(row.get("销售价", 0)))
-                            if pd.notna(row.get("销售价"))
-                            else Decimal("0")
-                        ),
-                        min_stock=(int(row.get("最小库存", 0)) if pd.notna(row.get("最小库存")) else 0),
-                        max_stock=(int(row.get("最大库存", 0)) if pd.notna(row.get("最大库存")) else 0),
-                        reorder_point=(int(row.get("再订货点", 0)) if pd.notna(row.get("再订货点")) else 0),
-                        track_inventory=str(row.get("库存管理", "是")).strip() == "是",
-                        warranty_period=(
-                            int(row.get("保修期(月)", 0)) if pd.notna(row.get("保修期(月)")) else 0
-                        ),
-                        shelf_life=(
-                            int(row.get("保质期(天)", 0)) if pd.notna(row.get("保质期(天)")) else None
-                        ),
-                        notes=str(row.get("备注", "")).strip(),
-                        created_by=request.user,
-                        updated_by=request.user,
-                    )
-                    success_count += 1
-                except Exception as e:
-                    error_messages.append(f"第{idx + 2}行：{str(e)}")
-
-        elif data_type == "locations":
-            # 导入库位
-            for idx, row in df.iterrows():
-                try:
-                    # 查找仓库
-                    warehouse_code = str(row.get("仓库编码", "")).strip()
-                    warehouse = Warehouse.objects.filter(
-                        code=warehouse_code, is_deleted=False
-                    ).first()
-
-                    if not warehouse:
-                        error_messages.append(f"第{idx + 2}行：找不到仓库 {warehouse_code}")
-                        continue
-
-                    # 创建库位
-                    Location.objects.create(
-                        warehouse=warehouse,
-                        code=str(row.get("库位编码", "")).strip(),
-                        name=str(row.get("库位名称", "")).strip(),
-                        aisle=str(row.get("通道", "")).strip(),
-                        shelf=str(row.get("货架", "")).strip(),
-                        level=str(row.get("层级", "")).strip(),
-                        position=str(row.get("位置", "")).strip(),
-                        capacity=(
-                            Decimal(str(row.get("容量", 0))) if pd.notna(row.get("容量")) else None
-                        ),
-                        is_active=str(row.get("是否启用", "是")).strip() == "是",
-                        created_by=request.user,
-                        updated_by=request.user,
-                    )
-                    success_count += 1
-                except Exception as e:
-                    error_messages.append(f"第{idx + 2}行：{str(e)}")
-
-        elif data_type == "units":
+        if data_type == "units":
             # 导入计量单位
             from products.models import Unit
 
@@ -3594,3 +3497,79 @@ def data_import(request):
         logger.error(f"导入数据失败: {str(e)}", exc_info=True)
         messages.error(request, f"导入失败：{str(e)}")
         return redirect("inventory:stock_import")
+
+
+def _pipeline_data_import(request, pipeline_class, uploaded_file):
+    """
+    Import products/locations through the chunked bulk import pipeline.
+
+    Large files are handed to a background job when Celery is available;
+    the stock import page then polls ``data_import_progress`` for the job.
+    """
+    from django.conf import settings
+
+    from .import_pipeline import ASYNC_IMPORT_FILE_SIZE, ImportProgress
+
+    if uploaded_file.size > ASYNC_IMPORT_FILE_SIZE and getattr(
+        settings, "CELERY_BROKER_URL", None
+    ):
+        from django.core.files.storage import default_storage
+
+        from .tasks import run_data_import_job
+
+        job_id = ImportProgress.new_job_id()
+        file_path = default_storage.save(f"imports/{job_id}_{uploaded_file.name}", uploaded_file)
+        ImportProgress(job_id).update(
+            status="pending",
+            data_type=pipeline_class.data_type,
+            total=0,
+            processed=0,
+            user_id=request.user.pk,
+        )
+        run_data_import_job.delay(job_id, file_path, pipeline_class.data_type, request.user.pk)
+
+        messages.info(request, "文件较大，已转入后台导入，请稍候查看导入进度")
+        return redirect(f"{reverse('inventory:stock_import')}?import_job={job_id}")
+
+    try:
+        df = pipeline_class.read_file(uploaded_file, uploaded_file.name)
+    except ImportError:
+        messages.error(
+            request,
+            "缺少必要的库。请安装 pandas 和 openpyxl：pip install pandas openpyxl",
+        )
+        return redirect("inventory:stock_import")
+    except Exception as e:
+        messages.error(request, f"导入失败：{str(e)}")
+        return redirect("inventory:stock_import")
+
+    if len(df) == 0:
+        messages.error(request, "文件中没有数据")
+        return redirect("inventory:stock_import")
+
+    summary = pipeline_class(request.user).run(df)
+
+    if summary["success"] > 0:
+        messages.success(request, f"成功导入 {summary['success']} 条记录")
+    if summary["error_count"]:
+        messages.warning(
+            request,
+            f"有 {summary['error_count']} 条记录导入失败：" + "; ".join(summary["errors"][:5]),
+        )
+        if summary["error_count"] > 5:
+            messages.warning(request, f"...还有 {summary['error_count'] - 5} 条错误")
+
+    return redirect("inventory:stock_import")
+
+
+@login_required
+def data_import_progress(request, job_id):
+    """Return the progress of a background data import job started by the current user."""
+    from django.http import JsonResponse
+
+    from .import_pipeline import ImportProgress
+
+    state = ImportProgress(job_id).get_for_user(request.user)
+    if state is None:
+        return JsonResponse({"success": False, "message": "导入任务不存在或已过期"}, status=404)
+    return JsonResponse({"success": True, "data": state})
@@ -4,15 +4,24 @@
 定义物流适配器的统一接口
 """
 
+import logging
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional
 
+from core.services.retry_manager import DeadlineExceeded
 from logistics.models import ShippingOrder
 
+logger = logging.getLogger(__name__)
+
 
 class LogisticsAdapterBase(ABC):
     """物流适配器基类 - 定义统一接口"""
 
+    # 单次批量查询轨迹的最大运单数，支持批量接口的适配器可以调大
+    max_batch_size = 1
+    # 单次请求超时（秒），调用方设置了时间预算（deadline_scope）时按剩余时间截断
+    timeout = 30
+
     def __init__(self, logistics_company):
         from logistics.models import LogisticsCompany
 
@@ -68,6 +77,29 @@ class LogisticsAdapterBase(ABC):
         """
         pass
 
+    def track_shipping_batch(self, tracking_numbers: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """批量查询物流轨迹
+
+        默认逐个调用 track_shipping，支持批量接口的适配器应覆盖此方法。
+        超过调用方的时间预算时停止查询，剩余单号不包含在结果中。
+
+        Args:
+            tracking_numbers: 快递单号列表（不超过 max_batch_size）
+
+        Returns:
+            Dict[str, List[Dict]]: 快递单号 -> 轨迹信息列表，查询失败的单号不包含在结果中
+        """
+        results = {}
+        for tracking_number in tracking_numbers:
+            try:
+                results[tracking_number] = self.track_shipping(tracking_number)
+            except DeadlineExceeded:
+                logger.warning(f"查询物流轨迹超过时间预算，剩余单号下次查询: {tracking_number}")
+                break
+            except Exception as e:
+                logger.error(f"查询物流轨迹失败: {tracking_number}, 错误: {e}")
+        return results
+
     @abstractmethod
     def print_waybill(self, shipping_order: ShippingOrder) -> str:
         """打印面单
@@ -12,6 +12,7 @@ import time
 from typing import Any, Dict, List
 
 import requests
+from core.services.retry_manager import request_timeout
 from logistics.adapters.base import LogisticsAdapterBase
 from logistics.adapters.factory import register_adapter
 from logistics.models import ShippingOrder
@@ -35,6 +36,9 @@ class SFAdapter(LogisticsAdapterBase):
         if not self.client_id or not self.client_secret:
             raise ValueError("顺丰API配置不完整，需要client_id和client_secret")
 
+        # 下单、打印等写接口耗时较长
+        self.timeout = 60
+
     def _sign_request(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """签名请求
 
@@ -72,7 +76,7 @@ class SFAdapter(LogisticsAdapterBase):
 
             signed_params = self._sign_request(params)
 
-            response = requests.get(url, params=signed_params, timeout=30)
+            response = requests.get(url, params=signed_params, timeout=request_timeout(30))
             response.raise_for_status()
 
             data = response.json()
@@ -129,7 +133,7 @@ class SFAdapter(LogisticsAdapterBase):
 
             # 发送请求
             url = f"{self.api_url}/order/create"
-            response = requests.post(url, json=signed_params, timeout=60)
+            response = requests.post(url, json=signed_params, timeout=request_timeout(self.timeout))
             response.raise_for_status()
 
             data = response.json()
@@ -170,29 +174,13 @@ class SFAdapter(LogisticsAdapterBase):
 
             # 发送请求
             url = f"{self.api_url}/route/track"
-            response = requests.post(url, json=signed_params, timeout=60)
+            response = requests.post(url, json=signed_params, timeout=request_timeout(self.timeout))
             response.raise_for_status()
 
             data = response.json()
 
             if data.get("code") == 200:
-                routes = data.get("data", {}).get("routes", [])
-
-                # 转换为统一格式
-                tracking_infos = []
-                for route in routes:
-                    tracking_infos.append(
-                        {
-                            "track_time": route.get("time"),
-                            "track_status": route.get("status"),
-                            "track_location": route.get("location", ""),
-                            "track_description": route.get("description", ""),
-                            "operator": route.get("operator", ""),
-                            "raw_data": route,
-                        }
-                    )
-
-                return tracking_infos
+                return self._convert_routes(data.get("data", {}).get("routes", []))
             else:
                 raise Exception(f"查询顺丰物流失败: {data.get('message', '未知错误')}")
 
@@ -203,6 +191,20 @@ class SFAdapter(LogisticsAdapterBase):
             logger.error(f"查询顺丰物流失败: {e}")
             raise
 
+    def _convert_routes(self, routes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """转换顺丰路由为统一的轨迹格式"""
+        return [
+            {
+                "track_time": route.get("time"),
+                "track_status": route.get("status"),
+                "track_location": route.get("location", ""),
+                "track_description": route.get("description", ""),
+                "operator": route.get("operator", ""),
+                "raw_data": route,
+            }
+            for route in routes
+        ]
+
     def print_waybill(self, shipping_order: ShippingOrder) -> str:
         """打印面单
 
@@ -227,7 +229,7 @@ class SFAdapter(LogisticsAdapterBase):
 
             # 发送请求
             url = f"{self.api_url}/waybill/print"
-            response = requests.post(url, json=signed_params, timeout=60)
+            response = requests.post(url, json=signed_params, timeout=request_timeout(self.timeout))
             response.raise_for_status()
 
             data = response.json()
@@ -270,7 +272,7 @@ class SFAdapter(LogisticsAdapterBase):
 
             # 发送请求
             url = f"{self.api_url}/order/cancel"
-            response = requests.post(url, json=signed_params, timeout=60)
+            response = requests.post(url, json=signed_params, timeout=request_timeout(self.timeout))
             response.raise_for_status()
 
             data = response.json()
@@ -303,7 +305,7 @@ class SFAdapter(LogisticsAdapterBase):
 
             # 发送请求
             url = f"{self.api_url}/price/query"
-            response = requests.post(url, json=signed_params, timeout=60)
+            response = requests.post(url, json=signed_params, timeout=request_timeout(self.timeout))
             response.raise_for_status()
 
             data = response.json()
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.9 on 2026-10-19 10:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_tracking_infos(apps, schema_editor):
+    """删除同一物流订单同一时间的重复轨迹，保留最早写入的一条"""
+    TrackingInfo = apps.get_model("logistics", "TrackingInfo")
+
+    duplicates = (
+        TrackingInfo.objects.values("shipping_order_id", "track_time")
+        .annotate(keep_id=Min("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for item in duplicates:
+        TrackingInfo.objects.filter(
+            shipping_order_id=item["shipping_order_id"], track_time=item["track_time"]
+        ).exclude(id=item["keep_id"]).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("logistics", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shippingorder",
+            name="next_track_at",
+            field=models.DateTimeField(
+                blank=True, help_text="为空表示尽快查询，终态订单不再查询", null=True, verbose_name="下次查询时间"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="shippingorder",
+            index=models.Index(
+                fields=["shipping_status", "next_track_at"], name="logistics_s_shippin_9f5df8_idx"
+            ),
+        ),
+        migrations.RunPython(remove_duplicate_tracking_infos, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="trackinginfo",
+            constraint=models.UniqueConstraint(
+                fields=("shipping_order", "track_time"), name="uniq_tracking_info_order_time"
+            ),
+        ),
+    ]
@@ -111,6 +111,9 @@ class ShippingOrder(BaseModel):
     shipped_at = models.DateTimeField("发货时间", null=True, blank=True)
     delivered_at = models.DateTimeField("签收时间", null=True, blank=True)
     last_track_at = models.DateTimeField("最后查询时间", null=True, blank=True)
+    next_track_at = models.DateTimeField(
+        "下次查询时间", null=True, blank=True, help_text="为空表示尽快查询，终态订单不再查询"
+    )
     note = models.TextField("备注", blank=True)
     waybill_image = models.ImageField("面单图片", upload_to="waybills/%Y/%m/", null=True, blank=True)
     waybill_pdf = models.FileField("面单PDF", upload_to="waybills/pdf/%Y/%m/", null=True, blank=True)
@@ -125,6 +128,7 @@ class ShippingOrder(BaseModel):
             models.Index(fields=["-shipped_at"]),
             models.Index(fields=["platform_order", "-shipped_at"]),
             models.Index(fields=["logistics_company", "shipping_status"]),
+            models.Index(fields=["shipping_status", "next_track_at"]),
         ]
         ordering = ["-created_at"]
 
@@ -166,6 +170,11 @@ class TrackingInfo(BaseModel):
             models.Index(fields=["shipping_order", "-track_time"]),
             models.Index(fields=["track_status", "-track_time"]),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shipping_order", "track_time"], name="uniq_tracking_info_order_time"
+            ),
+        ]
         ordering = ["track_time"]
 
     def __str__(self):
@@ -11,7 +11,8 @@ from django.db.models import Avg, Count, Q, Sum
 from django.utils import timezone
 from ecomm_sync.adapters import get_adapter as get_platform_adapter
 from logistics.adapters.factory import LogisticsAdapterFactory
-from logistics.models import LogisticsCompany, ShippingOrder, TrackingInfo
+from logistics.models import LogisticsCompany, ShippingOrder
+from logistics.services.tracking_scheduler import TrackingScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -116,48 +117,17 @@ class LogisticsSyncService:
         try:
             routes = adapter.track_shipping(shipping_order.tracking_number)
 
-            # 保存轨迹信息
-            for route in routes:
-                track_time = route.get("track_time")
-                track_status = route.get("track_status")
-                track_location = route.get("track_location", "")
-                track_description = route.get("track_description", "")
-                operator = route.get("operator", "")
-                raw_data = route.get("raw_data", {})
-
-                # 避免重复保存
-                TrackingInfo.objects.get_or_create(
-                    shipping_order=shipping_order,
-                    track_time=track_time,
-                    defaults={
-                        "track_status": track_status,
-                        "track_location": track_location,
-                        "track_description": track_description,
-                        "operator": operator,
-                        "raw_data": raw_data,
-                    },
-                )
+            # 保存轨迹信息（已存在的轨迹由唯一约束忽略）
+            scheduler = TrackingScheduler(sync_service=self)
+            scheduler.save_routes([(shipping_order, routes)])
 
-            # 更新物流订单状态
-            if routes:
-                latest_route = routes[-1]
-                latest_status = latest_route.get("track_status")
-
-                # 映射物流状态
-                new_status = self._map_logistics_status(latest_status)
-
-                if new_status != shipping_order.shipping_status:
-                    shipping_order.shipping_status = new_status
-
-                    # 如果已签收，更新签收时间
-                    if new_status == "delivered":
-                        shipping_order.delivered_at = latest_route.get("track_time")
-
-                    shipping_order.last_track_at = timezone.now()
-                    shipping_order.save()
+            # 更新物流订单状态，无论状态是否变化都记录查询时间并排期下次查询
+            changed = scheduler.apply_routes(shipping_order, routes, timezone.now())
+            shipping_order.save()
 
-                    # 同步状态到平台
-                    self._sync_status_to_platform(shipping_order, new_status)
+            if changed:
+                # 同步状态到平台
+                self._sync_status_to_platform(shipping_order, shipping_order.shipping_status)
 
         except Exception as e:
             logger.error(f"追踪物流失败: {shipping_order.tracking_number}, 错误: {e}")
@@ -168,31 +138,16 @@ class LogisticsSyncService:
     def batch_track_shipping(self, limit: int = 100) -> int:
         """批量追踪物流
 
+        到期订单按物流公司分组批量查询，详见 TrackingScheduler。
+
         Args:
             limit: 处理数量限制
 
         Returns:
-            int: 处理的物流订单数量
+            int: 成功查询的物流订单数量
         """
-        # 获取需要追踪的物流订单
-        # 条件：已发货、运输中、派送中，且1小时内未查询
-        one_hour_ago = timezone.now() - timezone.timedelta(hours=1)
-
-        shipping_orders = ShippingOrder.objects.filter(
-            shipping_status__in=["shipped", "in_transit", "out_for_delivery"],
-            last_track_at__lt=one_hour_ago,
-        )[:limit]
-
-        count = 0
-        for shipping_order in shipping_orders:
-            try:
-                self.track_shipping(shipping_order.id)
-                count += 1
-            except Exception as e:
-                logger.error(f"批量追踪物流失败: {shipping_order.id}, 错误: {e}")
-                continue
-
-        return count
+        stats = TrackingScheduler(sync_service=self).run(limit=limit)
+        return stats["tracked"]
 
     def print_waybill(self, shipping_order_id: int) -> str:
         """打印面单
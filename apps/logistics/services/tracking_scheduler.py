@@ -0,0 +1,256 @@
+"""
+物流轨迹追踪调度
+
+按物流状态和物流公司时效为每个物流订单计算下次查询时间，
+到期订单按物流公司分组批量查询，各物流公司并发执行，轨迹批量写入。
+"""
+
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from core.services.retry_manager import deadline_scope, remaining_time
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from logistics.adapters.factory import LogisticsAdapterFactory
+from logistics.models import ShippingOrder, TrackingInfo
+
+logger = logging.getLogger(__name__)
+
+
+class TrackingScheduler:
+    """物流轨迹追踪调度器"""
+
+    # 各状态的默认查询间隔，None 表示不再查询
+    POLL_INTERVALS = {
+        "pending": None,
+        "shipped": timedelta(hours=2),
+        "in_transit": timedelta(hours=1),
+        "out_for_delivery": timedelta(minutes=30),
+        "failed": timedelta(hours=6),
+        "delivered": None,
+        "returned": None,
+        "cancelled": None,
+    }
+    ACTIVE_STATUSES = [status for status, interval in POLL_INTERVALS.items() if interval]
+
+    # 查询失败后的重试间隔
+    RETRY_INTERVAL = timedelta(minutes=15)
+    DEFAULT_WORKERS = 4
+    BATCH_SIZE = 500
+    # 每轮查询一个物流公司轨迹的总时间预算（秒），超过后剩余订单按失败处理、稍后重试
+    FETCH_BUDGET = 300
+
+    def __init__(self, sync_service=None, workers: int = DEFAULT_WORKERS):
+        from logistics.services.sync_service import LogisticsSyncService
+
+        self.sync_service = sync_service or LogisticsSyncService()
+        self.workers = workers
+
+    # ------------------------------------------------------------------
+    # 调度策略
+    # ------------------------------------------------------------------
+
+    def poll_interval(self, shipping_order: ShippingOrder) -> Optional[timedelta]:
+        """
+        计算查询间隔
+
+        物流公司 api_config 可覆盖各状态间隔（tracking_intervals，单位分钟），
+        并配置承诺时效 sla_hours：时效前半段轨迹变化少，间隔加倍。
+        """
+        config = shipping_order.logistics_company.api_config or {}
+        status = shipping_order.shipping_status
+
+        overrides = config.get("tracking_intervals") or {}
+        if status in overrides:
+            minutes = overrides[status]
+            return timedelta(minutes=minutes) if minutes else None
+
+        interval = self.POLL_INTERVALS.get(status)
+        if interval is None:
+            return None
+
+        sla_hours = config.get("sla_hours")
+        if sla_hours and shipping_order.shipped_at and status in ("shipped", "in_transit"):
+            elapsed = timezone.now() - shipping_order.shipped_at
+            if elapsed < timedelta(hours=sla_hours) / 2:
+                interval *= 2
+
+        return interval
+
+    def next_track_at(self, shipping_order: ShippingOrder, now=None):
+        """下次查询时间（终态返回 None）"""
+        interval = self.poll_interval(shipping_order)
+        if interval is None:
+            return None
+        return (now or timezone.now()) + interval
+
+    def due_orders(self, limit: int, now=None) -> List[ShippingOrder]:
+        """到期需要查询的物流订单（从未排期的优先）"""
+        now = now or timezone.now()
+        return list(
+            ShippingOrder.objects.filter(
+                Q(next_track_at__isnull=True) | Q(next_track_at__lte=now),
+                shipping_status__in=self.ACTIVE_STATUSES,
+            )
+            .exclude(tracking_number="")
+            .select_related("logistics_company")
+            .order_by(F("next_track_at").asc(nulls_first=True), "id")[:limit]
+        )
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+
+    def run(self, limit: int = 100) -> Dict[str, int]:
+        """
+        执行一轮追踪
+
+        Returns:
+            Dict: tracked（成功查询）、failed（查询失败）、events（新增轨迹）、changed（状态变化）
+        """
+        orders = self.due_orders(limit)
+        stats = {"tracked": 0, "failed": 0, "events": 0, "changed": 0}
+        if not orders:
+            return stats
+
+        by_company = defaultdict(list)
+        for order in orders:
+            by_company[order.logistics_company_id].append(order)
+
+        # 并发只用于物流公司接口请求，数据库写入在当前线程完成
+        groups = list(by_company.values())
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(groups)))) as executor:
+            results = list(executor.map(self._fetch_in_thread, groups))
+
+        tracked, failed = {}, []
+        for group, routes_by_number in zip(groups, results):
+            for order in group:
+                routes = routes_by_number.get(order.tracking_number)
+                if routes is None:
+                    failed.append(order)
+                else:
+                    tracked[order.id] = (order, routes)
+
+        stats["events"] = self.save_routes((order, routes) for order, routes in tracked.values())
+        stats["changed"] = self._update_orders(tracked.values(), failed)
+        stats["tracked"] = len(tracked)
+        stats["failed"] = len(failed)
+
+        logger.info(f"物流追踪完成: {stats}")
+        return stats
+
+    def _fetch_in_thread(self, orders: List[ShippingOrder]) -> Dict[str, List[Dict[str, Any]]]:
+        """工作线程执行完毕后关闭其数据库连接"""
+        try:
+            return self._fetch_company(orders)
+        finally:
+            connection.close()
+
+    def _fetch_company(self, orders: List[ShippingOrder]) -> Dict[str, List[Dict[str, Any]]]:
+        """按适配器批量大小分块查询一个物流公司的轨迹（整体不超过 FETCH_BUDGET）"""
+        company = orders[0].logistics_company
+        try:
+            adapter = LogisticsAdapterFactory.get_adapter(company)
+        except Exception as e:
+            logger.error(f"获取物流适配器失败: {company.code}, 错误: {e}")
+            return {}
+
+        numbers = [order.tracking_number for order in orders]
+        size = max(1, adapter.max_batch_size)
+        results = {}
+        with deadline_scope(self.FETCH_BUDGET):
+            for start in range(0, len(numbers), size):
+                if remaining_time() == 0:
+                    logger.warning(
+                        f"查询物流轨迹超过时间预算: {company.code}, " f"剩余 {len(numbers) - start} 个单号下次查询"
+                    )
+                    break
+                chunk = numbers[start : start + size]
+                try:
+                    results.update(adapter.track_shipping_batch(chunk))
+                except Exception as e:
+                    logger.error(f"批量查询物流轨迹失败: {company.code}, 单号: {chunk}, 错误: {e}")
+        return results
+
+    def save_routes(self, order_routes) -> int:
+        """
+        批量写入轨迹，已存在的（同一订单同一时间）由唯一约束忽略
+
+        Returns:
+            int: 提交写入的轨迹数
+        """
+        infos = []
+        for order, routes in order_routes:
+            for route in routes:
+                if not route.get("track_time"):
+                    continue
+                infos.append(
+                    TrackingInfo(
+                        shipping_order=order,
+                        track_time=route.get("track_time"),
+                        track_status=route.get("track_status") or "",
+                        track_location=route.get("track_location", ""),
+                        track_description=route.get("track_description", ""),
+                        operator=route.get("operator", ""),
+                        raw_data=route.get("raw_data", {}),
+                    )
+                )
+
+        TrackingInfo.objects.bulk_create(infos, batch_size=self.BATCH_SIZE, ignore_conflicts=True)
+        return len(infos)
+
+    def apply_routes(self, order: ShippingOrder, routes: List[Dict[str, Any]], now) -> bool:
+        """
+        根据最新轨迹更新订单状态和下次查询时间（不保存）
+
+        Returns:
+            bool: 物流状态是否变化
+        """
+        changed = False
+        if routes:
+            latest_route = routes[-1]
+            new_status = self.sync_service._map_logistics_status(latest_route.get("track_status"))
+            if new_status != order.shipping_status:
+                order.shipping_status = new_status
+                if new_status == "delivered":
+                    track_time = latest_route.get("track_time")
+                    if isinstance(track_time, str):
+                        track_time = parse_datetime(track_time) or now
+                    order.delivered_at = track_time
+                changed = True
+
+        order.last_track_at = now
+        order.next_track_at = self.next_track_at(order, now)
+        return changed
+
+    def _update_orders(self, tracked, failed: List[ShippingOrder]) -> int:
+        now = timezone.now()
+        changed_orders = []
+        for order, routes in tracked:
+            if self.apply_routes(order, routes, now):
+                changed_orders.append(order)
+
+        # 查询失败的订单稍后重试，不更新最后查询时间
+        for order in failed:
+            order.next_track_at = now + self.RETRY_INTERVAL
+
+        orders = [order for order, _ in tracked] + failed
+        for order in orders:
+            order.updated_at = now
+
+        with transaction.atomic():
+            ShippingOrder.objects.bulk_update(
+                orders,
+                ["shipping_status", "delivered_at", "last_track_at", "next_track_at", "updated_at"],
+                batch_size=self.BATCH_SIZE,
+            )
+
+        for order in changed_orders:
+            self.sync_service._sync_status_to_platform(order, order.shipping_status)
+
+        return len(changed_orders)
@@ -0,0 +1,194 @@
+"""
+物流追踪调度测试
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from core.models import Platform
+from core.services.retry_manager import deadline_scope
+from django.test import TestCase
+from django.utils import timezone
+from ecomm_sync.models import PlatformOrder
+from logistics.adapters.base import LogisticsAdapterBase
+from logistics.adapters.factory import LogisticsAdapterFactory
+from logistics.adapters.sf.adapter import SFAdapter
+from logistics.models import LogisticsCompany, ShippingOrder, TrackingInfo
+from logistics.services.tracking_scheduler import TrackingScheduler
+
+
+class FakeBatchAdapter(LogisticsAdapterBase):
+    """记录批量查询调用的测试适配器"""
+
+    max_batch_size = 2
+    calls = []
+    routes = {}
+
+    def test_connection(self):
+        return True
+
+    def create_waybill(self, shipping_order):
+        return ""
+
+    def track_shipping(self, tracking_number):
+        return self.track_shipping_batch([tracking_number])[tracking_number]
+
+    def track_shipping_batch(self, tracking_numbers):
+        FakeBatchAdapter.calls.append(list(tracking_numbers))
+        return {number: self.routes[number] for number in tracking_numbers if number in self.routes}
+
+    def print_waybill(self, shipping_order):
+        return ""
+
+    def cancel_waybill(self, tracking_number):
+        return True
+
+
+class TrackingSchedulerTest(TestCase):
+    """物流追踪调度测试"""
+
+    def setUp(self):
+        LogisticsAdapterFactory.register("FAKE", FakeBatchAdapter)
+        FakeBatchAdapter.calls = []
+        FakeBatchAdapter.routes = {}
+
+        self.company = LogisticsCompany.objects.create(name="测试快递", code="FAKE")
+        platform = Platform.objects.create(
+            platform_name="Shopee", platform_code="shopee", platform_type="ecommerce"
+        )
+        self.platform_order = PlatformOrder.objects.create(
+            platform=platform,
+            platform_order_id="PO-1",
+            order_status="paid",
+            order_amount=Decimal("10"),
+        )
+        self.scheduler = TrackingScheduler(workers=2)
+
+    def tearDown(self):
+        LogisticsAdapterFactory._adapter_map.pop("FAKE", None)
+
+    def _shipping(self, number, status="in_transit", **kwargs):
+        return ShippingOrder.objects.create(
+            platform_order=self.platform_order,
+            logistics_company=self.company,
+            tracking_number=number,
+            shipping_status=status,
+            **kwargs,
+        )
+
+    def _route(self, hour, status="运输中"):
+        return {
+            "track_time": timezone.now().replace(hour=hour, minute=0, second=0, microsecond=0),
+            "track_status": status,
+            "track_location": "深圳",
+        }
+
+    def test_poll_interval_by_status_and_carrier(self):
+        """查询间隔随状态变化，终态不再查询，物流公司配置可覆盖"""
+        in_transit = self._shipping("T1")
+        delivered = self._shipping("T2", status="delivered")
+        self.assertEqual(self.scheduler.poll_interval(in_transit), timedelta(hours=1))
+        self.assertIsNone(self.scheduler.next_track_at(delivered))
+
+        self.company.api_config = {"tracking_intervals": {"in_transit": 240}}
+        self.company.save()
+        in_transit.refresh_from_db()
+        self.assertEqual(self.scheduler.poll_interval(in_transit), timedelta(hours=4))
+
+    def test_sla_backoff_early_in_transit(self):
+        """时效前半段加倍间隔"""
+        self.company.api_config = {"sla_hours": 72}
+        self.company.save()
+        order = self._shipping("T1", shipped_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(self.scheduler.poll_interval(order), timedelta(hours=2))
+
+    def test_run_batches_by_carrier_and_reschedules(self):
+        """到期订单批量查询，轨迹批量写入，未变化的订单同样排期"""
+        for number in ("T1", "T2", "T3"):
+            self._shipping(number)
+        self._shipping("T4", next_track_at=timezone.now() + timedelta(hours=1))
+        FakeBatchAdapter.routes = {
+            "T1": [self._route(1), self._route(2)],
+            "T2": [self._route(1), self._route(3, status="已签收")],
+        }
+
+        stats = self.scheduler.run(limit=10)
+
+        self.assertEqual(sorted(map(sorted, FakeBatchAdapter.calls)), [["T1", "T2"], ["T3"]])
+        self.assertEqual(stats["tracked"], 2)
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["changed"], 1)
+        self.assertEqual(TrackingInfo.objects.count(), 4)
+
+        t1 = ShippingOrder.objects.get(tracking_number="T1")
+        self.assertEqual(t1.shipping_status, "in_transit")
+        self.assertIsNotNone(t1.last_track_at)
+        self.assertGreater(t1.next_track_at, timezone.now() + timedelta(minutes=50))
+
+        t2 = ShippingOrder.objects.get(tracking_number="T2")
+        self.assertEqual(t2.shipping_status, "delivered")
+        self.assertIsNone(t2.next_track_at)
+
+        t3 = ShippingOrder.objects.get(tracking_number="T3")
+        self.assertIsNone(t3.last_track_at)
+        self.assertIsNotNone(t3.next_track_at)
+
+        # 再次执行：没有到期订单，重复轨迹也不会重复写入
+        self.assertEqual(self.scheduler.run(limit=10)["tracked"], 0)
+        self.scheduler.save_routes([(t1, FakeBatchAdapter.routes["T1"])])
+        self.assertEqual(TrackingInfo.objects.filter(shipping_order=t1).count(), 2)
+
+    def test_worker_threads_close_connections(self):
+        """查询线程执行完毕后关闭各自的数据库连接"""
+        self._shipping("T1")
+
+        with mock.patch("logistics.services.tracking_scheduler.connection") as connection:
+            self.scheduler.run(limit=10)
+
+        connection.close.assert_called_once_with()
+
+
+class SFBatchTrackingTest(TestCase):
+    """顺丰没有批量路由接口，批量查询逐单调用路由查询"""
+
+    def setUp(self):
+        company = LogisticsCompany.objects.create(
+            name="顺丰", code="SF", api_config={"client_id": "id", "client_secret": "secret"}
+        )
+        self.adapter = SFAdapter(company)
+
+    def test_batch_falls_back_to_single_waybill_requests(self):
+        adapter = self.adapter
+
+        def post(url, json, timeout):
+            if json["waybill_no"] == "SF2":
+                return mock.Mock(json=lambda: {"code": 500, "message": "运单不存在"})
+            route = {"time": "2026-01-01 10:00:00", "status": "运输中", "location": "深圳"}
+            return mock.Mock(json=lambda: {"code": 200, "data": {"routes": [route]}})
+
+        with mock.patch("logistics.adapters.sf.adapter.requests.post", side_effect=post) as call:
+            results = adapter.track_shipping_batch(["SF1", "SF2"])
+
+        self.assertEqual(adapter.max_batch_size, 1)
+        self.assertEqual(
+            [c.kwargs["json"]["waybill_no"] for c in call.call_args_list], ["SF1", "SF2"]
+        )
+        self.assertEqual(list(results), ["SF1"])
+        self.assertEqual(results["SF1"][0]["track_location"], "深圳")
+
+    def test_requests_respect_time_budget(self):
+        """请求超时按剩余预算截断，预算用完后不再发请求"""
+        route = {"time": "2026-01-01 10:00:00", "status": "运输中", "location": "深圳"}
+        response = mock.Mock(json=lambda: {"code": 200, "data": {"routes": [route]}})
+
+        with mock.patch(
+            "logistics.adapters.sf.adapter.requests.post", return_value=response
+        ) as call:
+            with deadline_scope(5):
+                self.assertEqual(list(self.adapter.track_shipping_batch(["SF1"])), ["SF1"])
+            with deadline_scope(0):
+                self.assertEqual(self.adapter.track_shipping_batch(["SF2", "SF3"]), {})
+
+        self.assertEqual(call.call_count, 1)
+        self.assertLessEqual(call.call_args.kwargs["timeout"], 5)
@@ -0,0 +1,136 @@
+"""
+Django管理命令：并行对账采购订单已收货数量
+
+按订单ID分块，多线程并行执行集合式对账（每块一次分组聚合 + 一次批量更新），
+输出偏差报告，可选导出CSV。
+
+使用方法:
+    python manage.py reconcile_received_quantities                       # 对账所有未结订单
+    python manage.py reconcile_received_quantities --dry-run             # 只报告偏差，不修复
+    python manage.py reconcile_received_quantities --workers 8 --report drift.csv
+"""
+
+import csv
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = "按已确认收货单并行对账采购订单的已收货数量，输出偏差报告"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--order", type=str, help="指定订单号（可选）", default=None)
+        parser.add_argument("--all", action="store_true", help="包含草稿和已取消的订单")
+        parser.add_argument("--workers", type=int, default=4, help="并行线程数")
+        parser.add_argument("--chunk-size", type=int, default=500, help="每块订单数")
+        parser.add_argument("--dry-run", action="store_true", help="只报告偏差，不修复")
+        parser.add_argument("--limit", type=int, default=20, help="输出的偏差明细条数")
+        parser.add_argument("--report", type=str, help="偏差报告CSV文件路径（可选）")
+
+    def handle(self, *args, **options):
+        from purchase.models import PurchaseOrder
+
+        orders = PurchaseOrder.objects.filter(is_deleted=False)
+        if options["order"]:
+            orders = orders.filter(order_number=options["order"])
+        elif not options["all"]:
+            orders = orders.exclude(status__in=["draft", "cancelled"])
+
+        order_ids = list(orders.order_by("pk").values_list("pk", flat=True))
+        chunk_size = max(options["chunk_size"], 1)
+        chunks = [order_ids[i : i + chunk_size] for i in range(0, len(order_ids), chunk_size)]
+
+        self.stdout.write(
+            f"开始对账 {len(order_ids)} 张采购订单（{len(chunks)} 块，{options['workers']} 个线程）..."
+        )
+        drifts, failed = self._run_chunks(chunks, options["workers"], options["dry_run"])
+        drifts.sort(key=lambda drift: drift.item_id)
+
+        self._write_summary(drifts, len(order_ids), options["limit"], options["dry_run"])
+        if options["report"]:
+            self._write_csv(drifts, options["report"])
+            self.stdout.write(f"偏差报告已导出: {options['report']}")
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} 块对账失败（见错误输出）"))
+
+    def _run_chunks(self, chunks, workers, dry_run):
+        """执行对账分块（workers>1 时使用线程池并行）"""
+        from purchase.reconciliation import reconcile_received_quantities
+
+        drifts, failed = [], 0
+        if workers <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                try:
+                    drifts.extend(reconcile_received_quantities(chunk, dry_run=dry_run))
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"对账失败（订单 {chunk[0]}~{chunk[-1]}）: {str(e)}")
+            return drifts, failed
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    self._run_in_thread, reconcile_received_quantities, chunk, dry_run
+                ): chunk
+                for chunk in chunks
+            }
+            for future in as_completed(futures):
+                try:
+                    drifts.extend(future.result())
+                except Exception as e:
+                    failed += 1
+                    chunk = futures[future]
+                    self.stderr.write(f"对账失败（订单 {chunk[0]}~{chunk[-1]}）: {str(e)}")
+        return drifts, failed
+
+    @staticmethod
+    def _run_in_thread(func, chunk, dry_run):
+        """工作线程执行完毕后关闭其数据库连接"""
+        try:
+            return func(chunk, dry_run=dry_run)
+        finally:
+            connection.close()
+
+    def _write_summary(self, drifts, order_count, limit, dry_run):
+        self.stdout.write("=" * 80)
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS(f"✓ {order_count} 张订单已收货数量全部正确"))
+            return
+
+        orders = {drift.order_id for drift in drifts}
+        over = sum(1 for drift in drifts if drift.difference < 0)
+        net = sum(drift.difference for drift in drifts)
+        for drift in drifts[:limit]:
+            self.stdout.write(
+                f"  {drift.order_number} 明细#{drift.item_id}: "
+                f"记录 {drift.recorded}，实际 {drift.actual}（{drift.difference:+d}）"
+            )
+        if len(drifts) > limit:
+            self.stdout.write(f"  ……其余 {len(drifts) - limit} 条偏差未显示")
+
+        action = "需要修复" if dry_run else "已修复"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"检查订单数: {order_count}，{action}订单 {len(orders)} 张、明细 {len(drifts)} 条"
+                f"（多记 {over} 条，少记 {len(drifts) - over} 条，净差 {net:+d}）"
+            )
+        )
+
+    @staticmethod
+    def _write_csv(drifts, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["订单号", "订单明细ID", "产品ID", "记录数量", "实际数量", "差异"])
+            for drift in drifts:
+                writer.writerow(
+                    [
+                        drift.order_number,
+                        drift.item_id,
+                        drift.product_id,
+                        drift.recorded,
+                        drift.actual,
+                        drift.difference,
+                    ]
+                )
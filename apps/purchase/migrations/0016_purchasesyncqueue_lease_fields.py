@@ -0,0 +1,49 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("purchase", "0015_remove_borrow_approved_at_remove_borrow_approved_by_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="purchasesyncqueue",
+            name="lease_expires_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="超时未完成的任务可被重新领取",
+                null=True,
+                verbose_name="租约到期时间",
+            ),
+        ),
+        migrations.AddField(
+            model_name="purchasesyncqueue",
+            name="leased_by",
+            field=models.CharField(blank=True, max_length=100, verbose_name="处理节点"),
+        ),
+        migrations.AddField(
+            model_name="purchasesyncqueue",
+            name="next_attempt_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                help_text="失败重试时按退避时间推迟",
+                verbose_name="下次处理时间",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchasesyncqueue",
+            index=models.Index(
+                fields=["status", "next_attempt_at"], name="purchase_sy_status_5ac892_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchasesyncqueue",
+            index=models.Index(
+                fields=["status", "lease_expires_at"], name="purchase_sy_status_c16cfa_idx"
+            ),
+        ),
+    ]
@@ -3,11 +3,11 @@ Purchase models for the ERP system.
 """
 
 from core.models import PAYMENT_METHOD_CHOICES, BaseModel
+from core.utils.query_optimization import sum_related
 from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.db.models import Sum
 from django.utils import timezone
 
 User = get_user_model()
@@ -333,16 +333,19 @@ class PurchaseOrder(BaseModel):
             self.approved_at = None
             self.save()
 
-    def calculate_totals(self):
+    def calculate_totals(self, subtotal=None):
         """
         Calculate order totals from line items.
+
+        Args:
+            subtotal: 已汇总的明细小计（批量重算时传入），默认单次SUM聚合
         """
         from decimal import Decimal
 
         # Calculate subtotal from all items
-        self.subtotal = sum(
-            item.line_total for item in self.items.filter(is_deleted=False)
-        ) or Decimal("0")
+        if subtotal is None:
+            subtotal = sum_related(self, "items", "line_total", is_deleted=False)
+        self.subtotal = subtotal
 
         # 确保所有数值字段都是Decimal类型
         self.tax_rate = Decimal(str(self.tax_rate))
@@ -377,29 +380,14 @@ class PurchaseOrder(BaseModel):
         Returns:
             dict: 更新结果统计
         """
-        from decimal import Decimal
+        from .reconciliation import reconcile_received_quantities
 
-        updated_count = 0
-        for item in self.items.filter(is_deleted=False):
-            # 计算该订单明细的实际已收货数量
-            # 从所有已收货状态的收货单明细中汇总
-            actual_received = PurchaseReceiptItem.objects.filter(
-                order_item=item,
-                is_deleted=False,
-                receipt__status="received",  # 只计算已确认收货的
-            ).aggregate(total=Sum("received_quantity"))["total"] or Decimal("0")
-
-            # 如果数量不一致，更新
-            if item.received_quantity != int(actual_received):
-                old_quantity = item.received_quantity
-                item.received_quantity = int(actual_received)
-                item.save(update_fields=["received_quantity", "updated_at"])
-                updated_count += 1
+        drifts = reconcile_received_quantities([self.pk])
 
         return {
             "order": self.order_number,
             "total_items": self.items.filter(is_deleted=False).count(),
-            "updated_items": updated_count,
+            "updated_items": len(drifts),
         }
 
 
@@ -1048,6 +1036,7 @@ class PurchaseReceipt(BaseModel):
         """
         from django.db import transaction
         from finance.models import SupplierAccountDetail
+        from finance.subledger import AccountsPayableLedger
         from inventory.models import InventoryTransaction
 
         # 验证状态
@@ -1082,20 +1071,12 @@ class PurchaseReceipt(BaseModel):
             )
 
             for detail in details:
-                # 检查是否已核销
-                if detail.allocated_amount > 0:
-                    raise ValueError(f"应付明细 {detail.detail_number} 已核销，无法撤销")
-
-                # 软删除明细
-                detail.is_deleted = True
-                detail.notes += f"\n于 {timezone.now()} 由收货单 {self.receipt_number} 撤销冲销"
-                detail.deleted_by = user
-                detail.deleted_at = timezone.now()
-                detail.save()
-
-                # 更新应付主单
-                if detail.parent_account:
-                    detail.parent_account.aggregate_from_details()
+                # 软删除明细并冲回应付主单（已核销的明细不允许撤销）
+                AccountsPayableLedger.void_detail(
+                    detail,
+                    user=user,
+                    note=f"于 {timezone.now()} 由收货单 {self.receipt_number} 撤销冲销",
+                )
 
             # 更新订单明细的已收货数量
             for item in self.items.filter(is_deleted=False):
@@ -1710,10 +1691,11 @@ class Borrow(BaseModel):
             # 计算应付金额
             detail_amount = convert_qty * unit_price
 
-            # 创建应付明细
+            # 创建应付明细并过账到应付主单
             from finance.models import SupplierAccountDetail
+            from finance.subledger import AccountsPayableLedger
 
-            SupplierAccountDetail.objects.create(
+            AccountsPayableLedger.record_detail(
                 detail_number=DocumentNumberGenerator.generate(
                     "account_detail",
                     model_class=SupplierAccountDetail,  # 传递模型类以支持编号重用
@@ -1729,9 +1711,6 @@ class Borrow(BaseModel):
                 created_by=user,
             )
 
-        # 自动归集应付主单
-        parent_account.aggregate_from_details()
-
         # 更新借用单关联
         self.converted_order = order
         self.updated_by = user
@@ -1941,6 +1920,13 @@ class PurchaseSyncQueue(BaseModel):
     error_message = models.TextField("错误信息", blank=True, help_text="同步失败时的错误信息")
     processed_at = models.DateTimeField("处理时间", null=True, blank=True, help_text="任务开始处理的时间")
     completed_at = models.DateTimeField("完成时间", null=True, blank=True, help_text="任务完成的时间")
+    next_attempt_at = models.DateTimeField(
+        "下次处理时间", default=timezone.now, help_text="失败重试时按退避时间推迟"
+    )
+    lease_expires_at = models.DateTimeField(
+        "租约到期时间", null=True, blank=True, help_text="超时未完成的任务可被重新领取"
+    )
+    leased_by = models.CharField("处理节点", max_length=100, blank=True)
 
     class Meta:
         verbose_name = "采购同步队列"
@@ -1952,6 +1938,8 @@ class PurchaseSyncQueue(BaseModel):
             models.Index(fields=["sync_type", "status"]),
             models.Index(fields=["-created_at"]),
             models.Index(fields=["retry_count", "status"]),
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["status", "lease_expires_at"]),
         ]
         ordering = ["-created_at"]
 
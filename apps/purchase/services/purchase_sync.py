@@ -10,10 +10,9 @@
 
 import logging
 
+from core.services.work_queue import LeaseQueue
 from django.db import transaction
-from django.db.models import F
 from django.utils import timezone
-from inventory.models import InventoryStock
 from purchase.models import (
     PurchaseOrder,
     PurchaseOrderItem,
@@ -21,6 +20,8 @@ from purchase.models import (
     PurchaseSyncQueue,
 )
 
+from .replenishment import ReplenishmentEngine
+
 logger = logging.getLogger(__name__)
 
 
@@ -283,108 +284,87 @@ class PurchaseSyncService:
             }
         """
 
-        # 获取待处理的同步任务
-        sync_queues = PurchaseSyncQueue.objects.filter(status="pending")[:limit]
+        from ecomm_sync.adapters import get_adapter
 
-        processed = 0
-        success_count = 0
-        failed_count = 0
-        errors = []
+        # 批量领取到期任务（SKIP LOCKED，并发 worker 不会重复处理）
+        queue = LeaseQueue(PurchaseSyncQueue)
+        sync_queues = queue.claim(limit, select_related=["platform_account"])
+
+        succeeded = []
+        failures = []
 
         for sync_queue in sync_queues:
+            # 批次耗时超过半个租约时续租，避免未处理完的任务被其他 worker 重新领取
+            queue.keep_alive(sync_queues)
             try:
-                # 更新状态为处理中
-                sync_queue.status = "processing"
-                sync_queue.processed_at = timezone.now()
-                sync_queue.save()
-
                 # 获取平台适配器
                 adapter = get_adapter(sync_queue.platform_account)
 
-                # 根据同步类型执行操作
-                if sync_queue.sync_type == "add":
-                    result = adapter.create_product(sync_queue.sync_data)
-                elif sync_queue.sync_type == "update":
-                    product_id = sync_queue.sync_data.get("platform_product_id")
-                    product_data = sync_queue.sync_data.get("product_data")
-                    result = adapter.update_product(product_id, product_data)
-                elif sync_queue.sync_type == "delete":
-                    product_id = sync_queue.sync_data.get("platform_product_id")
-                    result = adapter.delete_product(product_id)
-                else:
-                    raise ValueError(f"不支持的同步类型: {sync_queue.sync_type}")
-
-                # 更新状态为成功
-                sync_queue.status = "success"
-                sync_queue.completed_at = timezone.now()
-                sync_queue.save()
-
-                success_count += 1
+                # 根据同步类型执行操作（整体不超过适配器的时间预算）
+                with adapter.deadline():
+                    if sync_queue.sync_type == "add":
+                        adapter.create_product(sync_queue.sync_data)
+                    elif sync_queue.sync_type == "update":
+                        product_id = sync_queue.sync_data.get("platform_product_id")
+                        product_data = sync_queue.sync_data.get("product_data")
+                        adapter.update_product(product_id, product_data)
+                    elif sync_queue.sync_type == "delete":
+                        product_id = sync_queue.sync_data.get("platform_product_id")
+                        adapter.delete_product(product_id)
+                    else:
+                        raise ValueError(f"不支持的同步类型: {sync_queue.sync_type}")
+
+                succeeded.append(sync_queue)
 
             except Exception as e:
-                # 更新状态为失败
-                sync_queue.status = "failed"
-                sync_queue.error_message = str(e)
-                sync_queue.retry_count += 1
-
-                # 检查是否达到最大重试次数
-                if sync_queue.retry_count >= sync_queue.max_retries:
-                    sync_queue.save()
-                else:
-                    # 重置为pending，下次继续重试
-                    sync_queue.status = "pending"
-                    sync_queue.save()
-
-                failed_count += 1
-                errors.append(f"任务 {sync_queue.id} 处理失败: {str(e)}")
+                failures.append((sync_queue, str(e)))
+
+        # 批量更新状态：失败任务按退避时间重试，达到最大重试次数后置为失败
+        queue.complete(succeeded, completed_at=timezone.now())
+        queue.fail(failures)
 
         return {
-            "processed": processed,
-            "success_count": success_count,
-            "failed_count": failed_count,
-            "errors": errors,
+            "processed": len(sync_queues),
+            "success_count": len(succeeded),
+            "failed_count": len(failures),
+            "errors": [f"任务 {item.id} 处理失败: {error}" for item, error in failures],
         }
 
-    def auto_restock_alert(self) -> list:
+    def auto_restock_alert(self, draft_requests: bool = False) -> list:
         """自动补货提醒
 
+        由补货计划引擎统一计算（考虑在途采购、在途调拨、需求和交期）
+
+        Args:
+            draft_requests: 是否为需要补货的产品批量生成采购申请草稿
+
         Returns:
             list: 补货提醒列表
         """
-        alerts = []
-
-        # 获取库存不足的商品
-        low_stock_stocks = InventoryStock.objects.filter(
-            quantity__lte=F("min_quantity")
-        ).select_related("product")
-
-        for stock in low_stock_stocks:
-            # 检查是否有进行中的采购订单
-            has_pending_purchase = PurchaseOrderItem.objects.filter(
-                product=stock.product,
-                purchase_order__status__in=[
-                    "draft",
-                    "approved",
-                    "partial_received",
-                    "fully_received",
-                ],
-            ).exists()
-
-            if not has_pending_purchase:
-                # 计算建议采购数量
-                restock_quantity = stock.max_quantity - stock.quantity
-
-                alerts.append(
-                    {
-                        "product": stock.product,
-                        "current_quantity": stock.quantity,
-                        "min_quantity": stock.min_quantity,
-                        "max_quantity": stock.max_quantity,
-                        "restock_quantity": restock_quantity,
-                        "product_code": stock.product.code if stock.product else "",
-                        "product_name": stock.product.name if stock.product else "",
-                    }
-                )
+        from django.contrib.auth import get_user_model
+        from products.models import Product
+
+        engine = ReplenishmentEngine()
+        suggestions = engine.plan()
+        products = Product.objects.in_bulk({row["product_id"] for row in suggestions})
+
+        alerts = [
+            {
+                **row,
+                "product": products.get(row["product_id"]),
+                "current_quantity": row["on_hand"],
+                "min_quantity": row["reorder_level"],
+                "max_quantity": row["position"] + row["suggested"],
+                "restock_quantity": row["suggested"],
+                "product_code": products[row["product_id"]].code,
+                "product_name": products[row["product_id"]].name,
+            }
+            for row in suggestions
+        ]
+
+        if draft_requests and suggestions:
+            requester = get_user_model().objects.filter(is_superuser=True).first()
+            engine.draft_purchase_requests(suggestions, requester=requester)
 
         logger.info(f"生成了 {len(alerts)} 个补货提醒")
         return alerts
@@ -0,0 +1,410 @@
+"""
+补货计划引擎
+
+按（产品, 仓库）计算安全库存、再订货点和建议采购量：
+1. 少量分组查询加载库存、在途采购、在途调拨、日出库需求和供应商交期
+2. 用 NumPy 对全部产品-仓库组合一次向量化计算
+3. 可选：为需要补货的产品批量生成采购申请草稿
+
+计算口径：
+- 需求：最近 DEMAND_DAYS 天出库流水的日均值和标准差（无出库的日期按0计）
+- 安全库存 = Z × 日需求标准差 × √交期
+- 再订货点 = 日均需求 × 交期 + 安全库存，且不低于产品的再订货点/最小库存
+- 库存头寸 = 现有 - 预留 + 在途采购 + 在途调拨
+- 头寸不高于再订货点时补货到 max(最大库存, 再订货点 + 复盘周期需求)，按最小订购量取整
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, List
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Abs, TruncDate
+from django.utils import timezone
+from inventory.models import InventoryStock, InventoryTransaction, StockTransferItem, Warehouse
+from purchase.models import PurchaseOrderItem, PurchaseRequest, PurchaseRequestItem
+from suppliers.models import SupplierProduct
+
+from common.utils import DocumentNumberGenerator
+
+logger = logging.getLogger(__name__)
+
+# 计入在途的采购订单/调拨单状态
+OPEN_ORDER_STATUSES = ("draft", "approved", "partial_received")
+OPEN_TRANSFER_STATUSES = ("approved", "in_transit")
+# 未转订单的采购申请状态
+OPEN_REQUEST_STATUSES = ("draft", "approved")
+
+# 产品-仓库组合的整数编码：product_id * KEY_BASE + warehouse_id
+KEY_BASE = 1 << 32
+
+
+def encode_keys(product_ids, warehouse_ids) -> np.ndarray:
+    return np.asarray(product_ids, dtype=np.int64) * KEY_BASE + np.asarray(
+        warehouse_ids, dtype=np.int64
+    )
+
+
+def scatter(keys: np.ndarray, row_keys, values) -> np.ndarray:
+    """
+    把按（产品, 仓库）分组的查询结果累加到已排序的 keys 对应位置
+
+    不在 keys 中的行忽略
+    """
+    if len(keys) == 0 or len(row_keys) == 0:
+        return np.zeros(len(keys), dtype=np.float64)
+    row_keys = np.asarray(row_keys, dtype=np.int64)
+    index = np.searchsorted(keys, row_keys).clip(max=len(keys) - 1)
+    found = keys[index] == row_keys
+    weights = np.asarray(values, dtype=np.float64)[found]
+    return np.bincount(index[found], weights=weights, minlength=len(keys))
+
+
+class ReplenishmentEngine:
+    """补货计划引擎"""
+
+    # 需求统计窗口（天）
+    DEMAND_DAYS = 90
+    # 服务水平对应的 Z 值（1.65 ≈ 95%）
+    SERVICE_LEVEL_Z = 1.65
+    # 没有供应商交期时的默认交期（天）
+    DEFAULT_LEAD_TIME = 7
+    # 复盘周期（天），补货目标额外覆盖的需求天数
+    REVIEW_DAYS = 7
+
+    def __init__(
+        self,
+        demand_days: int = None,
+        service_level_z: float = None,
+        default_lead_time: int = None,
+        review_days: int = None,
+    ):
+        self.demand_days = demand_days or self.DEMAND_DAYS
+        self.z = self.SERVICE_LEVEL_Z if service_level_z is None else service_level_z
+        self.default_lead_time = default_lead_time or self.DEFAULT_LEAD_TIME
+        self.review_days = self.REVIEW_DAYS if review_days is None else review_days
+
+    # ------------------------------------------------------------------
+    # 数据加载
+    # ------------------------------------------------------------------
+
+    def load(self, as_of=None) -> Dict[str, np.ndarray]:
+        """
+        分组查询加载计算所需的全部数据
+
+        Returns:
+            dict: 按 key 排序对齐的数组
+        """
+        as_of = as_of or timezone.now()
+
+        stock_rows = list(
+            InventoryStock.objects.filter(
+                is_deleted=False, product__is_deleted=False, product__track_inventory=True
+            )
+            .values_list(
+                "product_id",
+                "warehouse_id",
+                "product__min_stock",
+                "product__max_stock",
+                "product__reorder_point",
+            )
+            .annotate(on_hand=Sum("quantity"), reserved=Sum("reserved_quantity"))
+            .order_by()
+        )
+        if not stock_rows:
+            return {}
+
+        columns = np.array(stock_rows, dtype=np.float64).T
+        keys = encode_keys(columns[0], columns[1])
+        order = np.argsort(keys)
+        keys = keys[order]
+        data = {
+            "keys": keys,
+            "product_id": columns[0][order].astype(np.int64),
+            "warehouse_id": columns[1][order].astype(np.int64),
+            "min_stock": columns[2][order],
+            "max_stock": columns[3][order],
+            "reorder_point": columns[4][order],
+            "on_hand": columns[5][order],
+            "reserved": columns[6][order],
+        }
+
+        data["open_po"] = self._open_purchase_quantities(keys)
+        data["in_transit"] = self._in_transit_quantities(keys)
+        data["demand_sum"], data["demand_sq"] = self._demand(keys, as_of)
+        (
+            data["lead_time"],
+            data["min_order_qty"],
+            data["supplier_id"],
+            data["unit_price"],
+        ) = self._supplier_terms(data["product_id"])
+        return data
+
+    def _open_purchase_quantities(self, keys: np.ndarray) -> np.ndarray:
+        """在途采购：未完成采购订单的未收货数量（未指定仓库的计入主仓库）"""
+        rows = list(
+            PurchaseOrderItem.objects.filter(
+                is_deleted=False,
+                purchase_order__is_deleted=False,
+                purchase_order__status__in=OPEN_ORDER_STATUSES,
+                quantity__gt=F("received_quantity"),
+            )
+            .values_list("product_id", "purchase_order__warehouse_id")
+            .annotate(open_qty=Sum(F("quantity") - F("received_quantity")))
+            .order_by()
+        )
+        if not rows:
+            return np.zeros(len(keys))
+
+        main_warehouse_id = (
+            Warehouse.objects.filter(warehouse_type="main", is_active=True, is_deleted=False)
+            .values_list("id", flat=True)
+            .first()
+        )
+        rows = [
+            (product_id, warehouse_id or main_warehouse_id or 0, qty)
+            for product_id, warehouse_id, qty in rows
+        ]
+        product_ids, warehouse_ids, quantities = zip(*rows)
+        return scatter(keys, encode_keys(product_ids, warehouse_ids), quantities)
+
+    def _in_transit_quantities(self, keys: np.ndarray) -> np.ndarray:
+        """在途调拨：调入仓库尚未收货的数量"""
+        rows = list(
+            StockTransferItem.objects.filter(
+                is_deleted=False,
+                transfer__is_deleted=False,
+                transfer__status__in=OPEN_TRANSFER_STATUSES,
+                requested_quantity__gt=F("received_quantity"),
+            )
+            .values_list("product_id", "transfer__to_warehouse_id")
+            .annotate(qty=Sum(F("requested_quantity") - F("received_quantity")))
+            .order_by()
+        )
+        if not rows:
+            return np.zeros(len(keys))
+        product_ids, warehouse_ids, quantities = zip(*rows)
+        return scatter(keys, encode_keys(product_ids, warehouse_ids), quantities)
+
+    def _demand(self, keys: np.ndarray, as_of):
+        """
+        最近 N 天按日汇总的出库量
+
+        Returns:
+            tuple: (出库总量, 日出库量平方和)
+        """
+        rows = list(
+            InventoryTransaction.objects.filter(
+                is_deleted=False,
+                transaction_type="out",
+                transaction_date__gte=as_of - timedelta(days=self.demand_days),
+                transaction_date__lt=as_of,
+            )
+            .values_list("product_id", "warehouse_id", TruncDate("transaction_date"))
+            .annotate(qty=Sum(Abs("quantity")))
+            .order_by()
+        )
+        if not rows:
+            return np.zeros(len(keys)), np.zeros(len(keys))
+        product_ids, warehouse_ids, _, quantities = zip(*rows)
+        row_keys = encode_keys(product_ids, warehouse_ids)
+        quantities = np.asarray(quantities, dtype=np.float64)
+        return scatter(keys, row_keys, quantities), scatter(keys, row_keys, quantities**2)
+
+    def _supplier_terms(self, product_ids: np.ndarray):
+        """
+        每个产品的供应商条件：首选供应商优先，其次交期最短
+
+        Returns:
+            tuple: (交期, 最小订购量, 供应商ID, 采购价) 数组，与 product_ids 对齐
+        """
+        terms = {}
+        rows = (
+            SupplierProduct.objects.filter(
+                is_deleted=False, is_active=True, product_id__in=np.unique(product_ids).tolist()
+            )
+            .order_by("product_id", "-is_preferred", "lead_time", "price")
+            .values_list("product_id", "lead_time", "min_order_qty", "supplier_id", "price")
+        )
+        for product_id, lead_time, min_order_qty, supplier_id, price in rows:
+            terms.setdefault(product_id, (lead_time, min_order_qty, supplier_id, price))
+
+        lead_time = np.full(len(product_ids), float(self.default_lead_time))
+        min_order_qty = np.ones(len(product_ids))
+        supplier_id = np.zeros(len(product_ids), dtype=np.int64)
+        unit_price = np.zeros(len(product_ids))
+        for index, product_id in enumerate(product_ids.tolist()):
+            term = terms.get(product_id)
+            if term:
+                lead_time[index] = term[0] or self.default_lead_time
+                min_order_qty[index] = max(float(term[1] or 1), 1)
+                supplier_id[index] = term[2]
+                unit_price[index] = float(term[3] or 0)
+        return lead_time, min_order_qty, supplier_id, unit_price
+
+    # ------------------------------------------------------------------
+    # 计算
+    # ------------------------------------------------------------------
+
+    def compute(self, data: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        向量化计算安全库存、再订货点和建议采购量
+
+        Args:
+            data: load() 返回的数组
+
+        Returns:
+            dict: 在 data 基础上增加 daily_demand, demand_std, safety_stock,
+                  reorder_level, position, suggested, needs_reorder
+        """
+        if not data:
+            return {}
+
+        days = float(self.demand_days)
+        mean = data["demand_sum"] / days
+        variance = np.maximum(data["demand_sq"] / days - mean**2, 0.0)
+        std = np.sqrt(variance)
+        lead_time = data["lead_time"]
+
+        safety = self.z * std * np.sqrt(lead_time)
+        reorder_level = np.maximum.reduce(
+            [mean * lead_time + safety, data["reorder_point"], data["min_stock"]]
+        )
+        position = data["on_hand"] - data["reserved"] + data["open_po"] + data["in_transit"]
+
+        target = np.maximum(data["max_stock"], reorder_level + mean * self.review_days)
+        shortfall = np.maximum(target - position, 0.0)
+        moq = data["min_order_qty"]
+        suggested = np.ceil(np.ceil(shortfall) / moq) * moq
+
+        needs_reorder = (position <= reorder_level) & (suggested > 0)
+
+        return {
+            **data,
+            "daily_demand": mean,
+            "demand_std": std,
+            "safety_stock": np.ceil(safety),
+            "reorder_level": np.ceil(reorder_level),
+            "position": position,
+            "suggested": np.where(needs_reorder, suggested, 0.0),
+            "needs_reorder": needs_reorder,
+        }
+
+    def plan(self, as_of=None) -> List[Dict]:
+        """
+        生成补货建议（只返回需要补货的产品-仓库），按缺口从大到小排序
+
+        Returns:
+            list: [{"product_id", "warehouse_id", "on_hand", "position", "reorder_level",
+                    "safety_stock", "suggested", "lead_time", "supplier_id", ...}, ...]
+        """
+        result = self.compute(self.load(as_of))
+        if not result:
+            return []
+
+        index = np.flatnonzero(result["needs_reorder"])
+        index = index[np.argsort(result["position"][index] - result["reorder_level"][index])]
+
+        suggestions = [
+            {
+                "product_id": int(result["product_id"][i]),
+                "warehouse_id": int(result["warehouse_id"][i]),
+                "on_hand": int(result["on_hand"][i]),
+                "reserved": int(result["reserved"][i]),
+                "open_po": int(result["open_po"][i]),
+                "in_transit": int(result["in_transit"][i]),
+                "position": int(result["position"][i]),
+                "daily_demand": round(float(result["daily_demand"][i]), 2),
+                "safety_stock": int(result["safety_stock"][i]),
+                "reorder_level": int(result["reorder_level"][i]),
+                "suggested": int(result["suggested"][i]),
+                "lead_time": int(result["lead_time"][i]),
+                "supplier_id": int(result["supplier_id"][i]) or None,
+                "unit_price": Decimal(str(result["unit_price"][i])).quantize(Decimal("0.01")),
+            }
+            for i in index.tolist()
+        ]
+        logger.info(f"补货计划: {len(result['keys'])} 个产品-仓库, {len(suggestions)} 个需要补货")
+        return suggestions
+
+    # ------------------------------------------------------------------
+    # 生成采购申请
+    # ------------------------------------------------------------------
+
+    def draft_purchase_requests(
+        self, suggestions: List[Dict], requester, department=None, chunk_size: int = 500
+    ) -> List[PurchaseRequest]:
+        """
+        为补货建议批量生成采购申请草稿
+
+        已有未转订单采购申请的产品跳过；每张申请单最多 chunk_size 行明细。
+
+        Returns:
+            list: 创建的采购申请
+        """
+        pending = set(
+            PurchaseRequestItem.objects.filter(
+                is_deleted=False,
+                purchase_request__is_deleted=False,
+                purchase_request__status__in=OPEN_REQUEST_STATUSES,
+                purchase_request__converted_order__isnull=True,
+                product_id__in={row["product_id"] for row in suggestions},
+            ).values_list("product_id", flat=True)
+        )
+        rows = [row for row in suggestions if row["product_id"] not in pending]
+        if not rows:
+            return []
+
+        warehouses = dict(
+            Warehouse.objects.filter(id__in={row["warehouse_id"] for row in rows}).values_list(
+                "id", "code"
+            )
+        )
+        today = timezone.now().date()
+        requests = []
+
+        with transaction.atomic():
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start : start + chunk_size]
+                items = [
+                    PurchaseRequestItem(
+                        product_id=row["product_id"],
+                        quantity=row["suggested"],
+                        estimated_price=row["unit_price"],
+                        estimated_total=row["unit_price"] * row["suggested"],
+                        preferred_supplier_id=row["supplier_id"],
+                        notes=(
+                            f"仓库: {warehouses.get(row['warehouse_id'], row['warehouse_id'])}，"
+                            f"头寸 {row['position']} ≤ 再订货点 {row['reorder_level']}"
+                        ),
+                        sort_order=index,
+                        created_by=requester,
+                    )
+                    for index, row in enumerate(chunk)
+                ]
+                max_lead_time = max(row["lead_time"] for row in chunk)
+                request = PurchaseRequest.objects.create(
+                    request_number=DocumentNumberGenerator.generate(
+                        "purchase_request", model_class=PurchaseRequest
+                    ),
+                    requester=requester,
+                    department=department,
+                    status="draft",
+                    priority="normal",
+                    request_date=today,
+                    required_date=today + timedelta(days=max_lead_time),
+                    purpose="系统自动补货",
+                    justification=f"{len(chunk)} 个产品-仓库的库存头寸低于再订货点",
+                    estimated_total=sum((item.estimated_total for item in items), Decimal("0")),
+                    created_by=requester,
+                )
+                for item in items:
+                    item.purchase_request = request
+                PurchaseRequestItem.objects.bulk_create(items, batch_size=chunk_size)
+                requests.append(request)
+
+        logger.info(f"生成补货采购申请 {len(requests)} 张, 明细 {len(rows)} 行")
+        return requests
@@ -0,0 +1,115 @@
+"""
+Purchase模块 - 已收货数量对账测试
+测试集合式对账的偏差识别、批量修复和并行对账命令
+"""
+
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from products.models import Product
+from purchase.models import PurchaseOrder, PurchaseOrderItem, PurchaseReceipt, PurchaseReceiptItem
+from purchase.reconciliation import reconcile_received_quantities
+from suppliers.models import Supplier
+
+User = get_user_model()
+
+
+class ReceivedQuantityReconciliationTest(TestCase):
+    """已收货数量对账测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="testpass123")
+        self.supplier = Supplier.objects.create(name="对账供应商", code="SUPREC")
+        self.products = [
+            Product.objects.create(name=f"产品{index}", code=f"REC-{index}") for index in range(3)
+        ]
+        self.orders = []
+        for index in range(4):
+            order = PurchaseOrder.objects.create(
+                order_number=f"PO-REC-{index}",
+                supplier=self.supplier,
+                order_date=timezone.now().date(),
+                status="approved",
+            )
+            for product in self.products:
+                item = PurchaseOrderItem.objects.create(
+                    purchase_order=order, product=product, quantity=10, unit_price=1
+                )
+                self.receive(order, item, 4, "received")
+                self.receive(order, item, 3, "pending")  # 未确认收货不计入
+                item.received_quantity = 4
+                item.save()
+            self.orders.append(order)
+
+        # 制造偏差：多记、少记、已删除的收货明细
+        self.over = self.orders[0].items.first()
+        PurchaseOrderItem.objects.filter(pk=self.over.pk).update(received_quantity=9)
+        self.under = self.orders[2].items.last()
+        self.receive(self.orders[2], self.under, 2, "received")
+        deleted = self.orders[3].items.first()
+        PurchaseReceiptItem.objects.filter(order_item=deleted, receipt__status="received").update(
+            is_deleted=True
+        )
+        self.deleted = deleted
+
+    def receive(self, order, item, quantity, status):
+        receipt = PurchaseReceipt.objects.create(
+            receipt_number=f"RC-{PurchaseReceipt.objects.count() + 1:05d}",
+            purchase_order=order,
+            receipt_date=timezone.now().date(),
+            status=status,
+        )
+        PurchaseReceiptItem.objects.create(
+            receipt=receipt, order_item=item, received_quantity=quantity
+        )
+
+    def test_reconcile_fixes_only_drifted_items(self):
+        """固定查询数对账，只更新有偏差的明细"""
+        order_ids = [order.pk for order in self.orders]
+        with self.assertNumQueries(2):
+            drifts = reconcile_received_quantities(order_ids, dry_run=True)
+        self.assertEqual(
+            [(d.item_id, d.recorded, d.actual) for d in drifts],
+            sorted([(self.over.pk, 9, 4), (self.under.pk, 4, 6), (self.deleted.pk, 4, 0)]),
+        )
+        self.assertEqual(PurchaseOrderItem.objects.get(pk=self.over.pk).received_quantity, 9)
+
+        # 加载明细、分组聚合、事务内一次批量更新
+        with self.assertNumQueries(5):
+            reconcile_received_quantities(order_ids)
+        quantities = dict(PurchaseOrderItem.objects.values_list("pk", "received_quantity"))
+        self.assertEqual(quantities[self.over.pk], 4)
+        self.assertEqual(quantities[self.under.pk], 6)
+        self.assertEqual(quantities[self.deleted.pk], 0)
+        self.assertEqual(reconcile_received_quantities(order_ids), [])
+
+    def test_recalculate_received_quantities_result(self):
+        """订单方法返回结构不变"""
+        result = self.orders[0].recalculate_received_quantities()
+        self.assertEqual(
+            result,
+            {"order": self.orders[0].order_number, "total_items": 3, "updated_items": 1},
+        )
+
+    def test_command_reports_drift(self):
+        """对账命令按块对账并输出偏差报告"""
+        out = StringIO()
+        call_command(
+            "reconcile_received_quantities",
+            "--dry-run",
+            "--chunk-size",
+            "1",
+            "--workers",
+            "1",
+            stdout=out,
+        )
+        self.assertIn("需要修复订单 3 张、明细 3 条（多记 2 条，少记 1 条，净差 -7）", out.getvalue())
+        self.assertEqual(PurchaseOrderItem.objects.get(pk=self.over.pk).received_quantity, 9)
+
+        out = StringIO()
+        call_command("reconcile_received_quantities", "--workers", "1", stdout=out)
+        self.assertIn("已修复订单 3 张", out.getvalue())
+        self.assertEqual(PurchaseOrderItem.objects.get(pk=self.under.pk).received_quantity, 6)
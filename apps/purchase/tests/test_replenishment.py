@@ -0,0 +1,152 @@
+"""
+Purchase模块 - 补货计划引擎测试
+测试在途/需求/交期的分组加载、向量化计算和批量生成采购申请
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from inventory.models import (
+    InventoryStock,
+    InventoryTransaction,
+    StockTransfer,
+    StockTransferItem,
+    Warehouse,
+)
+from products.models import Product
+from purchase.models import PurchaseOrder, PurchaseOrderItem, PurchaseRequest
+from purchase.services.purchase_sync import PurchaseSyncService
+from purchase.services.replenishment import ReplenishmentEngine
+from suppliers.models import Supplier, SupplierProduct
+
+User = get_user_model()
+
+
+class ReplenishmentEngineTest(TestCase):
+    """补货计划引擎测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="planner", password="testpass123")
+        self.main = Warehouse.objects.create(name="主仓", code="WH-MAIN", warehouse_type="main")
+        self.branch = Warehouse.objects.create(name="分仓", code="WH-BR", warehouse_type="branch")
+        self.supplier = Supplier.objects.create(name="补货供应商", code="SUPREP")
+        self.now = timezone.now()
+
+        # A：日均出库3，交期5天，最小订购量10
+        self.alpha = Product.objects.create(name="产品A", code="REP-A", max_stock=40)
+        SupplierProduct.objects.create(
+            supplier=self.supplier,
+            product=self.alpha,
+            price=Decimal("12.50"),
+            min_order_qty=10,
+            lead_time=5,
+            is_preferred=True,
+        )
+        # 出库流水会扣减库存：45 - 30 = 15
+        InventoryStock.objects.create(
+            product=self.alpha, warehouse=self.main, quantity=45, reserved_quantity=5
+        )
+        for day in range(10):
+            self.ship(self.alpha, self.main, -3, day)
+        order = PurchaseOrder.objects.create(
+            supplier=self.supplier, order_date=self.now.date(), status="approved"
+        )
+        PurchaseOrderItem.objects.create(
+            purchase_order=order, product=self.alpha, quantity=5, received_quantity=3, unit_price=1
+        )
+
+        # B：无需求，主仓充足，分仓低于再订货点但有在途调拨
+        self.beta = Product.objects.create(name="产品B", code="REP-B", reorder_point=10)
+        InventoryStock.objects.create(product=self.beta, warehouse=self.main, quantity=100)
+        InventoryStock.objects.create(product=self.beta, warehouse=self.branch, quantity=0)
+        transfer = StockTransfer.objects.create(
+            transfer_number="TR-REP-1",
+            from_warehouse=self.main,
+            to_warehouse=self.branch,
+            status="in_transit",
+            transfer_date=self.now.date(),
+        )
+        StockTransferItem.objects.create(transfer=transfer, product=self.beta, requested_quantity=4)
+
+        self.engine = ReplenishmentEngine(demand_days=10, service_level_z=0, review_days=0)
+
+    def ship(self, product, warehouse, quantity, days_ago):
+        movement = InventoryTransaction.objects.create(
+            transaction_type="out", product=product, warehouse=warehouse, quantity=quantity
+        )
+        InventoryTransaction.objects.filter(pk=movement.pk).update(
+            transaction_date=self.now - timedelta(days=days_ago, hours=1)
+        )
+
+    def test_plan_uses_open_orders_transfers_and_demand(self):
+        """在途采购、在途调拨计入头寸，需求和交期决定再订货点"""
+        with self.assertNumQueries(6):
+            suggestions = self.engine.plan(self.now)
+
+        rows = {(row["product_id"], row["warehouse_id"]): row for row in suggestions}
+        self.assertEqual(set(rows), {(self.alpha.pk, self.main.pk), (self.beta.pk, self.branch.pk)})
+
+        alpha = rows[(self.alpha.pk, self.main.pk)]
+        self.assertEqual((alpha["daily_demand"], alpha["lead_time"]), (3.0, 5))
+        self.assertEqual((alpha["open_po"], alpha["position"], alpha["reorder_level"]), (2, 12, 15))
+        # 补到最大库存40，缺口28，按最小订购量10取整
+        self.assertEqual(alpha["suggested"], 30)
+        self.assertEqual(alpha["supplier_id"], self.supplier.pk)
+
+        beta = rows[(self.beta.pk, self.branch.pk)]
+        self.assertEqual((beta["in_transit"], beta["position"], beta["suggested"]), (4, 4, 6))
+
+        # 缺口大的排在前面
+        self.assertEqual(suggestions[0]["product_id"], self.beta.pk)
+
+    def test_safety_stock_from_demand_variability(self):
+        """安全库存 = Z × 日需求标准差 × √交期"""
+        engine = ReplenishmentEngine(demand_days=2, service_level_z=2, review_days=0)
+        data = {
+            "keys": np.array([1]),
+            "demand_sum": np.array([6.0]),
+            "demand_sq": np.array([20.0]),
+            "lead_time": np.array([4.0]),
+            "reorder_point": np.array([0.0]),
+            "min_stock": np.array([0.0]),
+            "max_stock": np.array([0.0]),
+            "on_hand": np.array([15.0]),
+            "reserved": np.array([0.0]),
+            "open_po": np.array([0.0]),
+            "in_transit": np.array([0.0]),
+            "min_order_qty": np.array([1.0]),
+        }
+
+        result = engine.compute(data)
+
+        self.assertEqual(result["demand_std"][0], 1.0)
+        self.assertEqual(result["safety_stock"][0], 4.0)
+        self.assertEqual(result["reorder_level"][0], 16.0)
+        self.assertEqual(result["suggested"][0], 1.0)
+
+    def test_draft_purchase_requests_in_bulk(self):
+        """批量生成采购申请草稿，已有未转订单申请的产品不重复生成"""
+        suggestions = self.engine.plan(self.now)
+
+        requests = self.engine.draft_purchase_requests(suggestions, requester=self.user)
+
+        self.assertEqual(len(requests), 1)
+        items = {item.product_id: item for item in requests[0].items.all()}
+        self.assertEqual(items[self.alpha.pk].quantity, 30)
+        self.assertEqual(items[self.alpha.pk].estimated_total, Decimal("375.00"))
+        self.assertEqual(items[self.alpha.pk].preferred_supplier_id, self.supplier.pk)
+        self.assertEqual(requests[0].estimated_total, Decimal("375.00"))
+        self.assertEqual(self.engine.draft_purchase_requests(suggestions, requester=self.user), [])
+        self.assertEqual(PurchaseRequest.objects.count(), 1)
+
+    def test_restock_alert_uses_engine(self):
+        """补货提醒由引擎生成（默认90天窗口内A的日均需求很低，无需补货）"""
+        alerts = PurchaseSyncService().auto_restock_alert()
+
+        self.assertEqual([alert["product_code"] for alert in alerts], ["REP-B"])
+        self.assertEqual(alerts[0]["product"], self.beta)
+        self.assertEqual(alerts[0]["restock_quantity"], 6)
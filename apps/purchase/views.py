@@ -1560,6 +1560,7 @@ def receipt_receive(request, pk):
 
         # 获取或创建应付主单
         from finance.models import SupplierAccount, SupplierAccountDetail
+        from finance.subledger import AccountsPayableLedger
 
         from common.utils import DocumentNumberGenerator
 
@@ -1682,8 +1683,8 @@ def receipt_receive(request, pk):
                 model_class=SupplierAccountDetail,  # 传递模型类以支持编号重用
             )
 
-            # 创建正应付明细
-            SupplierAccountDetail.objects.create(
+            # 创建正应付明细并过账到应付主单
+            AccountsPayableLedger.record_detail(
                 detail_number=detail_number,
                 detail_type="receipt",  # 收货正应付
                 supplier=receipt.purchase_order.supplier,
@@ -1697,9 +1698,6 @@ def receipt_receive(request, pk):
                 created_by=request.user,
             )
 
-        # 自动归集应付主单
-        parent_account.aggregate_from_details()
-
         # Check if order is fully received
         order = receipt.purchase_order
         all_received = all(item.received_quantity >= item.quantity for item in order.items.all())
@@ -2240,6 +2238,7 @@ def return_approve(request, pk):
                     # ========== 自动生成负应付明细 ==========
                     # 每个明细单独生成负应付记录
                     from finance.models import SupplierAccount, SupplierAccountDetail
+                    from finance.subledger import AccountsPayableLedger
 
                     # 获取或创建应付主单
                     parent_account = SupplierAccount.get_or_create_for_order(
@@ -2255,8 +2254,8 @@ def return_approve(request, pk):
                         model_class=SupplierAccountDetail,  # 传递模型类以支持编号重用
                     )
 
-                    # 创建负应付明细
-                    negative_detail = SupplierAccountDetail.objects.create(
+                    # 创建负应付明细并过账到应付主单
+                    negative_detail = AccountsPayableLedger.record_detail(
                         detail_number=detail_number,
                         detail_type="return",  # 退货负应付
                         supplier=return_order.purchase_order.supplier,
@@ -2344,14 +2343,6 @@ def return_approve(request, pk):
             return_order.credit_note = credit_note
             return_order.save()
 
-        # 如果有已收货退货，自动归集应付主单
-        if total_refund > 0:
-            from finance.models import SupplierAccount
-
-            # 获取应付主单并自动归集
-            parent_account = SupplierAccount.get_or_create_for_order(return_order.purchase_order)
-            parent_account.aggregate_from_details()
-
         # 重新计算订单总金额
         return_order.purchase_order.calculate_totals()
 
@@ -0,0 +1,119 @@
+"""
+销售订单审核基准
+
+在回滚的事务中生成一批合成订单，分别用逐单 approve_order 和批量审核服务审核同样数量的订单，
+对比耗时和SQL查询数。不会留下任何数据。
+
+运行方式：python manage.py benchmark_order_approval --orders 1000 --items 3
+"""
+
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.customers.models import Customer, CustomerContact
+from apps.inventory.models import Warehouse
+from apps.products.models import Product
+from apps.sales.models import SalesOrder, SalesOrderItem
+from apps.sales.services.approval import BulkOrderApprovalService
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    """统计执行的SQL数（connection.queries_log 有9000条上限，不适合大批量）"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = "销售订单审核基准：逐单审核 vs 批量审核（数据在事务中回滚）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=1000, help="每种方式审核的订单数")
+        parser.add_argument("--items", type=int, default=3, help="每张订单的明细数")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options["orders"], options["items"])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def _run(self, count, items):
+        user = get_user_model().objects.create_user(username="benchmark_approval_user")
+        customer = Customer.objects.create(name="基准客户", code="BENCH-APPROVAL", created_by=user)
+        CustomerContact.objects.create(
+            customer=customer, name="联系人", mobile="13800000000", is_primary=True
+        )
+        Warehouse.objects.get_or_create(code="BENCH-WH", defaults={"name": "基准仓库"})
+        products = list(Product.objects.all()[:items])
+        if len(products) < items:
+            products += [
+                Product.objects.create(name=f"基准产品{index}", code=f"BENCH-P{index}")
+                for index in range(items - len(products))
+            ]
+
+        self.stdout.write(f"{count} 张订单 × {items} 条明细")
+        for run, (name, approve) in enumerate(
+            (("逐单审核", self._approve_each), ("批量审核", self._approve_bulk))
+        ):
+            orders = self._create_orders(f"BENCH-{run}-", count, customer, products, user)
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                started = time.perf_counter()
+                approve(orders, user)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{name}: 耗时 {elapsed:.2f}s，SQL {queries.count} 条"
+                    f"（每张订单 {queries.count / count:.1f} 条）"
+                )
+            )
+
+    @staticmethod
+    def _create_orders(prefix, count, customer, products, user):
+        orders = SalesOrder.objects.bulk_create(
+            SalesOrder(
+                order_number=f"{prefix}{index:06d}",
+                customer=customer,
+                order_date=timezone.now().date(),
+                status="pending",
+                created_by=user,
+            )
+            for index in range(count)
+        )
+        SalesOrderItem.objects.bulk_create(
+            SalesOrderItem(
+                order=order,
+                product=product,
+                quantity=2,
+                unit_price=Decimal("100.00"),
+                line_total=Decimal("200.00"),
+                created_by=user,
+            )
+            for order in orders
+            for product in products
+        )
+        return orders
+
+    @staticmethod
+    def _approve_each(orders, user):
+        for order in orders:
+            order.approve_order(user)
+
+    @staticmethod
+    def _approve_bulk(orders, user):
+        BulkOrderApprovalService(user).approve(orders)
@@ -6,6 +6,7 @@ from datetime import timedelta
 from decimal import Decimal
 
 from core.models import BaseModel
+from core.utils.query_optimization import sum_related
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.utils import timezone
@@ -147,15 +148,27 @@ class SalesOrder(BaseModel):
     def __str__(self):
         return f"{self.order_number} - {self.customer.name}"
 
+    # 参与金额计算的字段：save(update_fields=...) 不包含其中任何字段时不重新计算
+    TOTALS_INPUT_FIELDS = {"tax_rate", "discount_rate", "discount_amount", "shipping_cost"}
+    TOTALS_FIELDS = {"subtotal", "discount_amount", "tax_amount", "total_amount"}
+
     def save(self, *args, **kwargs):
         # Only calculate totals if this is an update (pk exists) or if explicitly requested
         # For new orders, totals will be calculated after items are added
         skip_calculate = kwargs.pop("skip_calculate", False)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not (
+            set(update_fields) & (self.TOTALS_INPUT_FIELDS | self.TOTALS_FIELDS)
+        ):
+            # 只更新状态等非金额字段
+            skip_calculate = True
         if not skip_calculate and self.pk:
             self.calculate_totals()
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | self.TOTALS_FIELDS
         super().save(*args, **kwargs)
 
-    def calculate_totals(self):
+    def calculate_totals(self, subtotal=None):
         """
         Calculate order totals.
         注意：本系统采用含税价格体系
@@ -163,6 +176,9 @@ class SalesOrder(BaseModel):
         - line_total 是含税行总计
         - total_amount 是含税总金额
         - tax_amount 从含税价反推得出（用于财务核算）
+
+        Args:
+            subtotal: 已汇总的明细含税小计（批量重算时传入），默认单次SUM聚合
         """
         # Safety check: only calculate if order has been saved (has pk)
         if not self.pk:
@@ -173,7 +189,9 @@ class SalesOrder(BaseModel):
             return
 
         # 1. 小计 = 所有行的含税总计之和
-        self.subtotal = sum([item.line_total for item in self.items.all()])
+        self.subtotal = (
+            subtotal if subtotal is not None else sum_related(self, "items", "line_total")
+        )
 
         # 2. 计算折扣
         # 如果设置了折扣率，则优先使用折扣率计算折扣金额
@@ -553,15 +571,27 @@ class Quote(BaseModel):
     def __str__(self):
         return f"{self.quote_number} - {self.customer.name}"
 
+    # 参与金额计算的字段：save(update_fields=...) 不包含其中任何字段时不重新计算
+    TOTALS_INPUT_FIELDS = {"tax_rate", "discount_amount", "currency", "exchange_rate"}
+    TOTALS_FIELDS = {"subtotal", "tax_amount", "total_amount", "total_amount_cny"}
+
     def save(self, *args, **kwargs):
         # Only calculate totals if this is an update (pk exists) or if explicitly requested
         # For new quotes, totals will be calculated after items are added
         skip_calculate = kwargs.pop("skip_calculate", False)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not (
+            set(update_fields) & (self.TOTALS_INPUT_FIELDS | self.TOTALS_FIELDS)
+        ):
+            # 只更新状态等非金额字段
+            skip_calculate = True
         if not skip_calculate and self.pk:
             self.calculate_totals()
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | self.TOTALS_FIELDS
         super().save(*args, **kwargs)
 
-    def calculate_totals(self):
+    def calculate_totals(self, subtotal=None):
         """
         Calculate quote totals.
         注意：本系统采用含税价格体系
@@ -571,6 +601,9 @@ class Quote(BaseModel):
         - tax_amount 从含税价反推得出（用于财务核算）
 
         注：支持明细行折扣和整单折扣
+
+        Args:
+            subtotal: 已汇总的明细含税小计（批量重算时传入），默认单次SUM聚合
         """
         # Safety check: only calculate if quote has been saved (has pk)
         if not self.pk:
@@ -582,7 +615,9 @@ class Quote(BaseModel):
             return
 
         # 1. 小计 = 所有行的含税总计之和（已包含明细行折扣）
-        self.subtotal = sum([item.line_total for item in self.items.all()])
+        self.subtotal = (
+            subtotal if subtotal is not None else sum_related(self, "items", "line_total")
+        )
 
         # 2. 整单折扣金额（从表单传入，不重置）
         # discount_amount is preserved from form input
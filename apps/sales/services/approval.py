@@ -0,0 +1,285 @@
+"""
+销售订单批量审核
+
+逐单调用 SalesOrder.approve_order 时，每张订单都要读取系统配置、默认仓库和客户主联系人，
+每个单据号约3次配置查询，发货明细和出库明细逐行插入，审核上千张平台导入订单需要数分钟。
+
+批量审核按块处理订单，每块在一个事务内：
+1. 锁定订单行，一次加载订单、明细、客户及客户主联系人
+2. 发货单号、出库单号各一次分配（DocumentNumberGenerator.generate_batch）
+3. bulk_create 发货单、发货明细、出库单、出库明细、应收账款，bulk_update 订单
+4. 批量写入不触发 post_save，通过 bump_version 通知依赖这些模型的缓存
+
+系统配置和默认仓库在整批开始时读取一次。生成的单据与逐单审核一致。
+"""
+
+import logging
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from core.models import SystemConfig
+from core.signals import bump_version
+from core.utils.document_number import DocumentNumberGenerator
+from customers.models import CustomerContact
+from django.db import transaction
+from django.db.models import Prefetch, QuerySet
+from django.utils import timezone
+from finance.models import CustomerAccount
+from inventory.models import OutboundOrder, OutboundOrderItem, Warehouse
+
+from ..models import Delivery, DeliveryItem, SalesOrder, SalesOrderItem
+
+logger = logging.getLogger(__name__)
+
+# 每个事务处理的订单数
+APPROVAL_CHUNK_SIZE = 200
+
+# 审核时更新的订单字段（含 save() 中重新计算的金额）
+ORDER_UPDATE_FIELDS = [
+    "approved_by",
+    "approved_at",
+    "status",
+    "subtotal",
+    "discount_amount",
+    "tax_amount",
+    "total_amount",
+    "updated_at",
+]
+
+PAYMENT_TERM_DAYS = {"net_30": 30, "net_60": 60}
+
+
+@dataclass
+class BulkApprovalResult:
+    """批量审核结果"""
+
+    approved: List[int] = field(default_factory=list)
+    skipped: Dict[int, str] = field(default_factory=dict)  # 订单ID -> 原因
+    deliveries: int = 0
+    accounts: int = 0
+
+
+class BulkOrderApprovalService:
+    """
+    销售订单批量审核服务
+
+    Example:
+        >>> service = BulkOrderApprovalService(request.user)
+        >>> result = service.approve(SalesOrder.objects.filter(status="pending"))
+        >>> len(result.approved), result.skipped
+    """
+
+    def __init__(
+        self,
+        approved_by_user,
+        warehouse=None,
+        auto_create_delivery: Optional[bool] = None,
+        chunk_size: int = APPROVAL_CHUNK_SIZE,
+    ):
+        """
+        Args:
+            approved_by_user: 审核人
+            warehouse: 发货仓库（默认第一个启用的仓库）
+            auto_create_delivery: 是否生成发货单和出库单（默认读取系统配置）
+            chunk_size: 每个事务处理的订单数
+        """
+        self.user = approved_by_user
+        self.warehouse = warehouse
+        self.auto_create_delivery = auto_create_delivery
+        self.chunk_size = chunk_size
+
+    def approve(self, orders: Iterable) -> BulkApprovalResult:
+        """
+        批量审核订单
+
+        已审核或没有明细的订单跳过并记录原因，不影响同一块内的其他订单。
+
+        Args:
+            orders: 订单ID、订单实例或订单查询集
+
+        Returns:
+            BulkApprovalResult: 审核结果
+
+        Raises:
+            ValueError: 需要生成发货单但没有可用仓库
+        """
+        if isinstance(orders, QuerySet):
+            order_ids = list(orders.values_list("pk", flat=True))
+        else:
+            order_ids = [getattr(order, "pk", order) for order in orders]
+        result = BulkApprovalResult()
+        if not order_ids:
+            return result
+
+        if self.auto_create_delivery is None:
+            config = SystemConfig.objects.filter(
+                key="sales_auto_create_delivery_on_approve", is_active=True
+            ).first()
+            self.auto_create_delivery = config.value.lower() == "true" if config else True
+
+        if self.auto_create_delivery and not self.warehouse:
+            self.warehouse = Warehouse.objects.filter(is_active=True).first()
+            if not self.warehouse:
+                raise ValueError("没有可用的仓库，请先创建仓库")
+
+        for start in range(0, len(order_ids), self.chunk_size):
+            self._approve_chunk(order_ids[start : start + self.chunk_size], result)
+
+        logger.info(
+            f"批量审核销售订单: 审核 {len(result.approved)} 张，跳过 {len(result.skipped)} 张，"
+            f"生成发货单 {result.deliveries} 张"
+        )
+        return result
+
+    @transaction.atomic
+    def _approve_chunk(self, order_ids: List[int], result: BulkApprovalResult):
+        # 锁定订单行，防止并发重复审核
+        locked_ids = list(
+            SalesOrder.objects.select_for_update()
+            .filter(pk__in=order_ids, is_deleted=False)
+            .values_list("pk", flat=True)
+        )
+        for order_id in set(order_ids) - set(locked_ids):
+            result.skipped[order_id] = "订单不存在"
+
+        orders = list(
+            SalesOrder.objects.filter(pk__in=locked_ids)
+            .select_related("customer")
+            .prefetch_related(
+                Prefetch("items", queryset=SalesOrderItem.objects.select_related("product")),
+                Prefetch(
+                    "customer__contacts",
+                    queryset=CustomerContact.objects.filter(is_primary=True),
+                    to_attr="primary_contacts",
+                ),
+            )
+            .order_by("pk")
+        )
+
+        approvable = []
+        for order in orders:
+            if order.approved_by_id:
+                result.skipped[order.pk] = "订单已经审核过了"
+            elif not order.items.all():
+                result.skipped[order.pk] = "订单没有明细，无法审核"
+            else:
+                approvable.append(order)
+        if not approvable:
+            return
+
+        now = timezone.now()
+        today = now.date()
+        for order in approvable:
+            order.approved_by = self.user
+            order.approved_at = now
+            order.status = "confirmed"
+            order.updated_at = now
+            order.calculate_totals()  # 使用预加载的明细，与 save() 一致
+        SalesOrder.objects.bulk_update(approvable, ORDER_UPDATE_FIELDS)
+
+        if self.auto_create_delivery:
+            self._create_deliveries(approvable, today)
+            result.deliveries += len(approvable)
+
+        accounts = []
+        for order in approvable:
+            days = PAYMENT_TERM_DAYS.get(order.payment_terms)
+            accounts.append(
+                CustomerAccount(
+                    customer=order.customer,
+                    sales_order=order,
+                    invoice_amount=order.total_amount,
+                    balance=order.total_amount,
+                    currency=order.currency,
+                    due_date=today + timedelta(days=days) if days else None,
+                    created_by=self.user,
+                )
+            )
+        CustomerAccount.objects.bulk_create(accounts)
+        result.accounts += len(accounts)
+
+        written = [SalesOrder, CustomerAccount]
+        if self.auto_create_delivery:
+            written += [Delivery, DeliveryItem, OutboundOrder, OutboundOrderItem]
+        bump_version(*written)
+        result.approved.extend(order.pk for order in approvable)
+
+    def _create_deliveries(self, orders: List[SalesOrder], today):
+        delivery_numbers = DocumentNumberGenerator.generate_batch("delivery", len(orders))
+        outbound_numbers = DocumentNumberGenerator.generate_batch("OBO", len(orders))
+
+        deliveries = []
+        outbound_orders = []
+        for order, delivery_number, outbound_number in zip(
+            orders, delivery_numbers, outbound_numbers
+        ):
+            primary_contact = (
+                order.customer.primary_contacts[0]
+                if not order.shipping_contact and order.customer.primary_contacts
+                else None
+            )
+            deliveries.append(
+                Delivery(
+                    delivery_number=delivery_number,
+                    sales_order=order,
+                    status="preparing",
+                    planned_date=order.required_date or today,
+                    shipping_address=order.shipping_address or order.customer.address,
+                    shipping_contact=order.shipping_contact
+                    or (primary_contact.name if primary_contact else ""),
+                    shipping_phone=order.shipping_phone
+                    or (primary_contact.mobile if primary_contact else ""),
+                    shipping_method=order.shipping_method,
+                    warehouse=self.warehouse,
+                    created_by=self.user,
+                )
+            )
+            outbound_orders.append(
+                OutboundOrder(
+                    order_number=outbound_number,
+                    warehouse=self.warehouse,
+                    order_type="sales",  # 销售出库
+                    status="pending",  # 待审核
+                    order_date=today,
+                    customer=order.customer,
+                    reference_number=order.order_number,
+                    reference_type="sales_order",
+                    reference_id=order.pk,
+                    notes=f"销售订单 {order.order_number} 审核自动生成",
+                    created_by=self.user,
+                )
+            )
+        Delivery.objects.bulk_create(deliveries)
+        OutboundOrder.objects.bulk_create(outbound_orders)
+
+        delivery_items = []
+        outbound_items = []
+        for order, delivery, outbound_order in zip(orders, deliveries, outbound_orders):
+            for order_item in order.items.all():
+                delivery_items.append(
+                    DeliveryItem(
+                        delivery=delivery,
+                        order_item=order_item,
+                        quantity=order_item.remaining_quantity,
+                        created_by=self.user,
+                    )
+                )
+                outbound_items.append(
+                    OutboundOrderItem(
+                        outbound_order=outbound_order,
+                        product=order_item.product,
+                        location=None,
+                        quantity=0,  # 初始为0,发货确认后更新
+                        batch_number="",
+                        notes="等待发货确认",
+                        created_by=self.user,
+                    )
+                )
+        DeliveryItem.objects.bulk_create(delivery_items, batch_size=1000)
+        OutboundOrderItem.objects.bulk_create(outbound_items, batch_size=1000)
+
+
+def bulk_approve_orders(orders, approved_by_user, **kwargs) -> BulkApprovalResult:
+    """批量审核销售订单（便捷函数）"""
+    return BulkOrderApprovalService(approved_by_user, **kwargs).approve(orders)
@@ -0,0 +1,185 @@
+"""
+Sales模块 - 批量审核测试
+测试批量审核生成的单据与逐单审核一致，以及查询次数不随订单数增长
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from ai_assistant.services.cache_service import CacheService
+from core.models import SystemConfig
+from core.utils.document_number import DocumentNumberGenerator
+from customers.models import Customer, CustomerContact
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from finance.models import CustomerAccount
+from inventory.models import OutboundOrder, OutboundOrderItem, Warehouse
+from products.models import Product, ProductCategory, Unit
+from sales.models import Delivery, DeliveryItem, SalesOrder, SalesOrderItem
+from sales.services.approval import BulkOrderApprovalService
+
+User = get_user_model()
+
+
+class BulkOrderApprovalTest(TestCase):
+    """批量审核测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="approver", password="testpass123")
+        self.customer = Customer.objects.create(
+            name="测试客户", code="CUS001", address="上海市测试路1号", created_by=self.user
+        )
+        CustomerContact.objects.create(
+            customer=self.customer,
+            name="张三",
+            mobile="13800138000",
+            is_primary=True,
+            created_by=self.user,
+        )
+        self.warehouse = Warehouse.objects.create(name="主仓库", code="WH001", created_by=self.user)
+        category = ProductCategory.objects.create(name="设备", code="EQ", created_by=self.user)
+        unit = Unit.objects.create(name="台", symbol="台", created_by=self.user)
+        self.products = [
+            Product.objects.create(
+                name=f"产品{index}",
+                code=f"PRD{index}",
+                category=category,
+                unit=unit,
+                created_by=self.user,
+            )
+            for index in range(2)
+        ]
+        SystemConfig.objects.create(
+            key="sales_auto_create_delivery_on_approve", value="true", is_active=True
+        )
+
+    def create_order(self, index, items=2, **kwargs):
+        order = SalesOrder.objects.create(
+            order_number=f"SO{index:04d}",
+            customer=self.customer,
+            order_date=date(2026, 1, 1),
+            payment_terms="net_30",
+            created_by=self.user,
+            **kwargs,
+        )
+        for product in self.products[:items]:
+            SalesOrderItem.objects.create(
+                order=order,
+                product=product,
+                quantity=3,
+                unit_price=Decimal("113.00"),
+                created_by=self.user,
+            )
+        return order
+
+    def snapshot(self, order):
+        """审核生成的单据（不含单号和时间）"""
+        order.refresh_from_db()
+        delivery = Delivery.objects.get(sales_order=order)
+        outbound = OutboundOrder.objects.get(reference_type="sales_order", reference_id=order.pk)
+        account = CustomerAccount.objects.get(sales_order=order)
+        return {
+            "order": (order.status, order.approved_by_id, order.total_amount, order.tax_amount),
+            "delivery": (
+                delivery.status,
+                delivery.shipping_address,
+                delivery.shipping_contact,
+                delivery.shipping_phone,
+                delivery.warehouse_id,
+                sorted(DeliveryItem.objects.filter(delivery=delivery).values_list("quantity")),
+            ),
+            "outbound": (
+                outbound.status,
+                outbound.order_type,
+                outbound.reference_number == order.order_number,
+                outbound.notes == f"销售订单 {order.order_number} 审核自动生成",
+                sorted(
+                    OutboundOrderItem.objects.filter(outbound_order=outbound).values_list(
+                        "product_id", "quantity", "notes"
+                    )
+                ),
+            ),
+            "account": (
+                account.invoice_amount,
+                account.balance,
+                account.due_date,
+                account.currency,
+            ),
+        }
+
+    def test_matches_single_order_approval(self):
+        """批量审核生成的发货单、出库单、应收账款与逐单审核一致"""
+        single = self.create_order(1)
+        single.approve_order(self.user)
+        bulk = self.create_order(2)
+
+        result = BulkOrderApprovalService(self.user).approve([bulk.pk])
+
+        self.assertEqual(result.approved, [bulk.pk])
+        self.assertEqual((result.deliveries, result.accounts), (1, 1))
+        self.assertEqual(self.snapshot(bulk), self.snapshot(single))
+        self.assertEqual(self.snapshot(bulk)["order"][2], Decimal("678.00"))
+
+    def test_skips_approved_and_empty_orders(self):
+        """已审核、无明细的订单跳过，其余订单正常审核"""
+        approved = self.create_order(1)
+        approved.approve_order(self.user)
+        empty = self.create_order(2, items=0)
+        pending = self.create_order(3)
+
+        result = BulkOrderApprovalService(self.user).approve(
+            SalesOrder.objects.filter(pk__in=[approved.pk, empty.pk, pending.pk])
+        )
+
+        self.assertEqual(result.approved, [pending.pk])
+        self.assertEqual(
+            result.skipped,
+            {approved.pk: "订单已经审核过了", empty.pk: "订单没有明细，无法审核"},
+        )
+        self.assertEqual(Delivery.objects.filter(sales_order=empty).count(), 0)
+
+    def test_query_count_independent_of_order_count(self):
+        """查询次数不随订单数增长，单据号连续分配"""
+        # 首次审核会创建单号序列行，先审核一张订单
+        BulkOrderApprovalService(self.user).approve([self.create_order(0)])
+        small = [self.create_order(index).pk for index in range(1, 3)]
+        large = [self.create_order(index).pk for index in range(10, 30)]
+
+        with CaptureQueriesContext(connection) as small_queries:
+            BulkOrderApprovalService(self.user).approve(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            BulkOrderApprovalService(self.user).approve(large)
+
+        self.assertEqual(len(large_queries), len(small_queries))
+        numbers = list(
+            Delivery.objects.filter(sales_order_id__in=large)
+            .order_by("sales_order_id")
+            .values_list("delivery_number", flat=True)
+        )
+        self.assertEqual(len(set(numbers)), 20)
+        self.assertEqual(numbers, sorted(numbers))
+        # 后续单号从批量分配之后继续
+        self.assertGreater(DocumentNumberGenerator.generate("delivery"), numbers[-1])
+
+    def test_without_delivery(self):
+        """关闭自动发货时只生成应收账款"""
+        order = self.create_order(1)
+        result = BulkOrderApprovalService(self.user, auto_create_delivery=False).approve([order])
+
+        self.assertEqual((result.deliveries, result.accounts), (0, 1))
+        self.assertFalse(Delivery.objects.filter(sales_order=order).exists())
+        self.assertTrue(CustomerAccount.objects.filter(sales_order=order).exists())
+
+    def test_bumps_cache_versions_on_commit(self):
+        """批量写入不触发 post_save，审核事务提交后递增订单的缓存版本号"""
+        order = self.create_order(1)
+        key = CacheService.model_version_key("sales.SalesOrder")
+        cache.set(key, 1, None)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BulkOrderApprovalService(self.user).approve([order])
+
+        self.assertEqual(cache.get(key), 2)
@@ -0,0 +1,170 @@
+"""
+Sales模块 - 单据金额计算测试
+测试聚合计算小计、按 update_fields 跳过重算和批量重算命令
+"""
+
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from customers.models import Customer
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from products.models import Product, ProductCategory, Unit
+from sales.models import Quote, QuoteItem, SalesOrder, SalesOrderItem
+
+User = get_user_model()
+
+
+class OrderTotalsTest(TestCase):
+    """订单金额计算测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="sales", password="testpass123")
+        self.customer = Customer.objects.create(name="测试客户", code="CUS001", created_by=self.user)
+        category = ProductCategory.objects.create(name="设备", code="EQ", created_by=self.user)
+        unit = Unit.objects.create(name="台", symbol="台", created_by=self.user)
+        self.product = Product.objects.create(
+            name="产品", code="PRD001", category=category, unit=unit, created_by=self.user
+        )
+        self.order = SalesOrder.objects.create(
+            order_number="SO0001",
+            customer=self.customer,
+            order_date=date(2026, 1, 1),
+            tax_rate=Decimal("13"),
+            created_by=self.user,
+        )
+        for price in ("113.00", "226.00", "339.00"):
+            SalesOrderItem.objects.create(
+                order=self.order,
+                product=self.product,
+                quantity=1,
+                unit_price=Decimal(price),
+                created_by=self.user,
+            )
+
+    def test_subtotal_aggregated_in_one_query(self):
+        """小计通过一次SUM聚合计算，不加载明细"""
+        with self.assertNumQueries(1):
+            self.order.calculate_totals()
+        self.assertEqual(self.order.subtotal, Decimal("678.00"))
+        self.assertEqual(self.order.tax_amount.quantize(Decimal("0.01")), Decimal("78.00"))
+
+        # 已预加载明细时不再查询
+        order = SalesOrder.objects.prefetch_related("items").get(pk=self.order.pk)
+        with self.assertNumQueries(0):
+            order.calculate_totals()
+        self.assertEqual(order.subtotal, Decimal("678.00"))
+
+    def test_status_only_save_skips_recalculation(self):
+        """update_fields 不含金额字段时不重算"""
+        self.order.status = "confirmed"
+        with self.assertNumQueries(1):
+            self.order.save(update_fields=["status"])
+
+        self.order.discount_rate = Decimal("10")
+        self.order.save(update_fields=["discount_rate"])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.discount_amount, Decimal("67.80"))
+        self.assertEqual(self.order.total_amount, Decimal("610.20"))
+
+    def test_recompute_command(self):
+        """批量重算只更新金额不一致的单据，dry-run 不写入"""
+        self.order.save()
+        quote = Quote.objects.create(
+            quote_number="SQ0001",
+            customer=self.customer,
+            quote_date=date(2026, 1, 1),
+            valid_until=date(2026, 2, 1),
+            created_by=self.user,
+        )
+        QuoteItem.objects.create(
+            quote=quote,
+            product=self.product,
+            quantity=2,
+            unit_price=Decimal("50.00"),
+            created_by=self.user,
+        )
+        quote.save()
+        # 绕过 save() 修改税率，模拟税率调整
+        SalesOrder.objects.filter(pk=self.order.pk).update(tax_rate=Decimal("9"))
+
+        out = StringIO()
+        call_command(
+            "recompute_document_totals",
+            "--documents",
+            "sales_order",
+            "quote",
+            "--dry-run",
+            stdout=out,
+        )
+        self.assertIn("检查 1 张，需要更新 1 张", out.getvalue())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.tax_amount, Decimal("78.00"))
+
+        out = StringIO()
+        call_command("recompute_document_totals", "--tax-rate", "9", stdout=out)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.tax_amount, Decimal("55.98"))
+        self.assertEqual(self.order.total_amount, Decimal("678.00"))
+        self.assertIn("检查 1 张，已更新 1 张", out.getvalue())
+
+    def test_recompute_skips_approved_documents_by_default(self):
+        """已审核单据的金额已计入应收，默认不重算，显式包含时才重算"""
+        self.order.save()
+        SalesOrder.objects.filter(pk=self.order.pk).update(
+            status="confirmed", tax_rate=Decimal("9")
+        )
+
+        out = StringIO()
+        call_command("recompute_document_totals", "--documents", "sales_order", stdout=out)
+        self.assertIn("检查 0 张", out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command(
+                "recompute_document_totals",
+                "--documents",
+                "sales_order",
+                "--status",
+                "confirmed",
+                stdout=StringIO(),
+            )
+
+        call_command(
+            "recompute_document_totals",
+            "--documents",
+            "sales_order",
+            "--include-approved",
+            stdout=StringIO(),
+        )
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.tax_amount, Decimal("55.98"))
+
+    def test_recompute_accepts_closed_statuses(self):
+        """已取消单据未入账，可用 --status 指定重算；未知状态单独报错"""
+        self.order.save()
+        SalesOrder.objects.filter(pk=self.order.pk).update(
+            status="cancelled", tax_rate=Decimal("9")
+        )
+
+        call_command(
+            "recompute_document_totals",
+            "--documents",
+            "sales_order",
+            "--status",
+            "cancelled",
+            stdout=StringIO(),
+        )
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.tax_amount, Decimal("55.98"))
+
+        with self.assertRaisesMessage(CommandError, "没有状态 canceled"):
+            call_command(
+                "recompute_document_totals",
+                "--documents",
+                "sales_order",
+                "--status",
+                "canceled",
+                stdout=StringIO(),
+            )
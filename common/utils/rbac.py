@@ -2,13 +2,14 @@
 RBAC decorators and utility functions.
 
 This module provides decorators for role and permission checking.
+Role models are imported when a check runs, so importing common.utils
+does not require them.
 """
 
 from functools import wraps
 
 from django.contrib.auth import get_user_model
 from django.http import JsonResponse
-from users.models import Permission, UserRole
 
 User = get_user_model()
 
@@ -29,6 +30,8 @@ def require_roles(*role_codes):
             if not request.user or not request.user.is_authenticated:
                 return JsonResponse({"error": "未登录或认证失败"}, status=401)
 
+            from users.models import UserRole
+
             user_roles = UserRole.objects.filter(
                 user=request.user, role__code__in=role_codes, is_active=True
             )
@@ -59,6 +62,8 @@ def require_permissions(*permission_codes):
             if not request.user or not request.user.is_authenticated:
                 return JsonResponse({"error": "未登录或认证失败"}, status=401)
 
+            from users.models import Permission
+
             user_permissions = Permission.objects.filter(
                 userrole__user=request.user,
                 userrole__is_active=True,
@@ -87,6 +92,8 @@ def has_role(user, role_code):
     Returns:
         bool: True if user has the role
     """
+    from users.models import UserRole
+
     return UserRole.objects.filter(user=user, role__code=role_code, is_active=True).exists()
 
 
@@ -101,6 +108,8 @@ def has_permission(user, permission_code):
     Returns:
         bool: True if user has the permission
     """
+    from users.models import Permission
+
     return Permission.objects.filter(
         userrole__user=user,
         userrole__is_active=True,
@@ -119,6 +128,8 @@ def get_user_roles(user):
     Returns:
         QuerySet: User's active roles
     """
+    from users.models import UserRole
+
     return UserRole.objects.filter(user=user, is_active=True).select_related("role")
 
 
@@ -132,6 +143,8 @@ def get_user_permissions(user):
     Returns:
         QuerySet: User's permissions
     """
+    from users.models import Permission
+
     return Permission.objects.filter(
         userrole__user=user,
         userrole__is_active=True,
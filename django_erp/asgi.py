@@ -1,11 +1,31 @@
 """
-ASGI config for better_laser_erp project.
+ASGI config for django_erp project.
+
+BI_REALTIME_ENABLED=True 时挂载BI实时大屏的 WebSocket 路由（需要安装 channels）。
 """
 
 import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "better_laser_erp.settings")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_erp.settings")
+
+# 先初始化 Django，再导入依赖模型的 WebSocket 路由
+django_asgi_app = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.BI_REALTIME_ENABLED:
+    from channels.auth import AuthMiddlewareStack
+    from channels.routing import ProtocolTypeRouter, URLRouter
+
+    from apps.bi.realtime.routing import websocket_urlpatterns
 
-application = get_asgi_application()
+    application = ProtocolTypeRouter(
+        {
+            "http": django_asgi_app,
+            "websocket": AuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
+        }
+    )
+else:
+    application = django_asgi_app
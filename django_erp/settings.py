@@ -556,12 +556,50 @@ CELERY_BEAT_SCHEDULE = {
         "schedule": crontab(minute="*/30"),  # 每30分钟
         "options": {"expires": 1800},
     },
+    # 媒体文件垃圾回收
+    "collect-media-garbage": {
+        "task": "core.tasks.collect_media_garbage",
+        "schedule": crontab(hour=4, minute=30),  # 每天凌晨4点半
+        "options": {"expires": 3600},
+    },
+    # 往来账龄快照
+    "snapshot-account-aging": {
+        "task": "finance.tasks.snapshot_account_aging",
+        "schedule": crontab(hour=0, minute=30),  # 每天凌晨0点半
+        "options": {"expires": 3600},
+    },
+    # 商品需求预测
+    "forecast-product-demand": {
+        "task": "apps.bi.tasks.forecast_product_demand",
+        "schedule": crontab(hour=3, minute=0),  # 每天凌晨3点
+        "options": {"expires": 7200},
+    },
 }
 
 # AI Assistant Configuration
 # AI助手异步处理配置
 AI_ASSISTANT_USE_ASYNC = config("AI_ASSISTANT_USE_ASYNC", default=False, cast=bool)
 
+# BI实时大屏配置
+# 启用后绑定订单/库存变更信号、WebSocket路由（django_erp/asgi.py）和聚合校正任务，需要安装 channels
+BI_REALTIME_ENABLED = config("BI_REALTIME_ENABLED", default=False, cast=bool)
+
+if BI_REALTIME_ENABLED:
+    ASGI_APPLICATION = "django_erp.asgi.application"
+    CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+    if REDIS_HOST:
+        # 多进程部署必须使用 Redis 通道层，分组推送才能到达所有连接
+        CHANNEL_LAYERS["default"] = {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [f"redis://{REDIS_HOST}:{REDIS_PORT}/2"]},
+        }
+    # BI实时大屏聚合校正（批量写入不触发信号）
+    CELERY_BEAT_SCHEDULE["rebuild-bi-realtime-aggregates"] = {
+        "task": "apps.bi.tasks.rebuild_realtime_aggregates",
+        "schedule": crontab(minute="*/10"),  # 每10分钟
+        "options": {"expires": 600},
+    }
+
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB